@@ -39,7 +39,8 @@ class Arc_KDTree(scipy.spatial.KDTree):
         """
         self.radius = radius
         self.circumference = 2 * math.pi * radius
-        scipy.spatial.KDTree.__init__(self, map(sphere.toXYZ, data), leafsize)
+        scipy.spatial.KDTree.__init__(self, sphere.toXYZ(numpy.asarray(data, float)),
+                                     leafsize)
 
     def _toXYZ(self, x):
         if not issubclass(type(x), numpy.ndarray):
@@ -51,7 +52,7 @@ class Arc_KDTree(scipy.spatial.KDTree):
         elif len(x.shape) == 1:
             x = numpy.array(sphere.toXYZ(x))
         else:
-            x = map(sphere.toXYZ, x)
+            x = sphere.toXYZ(x)
         return x
 
     def count_neighbors(self, other, r, p=2):
@@ -110,16 +111,7 @@ class Arc_KDTree(scipy.spatial.KDTree):
                 distance_upper_bound, self.radius)
         d, i = scipy.spatial.KDTree.query(self, self._toXYZ(x), k,
                                           eps=eps, distance_upper_bound=distance_upper_bound)
-        dims = len(d.shape)
-        r = self.radius
-        if dims == 0:
-            return sphere.linear2arcdist(d, r), i
-        if dims == 1:
-            #TODO: implement linear2arcdist on numpy arrays
-            d = [sphere.linear2arcdist(x, r) for x in d]
-        elif dims == 2:
-            d = [[sphere.linear2arcdist(x, r) for x in row] for row in d]
-        return numpy.array(d), i
+        return sphere.linear2arcdist(d, self.radius), i
 
     def query_ball_point(self, x, r, p=2, eps=0):
         """
@@ -230,10 +222,8 @@ class Arc_KDTree(scipy.spatial.KDTree):
         D = scipy.spatial.KDTree.sparse_distance_matrix(
             self, other, max_distance)
         D = D.tocoo()
-        #print D.data
-        a2l = lambda x: sphere.linear2arcdist(x, self.radius)
-        #print map(a2l,D.data)
-        return scipy.sparse.coo_matrix((map(a2l, D.data), (D.row, D.col))).todok()
+        d = sphere.linear2arcdist(numpy.asarray(D.data, float), self.radius)
+        return scipy.sparse.coo_matrix((d, (D.row, D.col))).todok()
 
 
 def KDTree(data, leafsize=10, distance_metric='Euclidean', radius=1.0):
@@ -9,6 +9,7 @@ import math
 import random
 import numpy
 import scipy.spatial
+import scipy.spatial.distance
 import scipy.constants
 from scipy.spatial.distance import euclidean
 from math import pi, cos, sin, asin
@@ -50,6 +51,8 @@ def arcdist2linear(arc_dist, radius=RADIUS_EARTH_KM):
     2.0
     """
     c = 2 * math.pi * radius
+    if isinstance(arc_dist, numpy.ndarray):
+        return numpy.sqrt(2 - 2 * numpy.cos(numpy.radians((arc_dist * 360.0) / c)))
     d = (2 - (2 * math.cos(math.radians((arc_dist * 360.0) / c)))) ** (0.5)
     return d
 
@@ -64,7 +67,22 @@ def linear2arcdist(linear_dist, radius=RADIUS_EARTH_KM):
     >>> d = arcdist(pt0,pt1,RADIUS_EARTH_MILES)
     >>> d == linear2arcdist(2.0, radius = RADIUS_EARTH_MILES)
     True
+
+    Arrays of distances are converted at once, infinite distances are kept
+    and rounding errors above the diameter are clipped
+
+    >>> d = linear2arcdist(numpy.array([0, 2.0, numpy.inf]), RADIUS_EARTH_MILES)
+    >>> d[1] == math.pi*RADIUS_EARTH_MILES
+    True
+    >>> d[2]
+    inf
     """
+    if isinstance(linear_dist, numpy.ndarray):
+        c = 2 * math.pi * radius
+        a2 = linear_dist ** 2
+        theta = numpy.degrees(numpy.arccos(numpy.clip((2 - a2) / 2., -1, 1)))
+        d = (theta * c) / 360.0
+        return numpy.where(numpy.isinf(linear_dist), numpy.inf, d)
     if linear_dist == float('inf'):
         return float('inf')
     elif linear_dist > 2.0:
@@ -81,7 +99,24 @@ def toXYZ(pt):
         REASON: pi = 180 degrees,
                 theta+(pi/2)....
                 theta = 90 degrees,
-                180 =  90+180/2"""
+                180 =  90+180/2
+
+    An n x 2 array of points is converted at once into an n x 3 array
+
+    >>> xyz = toXYZ(numpy.array([(0, 0), (180, 0), (0, 90)]))
+    >>> xyz.shape
+    (3, 3)
+    >>> numpy.allclose(xyz[1], toXYZ((180, 0)))
+    True
+    """
+    if numpy.ndim(pt) == 2:
+        pt = numpy.radians(numpy.asarray(pt, float))
+        phi = pt[:, 0] + pi
+        theta = pt[:, 1] + (pi / 2)
+        sin_theta = numpy.sin(theta)
+        return numpy.column_stack((sin_theta * numpy.cos(phi),
+                                   sin_theta * numpy.sin(phi),
+                                   numpy.cos(theta)))
     phi, theta = map(math.radians, pt)
     phi, theta = phi + pi, theta + (pi / 2)
     x = 1 * sin(theta) * cos(phi)
@@ -108,45 +143,32 @@ def brute_knn(pts, k, mode='arc'):
     """
     valid modes are ['arc','xrz']
     """
-    n = len(pts)
-    full = numpy.zeros((n, n))
-    for i in xrange(n):
-        for j in xrange(i + 1, n):
-            if mode == 'arc':
-                lng0, lat0 = pts[i]
-                lng1, lat1 = pts[j]
-                dist = arcdist(pts[i], pts[j], radius=RADIUS_EARTH_KM)
-            elif mode == 'xyz':
-                dist = euclidean(pts[i], pts[j])
-            full[i, j] = dist
-            full[j, i] = dist
-    w = {}
-    for i in xrange(n):
-        w[i] = full[i].argsort()[1:k + 1].tolist()
-    return w
+    pts = numpy.asarray(pts, float)
+    if mode == 'arc':
+        pts = toXYZ(pts)
+    # the chord and arc distances rank the points in the same order
+    full = scipy.spatial.distance.cdist(pts, pts)
+    numpy.fill_diagonal(full, 0)
+    nn = full.argsort(axis=1)[:, 1:k + 1]
+    return dict(enumerate(nn.tolist()))
 
 
 def fast_knn(pts, k, return_dist=False):
     pts = numpy.array(pts)
-    kd = scipy.spatial.KDTree(pts)
+    kd = scipy.spatial.cKDTree(pts)
     d, w = kd.query(pts, k + 1)
     w = w[:, 1:]
-    wn = {}
-    for i in xrange(len(pts)):
-        wn[i] = w[i].tolist()
+    wn = dict(enumerate(w.tolist()))
     if return_dist:
-        d = d[:, 1:]
-        wd = {}
-        for i in xrange(len(pts)):
-            wd[i] = [linear2arcdist(x,
-                                    radius=RADIUS_EARTH_MILES) for x in d[i].tolist()]
+        d = linear2arcdist(d[:, 1:], radius=RADIUS_EARTH_MILES)
+        wd = dict(enumerate(d.tolist()))
         return wn, wd
     return wn
 
 
 def fast_threshold(pts, dist, radius=RADIUS_EARTH_KM):
     d = arcdist2linear(dist, radius)
-    kd = scipy.spatial.KDTree(pts)
+    kd = scipy.spatial.cKDTree(pts)
     r = kd.query_ball_tree(kd, d)
     wd = {}
     for i in xrange(len(pts)):
@@ -18,3 +18,4 @@ import mat
 import mtx
 import stata_txt
 import wk1
+import wnpz
@@ -82,66 +82,32 @@ class GalIO(FileIO.FileIO):
         462
 
         """
+        if self.pos > 0:
+            raise StopIteration
+        ids, counts, neighbors = _gal_arrays(self.file, self.data_type)
+        self.pos += 1
+        n = len(ids)
         if self._sparse:
-            if self.pos > 0:
-                raise StopIteration
-
-            header = self.file.readline().strip().split()
-            header_n = len(header)
-            n = int(header[0])
-            if header_n > 1:
-                n = int(header[1])
-            ids = []
-            idsappend = ids.append
-            row = []
-            extend = row.extend    # avoid dot in loops
-            col = []
-            append = col.append
-            counter = 0
-            typ = self.data_type
-            for i in xrange(n):
-                id, n_neighbors = self.file.readline().strip().split()
-                id = typ(id)
-                n_neighbors = int(n_neighbors)
-                neighbors_i = map(typ, self.file.readline().strip().split())
-                nn = len(neighbors_i)
-                extend([id] * nn)
-                counter += nn
-                for id_neigh in neighbors_i:
-                    append(id_neigh)
-                idsappend(id)
-            self.pos += 1
-            row = np.array(row)
-            col = np.array(col)
-            data = np.ones(counter)
-            ids = np.unique(row)
-            row = np.array([np.where(ids == j)[0] for j in row]).flatten()
-            col = np.array([np.where(ids == j)[0] for j in col]).flatten()
+            # rows and columns follow the sorted ids
+            keys = np.unique(ids)
+            row = _id_positions(keys, np.repeat(ids, counts))
+            col = _id_positions(keys, neighbors)
+            data = np.ones(len(col))
             spmat = sparse.csr_matrix((data, (row, col)), shape=(n, n))
             return WSP(spmat)
 
         else:
-            if self.pos > 0:
-                raise StopIteration
-            neighbors = {}
-            ids = []
-            # handle case where more than n is specified in first line
-            header = self.file.readline().strip().split()
-            header_n = len(header)
-            n = int(header[0])
-            if header_n > 1:
-                n = int(header[1])
-            w = {}
-            typ = self.data_type
-            for i in range(n):
-                id, n_neighbors = self.file.readline().strip().split()
-                id = typ(id)
-                n_neighbors = int(n_neighbors)
-                neighbors_i = map(typ, self.file.readline().strip().split())
-                neighbors[id] = neighbors_i
-                ids.append(id)
-            self.pos += 1
-            return W(neighbors, id_order=ids)
+            id_order = ids.tolist()
+            row = np.repeat(np.arange(n), counts)
+            col = _id_positions(ids, neighbors)
+            neighbors, weights = _csr_lists(id_order, row, col,
+                                            np.ones(len(col)))
+            w = W(neighbors, id_order=id_order)
+            # the CSR arrays are already at hand
+            w._sparse = sparse.csr_matrix((np.ones(len(col)), (row, col)),
+                                          shape=(n, n))
+            w._cache['sparse'] = w._sparse
+            return w
 
     def write(self, obj):
         """
@@ -216,3 +182,101 @@ class GalIO(FileIO.FileIO):
         FileIO.FileIO.close(self)
 
 
+def _gal_arrays(f, typ):
+    """
+    Parse the body of a GAL file in bulk
+
+    Parameters
+    ----------
+    f         : file
+                open GAL file, positioned at its start
+    typ       : callable
+                type of the ids
+
+    Returns
+    -------
+    ids       : array
+                (n,) ids of the observations in file order
+    counts    : array
+                (n,) number of neighbors of each observation
+    neighbors : array
+                ids of the neighbors of all the observations, concatenated
+    """
+    header = f.readline().strip().split()
+    n = int(header[0])
+    # handle case where more than n is specified in first line
+    if len(header) > 1:
+        n = int(header[1])
+    lines = f.read().splitlines()
+    heads = ' '.join(lines[0:2 * n:2]).split()
+    tokens = ' '.join(lines[1:2 * n:2]).split()
+    try:
+        counts = np.array(heads[1::2]).astype(int)
+        aligned = len(heads) == 2 * n and counts.sum() == len(tokens)
+    except ValueError:
+        aligned = False
+    if not aligned:
+        # some neighbor lines are missing, walk the records using the
+        # number of neighbors given for each observation
+        tokens = ' '.join(lines).split()
+        ids = []
+        counts = np.zeros(n, int)
+        neighbors = []
+        pos = 0
+        for i in xrange(n):
+            ids.append(tokens[pos])
+            counts[i] = k = int(tokens[pos + 1])
+            neighbors.extend(tokens[pos + 2:pos + 2 + k])
+            pos += 2 + k
+        tokens = neighbors
+    else:
+        ids = heads[0::2]
+    return _as_ids(ids, typ), counts, _as_ids(tokens, typ)
+
+
+def _as_ids(tokens, typ):
+    """
+    Array of the ids in the list of strings tokens, converted to typ
+    """
+    if typ is str:
+        return np.array(tokens, str)
+    if typ in (int, long, float):
+        return np.array(tokens, str).astype(typ)
+    return np.array(map(typ, tokens))
+
+
+def _id_positions(keys, values):
+    """
+    Position in keys of each of the values
+
+    Raises ValueError if some of the values are not in keys
+    """
+    keys = np.asarray(keys)
+    values = np.asarray(values)
+    if not len(values):
+        return np.zeros(0, int)
+    sorter = np.argsort(keys, kind='mergesort')
+    pos = np.searchsorted(keys, values, sorter=sorter)
+    pos[pos == len(keys)] = 0
+    pos = sorter[pos]
+    if (keys[pos] != values).any():
+        raise ValueError("Neighbor ids not found among the observation ids")
+    return pos
+
+
+def _csr_lists(ids, row, col, data):
+    """
+    neighbors and weights dictionaries of W from the links (row, col) with
+    weights data, rows and columns being positions in the list ids. The
+    links of each observation keep their order.
+    """
+    n = len(ids)
+    order = np.argsort(row, kind='mergesort')
+    bounds = np.bincount(row, minlength=n).cumsum()[:-1]
+    id_array = np.empty(n, object)
+    id_array[:] = ids
+    neighbors = np.split(id_array[col[order]], bounds)
+    weights = np.split(np.asarray(data, float)[order], bounds)
+    neighbors = dict(zip(ids, [nb.tolist() for nb in neighbors]))
+    weights = dict(zip(ids, [wt.tolist() for wt in weights]))
+    return neighbors, weights
@@ -2,7 +2,10 @@ import pysal
 import os.path
 import pysal.core.FileIO as FileIO
 from pysal.weights import W
+from pysal.core.IOHandlers.gal import _as_ids, _id_positions, _csr_lists
+from scipy import sparse
 from warnings import warn
+import numpy as np
 
 __author__ = "Charles R Schmidt <schmidtc@gmail.com>"
 __all__ = ["GwtIO"]
@@ -68,6 +71,30 @@ class GwtIO(FileIO.FileIO):
             self.file.seek(0)
             self.pos = 0
 
+    def _readarrays(self, id_type, id_order=None):
+        """
+        Reads the main body of gwt-like weights files in bulk into the
+        links of the weights: the ids, and for every link the positions of
+        its two ids in the ids and its weight. Without id_order the ids
+        are those of the first column, in order of first appearance. A link
+        listed more than once keeps its last weight.
+        """
+        tokens = self.file.read().split()
+        i = _as_ids(tokens[0::3], id_type)
+        j = _as_ids(tokens[1::3], id_type)
+        v = np.array(tokens[2::3], str).astype(float)
+        if id_order is None:
+            first = np.unique(i, return_index=True)[1]
+            id_order = i[np.sort(first)].tolist()
+        row = _id_positions(id_order, i)
+        col = _id_positions(id_order, j)
+        key = row * len(id_order) + col
+        last = len(key) - 1 - np.unique(key[::-1], return_index=True)[1]
+        if len(last) < len(key):
+            keep = np.sort(last)
+            row, col, v = row[keep], col[keep], v[keep]
+        return id_order, row, col, v
+
     def _readlines(self, id_type, ret_ids=False):
         """
         Reads the main body of gwt-like weights files
@@ -77,21 +104,8 @@ class GwtIO(FileIO.FileIO):
         So, for code reusability, this part is separated out from
         _read function by Myunghwa Hwang.
         """
-        data = [row.strip().split() for row in self.file.readlines()]
-        ids = filter(unique_filter(), [x[0] for x in data])
-        ids = map(id_type, ids)
-        WN = {}
-        for id in ids:  # note: fromkeys is no good here, all keys end up sharing the say dict value
-            WN[id] = {}
-        for i, j, v in data:
-            i = id_type(i)
-            j = id_type(j)
-            WN[i][j] = float(v)
-        weights = {}
-        neighbors = {}
-        for i in WN:
-            weights[i] = WN[i].values()
-            neighbors[i] = WN[i].keys()
+        ids, row, col, v = self._readarrays(id_type)
+        neighbors, weights = _csr_lists(ids, row, col, v)
         if ret_ids:
             return weights, neighbors, ids
         else:
@@ -152,13 +166,14 @@ class GwtIO(FileIO.FileIO):
         self.n = n
         self.shp = shp
         self.id_var = id_var
-        if id_order is None:
-            weights, neighbors, id_order = self._readlines(id_type, True)
-        else:
-            weights, neighbors = self._readlines(id_type)
+        id_order, row, col, v = self._readarrays(id_type, id_order)
+        neighbors, weights = _csr_lists(id_order, row, col, v)
 
         self.pos += 1
         w = W(neighbors, weights, id_order)
+        n = len(id_order)
+        w._sparse = sparse.csr_matrix((v, (row, col)), shape=(n, n))
+        w._cache['sparse'] = w._sparse
         #w.transform = 'b'
         #set meta data
         w._shpName = self.shpName
@@ -2,7 +2,9 @@ import pysal.core.Tables
 import datetime
 import struct
 import itertools
+import mmap
 from warnings import warn
+import numpy as np
 import pysal
 
 __author__ = "Charles R Schmidt <schmidtc@gmail.com>"
@@ -106,50 +108,97 @@ class DBF(pysal.core.Tables.DataTable):
         """return the column vector"""
         if key not in self._col_index:
             raise AttributeError('Field: % s does not exist in header' % key)
-        prevPos = self.tell()
         idx, offset = self._col_index[key]
         typ, size, deci = self.field_spec[idx]
-        gap = (self.record_size - size)
-        f = self.f
-        f.seek(self.header_size + offset)
-        col = [0] * self.n_records
-        for i in xrange(self.n_records):
-            value = f.read(size)
-            f.seek(gap, 1)
-            if typ == 'N':
-                value = value.replace('\0', '').lstrip()
-                if value == '':
-                    value = pysal.MISSINGVALUE
-                elif deci:
-                    try:
-                        value = float(value)
-                    except ValueError:
-                        value = pysal.MISSINGVALUE
-                else:
-                    try:
-                        value = int(value)
-                    except ValueError:
-                        value = pysal.MISSINGVALUE
-            elif typ == 'D':
-                try:
-                    y, m, d = int(value[:4]), int(value[4:6]), int(value[6:8])
-                    value = datetime.date(y, m, d)
-                except ValueError:
-                    value = pysal.MISSINGVALUE
-            elif typ == 'L':
-                value = (value in 'YyTt' and 'T') or (
-                    value in 'NnFf' and 'F') or '?'
-            elif typ == 'F':
-                value = value.replace('\0', '').lstrip()
-                if value == '':
-                    value = pysal.MISSINGVALUE
-                else:
-                    value = float(value)
-            if isinstance(value, str):
-                value = value.rstrip()
-            col[i] = value
-        self.seek(prevPos)
-        return col
+        raw = self._raw_cols([key])[0]
+        if typ in 'NFD':
+            values, missing = _decode(raw, typ, deci)
+            col = values.tolist()
+            for i in np.flatnonzero(missing):
+                col[i] = pysal.MISSINGVALUE
+            return col
+        return [_cast(value, typ, deci) for value in raw.tolist()]
+
+    def _raw_cols(self, keys, rows=None):
+        """
+        the undecoded cells of the columns keys, in the slice rows of the
+        records (default all), as fixed width string arrays read from a
+        memory map of the file
+        """
+        names, formats, offsets = [], [], []
+        for key in keys:
+            if key not in self._col_index:
+                raise AttributeError('Field: % s does not exist in header' % key)
+            idx, offset = self._col_index[key]
+            names.append('f%d' % len(names))
+            formats.append('S%d' % self.field_spec[idx][1])
+            offsets.append(offset)
+        dtype = np.dtype({'names': names, 'formats': formats,
+                          'offsets': offsets, 'itemsize': self.record_size})
+        if not self.n_records:
+            return [np.array([], fmt) for fmt in formats]
+        mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            records = np.frombuffer(mm, dtype, self.n_records,
+                                    self.header_size)
+            if rows is not None:
+                records = records[rows]
+            cols = [records[name].copy() for name in names]
+            del records
+        finally:
+            mm.close()
+        return cols
+
+    def by_col_array(self, *args, **kwargs):
+        """
+        Return the columns of the table as a n x k numpy array
+
+        Only the requested columns are read, and they are decoded in bulk.
+        Missing values (pysal.MISSINGVALUE in rows and by_col) are masked.
+
+        Parameters
+        ----------
+        args     : string or list of strings
+                   column names, or one list of column names
+        rows     : slice
+                   keyword only, the rows to read (default all). Only the
+                   pages of the file holding these rows are read, so that
+                   large tables can be read in chunks.
+
+        Returns
+        -------
+        array    : masked array
+                   n x k, 'N' and 'F' fields as int if all the fields are
+                   'N' without decimals otherwise as float, 'D' fields as
+                   datetime64[D], 'L' fields as bool and 'C' fields as
+                   strings. Fields of different kinds are combined as numpy
+                   would combine them.
+
+        Examples
+        --------
+        >>> import pysal
+        >>> dbf = pysal.open(pysal.examples.get_path('juvenile.dbf'), 'r')
+        >>> y = dbf.by_col_array('ID', 'X')
+        >>> y.shape
+        (168, 2)
+        >>> y[:2].tolist()
+        [[1, 94], [2, 80]]
+        >>> dbf.by_col_array(['X'])[:2, 0].tolist()
+        [94, 80]
+        >>> dbf.by_col_array('ID', 'X', rows=slice(1, 3)).tolist()
+        [[2, 80], [3, 79]]
+        """
+        if len(args) == 1 and not isinstance(args[0], basestring):
+            keys = list(args[0])
+        else:
+            keys = list(args)
+        cols, masks = [], []
+        for key, raw in zip(keys, self._raw_cols(keys, kwargs.get('rows'))):
+            typ, size, deci = self.field_spec[self._col_index[key][0]]
+            values, missing = _decode(raw, typ, deci)
+            cols.append(values)
+            masks.append(missing)
+        return np.ma.array(np.column_stack(cols), mask=np.column_stack(masks))
 
     def read_record(self, i):
         self.seek(i)
@@ -161,39 +210,7 @@ class DBF(pysal.core.Tables.DataTable):
         for (name, typ, size, deci), value in itertools.izip(self.field_info, rec):
             if name == 'DeletionFlag':
                 continue
-            if typ == 'N':
-                value = value.replace('\0', '').lstrip()
-                if value == '':
-                    value = pysal.MISSINGVALUE
-                elif deci:
-                    try:
-                        value = float(value)
-                    except ValueError:
-                        value = pysal.MISSINGVALUE
-                else:
-                    try:
-                        value = int(value)
-                    except ValueError:
-                        value = pysal.MISSINGVALUE
-            elif typ == 'D':
-                try:
-                    y, m, d = int(value[:4]), int(value[4:6]), int(value[6:8])
-                    value = datetime.date(y, m, d)
-                except ValueError:
-                    #value = datetime.date.min#NULL Date: See issue 114
-                    value = pysal.MISSINGVALUE
-            elif typ == 'L':
-                value = (value in 'YyTt' and 'T') or (
-                    value in 'NnFf' and 'F') or '?'
-            elif typ == 'F':
-                value = value.replace('\0', '').lstrip()
-                if value == '':
-                    value = pysal.MISSINGVALUE
-                else:
-                    value = float(value)
-            if isinstance(value, str):
-                value = value.rstrip()
-            result.append(value)
+            result.append(_cast(value, typ, deci))
         return result
 
     def _read(self):
@@ -287,6 +304,90 @@ class DBF(pysal.core.Tables.DataTable):
         if self.f.tell() != POS and not self.FIRST_WRITE:
             self.f.seek(POS)
 
+
+def _cast(value, typ, deci):
+    """
+    value of one dbf cell, pysal.MISSINGVALUE if it is empty or invalid
+    """
+    if typ == 'N':
+        value = value.replace('\0', '').lstrip()
+        if value == '':
+            value = pysal.MISSINGVALUE
+        elif deci:
+            try:
+                value = float(value)
+            except ValueError:
+                value = pysal.MISSINGVALUE
+        else:
+            try:
+                value = int(value)
+            except ValueError:
+                value = pysal.MISSINGVALUE
+    elif typ == 'D':
+        try:
+            y, m, d = int(value[:4]), int(value[4:6]), int(value[6:8])
+            value = datetime.date(y, m, d)
+        except ValueError:
+            #value = datetime.date.min#NULL Date: See issue 114
+            value = pysal.MISSINGVALUE
+    elif typ == 'L':
+        value = (value in 'YyTt' and 'T') or (
+            value in 'NnFf' and 'F') or '?'
+    elif typ == 'F':
+        value = value.replace('\0', '').lstrip()
+        if value == '':
+            value = pysal.MISSINGVALUE
+        else:
+            value = float(value)
+    if isinstance(value, str):
+        value = value.rstrip()
+    return value
+
+
+def _decode(raw, typ, deci):
+    """
+    typed values and missing mask of a column of raw dbf cells
+
+    Cells are converted in bulk by numpy. Columns numpy cannot convert as a
+    whole fall back to _cast cell by cell, so both paths agree.
+    """
+    if typ in 'NF':
+        dtype = int if typ == 'N' and not deci else float
+        cells = np.char.strip(raw)
+        missing = cells == ''
+        values = np.zeros(len(raw), dtype)
+        try:
+            values[~missing] = cells[~missing].astype(dtype)
+        except (ValueError, OverflowError):
+            col = [_cast(value, typ, deci) for value in raw.tolist()]
+            missing = np.array([value is None for value in col], bool)
+            values = np.array([value or 0 for value in col], dtype)
+    elif typ == 'D':
+        digits = raw.astype('S8').view(np.uint8).reshape(-1, 8) - ord('0')
+        digits = digits.astype(int)
+        y = np.dot(digits[:, :4], [1000, 100, 10, 1])
+        m = np.dot(digits[:, 4:6], [10, 1])
+        d = np.dot(digits[:, 6:], [10, 1])
+        month = (y - 1970) * 12 + m - 1
+        values = month.astype('M8[M]').astype('M8[D]') + (d - 1)
+        missing = ((digits > 9).any(1) | (m < 1) | (m > 12) | (d < 1) |
+                   (values.astype('M8[M]') != month.astype('M8[M]')))
+        bad = np.flatnonzero(missing & (np.char.strip(raw) != ''))
+        for i in bad:
+            value = _cast(raw[i], typ, deci)
+            if value is not None:
+                values[i] = value
+                missing[i] = False
+        values[missing] = np.datetime64('NaT')
+    elif typ == 'L':
+        cells = raw.astype('S1')
+        values = np.in1d(cells, list('YyTt'))
+        missing = ~(values | np.in1d(cells, list('NnFf')))
+    else:
+        values = np.char.rstrip(raw)
+        missing = np.zeros(len(raw), bool)
+    return values, missing
+
 if __name__ == '__main__':
     import pysal
     file_name = pysal.examples.get_path("10740.dbf")
@@ -9,7 +9,7 @@ __all__ = ['PurePyShpWrapper']
 
 #import pysal
 import pysal.core.FileIO  # as FileIO
-from pysal.core.util import shp_file
+from pysal.core.util import shp_file, shp_geometry
 import pysal.cg as cg
 from warnings import warn
 import unittest
@@ -31,6 +31,9 @@ class PurePyShpWrapper(pysal.core.FileIO.FileIO):
     This class wraps _pyShpIO's shp_file class with the PySAL FileIO API.
     shp_file can be used without PySAL.
 
+    In read mode the whole geometry is loaded at once with shp_geometry, the
+    pysal.cg shapes are only built when the records are read.
+
     Attributes
     ----------
 
@@ -76,7 +79,7 @@ class PurePyShpWrapper(pysal.core.FileIO.FileIO):
             return 0
 
     def __open(self):
-        self.dataObj = shp_file(self.dataPath)
+        self.dataObj = shp_geometry(self.dataPath)
         self.header = self.dataObj.header
         self.bbox = self.dataObj.bbox
         try:
@@ -138,23 +141,20 @@ class PurePyShpWrapper(pysal.core.FileIO.FileIO):
         self.pos += 1
 
     def _read(self):
-        try:
-            rec = self.dataObj.get_shape(self.pos)
-        except IndexError:
+        if self.pos >= len(self.dataObj):
             return None
         self.pos += 1
         if self.dataObj.type() == 'POINT':
+            rec = self.dataObj.get_shape(self.pos - 1)
             shp = self.type((rec['X'], rec['Y']))
         elif self.dataObj.type() == 'POINTZ':
+            rec = self.dataObj.get_shape(self.pos - 1)
             shp = self.type((rec['X'], rec['Y']))
             shp.Z = rec['Z']
             shp.M = rec['M']
         else:
-            if rec['NumParts'] > 1:
-                partsIndex = list(rec['Parts Index'])
-                partsIndex.append(None)
-                parts = [rec['Vertices'][partsIndex[i]:partsIndex[
-                    i + 1]] for i in xrange(rec['NumParts'])]
+            parts = self.dataObj.get_parts(self.pos - 1)
+            if len(parts) > 1:
                 if self.dataObj.type() == 'POLYGON':
                     is_cw = map(pysal.cg.is_clockwise, parts)
                     vertices = [part for part, cw in zip(parts, is_cw) if cw]
@@ -165,8 +165,8 @@ class PurePyShpWrapper(pysal.core.FileIO.FileIO):
                 else:
                     vertices = parts
                     shp = self.type(vertices)
-            elif rec['NumParts'] == 1:
-                vertices = rec['Vertices']
+            elif len(parts) == 1:
+                vertices = parts[0]
                 if self.dataObj.type() == 'POLYGON' and not pysal.cg.is_clockwise(vertices):
                     ### SHAPEFILE WARNING: Polygon %d topology has been fixed. (ccw -> cw)
                     warn("SHAPEFILE WARNING: Polygon %d topology has been fixed. (ccw -> cw)" % (self.pos), RuntimeWarning)
@@ -27,6 +27,38 @@ class test_GalIO(unittest.TestCase):
         self.assertEqual(w.s0, 462.0)
         self.assertEqual(w.s1, 924.0)
 
+    def test_read_sparse(self):
+        wsp = self.obj.read(sparse=True)
+        self.obj.seek(0)
+        w = self.obj.read()
+        self.assertEqual(wsp.n, 100)
+        ids = sorted(w.id_order)
+        w.id_order = ids
+        self.assertEqual((wsp.sparse != w.sparse).nnz, 0)
+
+    def test_read_islands(self):
+        # the neighbor line of an island may be empty or missing
+        for body in ['1 1\n2\n2 2\n1 3\n3 1\n2\n4 0\n\n',
+                     '1 1\n2\n4 0\n2 2\n1 3\n3 1\n2\n',
+                     '4 0\n1 1\n2\n2 2\n1 3\n3 1\n2\n']:
+            f = tempfile.NamedTemporaryFile(suffix='.gal', delete=False)
+            f.write('4\n' + body)
+            f.close()
+            w = pysal.open(f.name, 'r').read()
+            os.remove(f.name)
+            self.assertEqual(w.neighbors, {'1': ['2'], '2': ['1', '3'],
+                                           '3': ['2'], '4': []})
+            self.assertEqual(w.sparse.nnz, 4)
+        # an island without a neighbor line first
+        f = tempfile.NamedTemporaryFile(suffix='.gal', delete=False)
+        f.write('4\n4 0\n1 2\n2 3\n2 2\n1 3\n3 2\n1 2\n')
+        f.close()
+        w = pysal.open(f.name, 'r').read()
+        os.remove(f.name)
+        self.assertEqual(w.id_order, ['4', '1', '2', '3'])
+        self.assertEqual(w.neighbors, {'1': ['2', '3'], '2': ['1', '3'],
+                                       '3': ['1', '2'], '4': []})
+
     def test_seek(self):
         self.test_read()
         self.failUnlessRaises(StopIteration, self.obj.read)
@@ -2,6 +2,7 @@ import unittest
 import pysal
 import tempfile
 import os
+import numpy as np
 
 
 class test_DBF(unittest.TestCase):
@@ -107,5 +108,51 @@ class test_DBF(unittest.TestCase):
 
         os.remove(fname)
 
+    def test_by_col_array(self):
+        import datetime
+        f = tempfile.NamedTemporaryFile(suffix='.dbf')
+        fname = f.name
+        f.close()
+        db = pysal.core.IOHandlers.pyDbfIO.DBF(fname, 'w')
+        db.header = ["recID", "date", "aFloat", "flag"]
+        db.field_spec = [('N', 10, 0), ('D', 8, 0), ('N', 8, 3),
+                         ('L', 1, 0)]
+        records = [[1, datetime.date(2010, 2, 28), 0.5, 'T'],
+                   [None, None, None, '?'],
+                   [3, datetime.date(2012, 12, 1), -1.25, 'F']]
+        for rec in records:
+            db.write(rec)
+        db.close()
+        db = pysal.core.IOHandlers.pyDbfIO.DBF(fname, 'r')
+        for i, key in enumerate(db.header):
+            self.assertEquals(db.by_col(key), [rec[i] for rec in records])
+        ids = db.by_col_array('recID')
+        self.assertEquals(ids.dtype, np.dtype(int))
+        self.assertEquals(ids.mask[:, 0].tolist(), [False, True, False])
+        self.assertEquals(ids.compressed().tolist(), [1, 3])
+        x = db.by_col_array(['aFloat', 'recID'])
+        self.assertEquals(x.shape, (3, 2))
+        self.assertEquals(x[2].tolist(), [-1.25, 3.0])
+        dates = db.by_col_array('date')[:, 0]
+        self.assertEquals(dates.dtype, np.dtype('M8[D]'))
+        self.assertEquals(dates[0], np.datetime64('2010-02-28'))
+        self.assertTrue(dates.mask[1])
+        flags = db.by_col_array('flag')[:, 0]
+        self.assertEquals(flags.tolist(), [True, None, False])
+        db.close()
+        os.remove(fname)
+
+    def test_by_col_array_subset(self):
+        y = self.dbObj.by_col_array('TRT2000', 'STFID')
+        self.assertEquals(y.shape, (195, 2))
+        self.assertEquals(y[0].tolist(), ['000107', '35001000107'])
+        self.assertEquals(y[:, 0].tolist(), self.dbObj.by_col('TRT2000'))
+
+    def test_by_col_array_rows(self):
+        y = self.dbObj.by_col_array('TRT2000', 'STFID')
+        for rows in [slice(0, 10), slice(190, 200), slice(5, 50, 7)]:
+            chunk = self.dbObj.by_col_array('TRT2000', 'STFID', rows=rows)
+            self.assertEquals(chunk.tolist(), y[rows].tolist())
+
 if __name__ == '__main__':
     unittest.main()
@@ -48,6 +48,23 @@ class test_PurePyShpWrapper(unittest.TestCase):
         for shpA, shpB in zip(objs, objsB):
             self.assertEquals(shpA.vertices, shpB.vertices)
 
+    def test_shapes(self):
+        for name in ['10740.shp', 'NAT.shp', 'Line.shp', 'Point.shp']:
+            path = pysal.examples.get_path(name)
+            shps = pysal.core.IOHandlers.pyShpIO.PurePyShpWrapper(path, 'r')
+            recs = pysal.core.util.shp_file(path)
+            for shp, rec in zip(shps, recs):
+                if 'X' in rec:
+                    self.assertEquals(list(shp), [rec['X'], rec['Y']])
+                    continue
+                index = rec['Parts Index'] + [None]
+                rings = [rec['Vertices'][index[i]:index[i + 1]]
+                         for i in xrange(rec['NumParts'])]
+                parts = shp.parts + [h for h in getattr(shp, 'holes', []) if h]
+                self.assertEquals(sorted(map(sorted, parts)),
+                                  sorted(map(sorted, rings)))
+            shps.close()
+
     def test_random_access(self):
         self.shpObj.seek(57)
         shp57 = self.shpObj.read(1)[0]
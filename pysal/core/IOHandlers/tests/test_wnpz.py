@@ -0,0 +1,94 @@
+import unittest
+import pysal
+from pysal.core.IOHandlers.wnpz import WnpzIO
+import tempfile
+import os
+import numpy as np
+import mmap
+
+
+def _mapped(a):
+    """ whether the memory of array a comes from a mapped file """
+    while a is not None:
+        if isinstance(a, (np.memmap, mmap.mmap)):
+            return True
+        a = getattr(a, 'base', None)
+    return False
+
+
+class test_WnpzIO(unittest.TestCase):
+    def setUp(self):
+        self.w = pysal.open(pysal.examples.get_path('juvenile.gwt'), 'r').read()
+        f = tempfile.NamedTemporaryFile(suffix='.wnpz')
+        self.test_file = f.name
+        f.close()
+        o = pysal.open(self.test_file, 'w')
+        o.write(self.w)
+        o.close()
+        self.obj = WnpzIO(self.test_file, 'r')
+
+    def tearDown(self):
+        self.obj.close()
+        os.remove(self.test_file)
+
+    def test_close(self):
+        f = self.obj
+        f.close()
+        self.failUnlessRaises(ValueError, f.read)
+
+    def test_read(self):
+        w = self.obj.read()
+        self.assertEqual(168, w.n)
+        self.assertAlmostEqual(16.678571428571427, w.mean_neighbors)
+        self.assertEqual(self.w.id_order, w.id_order)
+        self.assertEqual(self.w[1], w[1])
+        self.assertEqual(self.w.s0, w.s0)
+        self.assertTrue(_mapped(w.sparse.indices))
+        self.obj.seek(0)
+        wsp = self.obj.read(sparse=True)
+        self.assertEqual(168, wsp.n)
+        self.assertEqual(self.w.s0, wsp.s0)
+
+    def test_moments(self):
+        w = self.obj.read()
+        self.assertTrue('trcWtW' in w._cache)
+        self.assertAlmostEqual(w.trcWtW, self.w.trcWtW)
+        self.assertAlmostEqual(w.trcW2, self.w.trcW2)
+        w.transform = 'r'
+        self.w.transform = 'r'
+        self.assertAlmostEqual(w.trcWtW_WW, self.w.trcWtW_WW)
+
+    def test_seek(self):
+        self.test_read()
+        self.failUnlessRaises(StopIteration, self.obj.read)
+        self.obj.seek(0)
+        self.test_read()
+
+    def test_transform(self):
+        w = self.obj.read()
+        w.transform = 'r'
+        self.w.transform = 'r'
+        self.assertEqual(self.w.weights[1], w.weights[1])
+        # the file is mapped copy-on-write and is left untouched
+        w.transform = 'o'
+        w.data *= 2
+        self.obj.seek(0)
+        self.assertEqual(self.obj.read()[1], {2: 14.1421356})
+
+    def test_write(self):
+        for i in [False, True]:
+            self.obj.seek(0)
+            w = self.obj.read(sparse=i)
+            f = tempfile.NamedTemporaryFile(suffix='.wnpz')
+            fname = f.name
+            f.close()
+            o = pysal.open(fname, 'w')
+            o.write(w)
+            o.close()
+            wnew = pysal.open(fname, 'r').read(sparse=i)
+            self.assertEqual(wnew.s0, w.s0)
+            self.assertEqual(wnew.id_order, w.id_order)
+            os.remove(fname)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+import struct
+import zipfile
+import numpy as np
+import scipy.sparse as SP
+import pysal.core.FileIO as FileIO
+from pysal.weights import W, WSP, WCSR
+from pysal.weights.weights import sparse_moments
+
+__all__ = ["WnpzIO"]
+
+# fixed size of a zip local file header, before the member name and extra
+# field
+ZIP_HEADER_SIZE = 30
+
+
+class WnpzIO(FileIO.FileIO):
+    """
+    Opens, reads, and writes weights file objects in the binary WNPZ format.
+
+    A WNPZ file is an uncompressed numpy npz archive holding the CSR arrays
+    of a spatial weights matrix:
+
+    indptr   : int32 array, (n+1, )
+    indices  : int32 array, (nnz, ), the columns of each row in sorted order
+    data     : float64 array, (nnz, ), the weights
+    id_order : array, (n, ), the ids of the observations
+    diagW2   : float64 array, (n, ), the diagonal of WW
+    diagWtW  : float64 array, (n, ), the diagonal of W'W
+
+    Since the members are stored uncompressed, indptr, indices and data are
+    read by memory mapping them straight from the file, without parsing nor
+    copying. Loading is then almost instantaneous whatever the size of the
+    weights, and the processes that read the same file share the pages
+    of the operating system cache instead of holding their own copies.
+    The arrays are mapped copy-on-write, so that changes to the weights do
+    not affect the file.
+
+    The diagonals are those of pysal.weights.weights.sparse_moments. They
+    are stored so that the traces used by the spatial regressions and
+    tests are not computed again for the weights read from the file, under
+    their original transformation.
+
+    The ids must be numbers or strings.
+
+    """
+
+    FORMATS = ['wnpz']
+    MODES = ['r', 'w']
+
+    def __init__(self, *args, **kwargs):
+        FileIO.FileIO.__init__(self, *args, **kwargs)
+        self.file = open(self.dataPath, self.mode + 'b')
+
+    def read(self, n=-1, sparse=False):
+        """
+        sparse: boolean
+                if true, return pysal WSP object
+                if false, return pysal WCSR object
+        """
+        self._sparse = sparse
+        self._complain_ifclosed(self.closed)
+        return self._read()
+
+    def seek(self, pos):
+        if pos == 0:
+            self.file.seek(0)
+            self.pos = 0
+
+    def _read(self):
+        """Reads a wnpz file
+        Returns a pysal.weights.weights.WCSR or pysal.weights.weights.WSP
+        object
+
+        Examples
+        --------
+
+        >>> import tempfile, pysal, os
+        >>> w = pysal.open(pysal.examples.get_path('stl.gal'), 'r').read()
+        >>> f = tempfile.NamedTemporaryFile(suffix='.wnpz')
+        >>> fname = f.name
+        >>> f.close()
+        >>> o = pysal.open(fname, 'w')
+        >>> o.write(w)
+        >>> o.close()
+
+        Open the wnpz file and map it into a pysal weights object
+
+        >>> f = pysal.open(fname, 'r')
+        >>> wnew = f.read()
+        >>> wnew.n
+        78
+        >>> wnew.neighbors['2']
+        ['5', '8', '10']
+        >>> wnew.mean_neighbors == w.mean_neighbors
+        True
+        >>> f.close()
+
+        The weights matrix can also be read as a WSP object
+
+        >>> wsp = pysal.open(fname, 'r').read(sparse=True)
+        >>> wsp.n
+        78
+        >>> wsp.id_order[:3]
+        ['1', '2', '3']
+        >>> os.remove(fname)
+
+        """
+        if self.pos > 0:
+            raise StopIteration
+        arrays = self._map()
+        indptr = arrays['indptr']
+        n = len(indptr) - 1
+        sp = SP.csr_matrix((arrays['data'], arrays['indices'], indptr),
+                           shape=(n, n), copy=False)
+        id_order = arrays['id_order'].tolist()
+        self.pos += 1
+        if self._sparse:
+            w = WSP(sp, id_order)
+        else:
+            w = WCSR(sp, id_order)
+        if 'diagW2' in arrays and 'diagWtW' in arrays:
+            diagW2 = arrays['diagW2']
+            diagWtW = arrays['diagWtW']
+            diagWtW_WW = diagWtW + diagW2
+            moments = {'diagW2': diagW2, 'diagWtW': diagWtW,
+                       'diagWtW_WW': diagWtW_WW, 'trcW2': diagW2.sum(),
+                       'trcWtW': diagWtW.sum(),
+                       'trcWtW_WW': diagWtW_WW.sum()}
+            for key in moments:
+                setattr(w, '_' + key, moments[key])
+                w._cache[key] = moments[key]
+        return w
+
+    def _map(self):
+        """
+        Memory map the members of the archive
+        """
+        arrays = {}
+        archive = zipfile.ZipFile(self.file)
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("%s is not an uncompressed npz archive" %
+                                 self.dataPath)
+            self.file.seek(info.header_offset)
+            header = self.file.read(ZIP_HEADER_SIZE)
+            name_len, extra_len = struct.unpack('<HH', header[26:30])
+            self.file.seek(info.header_offset + ZIP_HEADER_SIZE + name_len +
+                           extra_len)
+            version = np.lib.format.read_magic(self.file)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(self.file)
+            else:
+                header = np.lib.format.read_array_header_2_0(self.file)
+            shape, fortran_order, dtype = header
+            name = info.filename[:-len('.npy')]
+            if dtype.hasobject:
+                raise ValueError("%s holds python objects" % self.dataPath)
+            if name == 'id_order' or not np.prod(shape):
+                size = int(np.prod(shape)) * dtype.itemsize
+                a = np.frombuffer(self.file.read(size), dtype)
+                a = a.reshape(shape, order='F' if fortran_order else 'C')
+            else:
+                order = 'F' if fortran_order else 'C'
+                a = np.memmap(self.dataPath, dtype, 'c', self.file.tell(),
+                              shape, order)
+            arrays[name] = a
+        return arrays
+
+    def write(self, obj):
+        """
+
+        Parameters
+        ----------
+        .write(weightsObject)
+        accepts a weights object
+
+        Returns
+        ------
+
+        a wnpz file
+        write a weights object, under its current transformation, to the
+        opened wnpz file.
+
+        Examples
+        --------
+
+        >>> import tempfile, pysal, os
+        >>> testfile = pysal.open(pysal.examples.get_path('juvenile.gwt'),'r')
+        >>> w = testfile.read()
+
+        Create a temporary file for this example
+
+        >>> f = tempfile.NamedTemporaryFile(suffix='.wnpz')
+
+        Reassign to new var
+
+        >>> fname = f.name
+
+        Close the temporary named file
+
+        >>> f.close()
+
+        Open the new file in write mode
+
+        >>> o = pysal.open(fname,'w')
+
+        Write the Weights object into the open file
+
+        >>> o.write(w)
+        >>> o.close()
+
+        Read in the newly created wnpz file
+
+        >>> wnew =  pysal.open(fname,'r').read()
+
+        Compare values from old to new
+
+        >>> wnew.pct_nonzero == w.pct_nonzero
+        True
+        >>> wnew[1] == w[1]
+        True
+
+        Clean up temporary file created for this example
+
+        >>> os.remove(fname)
+        """
+        self._complain_ifclosed(self.closed)
+        if issubclass(type(obj), W) or issubclass(type(obj), WSP):
+            sp = obj.sparse.tocsr().copy()
+            sp.sum_duplicates()
+            sp.sort_indices()
+            id_order = obj.id_order
+            if id_order is None:
+                id_order = range(sp.shape[0])
+            id_order = np.array(id_order)
+            if id_order.dtype.hasobject:
+                raise TypeError("wnpz ids must be numbers or strings")
+            moments = sparse_moments(sp)
+            np.savez(self.file, indptr=sp.indptr.astype(np.int32),
+                     indices=sp.indices.astype(np.int32),
+                     data=sp.data.astype(np.float64), id_order=id_order,
+                     diagW2=moments['diagW2'].astype(np.float64),
+                     diagWtW=moments['diagWtW'].astype(np.float64))
+            self.pos += 1
+        else:
+            raise TypeError("Expected a pysal weights object, got: %s" % (
+                type(obj)))
+
+    def close(self):
+        self.file.close()
+        FileIO.FileIO.close(self)
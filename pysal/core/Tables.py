@@ -1,5 +1,6 @@
 __all__ = ['DataTable', 'DataRow']
 import FileIO
+import numpy as np
 
 __author__ = "Charles R Schmidt <schmidtc@gmail.com>"
 
@@ -37,6 +38,29 @@ class DataTable(FileIO.FileIO):
     def by_col(self):
         return self._By_Col(self)
 
+    def by_col_array(self, *args, **kwargs):
+        """ Return the columns of the table as a n x k numpy array
+
+            Accepts column names, or one list of column names, and the
+            keyword rows, a slice of the rows to return (default all).
+            Handlers that can decode whole columns at once override this.
+        """
+        if len(args) == 1 and not isinstance(args[0], basestring):
+            keys = list(args[0])
+        else:
+            keys = list(args)
+        rows = kwargs.get('rows')
+        if rows is None:
+            return np.array([self._get_col(key) for key in keys]).T
+        if not self.header:
+            raise AttributeError('Please set the header')
+        for key in keys:
+            if key not in self.header:
+                raise AttributeError('Field: % s does not exist in header' % key)
+        cols = [self.header.index(key) for key in keys]
+        data = [[row[col] for col in cols] for row in self[rows]]
+        return np.array(data).reshape(len(data), len(cols))
+
     def _get_col(self, key):
         """ returns the column vector
         """
@@ -18,7 +18,9 @@ from struct import calcsize, unpack, pack
 from cStringIO import StringIO
 from itertools import izip, islice
 import array
+import mmap
 import sys
+import numpy as np
 if sys.byteorder == 'little':
     SYS_BYTE_ORDER = '<'
 else:
@@ -27,7 +29,10 @@ STRUCT_ITEMSIZE = {}
 STRUCT_ITEMSIZE['i'] = calcsize('i')
 STRUCT_ITEMSIZE['d'] = calcsize('d')
 
-__all__ = ['shp_file', 'shx_file']
+__all__ = ['shp_file', 'shx_file', 'shp_geometry']
+
+# upper bound on the number of bytes scanned at once by _gather
+GATHER_CHUNK = 2 ** 24
 
 #SHAPEFILE Globals
 
@@ -526,6 +531,218 @@ class shx_file:
         self.fileObj.close()
 
 
+class shp_geometry:
+    """
+    Reads all the geometry of a SHP/SHX pair into flat arrays
+
+    The files are memory mapped and the records are decoded in bulk with
+    numpy, no Python object is created per record. Coordinates of all the
+    records are stored in one array, parts (rings) are delimited by offsets
+    into it, and records by offsets into the parts.
+
+    Attributes:
+    header -- dict -- Contents of the SHP header. #For contents see: HEADERSTRUCT
+    shapeType -- int -- ShapeType.
+    bbox -- list -- bounding box of the file, [xmin, ymin, xmax, ymax]
+    shape_types -- array -- (n,) shape type of each record, 0 for null shapes
+    bboxes -- array -- (n, 4) [xmin, ymin, xmax, ymax] of each record, nan for null shapes
+    coords -- array -- (m, 2) x, y of all vertices (points) in file order
+    parts -- array -- (n+1,) record i is made of parts parts[i]:parts[i+1]
+    rings -- array -- (p+1,) part j is made of vertices coords[rings[j]:rings[j+1]]
+
+    zm -- array -- (n_valid, 2) Z, M of each point, only for POINTZ files
+
+    Notes: Only X and Y are read for ARCZ and POLYGONZ shapes, their Z and M
+    values are skipped. Records are only turned into the dictionaries returned
+    by shp_file.get_shape, or into lists of rings with get_parts, when they are
+    requested.
+
+    Example:
+    >>> import pysal
+    >>> geo = shp_geometry(pysal.examples.get_path('Polygon.shp'))
+    >>> len(geo)
+    3
+    >>> geo.coords.shape
+    (45, 2)
+    >>> geo.parts.tolist()
+    [0, 2, 3, 4]
+    >>> geo.rings.tolist()
+    [0, 11, 24, 31, 45]
+    >>> geo.get_shape(1) == shp_file(pysal.examples.get_path('Polygon.shp')).get_shape(1)
+    True
+    """
+    def __init__(self, fileName):
+        if fileName.lower().endswith('.shp') or fileName.lower().endswith('.shx') or fileName.lower().endswith('.dbf'):
+            fileName = fileName[:-4]
+        self.fileName = fileName
+        shx = _map_file(fileName + '.shx')
+        shp = _map_file(fileName + '.shp')
+        try:
+            self._read(shp, shx)
+        finally:
+            shx.close()
+            shp.close()
+
+    def _read(self, shp, shx):
+        self.header = _unpackDict(UHEADERSTRUCT, StringIO(shp[:100]))
+        self.shapeType = self.header['Shape Type']
+        if self.shapeType not in (1, 3, 5, 11, 13, 15):
+            TYPE_DISPATCH[self.shapeType]()  # raises NotImplementedError
+        h = self.header
+        self.bbox = [h['BBOX Xmin'], h['BBOX Ymin'],
+                     h['BBOX Xmax'], h['BBOX Ymax']]
+        numRecords = (len(shx) - 100) // 8
+        index = np.frombuffer(shx, '>i4', 2 * numRecords, 100)
+        # skip the 8 byte record header, offsets are in 16 bit words
+        starts = index[::2].astype(np.int64) * 2 + 8
+        buf = np.frombuffer(shp, np.uint8)
+        n = numRecords
+        types = _gather(buf, starts, np.repeat(4, n))
+        self.shape_types = types = types.view('<i4').astype(int)
+        valid = types != 0
+        vstarts = starts[valid]
+        self.bboxes = np.empty((n, 4))
+        self.bboxes.fill(np.nan)
+        if self.shapeType in (1, 11):
+            size = 16 if self.shapeType == 1 else 32
+            xy = _gather(buf, vstarts + 4, np.repeat(size, len(vstarts)))
+            xy = xy.view('<f8').reshape(-1, size // 8)
+            if self.shapeType == 11:
+                self.zm = xy[:, 2:].copy()
+                xy = xy[:, :2].copy()
+            self.bboxes[valid] = np.hstack((xy, xy))
+            npoints = valid.astype(int)
+            nparts = npoints
+            self.coords = xy
+            parts_index = np.zeros(len(xy), int)
+        else:
+            head = _gather(buf, vstarts + 4, np.repeat(40, len(vstarts)))
+            head = head.reshape(-1, 40)
+            self.bboxes[valid] = head[:, :32].copy().view('<f8')
+            counts = head[:, 32:].copy().view('<i4')
+            nparts = np.zeros(n, int)
+            npoints = np.zeros(n, int)
+            nparts[valid] = counts[:, 0]
+            npoints[valid] = counts[:, 1]
+            parts_index = _gather(buf, vstarts + 44, 4 * nparts[valid])
+            parts_index = parts_index.view('<i4').astype(int)
+            self.coords = _gather(buf, vstarts + 44 + 4 * nparts[valid],
+                                  16 * npoints[valid])
+            self.coords = self.coords.view('<f8').reshape(-1, 2)
+        self.parts = np.concatenate(([0], nparts.cumsum()))
+        first = np.concatenate(([0], npoints.cumsum()))
+        self.rings = np.concatenate((parts_index + np.repeat(first[:-1], nparts),
+                                     first[-1:]))
+
+    def __len__(self):
+        return len(self.shape_types)
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self.get_shape(i)
+
+    def type(self):
+        return TYPE_DISPATCH[self.shapeType].String_Type
+
+    def get_shape(self, shpId):
+        """
+        Record shpId as the dictionary returned by shp_file.get_shape, None
+        for null shapes
+        """
+        if shpId + 1 > len(self):
+            raise IndexError
+        shape_type = int(self.shape_types[shpId])
+        if not shape_type:
+            return None
+        if self.shapeType in (1, 11):
+            x, y = self.coords[self.rings[shpId]].tolist()
+            rec = {'Shape Type': shape_type, 'X': x, 'Y': y}
+            if self.shapeType == 11:
+                rec['Z'], rec['M'] = self.zm[self.rings[shpId]].tolist()
+            return rec
+        rec = {'Shape Type': shape_type}
+        names = ['BBOX Xmin', 'BBOX Ymin', 'BBOX Xmax', 'BBOX Ymax']
+        rec.update(zip(names, self.bboxes[shpId].tolist()))
+        p0, p1 = self.parts[shpId], self.parts[shpId + 1]
+        rings = self.rings[p0:p1 + 1]
+        rec['NumParts'] = p1 - p0
+        rec['NumPoints'] = rings[-1] - rings[0]
+        rec['Parts Index'] = (rings[:-1] - rings[0]).tolist() or [0]
+        rec['Vertices'] = map(tuple, self.coords[rings[0]:rings[-1]].tolist())
+        return rec
+
+    def get_parts(self, shpId):
+        """
+        Parts (rings) of record shpId, as lists of (x, y) tuples
+
+        Example:
+        >>> import pysal
+        >>> geo = shp_geometry(pysal.examples.get_path('Polygon.shp'))
+        >>> map(len, geo.get_parts(0))
+        [11, 13]
+        """
+        if shpId + 1 > len(self):
+            raise IndexError
+        p0, p1 = self.parts[shpId], self.parts[shpId + 1]
+        rings = self.rings[p0:p1 + 1].tolist()
+        coords = self.coords
+        return [map(tuple, coords[a:b].tolist())
+                for a, b in izip(rings[:-1], rings[1:])]
+
+    def close(self):
+        """
+        The files are closed as soon as they are read, kept for
+        compatibility with shp_file
+        """
+        pass
+
+
+def _map_file(fileName):
+    """
+    Read only memory map of the whole file
+    """
+    f = open(fileName, 'rb')
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+
+
+def _gather(buf, starts, sizes):
+    """
+    Concatenate the byte ranges buf[starts[k]:starts[k] + sizes[k]]
+
+    The ranges are selected with a mask built over GATHER_CHUNK bytes of buf
+    at a time, so no per range Python work is done. Ranges must not overlap.
+    """
+    starts = np.asarray(starts, np.int64)
+    sizes = np.asarray(sizes, np.int64)
+    keep = sizes > 0
+    starts, sizes = starts[keep], sizes[keep]
+    out = np.empty(sizes.sum(), np.uint8)
+    if (np.diff(starts) < 0).any():
+        pos = 0
+        for start, size in izip(starts, sizes):
+            out[pos:pos + size] = buf[start:start + size]
+            pos += size
+        return out
+    ends = starts + sizes
+    pos = 0
+    k = 0
+    while k < len(starts):
+        stop = max(k + 1, np.searchsorted(starts, starts[k] + GATHER_CHUNK))
+        lo, hi = starts[k], ends[stop - 1]
+        mark = np.zeros(hi - lo + 1, np.int8)
+        mark[starts[k:stop] - lo] = 1
+        mark[ends[k:stop] - lo] -= 1
+        mask = np.cumsum(mark, dtype=np.int8)[:-1].view(bool)
+        chunk = buf[lo:hi][mask]
+        out[pos:pos + len(chunk)] = chunk
+        pos += len(chunk)
+        k = stop
+    return out
+
+
 class NullShape:
     Shape_Type = 0
     STRUCT = (('Shape Type', 'i', '<'))
@@ -1,8 +1,11 @@
 import unittest
 from cStringIO import StringIO
-from pysal.core.util.shapefile import noneMax, noneMin, shp_file, shx_file, NullShape, Point, PolyLine, MultiPoint, PointZ, PolyLineZ, PolygonZ, MultiPointZ, PointM, PolyLineM, PolygonM, MultiPointM, MultiPatch
+from pysal.core.util.shapefile import noneMax, noneMin, shp_file, shx_file, shp_geometry, NullShape, Point, PolyLine, MultiPoint, PointZ, PolyLineZ, PolygonZ, MultiPointZ, PointM, PolyLineM, PolygonM, MultiPointM, MultiPatch
 import os
+import tempfile
+import numpy as np
 import pysal
+from pysal.core.util import shapefile
 
 
 class TestNoneMax(unittest.TestCase):
@@ -135,6 +138,68 @@ class test_shx_file(unittest.TestCase):
         self.assertEqual(shx.fileObj.closed, True)
 
 
+class test_shp_geometry(unittest.TestCase):
+    def test___init__(self):
+        for name in ['Point.shp', 'Line.shp', 'Polygon.shp', 'NAT.shp']:
+            path = pysal.examples.get_path(name)
+            shp = shp_file(path)
+            geo = shp_geometry(path)
+            self.assertEqual(len(geo), len(shp))
+            self.assertEqual(geo.header, shp.header)
+            self.assertEqual(geo.type(), shp.type())
+            self.assertEqual(list(geo), list(shp))
+            self.assertEqual(len(geo.parts), len(geo) + 1)
+            self.assertEqual(geo.rings[-1], len(geo.coords))
+
+    def test_bboxes(self):
+        geo = shp_geometry(pysal.examples.get_path('columbus.shp'))
+        np.testing.assert_array_equal(
+            geo.bboxes[:, :2], [geo.coords[geo.rings[geo.parts[i]]:geo.rings[
+                geo.parts[i + 1]]].min(0) for i in xrange(len(geo))])
+        geo = shp_geometry(pysal.examples.get_path('Point.shp'))
+        np.testing.assert_array_equal(geo.bboxes[:, 2:], geo.coords)
+
+    def test_pointz(self):
+        f = tempfile.NamedTemporaryFile(suffix='.shp')
+        path = f.name
+        f.close()
+        shp = shp_file(path, 'w', 'POINTZ')
+        for i in xrange(5):
+            shp.add_shape({'Shape Type': 11, 'X': i, 'Y': -i, 'Z': i * 2.,
+                           'M': i * 3.})
+        # the writer only computes the header bounding box of POINT files
+        shp.header.update({'BBOX Xmin': 0., 'BBOX Xmax': 4.,
+                           'BBOX Ymin': -4., 'BBOX Ymax': 0.,
+                           'BBOX Zmin': 0., 'BBOX Zmax': 8.,
+                           'BBOX Mmin': 0., 'BBOX Mmax': 12.})
+        shp.close()
+        geo = shp_geometry(path)
+        self.assertEqual(list(geo), list(shp_file(path)))
+        np.testing.assert_array_equal(geo.zm[:, 1], np.arange(5) * 3.)
+        os.remove(path)
+        os.remove(path[:-1] + 'x')
+
+    def test_get_parts(self):
+        path = pysal.examples.get_path('NAT.shp')
+        geo = shp_geometry(path)
+        for i, rec in enumerate(shp_file(path)):
+            parts = geo.get_parts(i)
+            self.assertEqual(len(parts), rec['NumParts'])
+            self.assertEqual(sum(parts, []), rec['Vertices'])
+
+    def test_chunks(self):
+        path = pysal.examples.get_path('10740.shp')
+        geo = shp_geometry(path)
+        chunk = shapefile.GATHER_CHUNK
+        shapefile.GATHER_CHUNK = 1000
+        try:
+            geo2 = shp_geometry(path)
+        finally:
+            shapefile.GATHER_CHUNK = chunk
+        np.testing.assert_array_equal(geo.coords, geo2.coords)
+        np.testing.assert_array_equal(geo.rings, geo2.rings)
+
+
 class TestNullShape(unittest.TestCase):
     def test_pack(self):
         null_shape = NullShape()
@@ -0,0 +1,151 @@
+"""
+Conditional randomization engine for local spatial autocorrelation statistics
+
+"""
+import numpy as np
+
+__all__ = ['crand']
+
+# upper bound on the number of randomly assigned neighbor values held in
+# memory at any one time
+BLOCK_SIZE = 2 ** 21
+
+
+def crand(z, w, observed, stat, permutations, keep=False, weighted=True):
+    """
+    Conditional randomization inference for local statistics
+
+    Parameters
+    ----------
+    z            : array
+                   n values that are randomly assigned to the neighbors of
+                   each observation
+    w            : W
+                   spatial weights instance aligned with z
+    observed     : array
+                   n observed values of the local statistic
+    stat         : function
+                   stat(lag, ids) returns the local statistics of the
+                   observations in ids (len(ids) x permutations) given their
+                   randomized spatial lags
+    permutations : int
+                   number of conditional randomizations
+    keep         : boolean
+                   if True the simulated local statistics are returned,
+                   otherwise only the summaries are kept
+    weighted     : boolean
+                   if True the randomized neighbors are combined using the
+                   weights of w, otherwise they are simply summed
+
+    Returns
+    -------
+    larger       : array
+                   for each observation, the number of simulated values
+                   greater than or equal to the observed value
+    mean         : float
+                   mean of all simulated values
+    var          : float
+                   variance of all simulated values
+    sim          : array
+                   permutations x n simulated values if keep is True,
+                   otherwise None
+
+    Notes
+    -----
+    For observation i with ki neighbors the candidate set cannot include i.
+    A single pool of random neighbor sets of size max_neighbors is drawn from
+    n-1 ids, and for observation i every id at or above i is shifted up by
+    one, which excludes i without a per observation shuffle. Observations
+    with the same cardinality share the first ki columns of the pool and are
+    evaluated together in blocks, so the full n x permutations matrix of
+    simulated values is never built unless keep is True.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> import numpy as np
+    >>> np.random.seed(10)
+    >>> w = pysal.lat2W(5, 5)
+    >>> w.transform = 'r'
+    >>> z = np.arange(25.)
+    >>> z -= z.mean()
+    >>> lag = pysal.lag_spatial(w, z)
+    >>> res = crand(z, w, z * lag, lambda lag, ids: z[ids][:, None] * lag, 99)
+    >>> res[0].shape
+    (25,)
+    >>> res[3] is None
+    True
+    """
+    n = w.n
+    sparse = w.sparse
+    indptr = sparse.indptr
+    data = sparse.data
+    cards = np.diff(indptr)
+    k = cards.max()
+    rids = _sample_ids(n - 1, k, permutations)
+
+    larger = np.zeros(n, int)
+    count, mean, m2 = 0, 0.0, 0.0
+    sim = None
+    if keep:
+        sim = np.zeros((permutations, n))
+
+    for c in np.unique(cards):
+        c_ids = np.nonzero(cards == c)[0]
+        rid = rids[:, :c]
+        step = max(1, BLOCK_SIZE // max(1, permutations * c))
+        for start in xrange(0, len(c_ids), step):
+            ids = c_ids[start:start + step]
+            if c:
+                nids = rid[None, :, :] + (rid[None, :, :] >= ids[:, None, None])
+                zn = z[nids]
+                if weighted:
+                    wts = data[indptr[ids][:, None] + np.arange(c)]
+                    zn = zn * wts[:, None, :]
+                lag = zn.sum(2)
+            else:
+                lag = np.zeros((len(ids), permutations))
+            block = stat(lag, ids)
+            larger[ids] = (block >= observed[ids][:, None]).sum(1)
+            count, mean, m2 = _update_moments(count, mean, m2, block)
+            if keep:
+                sim[:, ids] = block.T
+    return larger, mean, m2 / count, sim
+
+
+def _sample_ids(n, k, permutations):
+    """
+    Draw permutations rows of k distinct ids out of range(n)
+
+    Rows with a repeated id are redrawn, which keeps every row a uniform
+    sample without replacement while avoiding a full permutation of n ids
+    per row when k is small relative to n.
+    """
+    if 2 * k * k > n:
+        return np.array([np.random.permutation(n)[:k]
+                         for i in xrange(permutations)])
+    rids = np.random.randint(0, n, (permutations, k))
+    while k > 1:
+        srids = np.sort(rids, axis=1)
+        dup = (srids[:, 1:] == srids[:, :-1]).any(1)
+        ndup = dup.sum()
+        if not ndup:
+            break
+        rids[dup] = np.random.randint(0, n, (ndup, k))
+    return rids
+
+
+def _update_moments(count, mean, m2, block):
+    """
+    Combine running mean and sum of squared deviations with a new block
+    """
+    nb = block.size
+    if not nb:
+        return count, mean, m2
+    mb = block.mean()
+    m2b = ((block - mb) ** 2).sum()
+    total = count + nb
+    delta = mb - mean
+    mean = mean + delta * nb / total
+    m2 = m2 + m2b + delta * delta * count * nb / total
+    return total, mean, m2
@@ -7,6 +7,8 @@ __author__ = "Luc Anselin <luc.anselin@asu.edu>"
 
 import pysal
 import numpy as np
+from pysal.esda.permutation import simulate, CrossProduct, \
+    SquaredDifference, AbsoluteDifference
 
 __all__ = ['Gamma']
 
@@ -34,6 +36,12 @@ class Gamma:
                       'yes' or 'y' standardize to mean zero and variance one
     permutations    : int
                       number of random permutations for calculation of pseudo-p_values
+    cores           : integer
+                      number of processes used to evaluate the permutations,
+                      see pysal.esda.permutation.simulate
+                      Default: 1 (None uses all cores available). A user
+                      defined operation has to be picklable to use more
+                      than one core.
 
     Attributes
     ----------
@@ -138,7 +146,8 @@ class Gamma:
     0.0030000000000000001
 
     """
-    def __init__(self, y, w, operation='c', standardize='no', permutations=PERMUTATIONS):
+    def __init__(self, y, w, operation='c', standardize='no',
+                 permutations=PERMUTATIONS, cores=1):
         self.w = w
         self.y = y
         self.op = operation
@@ -149,12 +158,11 @@ class Gamma:
             ysd = np.std(self.y)
             ys = (self.y - ym) / ysd
             self.y = ys
-        self.g = self.__calc(self.y, self.op)
+        calc = self.__calc_function(self.op)
+        self.g = calc(self.y[:, None])[0]
 
         if permutations:
-            sim = [self.__calc(np.random.permutation(self.y), self.op)
-                   for i in xrange(permutations)]
-            self.sim_g = np.array(sim)
+            self.sim_g = simulate(calc, self.y, permutations, cores)
             self.min_g = np.min(self.sim_g)
             self.mean_g = np.mean(self.sim_g)
             self.max_g = np.max(self.sim_g)
@@ -162,37 +170,15 @@ class Gamma:
             self.p_sim_g = p_sim_g
             self.g_z = (self.g - self.mean_g) / np.std(self.sim_g)
 
-    def __calc(self, z, op):
+    def __calc_function(self, op):
         if op == 'c':     # cross-product
-            zl = pysal.lag_spatial(self.w, z)
-            g = (z * zl).sum()
+            return CrossProduct(self.w)
         elif op == 's':   # squared difference
-            zs = np.zeros(z.shape)
-            z2 = z ** 2
-            for i, i0 in enumerate(self.w.id_order):
-                neighbors = self.w.neighbor_offsets[i0]
-                wijs = self.w.weights[i0]
-                zw = zip(neighbors, wijs)
-                zs[i] = sum([wij * (z2[i] - 2.0 * z[i] * z[
-                    j] + z2[j]) for j, wij in zw])
-            g = zs.sum()
+            return SquaredDifference(self.w)
         elif op == 'a':    # absolute difference
-            zs = np.zeros(z.shape)
-            for i, i0 in enumerate(self.w.id_order):
-                neighbors = self.w.neighbor_offsets[i0]
-                wijs = self.w.weights[i0]
-                zw = zip(neighbors, wijs)
-                zs[i] = sum([wij * abs(z[i] - z[j]) for j, wij in zw])
-            g = zs.sum()
+            return AbsoluteDifference(self.w)
         else:              # any previously defined function op
-            zs = np.zeros(z.shape)
-            for i, i0 in enumerate(self.w.id_order):
-                neighbors = self.w.neighbor_offsets[i0]
-                wijs = self.w.weights[i0]
-                zw = zip(neighbors, wijs)
-                zs[i] = sum([wij * op(z, i, j) for j, wij in zw])
-            g = zs.sum()
-        return g
+            return _Operation(self.w, op)
 
     def __pseudop(self, sim, g):
         above = sim >= g
@@ -202,3 +188,17 @@ class Gamma:
             psim = (self.permutations - larger + 1.) / (self.permutations + 1.)
         return psim
 
+
+class _Operation(object):
+    """
+    Sum of w_ij * op(z, i, j) for each column z of Z
+    """
+    def __init__(self, w, op):
+        pairs = w.sparse.tocoo()
+        self.pairs = zip(pairs.row, pairs.col, pairs.data)
+        self.op = op
+
+    def __call__(self, Z):
+        op = self.op
+        return np.array([sum([wij * op(z, i, j) for i, j, wij in self.pairs])
+                         for z in Z.T])
@@ -5,6 +5,7 @@ __author__ = "Sergio J. Rey <srey@asu.edu> "
 
 import numpy as np
 import scipy.stats as stats
+from pysal.esda.permutation import simulate, SquaredDifference
 
 __all__ = ['Geary']
 
@@ -26,6 +27,10 @@ class Geary:
     permutations   : int
                      number of random permutations for calculation of
                      pseudo-p_values
+    cores          : integer
+                     number of processes used to evaluate the permutations,
+                     see pysal.esda.permutation.simulate
+                     Default: 1 (None uses all cores available)
 
     Attributes
     ----------
@@ -81,7 +86,7 @@ class Geary:
     9.2e-05
     >>>
     """
-    def __init__(self, y, w, transformation="r", permutations=999):
+    def __init__(self, y, w, transformation="r", permutations=999, cores=1):
         self.n = len(y)
         self.y = y
         w.transform = transformation
@@ -94,7 +99,8 @@ class Geary:
         yd = y - y.mean()
         yss = sum(yd * yd)
         self.den = yss * self.w.s0 * 2.0
-        self.C = self.__calc(y)
+        calc = SquaredDifference(w, (self.n - 1) / self.den)
+        self.C = calc(y[:, None])[0]
         de = self.C - 1.0
         self.EC = 1.0
         self.z_norm = de / self.seC_norm
@@ -108,9 +114,7 @@ class Geary:
 
 
         if permutations:
-            sim = [self.__calc(np.random.permutation(self.y))
-                   for i in xrange(permutations)]
-            self.sim = sim = np.array(sim)
+            self.sim = sim = simulate(calc, self.y, permutations, cores)
             above = sim >= self.C
             larger = sum(above)
             if (permutations - larger) < larger:
@@ -146,16 +150,4 @@ class Geary:
         self.seC_rand = vc_rand ** (0.5)
         self.seC_norm = vc_norm ** (0.5)
 
-    def __calc(self, y):
-        ys = np.zeros(y.shape)
-        y2 = y ** 2
-        for i, i0 in enumerate(self.w.id_order):
-            neighbors = self.w.neighbor_offsets[i0]
-            wijs = self.w.weights[i0]
-            z = zip(neighbors, wijs)
-            ys[i] = sum([wij * (y2[i] - 2 * y[i] * y[j] + y2[j])
-                         for j, wij in z])
-        a = (self.n - 1) * sum(ys)
-        return a / self.den
-
 
@@ -6,6 +6,8 @@ __all__ = ['G', 'G_Local']
 
 from pysal.common import np, stats, math
 from pysal.weights.spatial_lag import lag_spatial as slag
+from pysal.esda.crand import crand
+from pysal.esda.permutation import simulate, CrossProduct
 
 PERMUTATIONS = 999
 
@@ -22,6 +24,10 @@ class G:
     permutations: int
                   the number of random permutations for calculating
                   pseudo p_values
+    cores: integer
+           number of processes used to evaluate the permutations,
+           see pysal.esda.permutation.simulate
+           Default: 1 (None uses all cores available)
 
     Attributes:
     -----------
@@ -94,7 +100,7 @@ class G:
     0.1729
 
     """
-    def __init__(self, y, w, permutations=PERMUTATIONS):
+    def __init__(self, y, w, permutations=PERMUTATIONS, cores=1):
         self.n = len(y)
         self.y = y
         w.transform = "B"
@@ -104,14 +110,13 @@ class G:
         self.y2 = y * y
         y = y.reshape(len(y), 1)  # Ensure that y is an n by 1 vector, otherwise y*y.T == y*y
         self.den_sum = (y * y.T).sum() - (y * y).sum()
-        self.G = self.__calc(self.y)
+        calc = CrossProduct(w, 1.0 / self.den_sum)
+        self.G = calc(self.y[:, None])[0]
         self.z_norm = (self.G - self.EG) / math.sqrt(self.VG)
         self.p_norm = 1.0 - stats.norm.cdf(np.abs(self.z_norm))
 
         if permutations:
-            sim = [self.__calc(np.random.permutation(self.y))
-                   for i in xrange(permutations)]
-            self.sim = sim = np.array(sim)
+            self.sim = sim = simulate(calc, self.y, permutations, cores)
             above = sim >= self.G
             larger = sum(above)
             if (self.permutations - larger) < larger:
@@ -155,11 +160,6 @@ class G:
         self.EG2 = EG2NUM / EG2DEN
         self.VG = self.EG2 - self.EG ** 2
 
-    def __calc(self, y):
-        yl = slag(self.w, y)
-        self.num = y * yl
-        return self.num.sum() / self.den_sum
-
 
 class G_Local:
     """
@@ -180,6 +180,9 @@ class G_Local:
     star: boolean
           whether or not to include focal observation in sums
           default is False
+    keep_simulations: boolean
+          if True the simulated local statistics are kept in sim,
+          otherwise only their summaries are stored
 
     Attributes:
     -----------
@@ -202,8 +205,8 @@ class G_Local:
     p_norm: array of floats
             p-value under normality assumption (one-sided)
             for two-sided tests, this value should be multiplied by 2
-    sim: array of arrays of floats (if permutations>0)
-         vector of I values for permutated samples
+    sim: array of arrays of floats (if permutations>0 and keep_simulations)
+         permutations x n array of G values for permutated samples
     p_sim: array of floats
            p-value based on permutations (one-sided)
            null: spatial randomness
@@ -265,7 +268,7 @@ class G_Local:
     array([-1.0136729 , -0.04361589,  1.31558703, -0.31412676,  1.15373986,
             1.77833941])
     >>> lg.p_sim[0]
-    0.10100000000000001
+    0.10199999999999999
 
     >>> numpy.random.seed(10)
 
@@ -277,7 +280,7 @@ class G_Local:
     array([-1.39727626, -0.28917762,  0.65064964, -0.28917762,  1.23452088,
             2.02424331])
     >>> lg_star.p_sim[0]
-    0.10100000000000001
+    0.10199999999999999
 
     >>> numpy.random.seed(10)
 
@@ -289,7 +292,7 @@ class G_Local:
     array([-0.62074534, -0.01780611,  1.31558703, -0.12824171,  0.28843496,
             1.77833941])
     >>> lg.p_sim[0]
-    0.10100000000000001
+    0.10199999999999999
 
     >>> numpy.random.seed(10)
 
@@ -301,10 +304,11 @@ class G_Local:
     array([-0.62488094, -0.09144599,  0.41150696, -0.09144599,  0.24690418,
             1.28024388])
     >>> lg_star.p_sim[0]
-    0.10100000000000001
+    0.10199999999999999
 
     """
-    def __init__(self, y, w, transform='R', permutations=PERMUTATIONS, star=False):
+    def __init__(self, y, w, transform='R', permutations=PERMUTATIONS,
+                 star=False, keep_simulations=False):
         self.n = len(y)
         self.y = y
         self.w = w
@@ -316,44 +320,33 @@ class G_Local:
         self.p_norm = np.array(
             [1 - stats.norm.cdf(np.abs(i)) for i in self.Zs])
         if permutations:
-            self.__crand()
-            sim = np.transpose(self.rGs)
-            above = sim >= self.Gs
-            larger = sum(above)
+            larger, self.EG_sim, self.VG_sim, sim = self.__crand(
+                keep_simulations)
             low_extreme = (self.permutations - larger) < larger
             larger[low_extreme] = self.permutations - larger[low_extreme]
             self.p_sim = (larger + 1.0) / (permutations + 1)
-            self.sim = sim
-            self.EG_sim = sim.mean()
-            self.seG_sim = sim.std()
-            self.VG_sim = self.seG_sim * self.seG_sim
+            if keep_simulations:
+                self.sim = sim
+                self.rGs = np.transpose(sim)
+            self.seG_sim = np.sqrt(self.VG_sim)
             self.z_sim = (self.Gs - self.EG_sim) / self.seG_sim
             self.p_z_sim = 1 - stats.norm.cdf(np.abs(self.z_sim))
 
-    def __crand(self):
+    def __crand(self, keep):
         y = self.y
-        rGs = np.zeros((self.n, self.permutations))
-        n_1 = self.n - 1
-        rid = range(n_1)
-        prange = range(self.permutations)
-        k = self.w.max_neighbors + 1
-        rids = np.array([np.random.permutation(rid)[0:k] for i in prange])
-        ids = np.arange(self.w.n)
-        ido = self.w.id_order
         wc = self.__getCardinalities()
         if self.w_transform == 'r':
             den = np.array(wc) + self.star
         else:
             den = np.ones(self.w.n)
-        for i in range(self.w.n):
-            idsi = ids[ids != i]
-            np.random.shuffle(idsi)
-            yi_star = y[i] * self.star
-            wci = wc[i]
-            rGs[i] = (y[idsi[rids[:, 0:wci]]]).sum(1) + yi_star
-            rGs[i] = (np.array(rGs[i]) / den[i]) / (
-                self.y_sum - (1 - self.star) * y[i])
-        self.rGs = rGs
+        yi_star = y * self.star
+        ydi = den * (self.y_sum - (1 - self.star) * y)
+
+        def gs(lag, ids):
+            return (lag + yi_star[ids][:, None]) / ydi[ids][:, None]
+
+        return crand(y, self.w, self.Gs, gs, self.permutations, keep,
+                     weighted=False)
 
     def __getCardinalities(self):
         ido = self.w.id_order
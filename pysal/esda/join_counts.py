@@ -6,6 +6,7 @@ __author__ = "Sergio J. Rey <srey@asu.edu> , Luc Anselin <luc.anselin@asu.edu>"
 
 import pysal
 import numpy as np
+from pysal.esda.permutation import simulate, CrossProduct
 
 __all__ = ['Join_Counts']
 
@@ -25,6 +26,10 @@ class Join_Counts:
                       spatial weights instance
     permutations    : int
                       number of random permutations for calculation of pseudo-p_values
+    cores           : integer
+                      number of processes used to evaluate the permutations,
+                      see pysal.esda.permutation.simulate
+                      Default: 1 (None uses all cores available)
 
     Attributes
     ----------
@@ -103,18 +108,17 @@ class Join_Counts:
     7.0
     >>>
     """
-    def __init__(self, y, w, permutations=PERMUTATIONS):
+    def __init__(self, y, w, permutations=PERMUTATIONS, cores=1):
         w.transformation = 'b'  # ensure we have binary weights
         self.w = w
         self.y = y
         self.permutations = permutations
         self.J = w.s0 / 2.
-        self.bb, self.ww, self.bw = self.__calc(self.y)
+        calc = _JoinCounts(w, self.J)
+        self.bb, self.ww, self.bw = calc(self.y[:, None])[0]
 
         if permutations:
-            sim = [self.__calc(np.random.permutation(self.y))
-                   for i in xrange(permutations)]
-            sim_jc = np.array(sim)
+            sim_jc = simulate(calc, self.y, permutations, cores)
             self.sim_bb = sim_jc[:, 0]
             self.min_bb = np.min(self.sim_bb)
             self.mean_bb = np.mean(self.sim_bb)
@@ -128,17 +132,23 @@ class Join_Counts:
             self.p_sim_bb = p_sim_bb
             self.p_sim_bw = p_sim_bw
 
-    def __calc(self, z):
-        zl = pysal.lag_spatial(self.w, z)
-        bb = sum(z * zl) / 2.0
-        zw = 1 - z
-        zl = pysal.lag_spatial(self.w, zw)
-        ww = sum(zw * zl) / 2.0
-        bw = self.J - (bb + ww)
-        return (bb, ww, bw)
-
     def __pseudop(self, sim, jc):
         above = sim >= jc
         larger = sum(above)
         psim = (larger + 1.) / (self.permutations + 1.)
         return psim
+
+
+class _JoinCounts(object):
+    """
+    bb, ww and bw join counts for each column of Z
+    """
+    def __init__(self, w, J):
+        self.cross = CrossProduct(w, 0.5)
+        self.J = J
+
+    def __call__(self, Z):
+        bb = self.cross(Z)
+        ww = self.cross(1 - Z)
+        bw = self.J - (bb + ww)
+        return np.column_stack((bb, ww, bw))
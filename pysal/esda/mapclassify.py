@@ -290,72 +290,144 @@ def natural_breaks(values, k=5, itmax=100):
 
 def _fisher_jenks_means(values, classes=5, sort=True):
     """
-    Jenks Optimal (Natural Breaks) algorithm implemented in Python.
-    The original Python code comes from here:
-    http://danieljlewis.org/2010/06/07/jenks-natural-breaks-algorithm-in-python/
-    and is based on a JAVA and Fortran code available here:
-    https://stat.ethz.ch/pipermail/r-sig-geo/2006-March/000811.html
+    Jenks Optimal (Natural Breaks) algorithm.
 
     Returns class breaks such that classes are internally homogeneous while
-    assuring heterogeneity among classes.
+    assuring heterogeneity among classes, as a list whose first element is
+    the minimum and whose following elements are the upper bounds of the
+    classes. See _Fisher_Jenks_Table.
 
     """
 
     if sort:
         values.sort()
-    mat1 = []
-    for i in range(0, len(values) + 1):
-        temp = []
-        for j in range(0, classes + 1):
-            temp.append(0)
-        mat1.append(temp)
-    mat2 = []
-    for i in range(0, len(values) + 1):
-        temp = []
-        for j in range(0, classes + 1):
-            temp.append(0)
-        mat2.append(temp)
-    for i in range(1, classes + 1):
-        mat1[1][i] = 1
-        mat2[1][i] = 0
-        for j in range(2, len(values) + 1):
-            mat2[j][i] = float('inf')
-    v = 0.0
-    for l in range(2, len(values) + 1):
-        s1 = 0.0
-        s2 = 0.0
-        w = 0.0
-        for m in range(1, l + 1):
-            i3 = l - m + 1
-            val = float(values[i3 - 1])
-            s2 += val * val
-            s1 += val
-            w += 1
-            v = s2 - (s1 * s1) / w
-            i4 = i3 - 1
-            if i4 != 0:
-                for j in range(2, classes + 1):
-                    if mat2[l][j] >= (v + mat2[i4][j - 1]):
-                        mat1[l][j] = i3
-                        mat2[l][j] = v + mat2[i4][j - 1]
-        mat1[l][1] = 1
-        mat2[l][1] = v
-
-    k = len(values)
-
-    kclass = []
-    for i in range(0, classes + 1):
-        kclass.append(0)
-    kclass[classes] = float(values[len(values) - 1])
-    kclass[0] = float(values[0])
-    countNum = classes
-    while countNum >= 2:
-        pivot = mat1[k][countNum]
-        id = int(pivot - 2)
-        kclass[countNum - 1] = values[id]
-        k = int(pivot - 1)
-        countNum -= 1
-    return kclass
+    table = _fisher_jenks_table(values)
+    return [float(table.u[0])] + table.bins(classes)
+
+
+class _Fisher_Jenks_Table:
+    """
+    Optimal Fisher-Jenks partitions of a set of values, for any number of
+    classes
+
+    Tied values are collapsed into weighted unique values, which are never
+    split between classes. With prefix sums of the weights, values and
+    squared values, the sum of squared deviations of any class is found in
+    constant time. The table of the dynamic program is built one number of
+    classes at a time, when first needed, and each layer is solved by divide
+    and conquer on the position of the last break, which is monotone in the
+    number of values covered. All the positions at one level of the
+    recursion are evaluated at once with numpy, so a layer takes
+    O(m log m) operations for m unique values, and one table answers all k.
+
+    Parameters
+    ----------
+    values : array
+             values to classify
+
+    Attributes
+    ----------
+    u      : array
+             sorted unique values
+    m      : int
+             number of unique values
+    """
+    def __init__(self, values):
+        values = np.asarray(values, float).flatten()
+        self.values = values.copy()
+        u, inverse = np.unique(values, return_inverse=True)
+        counts = np.bincount(inverse).astype(float)
+        self.u = u
+        self.m = len(u)
+        # centering keeps the prefix sums of squares accurate
+        x = u - values.mean()
+        self.cw = np.concatenate(([0.0], counts.cumsum()))
+        self.cs = np.concatenate(([0.0], (counts * x).cumsum()))
+        self.css = np.concatenate(([0.0], (counts * x * x).cumsum()))
+        j = np.arange(self.m + 1)
+        # cost[j] is the smallest sum of squared deviations of the first j
+        # unique values in the current number of classes, opt[c][j] the
+        # start of the last class in the best partition of j values in c
+        # classes
+        self.cost = np.empty(self.m + 1)
+        self.cost[0] = np.inf
+        self.cost[1:] = self._ssd(np.zeros(self.m, int), j[1:])
+        self.opt = [None, np.zeros(self.m + 1, int)]
+
+    def _ssd(self, i, j):
+        """
+        sum of squared deviations of the unique values i to j - 1
+        """
+        w = self.cw[j] - self.cw[i]
+        s = self.cs[j] - self.cs[i]
+        return self.css[j] - self.css[i] - s * s / w
+
+    def _add_layer(self):
+        c = len(self.opt)
+        m = self.m
+        prev = self.cost
+        cost = np.empty(m + 1)
+        cost.fill(np.inf)
+        opt = np.zeros(m + 1, int)
+        # ranges of ends j and of candidate starts i of the last class
+        jlo, jhi = np.array([c]), np.array([m])
+        ilo, ihi = np.array([c - 1]), np.array([m - 1])
+        while len(jlo):
+            mid = (jlo + jhi) // 2
+            hi = np.minimum(ihi, mid - 1)
+            sizes = hi - ilo + 1
+            seg = np.repeat(np.arange(len(mid)), sizes)
+            offsets = np.arange(sizes.sum()) - np.repeat(sizes.cumsum() - sizes, sizes)
+            i = ilo[seg] + offsets
+            total = prev[i] + self._ssd(i, mid[seg])
+            # first (smallest) start with the minimal cost in each segment
+            mins = np.minimum.reduceat(total, sizes.cumsum() - sizes)
+            hit = np.flatnonzero(total == mins[seg])
+            first = hit[np.concatenate(([True], seg[hit][1:] != seg[hit][:-1]))]
+            best = i[first]
+            cost[mid] = total[first]
+            opt[mid] = best
+            left = jlo < mid
+            right = mid < jhi
+            jlo, jhi, ilo, ihi = (np.concatenate((jlo[left], mid[right] + 1)),
+                                  np.concatenate((mid[left] - 1, jhi[right])),
+                                  np.concatenate((ilo[left], best[right])),
+                                  np.concatenate((best[left], ihi[right])))
+        self.cost = cost
+        self.opt.append(opt)
+
+    def bins(self, k):
+        """
+        Upper bounds of the classes of the optimal partition in k classes,
+        or in m classes if there are fewer than k unique values
+        """
+        k = min(k, self.m)
+        while len(self.opt) <= k:
+            self._add_layer()
+        breaks = []
+        j = self.m
+        for c in xrange(k, 1, -1):
+            j = self.opt[c][j]
+            breaks.append(self.u[j - 1])
+        breaks.reverse()
+        return breaks + [float(self.u[-1])]
+
+
+_FJ_TABLE = {}
+
+
+def _fisher_jenks_table(values):
+    """
+    _Fisher_Jenks_Table of values, reusing the last one built if it was for
+    the same values, so classifying the same data for several k (gadf,
+    K_classifiers) solves the dynamic program only once
+    """
+    values = np.asarray(values, float).flatten()
+    table = _FJ_TABLE.get('table')
+    if table is None or not np.array_equal(table.values, values):
+        table = _Fisher_Jenks_Table(values)
+        _FJ_TABLE['table'] = table
+    return table
 
 
 class Map_Classifier:
@@ -1012,8 +1084,8 @@ class Fisher_Jenks(Map_Classifier):
         self.name = "Fisher_Jenks"
 
     def _set_bins(self):
-        x = self.y.copy()
-        self.bins = _fisher_jenks_means(x, classes=self.k)[1:]
+        self.bins = _fisher_jenks_table(self.y).bins(self.k)
+        self.k = len(self.bins)
 
 
 class Fisher_Jenks_Sampled(Map_Classifier):
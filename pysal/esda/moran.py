@@ -5,6 +5,8 @@ Moran's I Spatial Autocorrelation Statistics
 __author__ = "Sergio J. Rey <srey@asu.edu>"
 from pysal.weights.spatial_lag import lag_spatial as slag
 from pysal.esda.smoothing import assuncao_rate
+from pysal.esda.crand import crand
+from pysal.esda.permutation import simulate, CrossProduct
 import scipy.stats as stats
 import numpy as np
 
@@ -33,6 +35,10 @@ class Moran:
     permutations    : int
                       number of random permutations for calculation of
                       pseudo-p_values
+    cores           : integer
+                      number of processes used to evaluate the permutations,
+                      see pysal.esda.permutation.simulate
+                      Default: 1 (None uses all cores available)
 
 
     Attributes
@@ -107,13 +113,15 @@ class Moran:
     >>> mi.p_norm
     5.7916539074498452e-05
     """
-    def __init__(self, y, w, transformation="r", permutations=PERMUTATIONS):
+    def __init__(self, y, w, transformation="r", permutations=PERMUTATIONS,
+                 cores=1):
         self.y = y
         w.transform = transformation
         self.w = w
         self.permutations = permutations
         self.__moments()
-        self.I = self.__calc(self.z)
+        calc = CrossProduct(w, self.n / self.w.s0 / self.z2ss)
+        self.I = calc(self.z[:, None])[0]
         self.z_norm = (self.I - self.EI) / self.seI_norm
         self.z_rand = (self.I - self.EI) / self.seI_rand
         if self.z_norm > 0:
@@ -124,9 +132,7 @@ class Moran:
             self.p_rand = stats.norm.cdf(self.z_rand)
 
         if permutations:
-            sim = [self.__calc(np.random.permutation(self.z))
-                   for i in xrange(permutations)]
-            self.sim = sim = np.array(sim)
+            self.sim = sim = simulate(calc, self.z, permutations, cores)
             above = sim >= self.I
             larger = sum(above)
             if (self.permutations - larger) < larger:
@@ -167,11 +173,6 @@ class Moran:
         self.VI_rand = vi
         self.seI_rand = vi ** (1 / 2.)
 
-    def __calc(self, z):
-        zl = slag(self.w, z)
-        inum = sum(z * zl)
-        return self.n / self.w.s0 * inum / self.z2ss
-
 
 class Moran_BV:
     """Bivariate Moran's I
@@ -396,6 +397,10 @@ class Moran_Rate(Moran):
     permutations    : int
                       number of random permutations for calculation of pseudo
                       p_values
+    cores           : integer
+                      number of processes used to evaluate the permutations,
+                      see pysal.esda.permutation.simulate
+                      Default: 1 (None uses all cores available)
 
 
     Attributes
@@ -468,13 +473,13 @@ class Moran_Rate(Moran):
     """
 
     def __init__(self, e, b, w, adjusted=True, transformation="r",
-                 permutations=PERMUTATIONS):
+                 permutations=PERMUTATIONS, cores=1):
         if adjusted:
             y = assuncao_rate(e, b)
         else:
             y = e * 1.0 / b
         Moran.__init__(self, y, w, transformation=transformation,
-                       permutations=permutations)
+                       permutations=permutations, cores=cores)
 
 
 class Moran_Local:
@@ -497,6 +502,9 @@ class Moran_Local:
 
     permutations   : number of random permutations for calculation of pseudo
                      p_values
+    keep_simulations : boolean
+                       if True the simulated local statistics are kept in
+                       sim, otherwise only their summaries are stored
 
     Attributes
     ----------
@@ -512,8 +520,8 @@ class Moran_Local:
                    value of Moran's I
     q            : array (if permutations>0)
                    values indicate quadrat location 1 HH,  2 LH,  3 LL,  4 HL
-    sim          : array (if permutations>0)
-                   vector of I values for permutated samples
+    sim          : array (if permutations>0 and keep_simulations)
+                   permutations x n array of Ii values for permutated samples
     p_sim        : array (if permutations>0)
                    p-value based on permutations (one-sided)
                    null: spatial randomness
@@ -545,13 +553,14 @@ class Moran_Local:
     >>> lm.q
     array([4, 4, 4, 2, 3, 3, 1, 4, 3, 3])
     >>> lm.p_z_sim[0]
-    0.46756830387716064
+    0.49518324030436089
 
     Note random components result is slightly different values across
     architectures so the results have been removed from doctests and will be
     moved into unittests that are conditional on architectures
     """
-    def __init__(self, y, w, transformation="r", permutations=PERMUTATIONS):
+    def __init__(self, y, w, transformation="r", permutations=PERMUTATIONS,
+                 keep_simulations=False):
         self.y = y
         n = len(y)
         self.n = n
@@ -571,17 +580,15 @@ class Moran_Local:
         self.Is = self.calc(self.w, self.z)
         self.__quads()
         if permutations:
-            self.__crand()
-            sim = np.transpose(self.rlisas)
-            above = sim >= self.Is
-            larger = sum(above)
+            larger, self.EI_sim, self.VI_sim, sim = self.__crand(
+                keep_simulations)
             low_extreme = (self.permutations - larger) < larger
             larger[low_extreme] = self.permutations - larger[low_extreme]
             self.p_sim = (larger + 1.0) / (permutations + 1.0)
-            self.sim = sim
-            self.EI_sim = sim.mean()
-            self.seI_sim = sim.std()
-            self.VI_sim = self.seI_sim * self.seI_sim
+            if keep_simulations:
+                self.sim = sim
+                self.rlisas = np.transpose(sim)
+            self.seI_sim = np.sqrt(self.VI_sim)
             self.z_sim = (self.Is - self.EI_sim) / self.seI_sim
             self.p_z_sim = 1 - stats.norm.cdf(np.abs(self.z_sim))
 
@@ -589,37 +596,23 @@ class Moran_Local:
         zl = slag(w, z)
         return self.n_1 * self.z * zl / self.den
 
-    def __crand(self):
+    def __crand(self, keep):
         """
         conditional randomization
 
         for observation i with ni neighbors,  the candidate set cannot include
-        i (we don't want i being a neighbor of i). we have to sample without
-        replacement from a set of ids that doesn't include i. numpy doesn't
-        directly support sampling wo replacement and it is expensive to
-        implement this. instead we omit i from the original ids,  permutate the
-        ids and take the first ni elements of the permutated ids as the
-        neighbors to i in each randomization.
+        i (we don't want i being a neighbor of i). a single pool of random
+        neighbor sets is drawn from the n-1 ids that exclude i and shared
+        across observations, see pysal.esda.crand.crand.
 
         """
         z = self.z
-        lisas = np.zeros((self.n, self.permutations))
-        n_1 = self.n - 1
-        prange = range(self.permutations)
-        k = self.w.max_neighbors + 1
-        nn = self.n - 1
-        rids = np.array([np.random.permutation(nn)[0:k] for i in prange])
-        ids = np.arange(self.w.n)
-        ido = self.w.id_order
-        w = [self.w.weights[ido[i]] for i in ids]
-        wc = [self.w.cardinalities[ido[i]] for i in ids]
-
-        for i in xrange(self.w.n):
-            idsi = ids[ids != i]
-            np.random.shuffle(idsi)
-            tmp = z[idsi[rids[:, 0:wc[i]]]]
-            lisas[i] = z[i] * (w[i] * tmp).sum(1)
-        self.rlisas = (n_1 / self.den) * lisas
+        scale = self.n_1 / self.den
+
+        def lisas(lag, ids):
+            return (scale * z[ids])[:, None] * lag
+
+        return crand(z, self.w, self.Is, lisas, self.permutations, keep)
 
     def __quads(self):
         zl = slag(self.w, self.z)
@@ -655,6 +648,9 @@ class Moran_Local_Rate(Moran_Local):
                      "V": variance-stabilizing.
     permutations   : number of random permutations for calculation of pseudo
                      p_values
+    keep_simulations : boolean
+                       if True the simulated local statistics are kept in
+                       sim, otherwise only their summaries are stored
 
 
     Attributes
@@ -672,8 +668,8 @@ class Moran_Local_Rate(Moran_Local):
                    value of Moran's I
     q            : array (if permutations>0)
                    values indicate quadrat location 1 HH,  2 LH,  3 LL,  4 HL
-    sim          : array (if permutations>0)
-                   vector of I values for permutated samples
+    sim          : array (if permutations>0 and keep_simulations)
+                   permutations x n array of Ii values for permutated samples
     p_sim        : array (if permutations>0)
                    p-value based on permutations (one-sided)
                    null: spatial randomness
@@ -713,7 +709,7 @@ class Moran_Local_Rate(Moran_Local):
     >>> lm.q[:10]
     array([2, 4, 3, 1, 2, 1, 1, 4, 2, 4])
     >>> lm.p_z_sim[0]
-    0.39319552026912641
+    0.4075510649196592
 
     Note random components result is slightly different values across
     architectures so the results have been removed from doctests and will be
@@ -721,14 +717,15 @@ class Moran_Local_Rate(Moran_Local):
     """
 
     def __init__(self, e, b, w, adjusted=True, transformation="r",
-                 permutations=PERMUTATIONS):
+                 permutations=PERMUTATIONS, keep_simulations=False):
         if adjusted:
             y = assuncao_rate(e, b)
         else:
             y = e * 1.0 / b
         Moran_Local.__init__(self, y, w,
                              transformation=transformation,
-                             permutations=permutations)
+                             permutations=permutations,
+                             keep_simulations=keep_simulations)
 
 
 def _test():
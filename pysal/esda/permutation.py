@@ -0,0 +1,178 @@
+"""
+Permutation inference for global spatial autocorrelation statistics
+
+"""
+import multiprocessing as mp
+from platform import system
+import numpy as np
+
+__all__ = ['simulate', 'CrossProduct', 'SquaredDifference',
+           'AbsoluteDifference']
+
+# upper bound on the number of values in a block of permuted vectors
+BLOCK_SIZE = 2 ** 20
+# upper bound on the number of permutations evaluated in one block
+MAX_BLOCK = 1000
+MAX_SEED = 2 ** 31 - 1
+
+_WORKER = {}
+
+
+def simulate(stat, y, permutations, cores=1):
+    """
+    Evaluate a global statistic on random permutations of y
+
+    Parameters
+    ----------
+    stat         : callable
+                   stat(Y) returns the statistic for each column of the n x b
+                   array Y of permuted copies of y, as an array whose first
+                   dimension is b. It has to be picklable if cores is not 1.
+    y            : array
+                   n values that are permuted
+    permutations : int
+                   number of random permutations
+    cores        : integer
+                   number of processes used to evaluate the permutations.
+                   Default: 1, permutations are drawn from the global numpy
+                   random stream, in the same order as repeated calls to
+                   np.random.permutation(y). For any other value (None means
+                   all cores available) each block of permutations draws from
+                   its own random stream, seeded from the global stream, so
+                   results only depend on the seed and not on the number of
+                   cores. Note: multiprocessing is not available on Windows.
+
+    Returns
+    -------
+    sim          : array
+                   statistic for each permutation, first dimension is
+                   permutations
+
+    Examples
+    --------
+    >>> import pysal
+    >>> import numpy as np
+    >>> np.random.seed(12345)
+    >>> w = pysal.lat2W(4, 4)
+    >>> y = np.arange(16.)
+    >>> sim = simulate(CrossProduct(w), y, 99)
+    >>> sim.shape
+    (99,)
+    >>> np.random.seed(12345)
+    >>> sim1 = simulate(CrossProduct(w), y, 99, cores=2)
+    >>> np.random.seed(12345)
+    >>> sim2 = simulate(CrossProduct(w), y, 99, cores=3)
+    >>> (sim1 == sim2).all()
+    True
+    """
+    n = len(y)
+    size = max(1, min(MAX_BLOCK, BLOCK_SIZE // max(1, n)))
+    sizes = [size] * (permutations // size)
+    if permutations % size:
+        sizes.append(permutations % size)
+    if cores == 1:
+        return np.concatenate([stat(_permute(y, b, np.random))
+                               for b in sizes])
+    seeds = np.random.randint(0, MAX_SEED, len(sizes))
+    tasks = zip(seeds, sizes)
+    if cores is None:
+        cores = mp.cpu_count()
+    if system() == 'Windows' or cores == 1 or len(tasks) == 1:
+        sims = [_block(stat, y, seed, b) for seed, b in tasks]
+    else:
+        pool = mp.Pool(min(cores, len(tasks)), _init_worker, (stat, y))
+        try:
+            sims = pool.map(_work, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    return np.concatenate(sims)
+
+
+def _permute(y, b, rs):
+    """
+    n x b array of random permutations of y drawn from rs
+    """
+    Y = np.empty((len(y), b))
+    for j in xrange(b):
+        Y[:, j] = rs.permutation(y)
+    return Y
+
+
+def _block(stat, y, seed, b):
+    return stat(_permute(y, b, np.random.RandomState(seed)))
+
+
+def _init_worker(stat, y):
+    _WORKER['stat'] = stat
+    _WORKER['y'] = y
+
+
+def _work(task):
+    seed, b = task
+    return _block(_WORKER['stat'], _WORKER['y'], seed, b)
+
+
+class CrossProduct(object):
+    """
+    Sum of w_ij * y_i * y_j for each column of Y, times scale
+
+    Parameters
+    ----------
+    w     : W
+            spatial weights instance with the transformation to be used
+    scale : float
+            constant the sums are multiplied by
+    """
+    def __init__(self, w, scale=1.0):
+        self.sparse = w.sparse
+        self.scale = scale
+
+    def __call__(self, Y):
+        return self.scale * (Y * (self.sparse * Y)).sum(0)
+
+
+class SquaredDifference(object):
+    """
+    Sum of w_ij * (y_i - y_j)**2 for each column of Y, times scale
+
+    Parameters
+    ----------
+    w     : W
+            spatial weights instance with the transformation to be used
+    scale : float
+            constant the sums are multiplied by
+    """
+    def __init__(self, w, scale=1.0):
+        self.sparse = w.sparse
+        self.scale = scale
+        self.margins = np.asarray(self.sparse.sum(0)).flatten() + \
+            np.asarray(self.sparse.sum(1)).flatten()
+
+    def __call__(self, Y):
+        Y = Y - Y.mean(0)
+        cross = (Y * (self.sparse * Y)).sum(0)
+        return self.scale * (np.dot(self.margins, Y * Y) - 2 * cross)
+
+
+class AbsoluteDifference(object):
+    """
+    Sum of w_ij * abs(y_i - y_j) for each column of Y, times scale
+
+    Parameters
+    ----------
+    w     : W
+            spatial weights instance with the transformation to be used
+    scale : float
+            constant the sums are multiplied by
+    """
+    def __init__(self, w, scale=1.0):
+        pairs = w.sparse.tocoo()
+        self.row = pairs.row
+        self.col = pairs.col
+        self.data = pairs.data
+        self.scale = scale
+
+    def __call__(self, Y):
+        d = np.abs(Y[self.row] - Y[self.col])
+        return self.scale * np.dot(self.data, d)
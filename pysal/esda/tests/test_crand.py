@@ -0,0 +1,66 @@
+import unittest
+import pysal
+from pysal.esda import crand
+import numpy as np
+
+
+class Crand_Tester(unittest.TestCase):
+    def setUp(self):
+        self.w = pysal.open(pysal.examples.get_path("stl.gal")).read()
+        self.w.transform = 'r'
+        f = pysal.open(pysal.examples.get_path("stl_hom.txt"))
+        y = np.array(f.by_col['HR8893'])
+        self.z = (y - y.mean()) / y.std()
+        self.observed = self.z * pysal.lag_spatial(self.w, self.z)
+
+    def stat(self, lag, ids):
+        return self.z[ids][:, None] * lag
+
+    def test_crand(self):
+        np.random.seed(10)
+        larger, mean, var, sim = crand.crand(self.z, self.w, self.observed,
+                                             self.stat, 99, keep=True)
+        np.random.seed(10)
+        n = self.w.n
+        rids = crand._sample_ids(n - 1, self.w.max_neighbors, 99)
+        ids = np.arange(n)
+        ref = np.zeros((99, n))
+        for i in ids:
+            idsi = ids[ids != i]
+            wi = np.array(self.w.weights[self.w.id_order[i]])
+            nbrs = idsi[rids[:, :len(wi)]]
+            ref[:, i] = self.z[i] * (wi * self.z[nbrs]).sum(1)
+        np.testing.assert_array_almost_equal(sim, ref)
+        np.testing.assert_array_equal(larger, (ref >= self.observed).sum(0))
+        self.assertAlmostEquals(mean, ref.mean())
+        self.assertAlmostEquals(var, ref.var())
+
+    def test_crand_blocks(self):
+        np.random.seed(10)
+        res = crand.crand(self.z, self.w, self.observed, self.stat, 99)
+        self.assertEquals(res[3], None)
+        block_size = crand.BLOCK_SIZE
+        crand.BLOCK_SIZE = 10
+        try:
+            np.random.seed(10)
+            small = crand.crand(self.z, self.w, self.observed, self.stat, 99)
+        finally:
+            crand.BLOCK_SIZE = block_size
+        np.testing.assert_array_equal(res[0], small[0])
+        self.assertAlmostEquals(res[1], small[1])
+        self.assertAlmostEquals(res[2], small[2])
+
+    def test_sample_ids(self):
+        np.random.seed(10)
+        rids = crand._sample_ids(20, 3, 500)
+        self.assertEquals(rids.shape, (500, 3))
+        srids = np.sort(rids, axis=1)
+        self.assertFalse((srids[:, 1:] == srids[:, :-1]).any())
+        self.assertTrue(rids.min() >= 0 and rids.max() < 20)
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(Crand_Tester)
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite)
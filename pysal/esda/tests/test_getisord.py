@@ -31,22 +31,22 @@ class G_Local_Tester(unittest.TestCase):
     def test_G_Local_Binary(self):
         lg = getisord.G_Local(self.y, self.w, transform='B')
         self.assertAlmostEquals(lg.Zs[0], -1.0136729, places=7)
-        self.assertAlmostEquals(lg.p_sim[0], 0.10100000000000001, places=7)
+        self.assertAlmostEquals(lg.p_sim[0], 0.10199999999999999, places=7)
 
     def test_G_Local_Row_Standardized(self):
         lg = getisord.G_Local(self.y, self.w, transform='R')
         self.assertAlmostEquals(lg.Zs[0], -0.62074534, places=7)
-        self.assertAlmostEquals(lg.p_sim[0], 0.10100000000000001, places=7)
+        self.assertAlmostEquals(lg.p_sim[0], 0.10199999999999999, places=7)
 
     def test_G_star_Local_Binary(self):
         lg = getisord.G_Local(self.y, self.w, transform='B', star=True)
         self.assertAlmostEquals(lg.Zs[0], -1.39727626, places=8)
-        self.assertAlmostEquals(lg.p_sim[0], 0.10100000000000001, places=7)
+        self.assertAlmostEquals(lg.p_sim[0], 0.10199999999999999, places=7)
 
     def test_G_star_Row_Standardized(self):
         lg = getisord.G_Local(self.y, self.w, transform='R', star=True)
         self.assertAlmostEquals(lg.Zs[0], -0.62488094, places=8)
-        self.assertAlmostEquals(lg.p_sim[0], 0.10100000000000001, places=7)
+        self.assertAlmostEquals(lg.p_sim[0], 0.10199999999999999, places=7)
 
 suite = unittest.TestSuite()
 test_classes = [G_Tester, G_Local_Tester]
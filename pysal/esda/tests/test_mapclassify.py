@@ -256,6 +256,20 @@ class TestFisherJenks(unittest.TestCase):
         np.testing.assert_array_almost_equal(fj.counts, np.array([49, 3, 4,
                                                                   1, 1]))
 
+    def test_Fisher_Jenks_ties(self):
+        y = np.array([1, 1, 1, 1, 2, 2, 9, 9, 10, 30.])
+        fj = Fisher_Jenks(y, k=3)
+        self.assertEquals(fj.bins, [2.0, 10.0, 30.0])
+        np.testing.assert_array_almost_equal(fj.counts, np.array([6, 3, 1]))
+        fj = Fisher_Jenks(y, k=6)
+        self.assertEquals(fj.k, 5)
+        self.assertEquals(fj.bins, [1.0, 2.0, 9.0, 10.0, 30.0])
+
+    def test_Fisher_Jenks_all_k(self):
+        table = pysal.esda.mapclassify._Fisher_Jenks_Table(self.V)
+        for k in [7, 2, 5]:
+            self.assertEquals(table.bins(k), Fisher_Jenks(self.V, k=k).bins)
+
 
 class TestJenksCaspall(unittest.TestCase):
     def setUp(self):
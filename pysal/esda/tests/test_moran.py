@@ -15,6 +15,15 @@ class Moran_Tester(unittest.TestCase):
         self.assertAlmostEquals(mi.I, 0.24365582621771659, 7)
         self.assertAlmostEquals(mi.p_norm,0.00013573931385468807)
 
+    def test_moran_cores(self):
+        np.random.seed(10)
+        mi = moran.Moran(self.y, self.w, permutations=99, cores=2)
+        np.random.seed(10)
+        mi1 = moran.Moran(self.y, self.w, permutations=99, cores=None)
+        self.assertEquals(len(mi.sim), 99)
+        np.testing.assert_array_almost_equal(mi.sim, mi1.sim)
+        self.assertAlmostEquals(mi.p_sim, mi1.p_sim)
+
     def test_sids(self):
         w = pysal.open(pysal.examples.get_path("sids2.gal")).read()
         f = pysal.open(pysal.examples.get_path("sids2.dbf"))
@@ -62,9 +71,19 @@ class Moran_Local_Tester(unittest.TestCase):
     def test_Moran_Local(self):
         lm = moran.Moran_Local(
             self.y, self.w, transformation="r", permutations=99)
-        self.assertAlmostEquals(lm.z_sim[0], -0.081383956359666748)
-        self.assertAlmostEquals(lm.p_z_sim[0], 0.46756830387716064)
-        self.assertAlmostEquals(lm.VI_sim, 0.2067126047680822)
+        self.assertAlmostEquals(lm.z_sim[0], -0.012074119408404194)
+        self.assertAlmostEquals(lm.p_z_sim[0], 0.49518324030436089)
+        self.assertAlmostEquals(lm.VI_sim, 0.23519675087018413)
+
+    def test_Moran_Local_keep_simulations(self):
+        lm = moran.Moran_Local(self.y, self.w, transformation="r",
+                               permutations=99, keep_simulations=True)
+        self.assertEquals(lm.sim.shape, (99, 10))
+        self.assertAlmostEquals(lm.EI_sim, lm.sim.mean())
+        self.assertAlmostEquals(lm.VI_sim, lm.sim.var())
+        larger = (lm.sim >= lm.Is).sum(0)
+        larger = np.minimum(larger, 99 - larger)
+        np.testing.assert_array_almost_equal(lm.p_sim, (larger + 1.) / 100.)
 
 
 class Moran_Local_Rate_Tester(unittest.TestCase):
@@ -78,9 +97,9 @@ class Moran_Local_Rate_Tester(unittest.TestCase):
     def test_moran_rate(self):
         lm = moran.Moran_Local_Rate(self.e, self.b, self.w,
                                     transformation="r", permutations=99)
-        self.assertAlmostEquals(lm.z_sim[0], -0.27099998923550017)
-        self.assertAlmostEquals(lm.p_z_sim[0], 0.39319552026912641)
-        self.assertAlmostEquals(lm.VI_sim, 0.21879403675396222)
+        self.assertAlmostEquals(lm.z_sim[0], -0.23384910006941778)
+        self.assertAlmostEquals(lm.p_z_sim[0], 0.4075510649196592)
+        self.assertAlmostEquals(lm.VI_sim, 0.25071792939992499)
 
 
 suite = unittest.TestSuite()
@@ -0,0 +1,65 @@
+import unittest
+import pysal
+from pysal.esda import permutation
+import numpy as np
+
+
+class Permutation_Tester(unittest.TestCase):
+    def setUp(self):
+        self.w = pysal.open(pysal.examples.get_path("stl.gal")).read()
+        self.w.transform = 'r'
+        f = pysal.open(pysal.examples.get_path("stl_hom.txt"))
+        self.y = np.array(f.by_col['HR8893'])
+        np.random.seed(10)
+        self.Y = np.column_stack([np.random.permutation(self.y)
+                                  for i in range(5)])
+
+    def pairs(self):
+        for i, i0 in enumerate(self.w.id_order):
+            for j, wij in zip(self.w.neighbor_offsets[i0], self.w.weights[i0]):
+                yield i, j, wij
+
+    def test_kernels(self):
+        cross = permutation.CrossProduct(self.w, 2.0)(self.Y)
+        sqdiff = permutation.SquaredDifference(self.w)(self.Y)
+        absdiff = permutation.AbsoluteDifference(self.w)(self.Y)
+        for k, z in enumerate(self.Y.T):
+            terms = list(self.pairs())
+            self.assertAlmostEquals(
+                cross[k], 2 * sum([wij * z[i] * z[j] for i, j, wij in terms]))
+            self.assertAlmostEquals(
+                sqdiff[k], sum([wij * (z[i] - z[j]) ** 2
+                                for i, j, wij in terms]))
+            self.assertAlmostEquals(
+                absdiff[k], sum([wij * abs(z[i] - z[j])
+                                 for i, j, wij in terms]))
+
+    def test_simulate_serial(self):
+        calc = permutation.CrossProduct(self.w)
+        np.random.seed(10)
+        sim = permutation.simulate(calc, self.y, 99)
+        np.random.seed(10)
+        ref = [calc(np.random.permutation(self.y)[:, None])[0]
+               for i in range(99)]
+        np.testing.assert_array_almost_equal(sim, ref)
+
+    def test_simulate_cores(self):
+        calc = permutation.CrossProduct(self.w)
+        max_block = permutation.MAX_BLOCK
+        permutation.MAX_BLOCK = 10
+        try:
+            np.random.seed(10)
+            sim2 = permutation.simulate(calc, self.y, 99, cores=2)
+            np.random.seed(10)
+            sim3 = permutation.simulate(calc, self.y, 99, cores=3)
+        finally:
+            permutation.MAX_BLOCK = max_block
+        self.assertEquals(sim2.shape, (99,))
+        np.testing.assert_array_equal(sim2, sim3)
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(Permutation_Tester)
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite)
@@ -7,6 +7,8 @@ __author__ = "Sergio J. Rey <srey@asu.edu> "
 from pysal.common import *
 import numpy as np
 from scipy.stats import norm as NORM
+from pysal.esda.permutation import simulate, AbsoluteDifference, \
+    BLOCK_SIZE, MAX_BLOCK
 
 __all__ = ['Gini', 'Gini_Spatial']
 
@@ -36,11 +38,10 @@ class Gini:
     def __init__(self,x):
 
         x.shape = (x.shape[0],)
-        d = np.abs(np.array([x - xi for xi in x]))
         n = len(x)
         xbar = x.mean()
         den = xbar * 2 * n**2
-        dtotal = d.sum()
+        dtotal = _abs_deviation_total(x)
         self.g = dtotal/den
 
 class Gini_Spatial:
@@ -61,6 +62,11 @@ class Gini_Spatial:
     permutations: int (default = 99)
                   number of permutations for inference
 
+    cores: int (default = 1)
+           number of processes used to evaluate the permutations, see
+           pysal.esda.permutation.simulate. With 1, the permutations are the
+           successive shuffles of the ids by np.random.shuffle.
+
     Attributes
     ----------
 
@@ -129,6 +135,14 @@ class Gini_Spatial:
     >>> gs.p_z_sim
     0.0
 
+    The permutations only evaluate the absolute deviations of the neighbor
+    pairs, and can be spread over several processes
+
+    >>> np.random.seed(12345)
+    >>> gs = pysal.inequality.gini.Gini_Spatial(y[:,0], w, cores=2)
+    >>> gs.p_sim
+    0.01
+
     Thus, the amount of inequality between pairs of states that are not in the
     same regime (neighbors) is significantly higher than what is expected
     under the null of random spatial inequality.
@@ -144,15 +158,16 @@ class Gini_Spatial:
 
  
     """
-    def __init__(self,x, w, permutations = 99):
+    def __init__(self,x, w, permutations = 99, cores=1):
         x.shape = (x.shape[0],)
-        d = np.abs(np.array([x - xi for xi in x]))
         n = len(x)
         xbar = x.mean()
         den = xbar * 2 * n**2
-        wg = w.sparse.multiply(d).sum()
+        # sum of w_ij |x_i - x_j| over the nonzero weights only
+        stat = AbsoluteDifference(w)
+        wg = stat(x)
         self.wg = wg # spatial inequality component
-        dtotal = d.sum()
+        dtotal = _abs_deviation_total(x)
         wcg = dtotal - wg # complement to spatial inequality component
         self.wcg = wcg
         self.g = dtotal / den
@@ -161,13 +176,11 @@ class Gini_Spatial:
         self.den = den
 
         if permutations:
-            ids = np.arange(n)
-
-            wcgp = np.zeros((permutations,1))
-            for perm in xrange(permutations):
-                # permute rows/cols of d
-                np.random.shuffle(ids)
-                wcgp[perm] = w.sparse.multiply(d[ids,:][:,ids]).sum()
+            if cores == 1:
+                wcgp = _shuffled_stat(stat, x, permutations)
+            else:
+                wcgp = simulate(stat, x, permutations, cores)
+            wcgp.shape = (permutations, 1)
             above = wcgp >= self.wcg
             larger = above.sum()
             if (permutations -  larger) <  larger:
@@ -177,3 +190,35 @@ class Gini_Spatial:
             self.s_wcg = wcgp.std()
             self.z_wcg = (self.wcg - self.e_wcg) / self.s_wcg
             self.p_z_sim = 1.0 - NORM.cdf(self.z_wcg)
+
+
+def _abs_deviation_total(x):
+    """
+    Sum of |x_i - x_j| over all ordered pairs, from the sorted values
+
+    The k-th smallest value is larger than k values and smaller than n - k - 1
+    values, so the sum is 2 * sum_k (2k - n + 1) x_(k), in O(n log n) and
+    without the n x n matrix of differences.
+    """
+    xs = np.sort(x)
+    n = len(xs)
+    return 2.0 * np.dot(2.0 * np.arange(n) - n + 1, xs)
+
+
+def _shuffled_stat(stat, x, permutations):
+    """
+    stat of x permuted by successive in place shuffles of its ids, evaluated
+    on blocks of permuted copies of x
+    """
+    n = len(x)
+    ids = np.arange(n)
+    size = max(1, min(MAX_BLOCK, BLOCK_SIZE // max(1, n)))
+    sims = []
+    for start in xrange(0, permutations, size):
+        b = min(size, permutations - start)
+        X = np.empty((n, b))
+        for j in xrange(b):
+            np.random.shuffle(ids)
+            X[:, j] = x[ids]
+        sims.append(stat(X))
+    return np.concatenate(sims)
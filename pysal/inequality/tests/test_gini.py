@@ -0,0 +1,52 @@
+import unittest
+import pysal
+import numpy as np
+from pysal.inequality.gini import *
+
+
+class test_Gini(unittest.TestCase):
+
+    def test___init__(self):
+        f = pysal.open(pysal.examples.get_path("mexico.csv"))
+        y = np.array(f.by_col["pcgdp1940"], float)
+        d = np.abs(y[:, None] - y[None, :])
+        gini = Gini(y)
+        self.assertAlmostEqual(gini.g, d.sum() / (2 * len(y) ** 2 * y.mean()))
+        self.assertAlmostEqual(gini.g, 0.35372371173452849)
+
+
+class test_Gini_Spatial(unittest.TestCase):
+
+    def setUp(self):
+        f = pysal.open(pysal.examples.get_path("mexico.csv"))
+        self.y = np.array(f.by_col["pcgdp1940"], float)
+        regimes = np.array(f.by_col('hanson98'))
+        self.w = pysal.regime_weights(regimes)
+
+    def test___init__(self):
+        y = self.y
+        d = np.abs(y[:, None] - y[None, :])
+        np.random.seed(12345)
+        gs = Gini_Spatial(y, self.w, permutations=0)
+        self.assertAlmostEqual(gs.wg, (self.w.full()[0] * d).sum())
+        self.assertAlmostEqual(gs.wcg, d.sum() - gs.wg)
+        self.assertAlmostEqual(gs.g, Gini(y).g)
+
+    def test_permutations(self):
+        y = self.y
+        d = np.abs(y[:, None] - y[None, :])
+        np.random.seed(12345)
+        gs = Gini_Spatial(y, self.w, permutations=20)
+        # shuffles of the rows and columns of the dense differences
+        np.random.seed(12345)
+        ids = np.arange(len(y))
+        wcgp = np.zeros(20)
+        for perm in range(20):
+            np.random.shuffle(ids)
+            wcgp[perm] = self.w.sparse.multiply(d[ids, :][:, ids]).sum()
+        self.assertAlmostEqual(gs.e_wcg, wcgp.mean())
+        self.assertAlmostEqual(gs.s_wcg, wcgp.std())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,26 @@ class test_TheilDSim(unittest.TestCase):
         np.testing.assert_almost_equal(theil_ds.bg_pvalue, np.array(
             [0.4, 0.344, 0.001, 0.001, 0.034, 0.072, 0.032]))
 
+    def test_kernel(self):
+        f = pysal.open(pysal.examples.get_path("mexico.csv"))
+        vnames = ["pcgdp%d" % dec for dec in range(1940, 2010, 10)]
+        y = np.transpose(np.array([f.by_col[v] for v in vnames]))
+        regimes = np.array(f.by_col('hanson98'))
+        stat = BetweenGroup(y, regimes)
+        np.random.seed(10)
+        ids = np.array([np.random.permutation(len(y))
+                        for r in range(20)]).T
+        bg = stat(ids)
+        # one decomposition of the permuted rows at a time
+        for r in range(20):
+            np.testing.assert_array_almost_equal(
+                bg[r], TheilD(y[ids[:, r]], regimes).bg)
+        theil_ds = TheilDSim(y, regimes, 20)
+        self.assertEqual(theil_ds.bg.shape, (21, 7))
+        np.testing.assert_array_equal(theil_ds.bg[0], TheilD(y, regimes).bg)
+        np.testing.assert_almost_equal(theil_ds.wg + theil_ds.bg,
+                                       np.tile(Theil(y).T, (21, 1)))
+
 
 if __name__ == '__main__':
     unittest.main()
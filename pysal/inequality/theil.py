@@ -5,7 +5,8 @@ __author__ = "Sergio J. Rey <srey@asu.edu> "
 
 from pysal.common import *
 import numpy as np
-__all__ = ['Theil', 'TheilD', 'TheilDSim']
+from pysal.esda.permutation import simulate
+__all__ = ['Theil', 'TheilD', 'TheilDSim', 'BetweenGroup']
 
 SMALL = np.finfo('float').tiny
 
@@ -102,29 +103,74 @@ class TheilD:
             0.07547525,  0.0702496 ])
    """
     def __init__(self, y, partition):
-        groups = np.unique(partition)
         T = Theil(y).T
-        ytot = y.sum(axis=0)
-
-        #group totals
-        gtot = np.array([y[partition == gid].sum(axis=0) for gid in groups])
-        mm = np.dot
-
-        if ytot.size == 1:  # y is 1-d
-            sg = gtot / (ytot * 1.)
-            sg.shape = (sg.size, 1)
-        else:
-            sg = mm(gtot, np.diag(1. / ytot))
-        ng = np.array([sum(partition == gid) for gid in groups])
-        ng.shape = (ng.size,)  # ensure ng is 1-d
-        n = y.shape[0]
         # between group inequality
-        bg = np.multiply(sg, np.log(mm(np.diag(n * 1. / ng), sg))).sum(axis=0)
+        bg = BetweenGroup(y, partition)(np.arange(len(y))[:, None])[0]
         self.T = T
         self.bg = bg
         self.wg = T - bg
 
 
+class BetweenGroup(object):
+    """Between group component of Theil's T for permutations of the
+    observations
+
+    The partition is turned into integer group codes once, and the group
+    totals of a block of b permutations are reduced together with one
+    np.bincount per column of y.
+
+    Parameters
+    ----------
+    y         : array  (n,t) or (n, )
+                observations across which inequality is calculated
+    partition : array (n, )
+                elements indicating which partition each observation belongs
+                to. These are assumed to be exhaustive.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> f=pysal.open(pysal.examples.get_path("mexico.csv"))
+    >>> y=np.array(f.by_col["pcgdp1940"])
+    >>> regimes=np.array(f.by_col('hanson98'))
+    >>> bg=BetweenGroup(y,regimes)
+    >>> bg(np.arange(len(y))[:, None])
+    array([[ 0.0345889]])
+    """
+    def __init__(self, y, partition):
+        self.y = np.asarray(y, float).reshape(len(y), -1)
+        groups, self.codes = np.unique(partition, return_inverse=True)
+        self.k = len(groups)
+        self.ng = np.bincount(self.codes, minlength=self.k)
+        self.ytot = self.y.sum(axis=0)
+
+    def __call__(self, ids):
+        """
+        Between group inequality of y[ids[:, j]] for each column j of ids
+
+        Parameters
+        ----------
+        ids : array (n,b)
+              each column orders the rows of y, as permuted ids
+
+        Returns
+        -------
+        bg  : array (b,t)
+              between group inequality, one row per column of ids
+        """
+        ids = np.asarray(ids).astype(int)
+        n, b = ids.shape
+        k = self.k
+        # group code of every (observation, permutation) pair
+        labels = (self.codes[:, None] + k * np.arange(b)).ravel()
+        bg = np.empty((b, self.y.shape[1]))
+        for c in xrange(self.y.shape[1]):
+            gtot = np.bincount(labels, self.y[ids, c].ravel(), k * b)
+            sg = gtot.reshape(b, k) / self.ytot[c]
+            bg[:, c] = (sg * np.log(sg * (n * 1. / self.ng))).sum(axis=1)
+        return bg
+
+
 class TheilDSim:
     """Random permutation based inference on Theil's inequality decomposition.
 
@@ -145,6 +191,10 @@ class TheilDSim:
     permutations : int
                    Number of random spatial permutations for computationally
                    based inference on the decomposition.
+    cores        : int
+                   number of processes used to evaluate the permutations, see
+                   pysal.esda.permutation.simulate
+
 
 
     Attributes
@@ -176,6 +226,8 @@ class TheilDSim:
     >>> theil_ds=TheilDSim(y,regimes,999)
     >>> theil_ds.bg_pvalue
     array([ 0.4  ,  0.344,  0.001,  0.001,  0.034,  0.072,  0.032])
+    >>> theil_ds.bg.shape
+    (1000, 7)
 
     References
     ----------
@@ -185,20 +237,20 @@ class TheilDSim:
        Pages 280-299.
 
     """
-    def __init__(self, y, partition, permutations=99):
+    def __init__(self, y, partition, permutations=99, cores=1):
 
         observed = TheilD(y, partition)
-        bg_ct = observed.bg == observed.bg  # already have one extreme value
-        bg_ct = bg_ct * 1.0
-        results = [observed]
-        for perm in range(permutations):
-            yp = np.random.permutation(y)
-            t = TheilD(yp, partition)
-            bg_ct += (1.0 * t.bg >= observed.bg)
-            results.append(t)
-        self.results = results
+        stat = BetweenGroup(y, partition)
+        # permutations of the ids of the observations, evaluated in blocks
+        if permutations:
+            bg = simulate(stat, np.arange(len(y)), permutations, cores)
+        else:
+            bg = np.zeros((0, stat.y.shape[1]))
+        # already have one extreme value
+        bg_ct = 1.0 + (bg >= observed.bg).sum(axis=0)
+        self.observed = observed
         self.T = observed.T
         self.bg_pvalue = bg_ct / (permutations * 1.0 + 1)
-        self.bg = np.array([r.bg for r in results])
-        self.wg = np.array([r.wg for r in results])
+        self.bg = np.vstack((observed.bg, bg))
+        self.wg = observed.T - self.bg
 
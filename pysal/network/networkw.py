@@ -7,7 +7,7 @@ __author__ = "Sergio Rey <sjsrey@gmail.com>, Jay Laura <jlaura@asu.edu>"
 from itertools import combinations
 import numpy as np
 import pysal as ps
-from util import threshold_distance, edge_length, knn_distance
+from util import shortest_paths, edge_length
 
 
 def w_links(wed):
@@ -39,7 +39,8 @@ def w_links(wed):
     return ps.W(neighbors)
 
 
-def w_distance(wed, threshold, cost=None, alpha=-1.0, binary=True, ids=None):
+def w_distance(wed, threshold, cost=None, alpha=-1.0, binary=True, ids=None,
+               cores=1):
     '''
     Generate a Weights object based on a threshold
      distance using a WED
@@ -49,6 +50,8 @@ def w_distance(wed, threshold, cost=None, alpha=-1.0, binary=True, ids=None):
     wed: PySAL Winged Edged Data Structure
     distance: float network threshold distance for neighbor membership
     cost: defaults to length, can be any cost dicationary {(edge): cost}
+    cores: integer number of processes used for the shortest path searches,
+     None means all cores available
 
     Returns
     -------
@@ -62,35 +65,20 @@ def w_distance(wed, threshold, cost=None, alpha=-1.0, binary=True, ids=None):
     else:
         ids = np.arange(len(wed.node_list))
     neighbors = {}
+    paths = shortest_paths(wed, cost, threshold=threshold, cores=cores)
     if binary is True:
-        for node in wed.node_list:
-            near, pred = threshold_distance(wed, cost, node, threshold)
-            neighbors[ids[node]] = near
+        for node, (near, distance, pred) in zip(wed.node_list, paths):
+            neighbors[ids[node]] = [node] + near
         return ps.W(neighbors, None, ids)
     elif binary is False:
         weights = {}
-        for node in wed.node_list:
-            wt = []
-            near, pred = threshold_distance(wed, cost, node, threshold)
-            near.remove(node)
+        for node, (near, distance, pred) in zip(wed.node_list, paths):
             neighbors[ids[node]] = near
-            for end in near:
-                path = [end]
-                previous = pred[end]
-                while previous != node:
-                    path.append(previous)
-                    end = previous
-                    previous = pred[end]
-                path.append(node)
-                cum_cost = 0
-                for p in range(len(path) - 1):
-                    cum_cost += cost[(path[p], path[p + 1])]
-                wt.append(cum_cost ** alpha)
-            weights[ids[node]] = wt
+            weights[ids[node]] = [d ** alpha for d in distance]
         return ps.W(neighbors, weights, ids)
 
 
-def w_knn(wed, n, cost=None, ids=None):
+def w_knn(wed, n, cost=None, ids=None, cores=1):
     '''
     Generate w Weights object based on the k-nearest
      network neighbors.
@@ -100,6 +88,8 @@ def w_knn(wed, n, cost=None, ids=None):
     wed: PySAL Winged Edged Data Structure
     n: integer number of neighbors for each node
     cost: defaults to length, can be any cost dictionary
+    cores: integer number of processes used for the shortest path searches,
+     None means all cores available
 
     Returns
     -------
@@ -113,6 +103,7 @@ def w_knn(wed, n, cost=None, ids=None):
     else:
         ids = np.arange(len(wed.node_list))
     neighbors = {}
-    for node in wed.node_list:
-        neighbors[node] = knn_distance(wed, cost, node, n=n)
+    paths = shortest_paths(wed, cost, k=n, cores=cores)
+    for node, (near, distance, pred) in zip(wed.node_list, paths):
+        neighbors[node] = near
     return ps.W(neighbors, id_order=ids)
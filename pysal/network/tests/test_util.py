@@ -0,0 +1,102 @@
+import unittest
+import pysal as ps
+from pysal.network import util
+from pysal.network.data import WED
+import pysal.network.net_shp_io as net_shp_io
+import pysal.network.networkw as networkw
+
+
+class TestShortestPaths(unittest.TestCase):
+    def setUp(self):
+        coords, edges = net_shp_io.reader(
+            ps.examples.get_path('eberly_net.shp'))
+        self.wed = WED(edges, coords)
+        self.cost = util.edge_length(self.wed)
+
+    def test_network_csr(self):
+        adj = util.network_csr(self.wed, self.cost)
+        self.assertEqual(adj.shape, (26, 26))
+        self.assertEqual((adj != adj.T).nnz, 0)
+        self.assertEqual(adj.nnz, len(self.wed.edge_list))
+        self.assertEqual(adj[0, 1], self.cost[(0, 1)])
+
+    def test_network_graph(self):
+        graph = util.network_graph(self.wed, self.cost)
+        indptr, indices, data, index = graph
+        adj = util.network_csr(self.wed, self.cost)
+        self.assertEqual(indptr, adj.indptr.tolist())
+        self.assertEqual(data, adj.data.tolist())
+        self.assertEqual([index[v] for v in self.wed.node_list], range(26))
+        # a graph built once gives the same searches
+        self.assertEqual(util.dijkstra(self.wed, self.cost, 3, graph=graph),
+                         util.dijkstra(self.wed, self.cost, 3))
+        self.assertEqual(util.knn_distance(self.wed, self.cost, 4, 3,
+                                           graph=graph), [1, 5, 8])
+        self.assertEqual(util.threshold_distance(self.wed, self.cost, 3, 6,
+                                                 graph=graph),
+                         util.threshold_distance(self.wed, self.cost, 3, 6))
+        self.assertEqual(util.shortest_paths(self.wed, self.cost, k=2,
+                                             graph=graph),
+                         util.shortest_paths(self.wed, self.cost, k=2))
+        # costs changed in place are used by the following searches
+        distance, pred = util.dijkstra(self.wed, self.cost, 0)
+        self.assertAlmostEqual(distance[2], 8.354101966249685)
+        for e in self.cost:
+            self.cost[e] = 1.0
+        distance, pred = util.dijkstra(self.wed, self.cost, 0)
+        self.assertEqual(distance[2], 3.0)
+
+    def test_dijkstra(self):
+        distance, pred = util.dijkstra(self.wed, self.cost, 0)
+        self.assertAlmostEqual(distance[2], 8.354101966249685)
+        self.assertEqual(distance[6], float('inf'))
+        self.assertEqual(util.shortest_path(self.wed, self.cost, 0, 2),
+                         [2, 3, 5, 0])
+
+    def test_threshold_distance(self):
+        near, pred = util.threshold_distance(self.wed, self.cost, 3, 6)
+        self.assertEqual(sorted(near), [2, 3, 4, 5])
+        self.assertEqual(pred[2], 3)
+
+    def test_knn_distance(self):
+        self.assertEqual(util.knn_distance(self.wed, self.cost, 4, 3),
+                         [1, 5, 8])
+        # only 2 nodes can be reached from node 6
+        self.assertEqual(sorted(util.knn_distance(self.wed, self.cost, 6, 3)),
+                         [7, 9])
+
+    def test_shortest_paths(self):
+        paths = util.shortest_paths(self.wed, self.cost, threshold=6)
+        for node, (near, distance, pred) in zip(self.wed.node_list, paths):
+            d, p = util.dijkstra(self.wed, self.cost, node)
+            self.assertEqual(sorted(near),
+                             sorted(v for v in self.wed.node_list
+                                    if v != node and d[v] <= 6))
+            self.assertEqual(distance, [d[v] for v in near])
+            self.assertEqual(sorted(distance), distance)
+
+    def test_shortest_paths_cores(self):
+        max_sources = util.MAX_SOURCES
+        util.MAX_SOURCES = 5
+        try:
+            serial = util.shortest_paths(self.wed, self.cost, k=4)
+            pooled = util.shortest_paths(self.wed, self.cost, k=4, cores=2)
+        finally:
+            util.MAX_SOURCES = max_sources
+        self.assertEqual(serial, pooled)
+        self.assertEqual(len(serial), len(self.wed.node_list))
+
+    def test_w_distance(self):
+        w = networkw.w_distance(self.wed, 6, binary=False)
+        self.assertEqual(w.n, 26)
+        self.assertEqual(sorted(w.neighbors[0]), [1, 5])
+        self.assertAlmostEqual(dict(zip(w.neighbors[0], w.weights[0]))[5],
+                               0.2)
+        wk = networkw.w_knn(self.wed, 3)
+        self.assertEqual(wk.neighbors[4], [1, 5, 8])
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestShortestPaths)
+
+if __name__ == '__main__':
+    unittest.main()
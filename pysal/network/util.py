@@ -8,12 +8,19 @@ import math
 from collections import OrderedDict
 from random import uniform
 import multiprocessing as mp
-from heapq import nsmallest
+from heapq import nsmallest, heappush, heappop
+from platform import system
 
 import pysal as ps
 import numpy as np
+from scipy import sparse
 from pysal.cg.standalone import get_points_dist
 
+# upper bound on the number of sources searched by one pool task
+MAX_SOURCES = 1000
+
+_WORKER = {}
+
 
 class SortedEdges(OrderedDict):
     def next_key(self, key):
@@ -295,7 +302,7 @@ def newpoint_coords(wed, edge, distance):
     return x0, y0
 
 
-def dijkstra(wed, cost, node, n=float('inf')):
+def dijkstra(wed, cost, node, n=float('inf'), graph=None):
     """
     Compute the shortest path between a start node and
         all other nodes in the wed.
@@ -307,36 +314,27 @@ def dijkstra(wed, cost, node, n=float('inf')):
     node: Start node ID
     n: integer break point to stop iteration and return n
      neighbors
+    graph: tuple returned by network_graph(wed, cost), built from wed and
+     cost when None
 
     Returns:
-    distance: List of distances from node to all other nodes
+    distance: List of distances from node to all other nodes, in the order
+     of wed.node_list
     pred : List of preceeding nodes for traversal route
     """
 
-    v0 = node
-    distance = [float('inf') for x in wed.node_list]
-    distance[wed.node_list.index(v0)] = 0
-    pred = [None for x in wed.node_list]
-    a = set()
-    a.add(v0)
-    while len(a) > 0:
-        #Get node with the lowest value from distance
-        dist = float('inf')
-        for node in a:
-            if distance[node] < dist:
-                dist = distance[node]
-                v = node
-        #Remove that node from the set
-        a.remove(v)
-        last = v
-        #4. Get the neighbors to the current node
-        neighbors = get_neighbor_distances(wed, v, cost)
-        for v1, indiv_cost in neighbors.iteritems():
-            if distance[v1] > distance[v] + indiv_cost:
-                distance[v1] = distance[v] + indiv_cost
-                pred[v1] = v
-                a.add(v1)
-    return distance, pred
+    if graph is None:
+        graph = network_graph(wed, cost)
+    indptr, indices, data, index = graph
+    k = None if n == float('inf') else n
+    order, dist, pred = csr_dijkstra(indptr, indices, data, index[node], k=k)
+    distance = [float('inf')] * len(wed.node_list)
+    predecessors = [None] * len(wed.node_list)
+    for v in order:
+        distance[v] = dist[v]
+        if pred[v] is not None:
+            predecessors[v] = wed.node_list[pred[v]]
+    return distance, predecessors
 
 
 def shortest_path(wed, cost, start, end):
@@ -369,6 +367,192 @@ def get_neighbor_distances(wed, v0, l):
             neighbors[e[1]] = l[e]
     return neighbors
 
+
+def network_csr(wed, cost):
+    """
+    Compact sparse row adjacency of the network, built once and shared by
+        all the shortest path searches on it.
+
+    Parameters
+    ----------
+    wed: PySAL Winged Edged Data Structure
+    cost: Cost per edge to travel, e.g. distance. Links are undirected, if
+     both (i, j) and (j, i) are given the lower cost is used.
+
+    Returns
+    -------
+    adj: scipy.sparse.csr_matrix, adj[i, j] is the cost of the link between
+     wed.node_list[i] and wed.node_list[j], rows hold the links of each node
+    """
+
+    index = dict((node, i) for i, node in enumerate(wed.node_list))
+    n = len(index)
+    links = [(index[i], index[j], c) for (i, j), c in cost.iteritems()
+             if i in index and j in index]
+    if not links:
+        return sparse.csr_matrix((n, n))
+    i, j, c = [np.array(x) for x in zip(*links)]
+    i, j = np.concatenate((i, j)), np.concatenate((j, i))
+    c = np.concatenate((c, c)).astype(float)
+    # keep the lowest cost of each (i, j)
+    order = np.lexsort((c, j, i))
+    i, j, c = i[order], j[order], c[order]
+    first = np.concatenate(([True], (i[1:] != i[:-1]) | (j[1:] != j[:-1])))
+    i, j, c = i[first], j[first], c[first]
+    indptr = np.concatenate(([0], np.bincount(i, minlength=n).cumsum()))
+    return sparse.csr_matrix((c, j, indptr), shape=(n, n))
+
+
+def network_graph(wed, cost):
+    """
+    CSR adjacency of the network, as lists, and position of each node. The
+        graph can be built once and passed to the searches (dijkstra,
+        threshold_distance, knn_distance, shortest_paths) run with the same
+        costs.
+
+    Parameters
+    ----------
+    wed: PySAL Winged Edged Data Structure
+    cost: Cost per edge to travel, e.g. distance
+
+    Returns
+    -------
+    indptr, indices, data: lists, CSR adjacency of the network (see
+     network_csr)
+    index: dict {node ID: position in wed.node_list}
+    """
+
+    adj = network_csr(wed, cost)
+    index = dict((node, i) for i, node in enumerate(wed.node_list))
+    return (adj.indptr.tolist(), adj.indices.tolist(), adj.data.tolist(),
+            index)
+
+
+def csr_dijkstra(indptr, indices, data, source, threshold=float('inf'),
+                 k=None):
+    """
+    Binary heap Dijkstra search over a CSR adjacency.
+
+    Parameters
+    ----------
+    indptr, indices, data: CSR adjacency of the network, as lists
+    source: int position of the start node
+    threshold: float, the search stops at the first node farther than
+     threshold
+    k: integer, the search stops once k nodes other than source are reached
+
+    Returns
+    -------
+    order: list of the positions reached, by increasing distance, source
+     first
+    dist: dict {position: distance}, final for the positions in order
+    pred: dict {position: preceding position}, final for the positions in
+     order
+    """
+
+    dist = {source: 0.0}
+    pred = {source: None}
+    done = set()
+    order = []
+    limit = float('inf') if k is None else k + 1
+    heap = [(0.0, source)]
+    while heap:
+        d, v = heappop(heap)
+        if v in done:
+            continue
+        if d > threshold:
+            break
+        done.add(v)
+        order.append(v)
+        if len(order) >= limit:
+            break
+        for jj in xrange(indptr[v], indptr[v + 1]):
+            u = indices[jj]
+            du = d + data[jj]
+            if u not in dist or du < dist[u]:
+                dist[u] = du
+                pred[u] = v
+                heappush(heap, (du, u))
+    return order, dist, pred
+
+
+def shortest_paths(wed, cost, threshold=float('inf'), k=None, sources=None,
+                   cores=1, graph=None):
+    """
+    Network distances from many sources, searched on one shared CSR
+        adjacency and optionally on a process pool.
+
+    Parameters
+    ----------
+    wed: PySAL Winged Edged Data Structure
+    cost: Cost per edge to travel, e.g. distance
+    threshold: float, only nodes within threshold of a source are returned
+    k: integer, only the k nearest nodes of a source are returned
+    sources: list of start node IDs, defaults to wed.node_list
+    cores: integer number of processes. Default: 1, the sources are searched
+     in this process. None means all cores available. Note: multiprocessing
+     is not available on Windows.
+    graph: tuple returned by network_graph(wed, cost), built from wed and
+     cost when None
+
+    Returns
+    -------
+    paths: list with, for each source, a tuple (near, distance, pred), near
+     is the list of node IDs reached by increasing distance, the source
+     excluded, distance their network distances and pred their preceeding
+     node IDs
+    """
+
+    if sources is None:
+        sources = wed.node_list
+    if graph is None:
+        graph = network_graph(wed, cost)
+    indptr, indices, data, index = graph
+    positions = [index[node] for node in sources]
+    tasks = [positions[i:i + MAX_SOURCES]
+             for i in xrange(0, len(positions), MAX_SOURCES)]
+    state = (indptr, indices, data, threshold, k)
+    if cores is None:
+        cores = mp.cpu_count()
+    if system() == 'Windows' or cores == 1 or len(tasks) < 2:
+        _init_worker(*state)
+        try:
+            results = map(_search, tasks)
+        finally:
+            _WORKER.clear()
+    else:
+        pool = mp.Pool(min(cores, len(tasks)), _init_worker, state)
+        try:
+            results = pool.map(_search, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    nodes = wed.node_list
+    paths = []
+    for result in results:
+        for near, distance, pred in result:
+            paths.append(([nodes[v] for v in near], distance,
+                          [nodes[v] for v in pred]))
+    return paths
+
+
+def _init_worker(indptr, indices, data, threshold, k):
+    _WORKER['csr'] = indptr, indices, data
+    _WORKER['threshold'] = threshold
+    _WORKER['k'] = k
+
+
+def _search(sources):
+    indptr, indices, data = _WORKER['csr']
+    result = []
+    for source in sources:
+        order, dist, pred = csr_dijkstra(indptr, indices, data, source,
+                                         _WORKER['threshold'], _WORKER['k'])
+        near = order[1:]
+        result.append((near, [dist[v] for v in near], [pred[v] for v in near]))
+    return result
+
+
 def newpointer(k,v,c):
     '''
     Helper function for node insertion.
@@ -563,7 +747,8 @@ def segment_edges(wed, distance=None, count=None):
     return wed
 
 
-def threshold_distance(wed, cost, node, threshold, midpoint=False):
+def threshold_distance(wed, cost, node, threshold, midpoint=False,
+                       graph=None):
     """
     Compute the shortest path between a start node and
         all other nodes in the wed.
@@ -576,6 +761,8 @@ def threshold_distance(wed, cost, node, threshold, midpoint=False):
     threshold: float, distance to which neighbors are included
     midpoint: Boolean to indicate whether distance is computed from the start
      node or the midpoint of the edge
+    graph: tuple returned by network_graph(wed, cost), built from wed and
+     cost when None
 
     Returns
     -------
@@ -583,38 +770,20 @@ def threshold_distance(wed, cost, node, threshold, midpoint=False):
     pred : List of preceeding nodes for traversal route
     """
 
-    near = []
-    v0 = node
-    distance = [float('inf') for x in wed.node_list]
-    distance[wed.node_list.index(v0)] = 0
-    pred = [None for x in wed.node_list]
-    a = set()
-    a.add(v0)
-    while len(a) > 0:
-        #Get node with the lowest value from distance
-        dist = float('inf')
-        for node in a:
-            if distance[node] < dist:
-                dist = distance[node]
-                v = node
-        #Remove that node from the set
-        a.remove(v)
-        last = v
-        if distance[v] <= threshold:
-            near.append(v)
-        elif distance[v] > threshold:
-            break
-        #4. Get the neighbors to the current node
-        neighbors = get_neighbor_distances(wed, v, cost)
-        for v1, indiv_cost in neighbors.iteritems():
-            if distance[v1] > distance[v] + indiv_cost:
-                distance[v1] = distance[v] + indiv_cost
-                pred[v1] = v
-                a.add(v1)
-    return near,pred
+    if graph is None:
+        graph = network_graph(wed, cost)
+    indptr, indices, data, index = graph
+    order, dist, pred = csr_dijkstra(indptr, indices, data, index[node],
+                                     threshold)
+    near = [wed.node_list[v] for v in order]
+    predecessors = [None] * len(wed.node_list)
+    for v, p in pred.iteritems():
+        if p is not None:
+            predecessors[v] = wed.node_list[p]
+    return near, predecessors
 
 
-def knn_distance(wed, cost, node, n):
+def knn_distance(wed, cost, node, n, graph=None):
     """
     Compute the shortest path between a start node and
         all other nodes in the wed.
@@ -625,41 +794,18 @@ def knn_distance(wed, cost, node, n):
     cost: Cost per edge to travel, e.g. distance
     node: Start node ID
     n: integer number of nearest neighbors
+    graph: tuple returned by network_graph(wed, cost), built from wed and
+     cost when None
     Returns:
     distance: List of distances from node to all other nodes
     pred : List of preceeding nodes for traversal route
     """
 
-    near = []  #Set because we can update distance more than once
-    v0 = node
-    distance = [float('inf') for x in wed.node_list]
-    distance[wed.node_list.index(v0)] = 0
-    pred = [None for x in wed.node_list]
-    a = set()
-    a.add(v0)
-    while len(a) > 0:
-        #Get node with the lowest value from distance
-        dist = float('inf')
-        for node in a:
-            if distance[node] < dist:
-                dist = distance[node]
-                v = node
-                near.append(v)
-        #Remove that node from the set
-        a.remove(v)
-        last = v
-        #4. Get the neighbors to the current node
-        neighbors = get_neighbor_distances(wed, v, cost)
-        for v1, indiv_cost in neighbors.iteritems():
-            if distance[v1] > distance[v] + indiv_cost:
-                distance[v1] = distance[v] + indiv_cost
-                pred[v1] = v
-                a.add(v1)
-    near = nsmallest(n + 1, distance)
-    near.remove(0)  #Remove obs from near
-    for i,n in enumerate(near):
-        near[i] = distance.index(n)
-    return near
+    if graph is None:
+        graph = network_graph(wed, cost)
+    indptr, indices, data, index = graph
+    order, dist, pred = csr_dijkstra(indptr, indices, data, index[node], k=n)
+    return [wed.node_list[v] for v in order[1:]]
 
 def lat2Network(k):
     """helper function to create a network from a square lattice.
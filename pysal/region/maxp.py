@@ -12,6 +12,9 @@ import pysal
 from components import check_contiguity
 import copy
 import random
+import multiprocessing as mp
+from collections import deque
+from platform import system
 import numpy as np
 #from pysal.common import *
 from pysal.region import randomregion as RR
@@ -20,6 +23,11 @@ __all__ = ["Maxp", "Maxp_LISA"]
 
 LARGE = 10 ** 6
 MAX_ATTEMPTS = 100
+MAX_SEED = 2 ** 31 - 1
+# upper bound on the number of random solutions simulated in one task
+PERM_BLOCK = 100
+
+_WORKER = {}
 
 
 class Maxp:
@@ -52,6 +60,15 @@ class Maxp:
                       len(ids) is less than the number of observations, the
                       complementary ids are added to the end of seeds. Thus
                       the specified seeds get priority in the solution
+    cores           : int
+                      number of processes used for the initial solutions.
+                      Default: 1, all the solutions are drawn from the global
+                      random streams. For any other value (None means all
+                      cores available) each initial solution draws from its
+                      own random streams, seeded from the global ones, so the
+                      result only depends on the seeds and not on the number
+                      of cores. Note: multiprocessing is not available on
+                      Windows.
 
     Attributes
     ----------
@@ -107,9 +124,18 @@ class Maxp:
     [4, 14, 5, 24, 3]
     >>>
 
+    The initial solutions can be spread over several processes.
+
+    >>> np.random.seed(100)
+    >>> s2 = pysal.region.Maxp(w, z, floor, floor_variable=p, initial=20, cores=2)
+    >>> np.random.seed(100)
+    >>> s1 = pysal.region.Maxp(w, z, floor, floor_variable=p, initial=20, cores=3)
+    >>> s1.regions == s2.regions
+    True
+
     """
     def __init__(self, w, z, floor, floor_variable,
-                 verbose=False, initial=100, seeds=[]):
+                 verbose=False, initial=100, seeds=[], cores=1):
 
         self.w = w
         self.z = z
@@ -117,6 +143,13 @@ class Maxp:
         self.floor_variable = floor_variable
         self.verbose = verbose
         self.seeds = seeds
+        # attributes and floor variable by position of the areas in
+        # w.id_order, attributes centered to limit the rounding of the running
+        # sums of squares
+        self._pos = w.id2i
+        zc = np.asarray(z, float).reshape(w.n, -1)
+        self._z = zc - zc.mean(axis=0)
+        self._fv = np.asarray(floor_variable, float).flatten()
         self.initial_solution()
         if not self.p:
             self.feasible = False
@@ -127,16 +160,15 @@ class Maxp:
             self.current_area2region = copy.copy(self.area2region)
             self.initial_wss = []
             self.attempts = 0
-            for i in range(initial):
-                self.initial_solution()
-                if self.p:
-                    val = self.objective_function()
+            for i, solution in enumerate(self._restarts(initial, cores)):
+                if solution:
+                    regions, area2region, val = solution
                     self.initial_wss.append(val)
                     if self.verbose:
                         print 'initial solution: ', i, val, best_val
                     if val < best_val:
-                        self.current_regions = copy.copy(self.regions)
-                        self.current_area2region = copy.copy(self.area2region)
+                        self.current_regions = copy.copy(regions)
+                        self.current_area2region = copy.copy(area2region)
                         best_val = val
                     self.attempts += 1
             self.regions = copy.copy(self.current_regions)
@@ -148,47 +180,96 @@ class Maxp:
 
             self.swap()
 
-    def initial_solution(self):
+    def _restarts(self, initial, cores=1):
+        """Generate the initial solutions, one (regions, area2region, wss)
+        tuple per restart, None for the restarts that fail.
+
+        With cores other than 1 each restart draws from its own random
+        streams, seeded from the global ones, and the restarts run in a pool
+        of processes.
+        """
+        if cores == 1:
+            for i in xrange(initial):
+                yield self._restart()
+            return
+        seeds = np.random.randint(0, MAX_SEED, initial)
+        if cores is None:
+            cores = mp.cpu_count()
+        if system() == 'Windows' or cores == 1 or initial < 2:
+            for seed in seeds:
+                yield self._restart(seed)
+            return
+        pool = mp.Pool(min(cores, initial), _init_worker, (self,))
+        try:
+            solutions = pool.map(_work_restart, seeds)
+        finally:
+            pool.close()
+            pool.join()
+        for solution in solutions:
+            yield solution
+
+    def _restart(self, seed=None):
+        if seed is None:
+            self.initial_solution()
+        else:
+            self.initial_solution(random.Random(seed),
+                                  np.random.RandomState(seed))
+        if self.p:
+            return self.regions, self.area2region, self.objective_function()
+
+    def initial_solution(self, rand=random, np_rand=np.random):
+        """Grow regions from random seeds and assign the enclaves, drawing
+        from the streams rand (random module or random.Random) and np_rand
+        (numpy.random or RandomState), the global ones by default."""
         self.p = 0
         solving = True
         attempts = 0
+        pos = self._pos
+        fv = self._fv
         while solving and attempts <= MAX_ATTEMPTS:
             regions = []
             enclaves = []
             if not self.seeds:
                 candidates = copy.copy(self.w.id_order)
-                candidates = np.random.permutation(candidates)
+                candidates = np_rand.permutation(candidates)
                 candidates = candidates.tolist()
             else:
                 seeds = copy.copy(self.seeds)
-                nonseeds = [i for i in self.w.id_order if i not in seeds]
+                seed_set = set(seeds)
+                nonseeds = [i for i in self.w.id_order if i not in seed_set]
                 candidates = seeds
                 candidates.extend(nonseeds)
-            while candidates:
-                seed = candidates.pop(0)
+            # areas not yet in a region, seeds are taken in candidates order
+            available = set(candidates)
+            for seed in candidates:
+                if seed not in available:
+                    continue
+                available.remove(seed)
                 # try to grow it till threshold constraint is satisfied
                 region = [seed]
+                floor_total = 0 + fv[pos[seed]]
                 building_region = True
                 while building_region:
                     # check if floor is satisfied
-                    if self.check_floor(region):
+                    if floor_total >= self.floor:
                         regions.append(region)
                         building_region = False
                     else:
                         potential = []
+                        in_potential = set()
                         for area in region:
-                            neighbors = self.w.neighbors[area]
-                            neighbors = [neigh for neigh in neighbors if neigh in candidates]
-                            neighbors = [neigh for neigh in neighbors if neigh not in region]
-                            neighbors = [neigh for neigh in neighbors if neigh not in potential]
-                            potential.extend(neighbors)
+                            for neigh in self.w.neighbors[area]:
+                                if neigh in available and neigh not in in_potential:
+                                    potential.append(neigh)
+                                    in_potential.add(neigh)
                         if potential:
                             # add a random neighbor
-                            neigID = random.randint(0, len(potential) - 1)
+                            neigID = rand.randint(0, len(potential) - 1)
                             neigAdd = potential.pop(neigID)
                             region.append(neigAdd)
+                            floor_total += fv[pos[neigAdd]]
                             # remove it from candidates
-                            candidates.remove(neigAdd)
+                            available.remove(neigAdd)
                         else:
                             #print 'enclave'
                             #print region
@@ -205,20 +286,22 @@ class Maxp:
             for r, region in enumerate(regions):
                 for area in region:
                     a2r[area] = r
+            enclaves = deque(enclaves)
+            queued = set(enclaves)
             encCount = len(enclaves)
             encAttempts = 0
             while enclaves and encAttempts != encCount:
-                enclave = enclaves.pop(0)
-                neighbors = self.w.neighbors[enclave]
-                neighbors = [neighbor for neighbor in neighbors if neighbor not in enclaves]
+                enclave = enclaves.popleft()
+                queued.remove(enclave)
                 candidates = []
-                for neighbor in neighbors:
-                    region = a2r[neighbor]
-                    if region not in candidates:
-                        candidates.append(region)
+                for neighbor in self.w.neighbors[enclave]:
+                    if neighbor not in queued:
+                        region = a2r[neighbor]
+                        if region not in candidates:
+                            candidates.append(region)
                 if candidates:
                     # add enclave to random region
-                    regID = random.randint(0, len(candidates) - 1)
+                    regID = rand.randint(0, len(candidates) - 1)
                     rid = candidates[regID]
                     regions[rid].append(enclave)
                     a2r[enclave] = rid
@@ -229,6 +312,7 @@ class Maxp:
                 else:
                     # put back on que, no contiguous regions yet
                     enclaves.append(enclave)
+                    queued.add(enclave)
                     encAttempts += 1
                     feasible = False
             if feasible:
@@ -243,6 +327,16 @@ class Maxp:
                 attempts += 1
 
     def swap(self):
+        """Move areas between neighboring regions while the objective
+        function improves.
+
+        Each region keeps its number of areas, the running sums and sums of
+        squares of the attributes and its floor total, so the change of the
+        objective for a move is computed from a few arrays of length m,
+        whatever the size of the regions. The areas that cannot leave a
+        region without breaking its contiguity (articulation points) are
+        found once per region and reused until the region changes.
+        """
         swapping = True
         swap_iteration = 0
         if self.verbose:
@@ -251,6 +345,11 @@ class Maxp:
         self.k = len(self.regions)
         changed_regions = [1] * self.k
         nr = range(self.k)
+        pos = self._pos
+        zs = self._z
+        fv = self._fv
+        count, sums, squares, floors = self._region_sums()
+        cuts = {}
         while swapping:
             moves_made = 0
             regionIds = [r for r in nr if changed_regions[r]]
@@ -265,43 +364,39 @@ class Maxp:
                     # get neighbors
                     members = self.regions[seed]
                     neighbors = []
+                    in_neighbors = set()
                     for member in members:
-                        candidates = self.w.neighbors[member]
-                        candidates = [candidate for candidate in candidates if candidate not in members]
-                        candidates = [candidate for candidate in candidates if candidate not in neighbors]
-                        neighbors.extend(candidates)
+                        for candidate in self.w.neighbors[member]:
+                            if self.area2region[candidate] != seed and \
+                                    candidate not in in_neighbors:
+                                neighbors.append(candidate)
+                                in_neighbors.add(candidate)
                     candidates = []
                     for neighbor in neighbors:
-                        block = copy.copy(self.regions[self.area2region[
-                            neighbor]])
-                        if check_contiguity(self.w, block, neighbor):
-                            block.remove(neighbor)
-                            fv = self.check_floor(block)
-                            if fv:
-                                candidates.append(neighbor)
+                        r = self.area2region[neighbor]
+                        if r not in cuts:
+                            cuts[r] = self._articulation_points(r)
+                        if count[r] > 1 and neighbor not in cuts[r] and \
+                                floors[r] - fv[pos[neighbor]] >= self.floor:
+                            candidates.append(neighbor)
                     # find the best local move
                     if not candidates:
                         local_swapping = False
                     else:
-                        nc = len(candidates)
-                        moves = np.zeros([nc, 1], float)
+                        idx = np.array([pos[area] for area in candidates])
+                        outer = np.array([self.area2region[area]
+                                          for area in candidates])
+                        za = zs[idx]
+                        change = _wss(count[seed] + 1, sums[seed] + za,
+                                      squares[seed] + za * za) \
+                            + _wss(count[outer] - 1, sums[outer] - za,
+                                   squares[outer] - za * za) \
+                            - _wss(count[seed], sums[seed], squares[seed]) \
+                            - _wss(count[outer], sums[outer], squares[outer])
                         best = None
-                        cv = 0.0
-                        for area in candidates:
-                            current_internal = self.regions[seed]
-                            current_outter = self.regions[self.area2region[
-                                area]]
-                            current = self.objective_function([current_internal, current_outter])
-                            new_internal = copy.copy(current_internal)
-                            new_outter = copy.copy(current_outter)
-                            new_internal.append(area)
-                            new_outter.remove(area)
-                            new = self.objective_function([new_internal,
-                                                           new_outter])
-                            change = new - current
-                            if change < cv:
-                                best = area
-                                cv = change
+                        i = change.argmin()
+                        if change[i] < 0.0:
+                            best = candidates[i]
                         if best:
                             # make the move
                             area = best
@@ -309,6 +404,17 @@ class Maxp:
                             self.regions[old_region].remove(area)
                             self.area2region[area] = seed
                             self.regions[seed].append(area)
+                            z_area = za[i]
+                            count[seed] += 1
+                            sums[seed] += z_area
+                            squares[seed] += z_area * z_area
+                            floors[seed] += fv[pos[area]]
+                            count[old_region] -= 1
+                            sums[old_region] -= z_area
+                            squares[old_region] -= z_area * z_area
+                            floors[old_region] -= fv[pos[area]]
+                            cuts.pop(seed, None)
+                            cuts.pop(old_region, None)
                             moves_made += 1
                             changed_regions[seed] = 1
                             changed_regions[old_region] = 1
@@ -333,30 +439,93 @@ class Maxp:
                 print 'moves_made: ', moves_made
                 print 'objective function: ', self.objective_function()
 
+    def _region_sums(self):
+        """Number of areas, sums and sums of squares of the attributes, and
+        floor totals of the regions, one row per region."""
+        k = len(self.regions)
+        labels, idx = self._labels(self.regions)
+        zs = self._z[idx]
+        count = np.bincount(labels, minlength=k)
+        sums = np.zeros((k, zs.shape[1]))
+        squares = np.zeros((k, zs.shape[1]))
+        for j in xrange(zs.shape[1]):
+            sums[:, j] = np.bincount(labels, zs[:, j], k)
+            squares[:, j] = np.bincount(labels, zs[:, j] ** 2, k)
+        floors = np.bincount(labels, self._fv[idx], k)
+        return count, sums, squares, floors
+
+    def _articulation_points(self, r):
+        """Areas of region r whose removal breaks the contiguity of the
+        region (all of them if the region is not contiguous)."""
+        members = self.regions[r]
+        a2r = self.area2region
+        neighbors = self.w.neighbors
+        root = members[0]
+        order = {root: 0}
+        low = {root: 0}
+        cut = set()
+        root_children = 0
+        # iterative depth first search over the areas of the region
+        stack = [(root, None, iter(neighbors[root]))]
+        while stack:
+            area, parent, nbrs = stack[-1]
+            for nbr in nbrs:
+                if a2r[nbr] != r or nbr == parent:
+                    continue
+                if nbr in order:
+                    low[area] = min(low[area], order[nbr])
+                else:
+                    order[nbr] = low[nbr] = len(order)
+                    stack.append((nbr, area, iter(neighbors[nbr])))
+                    break
+            else:
+                stack.pop()
+                if parent is not None:
+                    low[parent] = min(low[parent], low[area])
+                    if parent == root:
+                        root_children += 1
+                    elif low[area] >= order[parent]:
+                        cut.add(parent)
+        if root_children > 1:
+            cut.add(root)
+        if len(order) < len(members):
+            return set(members)
+        return cut
+
     def check_floor(self, region):
-        selectionIDs = [self.w.id_order.index(i) for i in region]
-        cv = sum(self.floor_variable[selectionIDs])
+        selectionIDs = [self._pos[i] for i in region]
+        cv = self._fv[selectionIDs].sum()
         if cv >= self.floor:
             #print len(selectionIDs)
             return True
         else:
             return False
 
+    def _labels(self, solution):
+        """Region of each area in solution and position of the area."""
+        sizes = [len(region) for region in solution]
+        labels = np.repeat(np.arange(len(solution)), sizes)
+        idx = np.array([self._pos[i] for region in solution for i in region],
+                       int)
+        return labels, idx
+
     def objective_function(self, solution=None):
         # solution is a list of lists of region ids [[1,7,2],[0,4,3],...] such
         # that the first region has areas 1,7,2 the second region 0,4,3 and so
         # on. solution does not have to be exhaustive
         if not solution:
             solution = self.regions
-        wss = 0
-        for region in solution:
-            selectionIDs = [self.w.id_order.index(i) for i in region]
-            m = self.z[selectionIDs, :]
-            var = m.var(axis=0)
-            wss += sum(np.transpose(var)) * len(region)
-        return wss
-
-    def inference(self, nperm=99):
+        labels, idx = self._labels(solution)
+        k = len(solution)
+        zs = self._z[idx]
+        count = np.maximum(np.bincount(labels, minlength=k), 1)
+        means = np.zeros((k, zs.shape[1]))
+        for j in xrange(zs.shape[1]):
+            means[:, j] = np.bincount(labels, zs[:, j], k) / count
+        dev = zs - means[labels]
+        return (dev * dev).sum()
+
+    def inference(self, nperm=99, cores=1):
         """Compare the within sum of squares for the solution against
         simulated solutions where areas are randomly assigned to regions that
         maintain the cardinality of the original solution.
@@ -368,6 +537,14 @@ class Maxp:
                       number of random permutations for calculation of
                       pseudo-p_values
 
+        cores       : int
+                      number of processes used for the simulated solutions.
+                      Default: 1. For any other value (None means all cores
+                      available) each block of PERM_BLOCK solutions draws
+                      from its own random streams, seeded from the global
+                      ones, so the result does not depend on the number of
+                      cores.
+
         Attributes
         ----------
 
@@ -405,21 +582,20 @@ class Maxp:
         wsss = np.zeros(nperm + 1)
         self.wss = self.objective_function()
         cards = [len(i) for i in self.regions]
-        sim_solutions = RR.Random_Regions(ids, num_regions,
-                                          cardinality=cards, permutations=nperm)
+        sim_wss = self._simulate(nperm, cores, area_ids=ids,
+                                 num_regions=num_regions, cardinality=cards)
         cv = 1
         c = 1
-        for solution in sim_solutions.solutions_feas:
-            wss = self.objective_function(solution.regions)
+        for wss in sim_wss:
             wsss[c] = wss
             if wss <= self.wss:
                 cv += 1
             c += 1
-        self.pvalue = cv / (1. + len(sim_solutions.solutions_feas))
+        self.pvalue = cv / (1. + len(sim_wss))
         self.wss_perm = wsss
         self.wss_perm[0] = self.wss
 
-    def cinference(self, nperm=99, maxiter=1000):
+    def cinference(self, nperm=99, maxiter=1000, cores=1):
         """Compare the within sum of squares for the solution against
         conditional simulated solutions where areas are randomly assigned to
         regions that maintain the cardinality of the original solution and
@@ -435,6 +611,14 @@ class Maxp:
         maxiter     : int
                       maximum number of attempts to find each permutation
 
+        cores       : int
+                      number of processes used for the simulated solutions.
+                      Default: 1. For any other value (None means all cores
+                      available) each block of PERM_BLOCK solutions draws
+                      from its own random streams, seeded from the global
+                      ones, so the result does not depend on the number of
+                      cores.
+
         Attributes
         ----------
 
@@ -482,16 +666,15 @@ class Maxp:
         wsss = np.zeros(nperm + 1)
         self.cwss = self.objective_function()
         cards = [len(i) for i in self.regions]
-        sim_solutions = RR.Random_Regions(ids, num_regions,
-                                          cardinality=cards, contiguity=self.w,
-                                          maxiter=maxiter, permutations=nperm)
-        self.cfeas_sols = len(sim_solutions.solutions_feas)
+        sim_wss = self._simulate(nperm, cores, area_ids=ids,
+                                 num_regions=num_regions, cardinality=cards,
+                                 contiguity=self.w, maxiter=maxiter)
+        self.cfeas_sols = len(sim_wss)
         if self.cfeas_sols < nperm:
             raise Exception('not enough feasible solutions found')
         cv = 1
         c = 1
-        for solution in sim_solutions.solutions_feas:
-            wss = self.objective_function(solution.regions)
+        for wss in sim_wss:
             wsss[c] = wss
             if wss <= self.cwss:
                 cv += 1
@@ -500,6 +683,43 @@ class Maxp:
         self.cwss_perm = wsss
         self.cwss_perm[0] = self.cwss
 
+    def _simulate(self, nperm, cores=1, **kwargs):
+        """Objective function of the feasible random solutions of
+        Random_Regions(permutations=nperm, **kwargs)."""
+        if cores == 1:
+            sim_solutions = RR.Random_Regions(permutations=nperm, **kwargs)
+            return [self.objective_function(solution.regions)
+                    for solution in sim_solutions.solutions_feas]
+        sizes = [PERM_BLOCK] * (nperm // PERM_BLOCK)
+        if nperm % PERM_BLOCK:
+            sizes.append(nperm % PERM_BLOCK)
+        seeds = np.random.randint(0, MAX_SEED, len(sizes))
+        tasks = [(seed, size, kwargs) for seed, size in zip(seeds, sizes)]
+        if cores is None:
+            cores = mp.cpu_count()
+        if system() == 'Windows' or cores == 1 or len(tasks) == 1:
+            sims = [self._simulate_block(*task) for task in tasks]
+        else:
+            pool = mp.Pool(min(cores, len(tasks)), _init_worker, (self,))
+            try:
+                sims = pool.map(_work_simulate, tasks)
+            finally:
+                pool.close()
+                pool.join()
+        return [wss for sim in sims for wss in sim]
+
+    def _simulate_block(self, seed, nperm, kwargs):
+        # Random_Regions draws from the global stream, which is restored so
+        # that the caller's state is untouched when no pool is used
+        state = np.random.get_state()
+        np.random.seed(seed)
+        try:
+            sim_solutions = RR.Random_Regions(permutations=nperm, **kwargs)
+        finally:
+            np.random.set_state(state)
+        return [self.objective_function(solution.regions)
+                for solution in sim_solutions.solutions_feas]
+
 
 class Maxp_LISA(Maxp):
     """Max-p regionalization using LISA seeds
@@ -522,6 +742,9 @@ class Maxp_LISA(Maxp):
     initial        : int
                      number of initial feasible solutions to generate
                      prior to swapping
+    cores          : int
+                     number of processes used for the initial solutions
+                     (see Maxp)
 
     Attributes
     ----------
@@ -576,7 +799,7 @@ class Maxp_LISA(Maxp):
     [99, 89, 98]
 
     """
-    def __init__(self, w, z, y, floor, floor_variable, initial=100):
+    def __init__(self, w, z, y, floor, floor_variable, initial=100, cores=1):
 
         lis = pysal.Moran_Local(y, w)
         ids = np.argsort(lis.Is)
@@ -584,5 +807,26 @@ class Maxp_LISA(Maxp):
         ids = ids.tolist()
         mp = Maxp.__init__(
             self, w, z, floor=floor, floor_variable=floor_variable,
-            initial=initial, seeds=ids)
+            initial=initial, seeds=ids, cores=cores)
+
+
+def _wss(count, sums, squares):
+    """Within sum of squares of regions from their number of areas, and the
+    sums and sums of squares of their attributes (last axis)."""
+    count = np.asarray(count, float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wss = (squares - sums * sums / count[..., None]).sum(axis=-1)
+    return np.where(count > 0, wss, 0.0)
+
+
+def _init_worker(maxp):
+    _WORKER['maxp'] = maxp
+
+
+def _work_restart(seed):
+    return _WORKER['maxp']._restart(seed)
+
+
+def _work_simulate(task):
+    return _WORKER['maxp']._simulate_block(*task)
 
@@ -3,6 +3,7 @@ import unittest
 import pysal
 import numpy as np
 import random
+from pysal.region.components import is_component
 
 
 class Test_Maxp(unittest.TestCase):
@@ -48,6 +49,68 @@ class Test_Maxp(unittest.TestCase):
         self.assertEquals(mpl.p, 31)
         self.assertEquals(mpl.regions[0], [99, 89, 98])
 
+    def test_objective_function(self):
+        w = pysal.lat2W(10, 10)
+        z = np.random.random_sample((w.n, 2))
+        p = np.ones((w.n, 1), float)
+        solution = pysal.region.Maxp(w, z, 3, floor_variable=p, initial=10)
+        wss = sum(((z[region] - z[region].mean(axis=0)) ** 2).sum()
+                  for region in solution.regions)
+        self.assertAlmostEquals(solution.objective_function(), wss, 10)
+        for region in solution.regions:
+            self.assertTrue(is_component(w, region))
+
+    def test_swap_kernel(self):
+        w = pysal.lat2W(10, 10)
+        z = np.random.random_sample((w.n, 2))
+        p = np.ones((w.n, 1), float)
+        sol = pysal.region.Maxp(w, z, 3, floor_variable=p, initial=1)
+        count, sums, squares, floors = sol._region_sums()
+        wss = sol.objective_function()
+        for r, region in enumerate(sol.regions):
+            # areas whose removal breaks the region, by checking each one
+            cut = set(a for a in region if len(region) > 1 and
+                      not is_component(w, [b for b in region if b != a]))
+            self.assertEquals(sol._articulation_points(r), cut)
+            # change of the objective for moving a neighbor into the region,
+            # against the objective of the moved solution
+            for area in set(sum([w.neighbors[a] for a in region], [])):
+                outer = sol.area2region[area]
+                if outer == r:
+                    continue
+                za = sol._z[sol._pos[area]]
+                change = pysal.region.maxp._wss(
+                    [count[r] + 1, count[outer] - 1],
+                    np.array([sums[r] + za, sums[outer] - za]),
+                    np.array([squares[r] + za * za,
+                              squares[outer] - za * za])).sum() - \
+                    pysal.region.maxp._wss(count[[r, outer]],
+                                           sums[[r, outer]],
+                                           squares[[r, outer]]).sum()
+                moved = [[a for a in reg if a != area] for reg in sol.regions]
+                moved[r].append(area)
+                self.assertAlmostEquals(
+                    change, sol.objective_function(
+                        [reg for reg in moved if reg]) - wss, 10)
+
+    def test_restart_streams(self):
+        w = pysal.lat2W(10, 10)
+        z = np.random.random_sample((w.n, 2))
+        p = np.ones((w.n, 1), float)
+        sol = pysal.region.Maxp(w, z, 3, floor_variable=p, initial=1)
+        state, np_state = random.getstate(), np.random.get_state()
+        first = sol._restart(12345)
+        sol._simulate_block(6789, 5, {'area_ids': w.id_order,
+                                      'num_regions': sol.p,
+                                      'cardinality': map(len, sol.regions)})
+        # restarts and simulations with their own seeds leave the global
+        # streams as they were, and only depend on their seeds
+        self.assertEquals(random.getstate(), state)
+        np.testing.assert_array_equal(np.random.get_state()[1], np_state[1])
+        random.seed(1)
+        np.random.seed(1)
+        self.assertEquals(sol._restart(12345), first)
+
 
 suite = unittest.TestLoader().loadTestsFromTestCase(Test_Maxp)
 
@@ -7,13 +7,14 @@ __author__ = "Nicholas Malizia <nmalizia@asu.edu>", "Sergio J. Rey \
 
 import pysal
 import numpy as np
-import scipy.stats as stats
+import scipy.spatial
 import pysal.weights.Distance as Distance
-from pysal import cg
-from pysal.spatial_dynamics import util
+from pysal.core.util.shapefile import shp_geometry
+from pysal.esda.permutation import simulate, BLOCK_SIZE
 from datetime import date
 
-__all__ = ['SpaceTimeEvents', 'knox', 'mantel', 'jacquez', 'modified_knox']
+__all__ = ['SpaceTimeEvents', 'knox', 'mantel', 'jacquez', 'modified_knox',
+           'KnoxCount', 'ModifiedKnox', 'JacquezCount', 'MantelCorrelation']
 
 
 class SpaceTimeEvents:
@@ -117,18 +118,16 @@ class SpaceTimeEvents:
 
     """
     def __init__(self, path, time_col, infer_timestamp=False):
-        shp = pysal.open(path + '.shp')
         dbf = pysal.open(path + '.dbf')
 
-        # extract the spatial coordinates from the shapefile
-        x = [coords[0] for coords in shp]
-        y = [coords[1] for coords in shp]
+        # extract the spatial coordinates from the shapefile, the first
+        # vertex of each record
+        geo = shp_geometry(path + '.shp')
+        xy = geo.coords[geo.rings[geo.parts[:-1]]]
 
-        self.n = n = len(shp)
-        x = np.array(x)
-        y = np.array(y)
-        self.x = np.reshape(x, (n, 1))
-        self.y = np.reshape(y, (n, 1))
+        self.n = n = len(geo)
+        self.x = np.reshape(xy[:, 0], (n, 1))
+        self.y = np.reshape(xy[:, 1], (n, 1))
         self.space = np.hstack((self.x, self.y))
 
         # extract the temporal information from the database
@@ -150,10 +149,10 @@ class SpaceTimeEvents:
 
         # close open objects
         dbf.close()
-        shp.close()
 
 
-def knox(s_coords, t_coords, delta, tau, permutations=99, debug=False):
+def knox(s_coords, t_coords, delta, tau, permutations=99, debug=False,
+         cores=1):
     """
     Knox test for spatio-temporal interaction. [1]_
 
@@ -178,6 +177,10 @@ def knox(s_coords, t_coords, delta, tau, permutations=99, debug=False):
     debug           : bool
                       if true, debugging information is printed
 
+    cores           : int
+                      number of processes used to evaluate the permutations,
+                      see pysal.esda.permutation.simulate
+
     Returns
     -------
     knox_result     : dictionary
@@ -231,45 +234,33 @@ def knox(s_coords, t_coords, delta, tau, permutations=99, debug=False):
     the events.
 
     >>> print("%2.2f"%result['pvalue'])
-    0.17
+    0.18
 
     """
 
     # Do a kdtree on space first as the number of ties (identical points) is
-    # likely to be lower for space than time.
-
-    kd_s = pysal.cg.KDTree(s_coords)
-    neigh_s = kd_s.query_pairs(delta)
-    tau2 = tau * tau
-    ids = np.array(list(neigh_s))
+    # likely to be lower for space than time. The space neighbor pairs are
+    # found once, the permutations only relabel the times of the events.
 
-    # For the neighboring pairs in space, determine which are also time
-    # neighbors
+    n = len(t_coords)
+    i, j = _space_pairs(s_coords, delta)
+    stat = KnoxCount(i, j, t_coords, tau)
+    n_st = stat(np.arange(n)[:, None])[0]
 
-    d_t = (t_coords[ids[:,0]] - t_coords[ids[:,1]])**2
-    n_st = sum(d_t <= tau2)
-
-    knox_result = {'stat': n_st[0]}
+    knox_result = {'stat': n_st}
 
     if permutations:
-        joint = np.zeros((permutations, 1), int)
-        for p in xrange(permutations):
-            np.random.shuffle(t_coords)
-            d_t = (t_coords[ids[:,0]] - t_coords[ids[:,1]])**2
-            joint[p] = np.sum(d_t <= tau2)
-
-        larger = sum(joint >= n_st[0])
+        joint = simulate(stat, np.arange(n), permutations, cores)
+        larger = (joint >= n_st).sum()
         if (permutations - larger) < larger:
             larger = permutations - larger
-        p_sim = (larger + 1.) / (permutations +1. )
+        p_sim = (larger + 1.) / (permutations + 1.)
         knox_result['pvalue'] = p_sim
     return knox_result
 
-    
 
-
-
-def mantel(s_coords, t_coords, permutations=99, scon=1.0, spow=-1.0, tcon=1.0, tpow=-1.0):
+def mantel(s_coords, t_coords, permutations=99, scon=1.0, spow=-1.0,
+           tcon=1.0, tpow=-1.0, cores=1):
     """
     Standardized Mantel test for spatio-temporal interaction. [2]_
 
@@ -297,6 +288,10 @@ def mantel(s_coords, t_coords, permutations=99, scon=1.0, spow=-1.0, tcon=1.0, t
     tpow            : float
                       value for power transformation for temporal distances
 
+    cores           : int
+                      number of processes used to evaluate the permutations,
+                      see pysal.esda.permutation.simulate
+
 
     Returns
     -------
@@ -351,38 +346,28 @@ def mantel(s_coords, t_coords, permutations=99, scon=1.0, spow=-1.0, tcon=1.0, t
     >>> print("%2.2f"%result['pvalue'])
     0.01
 
+    Notes
+    -----
+    The distance matrices are never built, the pairs of events are visited
+    in blocks of rows of their lower triangles (see MantelCorrelation).
 
     """
 
-    t = t_coords
-    s = s_coords
-    n =  len(t)
-
-    # calculate the spatial and temporal distance matrices for the events
-    distmat = cg.distance_matrix(s)
-    timemat = cg.distance_matrix(t)
+    n = len(t_coords)
 
     # calculate the transformed standardized statistic
-    timevec = (util.get_lower(timemat) + tcon) ** tpow
-    distvec = (util.get_lower(distmat) + scon) ** spow
-    stat = stats.pearsonr(timevec, distvec)[0].sum()
+    corr = MantelCorrelation(s_coords, t_coords, scon, spow, tcon, tpow)
+    stat = corr(np.arange(n)[:, None])[0]
 
     # return the results (if no inference)
     if not permutations:
         return stat
 
-    # loop for generating a random distribution to assess significance
-    dist = []
-    for i in range(permutations):
-        trand = util.shuffle_matrix(timemat, range(n))
-        timevec = (util.get_lower(trand) + tcon) ** tpow
-        m = stats.pearsonr(timevec, distvec)[0].sum()
-        dist.append(m)
+    # permutations of the events in the temporal distances
+    distribution = simulate(corr, np.arange(n), permutations, cores)
 
     ## establish the pseudo significance of the observed statistic
-    distribution = np.array(dist)
-    greater = np.ma.masked_greater_equal(distribution, stat)
-    count = np.ma.count_masked(greater)
+    count = (distribution >= stat).sum()
     pvalue = (count + 1.0) / (permutations + 1.0)
 
     # report the results
@@ -390,7 +375,7 @@ def mantel(s_coords, t_coords, permutations=99, scon=1.0, spow=-1.0, tcon=1.0, t
     return mantel_result
 
 
-def jacquez(s_coords, t_coords, k, permutations=99):
+def jacquez(s_coords, t_coords, k, permutations=99, cores=1):
     """
     Jacquez k nearest neighbors test for spatio-temporal interaction. [3]_
 
@@ -409,6 +394,10 @@ def jacquez(s_coords, t_coords, k, permutations=99):
                       the number of permutations used to establish pseudo-
                       significance (default is 99)
 
+    cores           : int
+                      number of processes used to evaluate the permutations,
+                      see pysal.esda.permutation.simulate
+
     Returns
     -------
     jacquez_result  : dictionary
@@ -456,62 +445,33 @@ def jacquez(s_coords, t_coords, k, permutations=99):
     False
 
     """
-    time = t_coords
-    space = s_coords
-    n =  len(time)
-
-    # calculate the nearest neighbors in space and time separately
-    knnt = Distance.knnW(time, k)
-    knns = Distance.knnW(space, k)
+    n = len(t_coords)
 
-    nnt = knnt.neighbors
-    nns = knns.neighbors
-    knn_sum = 0
+    # calculate the nearest neighbors in space and time separately, once
+    stat = JacquezCount(Distance.knnW(s_coords, k),
+                        Distance.knnW(t_coords, k))
 
     # determine which events are nearest neighbors in both space and time
-    for i in range(n):
-        t_neighbors = nnt[i]
-        s_neighbors = nns[i]
-        check = set(t_neighbors)
-        inter = check.intersection(s_neighbors)
-        count = len(inter)
-        knn_sum += count
-
-    stat = knn_sum
+    stat_obs = stat(np.arange(n)[:, None])[0]
 
     # return the results (if no inference)
     if not permutations:
-        return stat
+        return stat_obs
 
-    # loop for generating a random distribution to assess significance
-    dist = []
-    for p in range(permutations):
-        j = 0
-        trand = np.random.permutation(time)
-        knnt = Distance.knnW(trand, k)
-        nnt = knnt.neighbors
-        for i in range(n):
-            t_neighbors = nnt[i]
-            s_neighbors = nns[i]
-            check = set(t_neighbors)
-            inter = check.intersection(s_neighbors)
-            count = len(inter)
-            j += count
-
-        dist.append(j)
+    # permutations relabel the times of the events against the fixed
+    # nearest neighbors
+    distribution = simulate(stat, np.arange(n), permutations, cores)
 
     # establish the pseudo significance of the observed statistic
-    distribution = np.array(dist)
-    greater = np.ma.masked_greater_equal(distribution, stat)
-    count = np.ma.count_masked(greater)
+    count = (distribution >= stat_obs).sum()
     pvalue = (count + 1.0) / (permutations + 1.0)
 
     # report the results
-    jacquez_result = {'stat': stat, 'pvalue': pvalue}
+    jacquez_result = {'stat': stat_obs, 'pvalue': pvalue}
     return jacquez_result
 
 
-def modified_knox(s_coords, t_coords, delta, tau, permutations=99):
+def modified_knox(s_coords, t_coords, delta, tau, permutations=99, cores=1):
     """
     Baker's modified Knox test for spatio-temporal interaction. [1]_
 
@@ -534,6 +494,10 @@ def modified_knox(s_coords, t_coords, delta, tau, permutations=99):
                       the number of permutations used to establish pseudo-
                       significance (default is 99)
 
+    cores           : int
+                      number of processes used to evaluate the permutations,
+                      see pysal.esda.permutation.simulate
+
     Returns
     -------
     modknox_result  : dictionary
@@ -587,69 +551,288 @@ def modified_knox(s_coords, t_coords, delta, tau, permutations=99):
     0.11
 
     """
-    s = s_coords
-    t = t_coords
-    n = len(t)
-
-    # calculate the spatial and temporal distance matrices for the events
-    sdistmat = cg.distance_matrix(s)
-    tdistmat = cg.distance_matrix(t)
-
-    # identify events within thresholds
-    spacmat = np.ones((n, n))
-    spacbin = sdistmat <= delta
-    spacmat = spacmat * spacbin
-    timemat = np.ones((n, n))
-    timebin = tdistmat <= tau
-    timemat = timemat * timebin
-
-    # calculate the observed (original) statistic
-    knoxmat = timemat * spacmat
-    obsstat = (knoxmat.sum() - n)
-
-    # calculate the expectated value
-    ssumvec = np.reshape((spacbin.sum(axis=0) - 1), (n, 1))
-    tsumvec = np.reshape((timebin.sum(axis=0) - 1), (n, 1))
-    expstat = (ssumvec * tsumvec).sum()
+    n = len(t_coords)
+
+    # identify events within thresholds, as pairs in space and as counts of
+    # neighbors in time
+    i, j = _space_pairs(s_coords, delta)
+    mknox = ModifiedKnox(i, j, t_coords, tau)
 
     # calculate the modified stat
-    stat = (obsstat - (expstat / (n - 1.0))) / 2.0
+    stat = mknox(np.arange(n)[:, None])[0]
 
     # return results (if no inference)
     if not permutations:
         return stat
-    distribution = []
-
-    # loop for generating a random distribution to assess significance
-    for p in range(permutations):
-        rtdistmat = util.shuffle_matrix(tdistmat, range(n))
-        timemat = np.ones((n, n))
-        timebin = rtdistmat <= tau
-        timemat = timemat * timebin
-
-        # calculate the observed knox again
-        knoxmat = timemat * spacmat
-        obsstat = (knoxmat.sum() - n)
 
-        # calculate the expectated value again
-        ssumvec = np.reshape((spacbin.sum(axis=0) - 1), (n, 1))
-        tsumvec = np.reshape((timebin.sum(axis=0) - 1), (n, 1))
-        expstat = (ssumvec * tsumvec).sum()
-
-        # calculate the modified stat
-        tempstat = (obsstat - (expstat / (n - 1.0))) / 2.0
-        distribution.append(tempstat)
+    # permutations relabel the times of the events
+    distribution = simulate(mknox, np.arange(n), permutations, cores)
 
     # establish the pseudo significance of the observed statistic
-    distribution = np.array(distribution)
-    greater = np.ma.masked_greater_equal(distribution, stat)
-    count = np.ma.count_masked(greater)
+    count = (distribution >= stat).sum()
     pvalue = (count + 1.0) / (permutations + 1.0)
 
     # return results
     modknox_result = {'stat': stat, 'pvalue': pvalue}
     return modknox_result
 
+
+class _PairCount(object):
+    """
+    Statistic on pairs of events for relabelings of the times of the events
+
+    Subclasses hold the pairs in self.i and self.j and count the pairs for a
+    block of relabelings in _count.
+    """
+    def __call__(self, ids):
+        """
+        statistic for each column of ids (n x b, as permuted ids) giving the
+        times of the events
+        """
+        ids = np.asarray(ids).astype(np.int64)
+        b = ids.shape[1]
+        # permuted copies of the pairs held in memory at once
+        step = max(1, BLOCK_SIZE // max(1, len(self.i)))
+        return np.concatenate([self._count(ids[:, c:c + step])
+                               for c in xrange(0, b, step)])
+
+    def _count(self, ids):
+        raise NotImplementedError
+
+
+class KnoxCount(_PairCount):
+    """
+    Knox statistic for relabelings of the times of the events
+
+    Parameters
+    ----------
+    i, j     : arrays
+               pairs of events that are neighbors in space, i < j
+    t_coords : array
+               nx1 temporal coordinates
+    tau      : float
+               threshold for proximity in time
+
+    Examples
+    --------
+    >>> t = np.array([[0.], [1.], [5.], [6.]])
+    >>> stat = KnoxCount(np.array([0, 2]), np.array([1, 3]), t, 2)
+    >>> stat(np.array([[0, 0], [1, 2], [2, 1], [3, 3]]))
+    array([2, 0])
+    """
+    def __init__(self, i, j, t_coords, tau):
+        self.i = i
+        self.j = j
+        self.t = np.asarray(t_coords, float).reshape(len(t_coords), -1)[:, 0]
+        self.tau = tau
+        self.tau2 = tau * tau
+
+    def _count(self, ids):
+        """
+        number of space neighbors that are also time neighbors
+        """
+        t = self.t[ids]
+        d_t = (t[self.i] - t[self.j]) ** 2
+        return (d_t <= self.tau2).sum(axis=0)
+
+
+class ModifiedKnox(KnoxCount):
+    """
+    Baker's modified Knox statistic for relabelings of the times of the
+    events
+
+    The number of time neighbors of each event is found by sorting the
+    times and sweeping thresholds over them with np.searchsorted. A
+    relabeling moves these counts with the times, so only the space time
+    neighbor pairs are counted again.
+
+    Parameters
+    ----------
+    i, j     : arrays
+               pairs of events that are neighbors in space, i < j
+    t_coords : array
+               nx1 temporal coordinates
+    tau      : float
+               threshold for proximity in time
+
+    Examples
+    --------
+    >>> t = np.array([[0.], [1.], [5.], [6.]])
+    >>> stat = ModifiedKnox(np.array([0, 2]), np.array([1, 3]), t, 2)
+    >>> stat(np.array([[0, 0], [1, 2], [2, 1], [3, 3]]))
+    array([ 1.33333333, -0.66666667])
+    """
+    def __init__(self, i, j, t_coords, tau):
+        KnoxCount.__init__(self, i, j, t_coords, tau)
+        n = len(self.t)
+        self.n = n
+        # number of space and time neighbors of each event
+        self.s_count = np.bincount(i, minlength=n) + \
+            np.bincount(j, minlength=n)
+        ts = np.sort(self.t)
+        self.t_count = np.searchsorted(ts, self.t + tau, 'right') - \
+            np.searchsorted(ts, self.t - tau, 'left') - 1
+
+    def _count(self, ids):
+        t = self.t[ids]
+        both = (np.abs(t[self.i] - t[self.j]) <= self.tau).sum(axis=0)
+        expected = np.dot(self.s_count, self.t_count[ids])
+        return (2 * both - (expected / (self.n - 1.0))) / 2.0
+
+
+class JacquezCount(_PairCount):
+    """
+    Jacquez k nearest neighbors statistic for relabelings of the times of
+    the events
+
+    The nearest neighbors are found once. Under a relabeling the events m
+    and i are time neighbors when the events whose times they took are, so
+    the space neighbor pairs are looked up in the sorted codes of the time
+    neighbor pairs.
+
+    Parameters
+    ----------
+    wk_s : W
+           k nearest neighbors of the events in space
+    wk_t : W
+           k nearest neighbors of the events in time
+
+    Examples
+    --------
+    >>> import pysal
+
+    The events 0 and 1, and 2 and 3, are the nearest neighbors of each other
+    both in space and in time
+
+    >>> wk = pysal.W({0: [1], 1: [0], 2: [3], 3: [2]})
+    >>> stat = JacquezCount(wk, wk)
+    >>> stat(np.array([[0, 0], [1, 2], [2, 1], [3, 3]]))
+    array([4, 0])
+    """
+    def __init__(self, wk_s, wk_t):
+        pairs = wk_s.sparse.tocoo()
+        self.i = pairs.row
+        self.j = pairs.col
+        pairs = wk_t.sparse.tocoo()
+        self.n = n = wk_t.n
+        self.t_codes = np.sort(pairs.row.astype(np.int64) * n + pairs.col)
+
+    def _count(self, ids):
+        """
+        number of space neighbors that are also time neighbors
+        """
+        codes = ids[self.i] * self.n + ids[self.j]
+        pos = np.searchsorted(self.t_codes, codes)
+        pos[pos == len(self.t_codes)] = 0
+        return (self.t_codes[pos] == codes).sum(axis=0)
+
+
+class MantelCorrelation(object):
+    """
+    Standardized Mantel statistic for permutations of the events in the
+    temporal distances
+
+    Neither distance matrix is built. The lower triangles are visited in
+    blocks of rows holding at most BLOCK_SIZE pairs, the moments of the
+    transformed distances are accumulated once and each permutation only
+    needs the cross products of the temporal and centered spatial blocks.
+
+    Parameters
+    ----------
+    s_coords : array
+               nx2 spatial coordinates
+    t_coords : array
+               nx1 temporal coordinates
+    scon     : float
+               constant added to spatial distances
+    spow     : float
+               value for power transformation for spatial distances
+    tcon     : float
+               constant added to temporal distances
+    tpow     : float
+               value for power transformation for temporal distances
+
+    Examples
+    --------
+    >>> s = np.array([[0., 0.], [0., 1.], [5., 5.], [5., 6.]])
+    >>> t = np.array([[0.], [1.], [5.], [6.]])
+    >>> corr = MantelCorrelation(s, t, 0., 1., 0., 1.)
+    >>> corr(np.array([[0, 1], [1, 0], [2, 2], [3, 3]]))
+    array([ 0.98776047,  0.94673756])
+    """
+    def __init__(self, s_coords, t_coords, scon=1.0, spow=-1.0, tcon=1.0,
+                 tpow=-1.0):
+        n = len(t_coords)
+        self.s = np.asarray(s_coords, float).reshape(n, -1)
+        self.t = np.asarray(t_coords, float).reshape(n, -1)
+        self.scon, self.spow = scon, spow
+        self.tcon, self.tpow = tcon, tpow
+        self.npairs = n * (n - 1) / 2
+        ids = np.arange(n)
+        self.smean, self.sstd = self._moments(self.s, ids, scon, spow)
+        self.tmean, self.tstd = self._moments(self.t, ids, tcon, tpow)
+
+    def __call__(self, ids):
+        """
+        Pearson correlation between the transformed spatial distances and
+        the temporal distances of the events ordered by each column of ids
+        (n x b, as permuted ids)
+        """
+        ids = np.asarray(ids).astype(int)
+        n, b = ids.shape
+        rows = np.arange(n)
+        cross = np.zeros(b)
+        for r0, r1 in self._rows(n):
+            ds = self._block(self.s, rows, r0, r1, self.scon, self.spow)
+            ds -= self.smean
+            for c in xrange(b):
+                dt = self._block(self.t, ids[:, c], r0, r1, self.tcon,
+                                 self.tpow)
+                cross[c] += np.dot(dt, ds)
+        return cross / (self.npairs * self.sstd * self.tstd)
+
+    def _rows(self, n):
+        """
+        blocks of rows r0:r1 of the lower triangle, starting at row 1
+        """
+        step = max(1, BLOCK_SIZE // max(1, n))
+        for r0 in xrange(1, n, step):
+            yield r0, min(n, r0 + step)
+
+    def _block(self, x, ids, r0, r1, con, power):
+        """
+        transformed distances between the rows of x[ids] in rows r0:r1 of
+        the lower triangle
+        """
+        xi = x[ids[r0:r1]]
+        xj = x[ids[:r1 - 1]]
+        d = np.sqrt(((xi[:, None, :] - xj[None, :, :]) ** 2).sum(2))
+        lower = np.arange(r0, r1)[:, None] > np.arange(r1 - 1)
+        return (d[lower] + con) ** power
+
+    def _moments(self, x, ids, con, power):
+        """
+        mean and standard deviation of the transformed distances
+        """
+        blocks = [(r0, r1) for r0, r1 in self._rows(len(ids))]
+        mean = sum([self._block(x, ids, r0, r1, con, power).sum()
+                    for r0, r1 in blocks]) / self.npairs
+        ss = sum([((self._block(x, ids, r0, r1, con, power) - mean) ** 2).sum()
+                  for r0, r1 in blocks])
+        return mean, np.sqrt(ss / self.npairs)
+
+
+def _space_pairs(s_coords, delta):
+    """
+    Pairs of events i < j within distance delta of each other in space, as
+    index arrays
+    """
+    kd_s = scipy.spatial.cKDTree(np.asarray(s_coords, float))
+    i, j, d = Distance._pairs_within(kd_s, delta)
+    upper = i < j
+    return i[upper], j[upper]
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -8,10 +8,11 @@ import numpy.linalg as la
 from pysal.spatial_dynamics.ergodic import fmpt, steady_state
 from scipy import stats
 import pysal
+from pysal.esda.permutation import simulate, BLOCK_SIZE
 from operator import gt
 
 __all__ = ["Markov", "LISA_Markov", "Spatial_Markov", "kullback",
-           "prais", "shorrock"]
+           "prais", "shorrock", "SpatialHomogeneity"]
 
 # TT predefine LISA transitions
 # TT[i,j] is the transition type from i to j
@@ -200,6 +201,10 @@ class Spatial_Markov:
                       pooled series. If false, quantiles are taken each
                       time period over n.
 
+    cores           : int
+                      number of processes used to evaluate the permutations,
+                      see pysal.esda.permutation.simulate
+
     Attributes
     ----------
     p               : matrix (k, k)
@@ -386,7 +391,7 @@ class Spatial_Markov:
        and convergence", 34 Geographical Analysis, 33, 195-214.
 
     """
-    def __init__(self, y, w, k=4, permutations=0, fixed=False):
+    def __init__(self, y, w, k=4, permutations=0, fixed=False, cores=1):
 
         self.y = y
         rows, cols = y.shape
@@ -420,18 +425,14 @@ class Spatial_Markov:
         self.x2_dof = dof
 
         if permutations:
-            nrp = np.random.permutation
-            rp = range(permutations)
-            counter = 0
-            x2_realizations = np.zeros((permutations, 1))
-            x2ss = []
-            for perm in range(permutations):
-                T, P, ss, F = self._calc(nrp(y), w, classes, k=k)
-                x2 = [chi2(T[i], self.transitions)[0] for i in range(k)]
-                x2s = sum(x2)
-                x2_realizations[perm] = x2s
-                if x2s >= self.x2:
-                    counter += 1
+            # permutations of the rows of y, only the x2 statistic is
+            # computed for them
+            stat = SpatialHomogeneity(y, w, classes, self.transitions, k=k,
+                                      fixed=fixed)
+            x2_realizations = simulate(stat, np.arange(rows), permutations,
+                                       cores)
+            x2_realizations.shape = (permutations, 1)
+            counter = (x2_realizations >= self.x2).sum()
             self.x2_rpvalue = (counter + 1.0) / (permutations + 1.)
             self.x2_realizations = x2_realizations
 
@@ -614,6 +615,129 @@ def chi2(T1, T2):
     return chi2, pvalue, dof
 
 
+class SpatialHomogeneity(object):
+    """
+    Spatial Markov homogeneity statistic for permutations of the rows of y
+
+    The own classes of the observations do not change under permutation, so
+    the (from, to) part of every transition is coded once. For a block of
+    permuted copies of y the spatial lags are computed with one sparse
+    product, classified into quantiles column by column and the conditional
+    transition counts of all copies are built with a single np.bincount over
+    the (lag class, from, to) codes. Only the x2 statistic is computed, no
+    steady states or first mean passage times.
+
+    Parameters
+    ----------
+    y           : array (n, t)
+                  One row per observation, one column per time period
+    w           : W
+                  spatial weights instance aligned with y
+    classes     : array (n, t)
+                  class of each observation in each period
+    transitions : array (k, k)
+                  counts of the a-spatial transitions, used to form the
+                  probabilities under the null
+    k           : int
+                  number of classes (quantiles)
+    fixed       : boolean
+                  If true, lag quantiles are taken over the entire n*t
+                  pooled series. If false, they are taken each time period
+                  over n.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> f = pysal.open(pysal.examples.get_path("usjoin.csv"))
+    >>> pci = np.array([f.by_col[str(y)] for y in range(1929,2010)])
+    >>> pci = pci.transpose()
+    >>> rpci = pci/(pci.mean(axis=0))
+    >>> w = pysal.open(pysal.examples.get_path("states48.gal")).read()
+    >>> w.transform = 'r'
+    >>> sm = Spatial_Markov(rpci, w, fixed=True, k=5)
+    >>> x2 = SpatialHomogeneity(rpci, w, sm.classes, sm.transitions, k=5,
+    ...                         fixed=True)
+    >>> x2(np.arange(48)[:, None])
+    array([ 200.8911757])
+    """
+    def __init__(self, y, w, classes, transitions, k=4, fixed=False):
+        self.y = np.asarray(y, float)
+        self.sparse = w.sparse
+        self.k = k
+        self.fixed = fixed
+        classes = np.asarray(classes, int)
+        self.own = classes[:, :-1] * k + classes[:, 1:]
+        transitions = np.asarray(transitions, float)
+        # same row normalization as chi2
+        rs = transitions.sum(axis=1)
+        self.p = transitions / (rs + (rs > 0))[:, None]
+
+    def __call__(self, ids):
+        """
+        x2 statistic of y[ids[:, j]] for each column j of ids
+
+        Parameters
+        ----------
+        ids : array (n, b)
+              each column orders the rows of y, as permuted ids
+
+        Returns
+        -------
+        x2  : array (b, )
+              sum of the chi2 values of the conditional transition matrices
+        """
+        ids = np.asarray(ids).astype(int)
+        n, b = ids.shape
+        t = self.y.shape[1]
+        # permuted copies held in memory at once
+        step = max(1, BLOCK_SIZE // max(1, n * t))
+        return np.concatenate([self._x2(ids[:, j:j + step])
+                               for j in xrange(0, b, step)])
+
+    def _x2(self, ids):
+        n, b = ids.shape
+        t = self.y.shape[1]
+        k = self.k
+        ly = self.sparse * self.y[ids].reshape(n, b * t)
+        if self.fixed:
+            ly = ly.reshape(n, b, t).transpose(2, 0, 1).reshape(n * t, b)
+            lc = _quantile_classes(ly, k).reshape(t, n, b).transpose(1, 2, 0)
+        else:
+            lc = _quantile_classes(ly, k).reshape(n, b, t)
+        codes = lc[:, :, :-1] * (k * k) + self.own[:, None, :]
+        codes += (k ** 3) * np.arange(b)[None, :, None]
+        T = np.bincount(codes.ravel(), minlength=b * k ** 3)
+        T = T.reshape(b, k, k, k).astype(float)
+        E = T.sum(axis=3)[:, :, :, None] * self.p
+        x2 = (T - E) ** 2 / (E + (E == 0))
+        return x2.reshape(b, -1).sum(axis=1)
+
+
+def _quantile_classes(x, k):
+    """
+    pysal.Quantiles(x[:, j], k=k).yb for every column j of x
+
+    Quantiles that repeat collapse into a single class, as in
+    pysal.esda.mapclassify.quantile, whose cut points are computed the same
+    way, with stats.scoreatpercentile, so that values equal to a cut point
+    fall in the same class.
+    """
+    w = 100. / k
+    p = np.arange(w, 100 + w, w)
+    if p[-1] > 100.0:
+        p[-1] = 100.0
+    cuts = stats.scoreatpercentile(x, list(p), axis=0).reshape(len(p), -1)
+    yb = np.zeros(x.shape, int)
+    prev = None
+    for q in cuts:
+        if prev is None:
+            yb += x > q
+        else:
+            yb += (x > q) * (q != prev)
+        prev = q
+    return yb
+
+
 class LISA_Markov(Markov):
     """
     Markov for Local Indicators of Spatial Association
@@ -845,11 +969,6 @@ class LISA_Markov(Markov):
         Markov.__init__(self, q, classes)
         self.q = q
         self.w = w
-        n, k = q.shape
-        k -= 1
-        self.significance_level = significance_level
-        move_types = np.zeros((n, k), int)
-        sm = np.zeros((n, k), int)
         self.significance_level = significance_level
         if permutations > 0:
             p = np.array([mli.p_z_sim for mli in ml]).transpose()
@@ -857,15 +976,11 @@ class LISA_Markov(Markov):
             pb = p <= significance_level
         else:
             pb = np.zeros_like(y.T)
-        for t in range(k):
-            origin = q[:, t]
-            dest = q[:, t + 1]
-            p_origin = pb[:, t]
-            p_dest = pb[:, t]
-            for r in range(n):
-                move_types[r, t] = TT[origin[r], dest[r]]
-                key = (origin[r], dest[r], p_origin[r], p_dest[r])
-                sm[r, t] = MOVE_TYPES[key]
+        # lookup of TT and MOVE_TYPES for all (observation, period) pairs
+        move_types = TT[q[:, :-1], q[:, 1:]]
+        p_origin = pb[:, :-1].astype(bool)
+        p_dest = pb[:, :-1].astype(bool)
+        sm = move_types + 16 * (2 * (~p_origin) + (~p_dest))
         if permutations > 0:
             self.significant_moves = sm
         self.move_types = move_types
@@ -874,7 +989,7 @@ class LISA_Markov(Markov):
 
         ybar = y.mean(axis=0)
         r = y / ybar
-        ylag = np.array([pysal.lag_spatial(w, yt) for yt in y])
+        ylag = pysal.lag_spatial(w, y.T).T
         rlag = ylag / ybar
         rc = r < 1.
         rlagc = rlag < 1.
@@ -10,8 +10,10 @@ import pysal
 import numpy as np
 import scipy as sp
 from numpy.random import permutation as NRP
+from pysal.esda.permutation import simulate, BLOCK_SIZE
 
-__all__ = ['SpatialTau', 'Tau', 'Theta', ]
+__all__ = ['SpatialTau', 'Tau', 'Theta', 'RegimeRankChange',
+           'NeighborConcordance']
 
 
 class Theta:
@@ -36,6 +38,9 @@ class Theta:
     permutations : int
                    number of random spatial permutations to generate for
                    computationally based inference
+    cores        : int
+                   number of processes used to evaluate the permutations, see
+                   pysal.esda.permutation.simulate
 
     Attributes
     ----------
@@ -87,7 +92,7 @@ class Theta:
     512
     >>>
     """
-    def __init__(self, y, regime, permutations=999):
+    def __init__(self, y, regime, permutations=999, cores=1):
         ranks = rankdata(y, axis=0)
         self.ranks = ranks
         n, k = y.shape
@@ -97,13 +102,12 @@ class Theta:
         self.regimes = regimes
         self.total = sum(abs(ranks_d))
         self.max_total = sum([abs(i - n + i - 1) for i in range(1, n + 1)])
-        self._calc(regime)
-        self.theta = self._calc(regime)
+        stat = RegimeRankChange(ranks_d, regime)
+        self.theta = stat(stat.codes[:, None])[0]
         self.permutations = permutations
         if permutations:
-            np.perm = np.random.permutation
-            sim = np.array([self._calc(
-                np.perm(regime)) for i in xrange(permutations)])
+            # permutations of the regime labels, evaluated in blocks
+            sim = simulate(stat, stat.codes, permutations, cores)
             self.theta.shape = (1, len(self.theta))
             sim = np.concatenate((self.theta, sim))
             self.sim = sim
@@ -113,9 +117,70 @@ class Theta:
             self.z = (sim[0] - sim.mean(axis=0)) / sim.std(axis=0)
 
     def _calc(self, regime):
-        within = [abs(
-            sum(self.ranks_d[regime == reg])) for reg in self.regimes]
-        return np.array(sum(within) / self.total)
+        stat = RegimeRankChange(self.ranks_d, regime)
+        return stat(stat.codes[:, None])[0]
+
+
+class RegimeRankChange(object):
+    """
+    Theta statistic for relabelings of the regimes
+
+    The regimes are coded as integers once, and the within regime sums of
+    rank changes of a block of b relabelings are reduced together with one
+    np.bincount per interval.
+
+    Parameters
+    ----------
+    ranks_d : array (n, k-1)
+              rank changes of the n observations in each interval
+    regime  : array (n,)
+              values corresponding to which regime each observation belongs
+              to
+
+    Attributes
+    ----------
+    codes   : array (n,)
+              integer code of the regime of each observation
+
+    Examples
+    --------
+    >>> ranks_d = np.array([[1., -1.], [2., 0.], [-2., 1.], [-1., 0.]])
+    >>> stat = RegimeRankChange(ranks_d, np.array(['a', 'a', 'b', 'b']))
+    >>> stat(np.array([[0, 0], [0, 1], [1, 0], [1, 1]]))
+    array([[ 1.        ,  1.        ],
+           [ 0.33333333,  0.        ]])
+    """
+    def __init__(self, ranks_d, regime):
+        self.ranks_d = np.asarray(ranks_d, float)
+        regimes, self.codes = np.unique(regime, return_inverse=True)
+        self.g = len(regimes)
+        self.total = np.abs(self.ranks_d).sum(axis=0)
+
+    def __call__(self, codes):
+        """
+        Theta of the regimes in each column of codes
+
+        Parameters
+        ----------
+        codes : array (n, b)
+                each column holds a regime code for every observation, as
+                permuted codes
+
+        Returns
+        -------
+        theta : array (b, k-1)
+                theta statistic, one row per column of codes
+        """
+        codes = np.asarray(codes).astype(int)
+        n, b = codes.shape
+        g = self.g
+        labels = (codes + g * np.arange(b)).ravel()
+        theta = np.empty((b, self.ranks_d.shape[1]))
+        for c in xrange(self.ranks_d.shape[1]):
+            within = np.bincount(labels, np.repeat(self.ranks_d[:, c], b),
+                                 g * b)
+            theta[:, c] = np.abs(within.reshape(b, g)).sum(axis=1)
+        return theta / self.total
 
 
 class Tau:
@@ -295,6 +360,9 @@ class SpatialTau:
     permutations : int
                    number of random spatial permutations for computationally
                    based inference
+    cores        : int
+                   number of processes used to evaluate the permutations, see
+                   pysal.esda.permutation.simulate
 
     Attributes
     ----------
@@ -368,7 +436,7 @@ class SpatialTau:
     '   0.572    0.579    0.280'
     """
 
-    def __init__(self, x, y, w, permutations=0):
+    def __init__(self, x, y, w, permutations=0, cores=1):
 
         w.transform = 'b'
         self.n = len(x)
@@ -379,52 +447,99 @@ class SpatialTau:
         self.discordant = res.discordant
         self.extraX = res.extraX
         self.extraY = res.extraY
-        res = self._calc(x, y, w)
-        self.tau_spatial = res[0]
+        stat = NeighborConcordance(x, y, w)
+        res = stat.counts(np.arange(self.n)[:, None])
+        self.tau_spatial = res[0][0]
         self.pairs_spatial = int(w.s0 / 2.)
-        self.concordant_spatial = res[1]
-        self.discordant_spatial = res[2]
+        self.concordant_spatial = res[1][0]
+        self.discordant_spatial = res[2][0]
 
         if permutations > 0:
-            taus = np.zeros(permutations)
-            ids = np.arange(self.n)
-            for r in xrange(permutations):
-                rids = np.random.permutation(ids)
-                taus[r] = self._calc(x[rids], y[rids], w)[0]
+            # permutations of the ids, the same one for x and y
+            taus = simulate(stat, np.arange(self.n), permutations, cores)
             self.taus = taus
             self.tau_spatial_psim = pseudop(taus, self.tau_spatial,
                                             permutations)
 
     def _calc(self, x, y, w):
-        n1 = n2 = iS = gc = 0
-        ijs = {}
-        for i in w.id_order:
-            xi = x[i]
-            yi = y[i]
-            for j in w.neighbors[i]:
-                if i < j:
-                    ijs[(i, j)] = (i, j)
-                    xj = x[j]
-                    yj = y[j]
-                    dx = xi - xj
-                    dy = yi - yj
-                    dxdy = dx * dy
-                    if dxdy != 0:
-                        n1 += 1
-                        n2 += 2
-                        if dxdy > 0.0:
-                            gc += 1
-                            iS += 1
-                        else:
-                            iS -= 1
-                    else:
-                        if dx != 0.0:
-                            n1 += 1
-                        if dy != 0.0:
-                            n2 += 1
+        stat = NeighborConcordance(x, y, w)
+        return [r[0] for r in stat.counts(np.arange(len(x))[:, None])]
+
+
+class NeighborConcordance(object):
+    """
+    Spatial tau for permutations of the observations
+
+    The neighbor pairs (i<j) are extracted once from w.sparse, and the
+    concordance of all pairs of a block of permuted copies of x and y is
+    evaluated with array sign products.
+
+    Parameters
+    ----------
+    x : array (n,)
+        first variable
+    y : array (n,)
+        second variable
+    w : W
+        spatial weights object aligned with x and y
+
+    Examples
+    --------
+    >>> import pysal
+    >>> w = pysal.lat2W(2, 2)
+    >>> stat = NeighborConcordance(np.array([1., 2, 3, 4]),
+    ...                            np.array([1., 3, 2, 4]), w)
+    >>> stat(np.array([[0, 1], [1, 0], [2, 2], [3, 3]]))
+    array([ 0.70710678,  0.35355339])
+    """
+    def __init__(self, x, y, w):
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        pairs = w.sparse.tocoo()
+        upper = pairs.row < pairs.col
+        self.i = pairs.row[upper]
+        self.j = pairs.col[upper]
+
+    def __call__(self, ids):
+        """
+        tau_spatial of x[ids[:, c]] and y[ids[:, c]] for each column c of ids
+
+        Parameters
+        ----------
+        ids : array (n, b)
+              each column orders the observations, as permuted ids
+
+        Returns
+        -------
+        taus : array (b, )
+        """
+        return self.counts(ids)[0]
+
+    def counts(self, ids):
+        """
+        tau_spatial, concordant and discordant neighbor pairs for each
+        column of ids
+        """
+        ids = np.asarray(ids).astype(int)
+        b = ids.shape[1]
+        # permuted copies of the pairs held in memory at once
+        step = max(1, BLOCK_SIZE // max(1, len(self.i)))
+        res = [self._counts(ids[:, c:c + step]) for c in xrange(0, b, step)]
+        return [np.concatenate(r) for r in zip(*res)]
+
+    def _counts(self, ids):
+        xp = self.x[ids]
+        yp = self.y[ids]
+        dx = xp[self.i] - xp[self.j]
+        dy = yp[self.i] - yp[self.j]
+        dxdy = dx * dy
+        paired = (dxdy != 0).sum(axis=0)
+        gc = (dxdy > 0).sum(axis=0)
+        iS = 2 * gc - paired
+        n1 = (dx != 0).sum(axis=0)
+        n2 = paired + (dy != 0).sum(axis=0)
         tau_g = iS / (np.sqrt(n1) * np.sqrt(n2))
-        gd = gc - iS
-        return [tau_g, gc, gd]
+        return tau_g, gc, gc - iS
 
 
 def pseudop(sim, observed, nperm):
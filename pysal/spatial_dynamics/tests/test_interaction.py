@@ -26,6 +26,23 @@ class Knox_Tester(unittest.TestCase):
             self.events.t, delta=20, tau=5, permutations=1)
         self.assertEquals(result['stat'], 13.0)
 
+    def test_knox_count(self):
+        s, t = self.events.space, self.events.t
+        pairs = np.array(list(pysal.cg.KDTree(s).query_pairs(20)))
+        stat = interaction.KnoxCount(pairs[:, 0], pairs[:, 1], t, 5)
+        np.random.seed(100)
+        ids = np.array([np.random.permutation(len(t)) for r in range(20)]).T
+        counts = stat(ids)
+        # time neighbors among the space neighbors of each relabeling
+        for r in range(20):
+            tp = t[ids[:, r]]
+            d_t = (tp[pairs[:, 0]] - tp[pairs[:, 1]]) ** 2
+            self.assertEquals(counts[r], (d_t <= 25).sum())
+        # the times of the events are not shuffled in place
+        t0 = t.copy()
+        interaction.knox(s, t, delta=20, tau=5, permutations=9)
+        np.testing.assert_array_equal(t, t0)
+
 
 class Mantel_Tester(unittest.TestCase):
     def setUp(self):
@@ -37,6 +54,20 @@ class Mantel_Tester(unittest.TestCase):
                 self.events.time, 1, scon=0.0, spow=1.0, tcon=0.0, tpow=1.0)
         self.assertAlmostEquals(result['stat'], 0.014154, 6)
 
+    def test_mantel_correlation(self):
+        # same as the correlation of the lower triangles of the full
+        # distance matrices
+        s = self.events.space[:40]
+        t = self.events.t[:40]
+        ids = np.random.permutation(40)
+        corr = interaction.MantelCorrelation(s, t, 1.0, -1.0, 1.0, -1.0)
+        sdist = pysal.cg.distance_matrix(s)
+        tdist = pysal.cg.distance_matrix(t[ids])
+        lower = np.tril_indices(40, -1)
+        r = np.corrcoef((sdist[lower] + 1.0) ** -1,
+                        (tdist[lower] + 1.0) ** -1)[0, 1]
+        self.assertAlmostEquals(corr(ids[:, None])[0], r, 10)
+
 
 class Jacquez_Tester(unittest.TestCase):
     def setUp(self):
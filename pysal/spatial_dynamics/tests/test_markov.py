@@ -53,6 +53,59 @@ class test_Spatial_Markov(unittest.TestCase):
             [0.01776781, 0.19964349, 0.19009833, 0.25524697, 0.3372434]])
         np.testing.assert_array_almost_equal(S, sm.S)
 
+    def test_quantile_classes(self):
+        f = pysal.open(pysal.examples.get_path('usjoin.csv'))
+        pci = np.array([f.by_col[str(y)] for y in range(1929, 2010)])
+        rpci = pci.transpose() / (pci.transpose().mean(axis=0))
+        w = pysal.open(pysal.examples.get_path("states48.gal")).read()
+        w.transform = 'r'
+        ly = pysal.lag_spatial(w, rpci)
+        # ties on the cut points, and quantiles that repeat
+        ties = np.repeat(np.arange(12.), 4).reshape(48, 1)
+        ties[:30] = 0.
+        for x in [ly, ly.reshape(-1, 1), ties]:
+            yb = markov._quantile_classes(x, 5)
+            for j in range(x.shape[1]):
+                np.testing.assert_array_equal(
+                    yb[:, j], pysal.Quantiles(x[:, j], k=5).yb)
+
+    def test_observed(self):
+        f = pysal.open(pysal.examples.get_path('usjoin.csv'))
+        pci = np.array([f.by_col[str(y)] for y in range(1929, 2010)])
+        rpci = pci.transpose() / (pci.transpose().mean(axis=0))
+        w = pysal.open(pysal.examples.get_path("states48.gal")).read()
+        w.transform = 'r'
+        for fixed in (True, False):
+            sm = pysal.Spatial_Markov(rpci, w, fixed=fixed, k=5)
+            x2 = markov.SpatialHomogeneity(rpci, w, sm.classes,
+                                           sm.transitions, k=5, fixed=fixed)
+            self.assertAlmostEqual(x2(np.arange(48)[:, None])[0], sm.x2, 10)
+
+    def test_permutations(self):
+        f = pysal.open(pysal.examples.get_path('usjoin.csv'))
+        pci = np.array([f.by_col[str(y)] for y in range(1929, 2010)])
+        pci = pci.transpose()
+        rpci = pci / (pci.mean(axis=0))
+        w = pysal.open(pysal.examples.get_path("states48.gal")).read()
+        w.transform = 'r'
+        for fixed in (True, False):
+            sm = pysal.Spatial_Markov(rpci, w, fixed=fixed, k=5)
+            x2 = markov.SpatialHomogeneity(rpci, w, sm.classes,
+                                           sm.transitions, k=5, fixed=fixed)
+            ids = np.arange(48)
+            np.testing.assert_array_almost_equal(x2(ids[:, None]), [sm.x2])
+            # each permutation of a block of rows matches the full
+            # computation
+            np.random.seed(10)
+            perms = np.array([np.random.permutation(ids)
+                              for r in range(5)]).T
+            expected = []
+            for r in range(5):
+                T = sm._calc(rpci[perms[:, r]], w, sm.classes, k=5)[0]
+                expected.append(sum([markov.chi2(Ti, sm.transitions)[0]
+                                     for Ti in T]))
+            np.testing.assert_array_almost_equal(x2(perms), expected)
+
 
 class test_chi2(unittest.TestCase):
     def test_chi2(self):
@@ -4,6 +4,30 @@ from pysal.spatial_dynamics import rank
 import numpy as np
 
 
+def _tau_loop(x, y, w):
+    """ spatial tau by a direct loop over the neighbor pairs """
+    n1 = n2 = iS = gc = 0
+    for i in w.id_order:
+        for j in w.neighbors[i]:
+            if i < j:
+                dx = x[i] - x[j]
+                dy = y[i] - y[j]
+                if dx * dy != 0:
+                    n1 += 1
+                    n2 += 2
+                    if dx * dy > 0.0:
+                        gc += 1
+                        iS += 1
+                    else:
+                        iS -= 1
+                else:
+                    if dx != 0.0:
+                        n1 += 1
+                    if dy != 0.0:
+                        n2 += 1
+    return [iS / (np.sqrt(n1) * np.sqrt(n2)), gc, gc - iS]
+
+
 class Theta_Tester(unittest.TestCase):
     def setUp(self):
         f = pysal.open(pysal.examples.get_path('mexico.csv'))
@@ -30,6 +54,20 @@ class Theta_Tester(unittest.TestCase):
             self.assertAlmostEqual(exp[i], obs[i])
         self.assertEqual(t.max_total, 512)
 
+    def test_kernel(self):
+        t = rank.Theta(self.y, self.regime, 0)
+        stat = rank.RegimeRankChange(t.ranks_d, self.regime)
+        np.random.seed(10)
+        perms = np.array([np.random.permutation(stat.codes)
+                          for r in range(20)]).T
+        thetas = stat(perms)
+        # within regime sums of the rank changes by a loop over the regimes
+        for r in range(20):
+            regime = t.regimes[perms[:, r]]
+            within = [abs(sum(t.ranks_d[regime == reg])) for reg in t.regimes]
+            np.testing.assert_array_almost_equal(thetas[r],
+                                                 sum(within) / t.total)
+
 
 class SpatialTau_Tester(unittest.TestCase):
     def setUp(self):
@@ -52,6 +90,19 @@ class SpatialTau_Tester(unittest.TestCase):
             self.assertAlmostEqual(ev_tau_s[i], obs[i].taus.mean(), 3)
             self.assertAlmostEqual(p_vals[i], obs[i].tau_spatial_psim, 3)
 
+    def test_kernel(self):
+        x, y = self.y[:, 0], self.y[:, 1]
+        self.w.transform = 'b'
+        stat = rank.NeighborConcordance(x, y, self.w)
+        np.random.seed(12345)
+        ids = np.array([np.random.permutation(len(x))
+                        for r in range(20)]).T
+        taus, gcs, gds = stat.counts(ids)
+        for r in range(20):
+            tau, gc, gd = _tau_loop(x[ids[:, r]], y[ids[:, r]], self.w)
+            self.assertAlmostEqual(taus[r], tau)
+            self.assertEqual((gcs[r], gds[r]), (gc, gd))
+
 
 class Tau_Tester(unittest.TestCase):
     def test_Tau(self):
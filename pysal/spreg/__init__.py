@@ -14,3 +14,8 @@ from error_sp_regimes import *
 from error_sp_het_regimes import *
 from error_sp_hom_regimes import *
 from probit import *
+from ml_lag import *
+from ml_error import *
+from batch import *
+from stream import *
+from impacts import *
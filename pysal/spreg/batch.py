@@ -0,0 +1,1237 @@
+"""
+Batch estimation of one specification over many dependent variables and
+subsets of the regressors.
+"""
+
+import numpy as np
+import numpy.linalg as la
+from scipy import stats
+from scipy.stats.stats import chisqprob
+import ols as OLS
+import twosls_sp as TSLS_SP
+import error_sp as ERROR_SP
+import user_output as USER
+import summary_output as SUMMARY
+from utils import optim_moments, sp_att, set_warn
+from pysal.weights.weights import sparse_moments
+
+__all__ = ["OLS_Batch", "GM_Lag_Batch", "GM_Error_Batch"]
+
+
+class BatchProps:
+    """
+    Helper class that gives access to the regressions of a batch. It takes
+    no parameters. See OLS_Batch for example usage.
+
+    Attributes
+    ----------
+    summary : string
+              Summaries of all the regressions of the batch, built the first
+              time the attribute is accessed (note: use in conjunction with
+              the print command)
+
+    """
+
+    def model(self, j, s=0):
+        """
+        Regression of dependent variable j on subset s of the regressors,
+        with its summary
+
+        The regression object is built from the estimates of the batch, the
+        first time it is asked for, instead of being fitted again.
+
+        Parameters
+        ----------
+        j       : integer
+                  Column of the dependent variable in y
+        s       : integer
+                  Position of the subset of the regressors in subsets
+
+        Returns
+        -------
+        reg     : regression object
+                  Object with the attributes and summary of the
+                  corresponding single regression class (OLS, GM_Lag or
+                  GM_Error)
+
+        """
+        if (j, s) not in self._models:
+            self._models[j, s] = self._model_class(self, j, s)
+        return self._models[j, s]
+
+    @property
+    def summary(self):
+        if 'summary' not in self._cache:
+            summaries = [self.model(j, s).summary
+                         for s in range(len(self.subsets))
+                         for j in range(self.m)]
+            self._cache['summary'] = '\n'.join(summaries)
+        return self._cache['summary']
+
+
+class BaseOLS_Batch(BatchProps):
+    """
+    Ordinary least squares of many dependent variables on subsets of the
+    same regressors (note: no consistency checks, diagnostics or constant
+    added)
+
+    X'X is computed once for all the regressions and inverted once per
+    subset, and all the dependent variables are solved together with
+    matrix products.
+
+    Parameters
+    ----------
+    y            : array
+                   nxm array with one column for each dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    subsets      : list
+                   Arrays with the columns of x in each subset of the
+                   regressors. Default set to None, a single subset with
+                   all the columns of x.
+    w            : Sparse matrix
+                   Spatial weights sparse matrix, used only for the spatial
+                   diagnostics
+    sig2n_k      : boolean
+                   If True, then use n-k to estimate sigma^2. If False, use n.
+    spat_diag    : boolean
+                   If True, then compute the Lagrange Multiplier tests of
+                   spatial dependence (requires w).
+
+    Attributes
+    ----------
+    betas        : array
+                   sxmxK array of estimated coefficients, one row for each
+                   subset and dependent variable, one column for each
+                   column of x. The coefficients of the columns not in a
+                   subset are nan.
+    std_err      : array
+                   sxmxK array of the standard errors of betas
+    t_stat       : array
+                   sxmxKx2 array of the t statistics of betas and their
+                   p-values
+    utu          : array
+                   sxm array of the sums of squared residuals
+    sig2         : array
+                   sxm array of the sigma squared used in computations
+    r2           : array
+                   sxm array of the R squared
+    ar2          : array
+                   sxm array of the adjusted R squared
+    lm_error     : array
+                   sxmx2 array of the LM error test statistics and their
+                   p-values (only if spat_diag is True)
+    lm_lag       : array
+                   sxmx2 array of the LM lag test statistics and their
+                   p-values (only if spat_diag is True)
+    rlm_error    : array
+                   sxmx2 array of the robust LM error test statistics and
+                   their p-values (only if spat_diag is True)
+    rlm_lag      : array
+                   sxmx2 array of the robust LM lag test statistics and
+                   their p-values (only if spat_diag is True)
+    lm_sarma     : array
+                   sxmx2 array of the LM SARMA test statistics and their
+                   p-values (only if spat_diag is True)
+    n            : integer
+                   Number of observations
+    m            : integer
+                   Number of dependent variables
+    k            : array
+                   Number of variables for which coefficients are estimated
+                   (including the constant) in each subset
+    subsets      : list
+                   Arrays with the columns of x in each subset
+    y            : array
+                   nxm array of dependent variables
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> y = np.array([db.by_col(name) for name in ['CRIME', 'HOVAL']]).T
+    >>> X = np.array([db.by_col(name) for name in ['INC', 'DISCBD']]).T
+    >>> X = np.hstack((np.ones((49, 1)), X))
+    >>> ols = BaseOLS_Batch(y, X, subsets=[np.array([0, 1]), np.arange(3)])
+    >>> ols.betas[1, 0]
+    array([ 68.37566311,  -1.1507089 ,  -5.85737382])
+    >>> ols.betas[0, 1]
+    array([ 15.17070179,   1.61847804,          nan])
+    """
+
+    def __init__(self, y, x, subsets=None, w=None, sig2n_k=True,
+                 spat_diag=False):
+        self.y = y
+        self.x = x
+        self.n, self.m = y.shape
+        if subsets is None:
+            subsets = [np.arange(x.shape[1])]
+        self.subsets = subsets
+        self.k = np.array([len(cols) for cols in subsets])
+        shape = (len(subsets), self.m)
+        self.betas = np.empty(shape + (x.shape[1], ))
+        self.betas.fill(np.nan)
+        self.std_err = self.betas.copy()
+        self.t_stat = np.empty(shape + (x.shape[1], 2))
+        self.t_stat.fill(np.nan)
+        self.utu = np.zeros(shape)
+        self.sig2 = np.zeros(shape)
+        self.r2 = np.zeros(shape)
+        self.ar2 = np.zeros(shape)
+        self._xtx = np.dot(x.T, x)
+        self._xtxi = []
+        xty = np.dot(x.T, y)
+        ss_tot = ((y - y.mean(0)) ** 2).sum(0)
+        if spat_diag:
+            for test in ['lm_error', 'lm_lag', 'rlm_error', 'rlm_lag',
+                         'lm_sarma']:
+                setattr(self, test, np.zeros(shape + (2, )))
+            wx = w * x
+            wy = w * y
+            xtwx = np.dot(x.T, wx)
+            t = sparse_moments(w)['trcWtW_WW']
+        for s, cols in enumerate(subsets):
+            n, k = self.n, len(cols)
+            xtxi = la.inv(self._xtx[np.ix_(cols, cols)])
+            betas = np.dot(xtxi, xty[cols])
+            u = y - np.dot(x[:, cols], betas)
+            utu = (u ** 2).sum(0)
+            if sig2n_k:
+                sig2 = utu / (n - k)
+            else:
+                sig2 = utu / n
+            std_err = np.sqrt(np.outer(xtxi.diagonal(), sig2))
+            t_stat = betas / std_err
+            self._xtxi.append(xtxi)
+            self.betas[s][:, cols] = betas.T
+            self.std_err[s][:, cols] = std_err.T
+            self.t_stat[s][:, cols, 0] = t_stat.T
+            self.t_stat[s][:, cols, 1] = stats.t.sf(abs(t_stat), n - k).T * 2
+            self.utu[s] = utu
+            self.sig2[s] = sig2
+            self.r2[s] = 1 - utu / ss_tot
+            self.ar2[s] = 1 - (1 - self.r2[s]) * (n - 1) / (n - k)
+            if spat_diag:
+                # the lags of the predictions and residuals follow from the
+                # lags of x and y, without a sparse product per subset
+                wxb = np.dot(wx[:, cols], betas)
+                sig2n = utu / n
+                utwuDs = (u * (wy - wxb)).sum(0) / sig2n
+                utwyDs = (u * wy).sum(0) / sig2n
+                xwxb = np.dot(xtwx[np.ix_(cols, cols)], betas)
+                num = (wxb ** 2).sum(0) - (xwxb * np.dot(xtxi, xwxb)).sum(0)
+                nj = num / sig2n + t
+                lm_error = utwuDs ** 2 / t
+                rlm_lag = (utwyDs - utwuDs) ** 2 / (nj - t)
+                lms = {'lm_error': (lm_error, 1),
+                       'lm_lag': (utwyDs ** 2 / nj, 1),
+                       'rlm_error': ((utwuDs - t * utwyDs / nj) ** 2 /
+                                     (t * (1. - t / nj)), 1),
+                       'rlm_lag': (rlm_lag, 1),
+                       'lm_sarma': (rlm_lag + lm_error, 2)}
+                for test in lms:
+                    lm, df = lms[test]
+                    getattr(self, test)[s] = np.column_stack(
+                        (lm, chisqprob(lm, df)))
+        self._cache = {}
+        self._models = {}
+
+
+class OLS_Batch(BaseOLS_Batch):
+    """
+    Ordinary least squares of many dependent variables on subsets of the
+    same regressors, with results and diagnostics.
+
+    The cross products of the regressors and their spatial lags are
+    computed once, each subset of the regressors is factorized once, and
+    all the dependent variables are solved together with matrix products.
+    The results of all the regressions are held in arrays; the regression
+    object of any of them, with its summary and the diagnostics that are
+    not computed in batch, is built on demand by the model method.
+
+    Parameters
+    ----------
+    y            : array
+                   nxm array with one column for each dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, excluding the constant
+    w            : pysal W object
+                   Spatial weights object (required if running spatial
+                   diagnostics)
+    subsets      : list
+                   Lists with the columns of x (excluding the constant) of
+                   each subset of the regressors; the constant is added to
+                   all the subsets. Default set to None, a single subset with
+                   all the columns of x.
+    sig2n_k      : boolean
+                   If True, then use n-k to estimate sigma^2. If False, use n.
+    nonspat_diag : boolean
+                   If True, then compute non-spatial diagnostics in the
+                   summaries of the regressions
+    spat_diag    : boolean
+                   If True, then compute Lagrange multiplier tests (requires
+                   w)
+    vm           : boolean
+                   If True, include variance-covariance matrix in the
+                   summaries
+    name_y       : list of strings
+                   Names of the dependent variables for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    Attributes
+    ----------
+    summary      : string
+                   Summaries of all the regressions, built the first time
+                   the attribute is accessed (note: use in conjunction with
+                   the print command)
+    betas        : array
+                   sxmxK array of estimated coefficients, one row for each
+                   subset and dependent variable, one column for each
+                   variable in name_x. The coefficients of the variables not
+                   in a subset are nan.
+    std_err      : array
+                   sxmxK array of the standard errors of betas
+    t_stat       : array
+                   sxmxKx2 array of the t statistics of betas and their
+                   p-values
+    utu          : array
+                   sxm array of the sums of squared residuals
+    sig2         : array
+                   sxm array of the sigma squared used in computations
+    r2           : array
+                   sxm array of the R squared
+    ar2          : array
+                   sxm array of the adjusted R squared
+    lm_error     : array
+                   sxmx2 array of the LM error test statistics and their
+                   p-values (only if spat_diag is True)
+    lm_lag       : array
+                   sxmx2 array of the LM lag test statistics and their
+                   p-values (only if spat_diag is True)
+    rlm_error    : array
+                   sxmx2 array of the robust LM error test statistics and
+                   their p-values (only if spat_diag is True)
+    rlm_lag      : array
+                   sxmx2 array of the robust LM lag test statistics and
+                   their p-values (only if spat_diag is True)
+    lm_sarma     : array
+                   sxmx2 array of the LM SARMA test statistics and their
+                   p-values (only if spat_diag is True)
+    n            : integer
+                   Number of observations
+    m            : integer
+                   Number of dependent variables
+    k            : array
+                   Number of variables for which coefficients are estimated
+                   (including the constant) in each subset
+    subsets      : list
+                   Arrays with the columns of x, including the constant, in
+                   each subset
+    y            : array
+                   nxm array of dependent variables
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    title        : string
+                   Name of the regression method used
+    name_y       : list of strings
+                   Names of the dependent variables for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+
+    Each column of y is a dependent variable
+
+    >>> y = np.array([db.by_col(name) for name in ['CRIME', 'HOVAL']]).T
+    >>> X = np.array([db.by_col(name) for name in ['INC', 'DISCBD']]).T
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+
+    Fit both dependent variables on INC alone and on INC and DISCBD
+
+    >>> ols = OLS_Batch(y, X, w, subsets=[[0], [0, 1]], spat_diag=True, name_y=['crime', 'hoval'], name_x=['inc', 'discbd'], name_ds='columbus')
+    >>> ols.betas.shape
+    (2, 2, 3)
+
+    The coefficients of the regression of crime on both variables, with a
+    nan for the variables left out of a subset
+
+    >>> ols.betas[1, 0]
+    array([ 68.37566311,  -1.1507089 ,  -5.85737382])
+    >>> ols.betas[0, 1]
+    array([ 15.17070179,   1.61847804,          nan])
+    >>> np.around(ols.r2, 4)
+    array([[ 0.4838,  0.2499],
+           [ 0.6472,  0.3034]])
+
+    The LM error test, and its p-value, of each regression
+
+    >>> np.around(ols.lm_error[:, :, 0], 4)
+    array([[ 3.1371,  1.5608],
+           [ 0.0929,  1.2931]])
+
+    The full regression object of any of them is built on demand
+
+    >>> reg = ols.model(0, s=1)
+    >>> reg.name_x
+    ['CONSTANT', 'inc', 'discbd']
+    >>> round(reg.r2, 4)
+    0.6472
+    """
+
+    def __init__(self, y, x, w=None, subsets=None, sig2n_k=True,
+                 nonspat_diag=True, spat_diag=False, vm=False, name_y=None,
+                 name_x=None, name_w=None, name_ds=None):
+
+        n = USER.check_arrays(x)
+        _check_y(y, n)
+        USER.check_weights(w, y)
+        USER.check_spat_diag(spat_diag, w)
+        x_constant = USER.check_constant(x)
+        wsparse = None
+        if spat_diag:
+            wsparse = w.sparse
+        BaseOLS_Batch.__init__(self, y=y, x=x_constant,
+                               subsets=_set_subsets(subsets, x),
+                               w=wsparse, sig2n_k=sig2n_k,
+                               spat_diag=spat_diag)
+        self.w = w
+        self.title = "ORDINARY LEAST SQUARES"
+        self.name_ds = USER.set_name_ds(name_ds)
+        self.name_y = _set_name_y(name_y, y)
+        self.name_x = USER.set_name_x(name_x, x)
+        self.name_w = USER.set_name_w(name_w, w)
+        self._model_class = _OLS_Model
+        self._summary_opts = {'vm': vm, 'nonspat_diag': nonspat_diag,
+                              'spat_diag': spat_diag}
+
+
+class BaseGM_Lag_Batch(BatchProps):
+    """
+    Spatial two stage least squares (S2SLS) of many dependent variables on
+    subsets of the same regressors (note: no consistency checks,
+    diagnostics or constant added); Anselin (1988) [1]_
+
+    The spatial lags of the regressors, the instruments and their cross
+    products are computed once for all the regressions. H'H is inverted
+    once per subset and, since the regressors only differ across dependent
+    variables by the spatial lag of y, the coefficients of all of them
+    follow from a partitioned inverse with a block shared by the whole
+    subset.
+
+    Parameters
+    ----------
+    y            : array
+                   nxm array with one column for each dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    w            : Sparse matrix
+                   Spatial weights sparse matrix
+    subsets      : list
+                   Arrays with the columns of x in each subset of the
+                   regressors, the constant (first column) included. Default
+                   set to None, a single subset with all the columns of x.
+    w_lags       : integer
+                   Orders of W to include as instruments for the spatially
+                   lagged dependent variable. For example, w_lags=1, then
+                   instruments are WX; if w_lags=2, then WX, WWX; and so on.
+    sig2n_k      : boolean
+                   If True, then use n-k to estimate sigma^2. If False, use n.
+
+    Attributes
+    ----------
+    betas        : array
+                   sxmx(K+1) array of estimated coefficients, one row for
+                   each subset and dependent variable, one column for each
+                   column of x and the last one for the spatial
+                   autoregressive coefficient. The coefficients of the
+                   columns not in a subset are nan.
+    std_err      : array
+                   sxmx(K+1) array of the standard errors of betas
+    z_stat       : array
+                   sxmx(K+1)x2 array of the z statistics of betas and their
+                   p-values
+    utu          : array
+                   sxm array of the sums of squared residuals
+    sig2         : array
+                   sxm array of the sigma squared used in computations
+    pr2          : array
+                   sxm array of the pseudo R squared (squared correlation
+                   between y and the predicted values)
+    n            : integer
+                   Number of observations
+    m            : integer
+                   Number of dependent variables
+    k            : array
+                   Number of variables for which coefficients are estimated
+                   (including the constant and the spatial lag) in each
+                   subset
+    subsets      : list
+                   Arrays with the columns of x in each subset
+    y            : array
+                   nxm array of dependent variables
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+
+    References
+    ----------
+
+    .. [1] Anselin, L. (1988) "Spatial Econometrics: Methods and Models".
+    Kluwer, Dordrecht.
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> y = np.array([db.by_col(name) for name in ['CRIME', 'HOVAL']]).T
+    >>> X = np.array([db.by_col(name) for name in ['INC', 'DISCBD']]).T
+    >>> X = np.hstack((np.ones((49, 1)), X))
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+    >>> reg = BaseGM_Lag_Batch(y, X, w.sparse, w_lags=2)
+    >>> np.around(reg.betas[0], 4)
+    array([[ 88.0412,  -1.2453,  -8.1573,  -0.3351],
+           [ 21.7957,   1.0023,   5.2067,  -0.3281]])
+    """
+
+    def __init__(self, y, x, w, subsets=None, w_lags=1, sig2n_k=False):
+        self.y = y
+        self.x = x
+        self.n, self.m = y.shape
+        kx = x.shape[1]
+        if subsets is None:
+            subsets = [np.arange(kx)]
+        self.subsets = subsets
+        self.k = np.array([len(cols) + 1 for cols in subsets])
+        # instruments: x and the lags of its columns other than the constant
+        lag = x[:, 1:]
+        h = [x]
+        for i in range(w_lags):
+            lag = w * lag
+            h.append(lag)
+        self._h = np.hstack(h)
+        self._wy = w * y
+        self._hth = np.dot(self._h.T, self._h)
+        self._hthi = []
+        self._hcols = []
+        hty = np.dot(self._h.T, y)
+        htwy = np.dot(self._h.T, self._wy)
+        shape = (len(subsets), self.m)
+        self.betas = np.empty(shape + (kx + 1, ))
+        self.betas.fill(np.nan)
+        self.std_err = self.betas.copy()
+        self.z_stat = np.empty(shape + (kx + 1, 2))
+        self.z_stat.fill(np.nan)
+        self.utu = np.zeros(shape)
+        self.sig2 = np.zeros(shape)
+        self.pr2 = np.zeros(shape)
+        yc = y - y.mean(0)
+        for s, cols in enumerate(subsets):
+            lags = [kx + i * (kx - 1) + cols[1:] - 1 for i in range(w_lags)]
+            hcols = np.hstack([cols] + lags)
+            hthi = la.inv(self._hth[np.ix_(hcols, hcols)])
+            self._hthi.append(hthi)
+            self._hcols.append(hcols)
+            # Z'H(H'H)^-1H'Z and Z'H(H'H)^-1H'y, split between x and Wy
+            fx = np.dot(self._hth[np.ix_(cols, hcols)], hthi)
+            fwy = np.dot(hthi, htwy[hcols])
+            xzx = np.dot(fx, self._hth[np.ix_(hcols, cols)])
+            xzwy = np.dot(fx, htwy[hcols])
+            wyzwy = (htwy[hcols] * fwy).sum(0)
+            xzy = np.dot(fx, hty[hcols])
+            wyzy = (hty[hcols] * fwy).sum(0)
+            xzxi = la.inv(xzx)
+            a = np.dot(xzxi, xzwy)
+            schur = wyzwy - (xzwy * a).sum(0)
+            rho = (wyzy - (a * xzy).sum(0)) / schur
+            betas = np.vstack((np.dot(xzxi, xzy) - a * rho, rho))
+            varb = np.vstack((xzxi.diagonal()[:, None] + a ** 2 / schur,
+                              1. / schur))
+            predy = np.dot(x[:, cols], betas[:-1]) + self._wy * rho
+            u = y - predy
+            n, k = self.n, self.k[s]
+            utu = (u ** 2).sum(0)
+            if sig2n_k:
+                sig2 = utu / (n - k)
+            else:
+                sig2 = utu / n
+            std_err = np.sqrt(varb * sig2)
+            z_stat = betas / std_err
+            pc = predy - predy.mean(0)
+            pos = np.hstack((cols, [kx]))
+            self.betas[s][:, pos] = betas.T
+            self.std_err[s][:, pos] = std_err.T
+            self.z_stat[s][:, pos, 0] = z_stat.T
+            self.z_stat[s][:, pos, 1] = stats.norm.sf(abs(z_stat)).T * 2
+            self.utu[s] = utu
+            self.sig2[s] = sig2
+            self.pr2[s] = (yc * pc).sum(0) ** 2 / ((yc ** 2).sum(0) *
+                                                   (pc ** 2).sum(0))
+        self._cache = {}
+        self._models = {}
+
+
+class GM_Lag_Batch(BaseGM_Lag_Batch):
+    """
+    Spatial two stage least squares (S2SLS) of many dependent variables on
+    subsets of the same regressors, with results and diagnostics; Anselin
+    (1988) [1]_
+
+    The spatial lags of the regressors and of the dependent variables, the
+    instruments and their cross products are computed once for all the
+    regressions, and all the dependent variables are solved together with
+    matrix products. The results of all the regressions are held in arrays;
+    the regression object of any of them, with its summary and the
+    predictions of the reduced form, is built on demand by the model
+    method.
+
+    Parameters
+    ----------
+    y            : array
+                   nxm array with one column for each dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, excluding the constant
+    w            : pysal W object
+                   Spatial weights object
+    subsets      : list
+                   Lists with the columns of x (excluding the constant) of
+                   each subset of the regressors; the constant is added to
+                   all the subsets. Default set to None, a single subset with
+                   all the columns of x.
+    w_lags       : integer
+                   Orders of W to include as instruments for the spatially
+                   lagged dependent variable. For example, w_lags=1, then
+                   instruments are WX; if w_lags=2, then WX, WWX; and so on.
+    sig2n_k      : boolean
+                   If True, then use n-k to estimate sigma^2. If False, use n.
+    spat_diag    : boolean
+                   If True, then compute Anselin-Kelejian test in the
+                   summaries of the regressions
+    vm           : boolean
+                   If True, include variance-covariance matrix in the
+                   summaries
+    name_y       : list of strings
+                   Names of the dependent variables for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+    inv_method   : string
+                   Method used by the regressions built by model to compute
+                   the predictions of the reduced form (see
+                   pysal.spreg.utils.inverse_prod)
+
+    Attributes
+    ----------
+    summary      : string
+                   Summaries of all the regressions, built the first time
+                   the attribute is accessed (note: use in conjunction with
+                   the print command)
+    betas        : array
+                   sxmx(K+1) array of estimated coefficients, one row for
+                   each subset and dependent variable, one column for each
+                   variable in name_x and the last one for the spatial
+                   autoregressive coefficient. The coefficients of the
+                   variables not in a subset are nan.
+    std_err      : array
+                   sxmx(K+1) array of the standard errors of betas
+    z_stat       : array
+                   sxmx(K+1)x2 array of the z statistics of betas and their
+                   p-values
+    utu          : array
+                   sxm array of the sums of squared residuals
+    sig2         : array
+                   sxm array of the sigma squared used in computations
+    pr2          : array
+                   sxm array of the pseudo R squared (squared correlation
+                   between y and the predicted values)
+    n            : integer
+                   Number of observations
+    m            : integer
+                   Number of dependent variables
+    k            : array
+                   Number of variables for which coefficients are estimated
+                   (including the constant and the spatial lag) in each
+                   subset
+    subsets      : list
+                   Arrays with the columns of x, including the constant, in
+                   each subset
+    y            : array
+                   nxm array of dependent variables
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    title        : string
+                   Name of the regression method used
+    name_y       : list of strings
+                   Names of the dependent variables for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    References
+    ----------
+
+    .. [1] Anselin, L. (1988) "Spatial Econometrics: Methods and Models".
+    Kluwer, Dordrecht.
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> y = np.array([db.by_col(name) for name in ['CRIME', 'HOVAL']]).T
+    >>> X = np.array([db.by_col(name) for name in ['INC', 'DISCBD']]).T
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+    >>> reg = GM_Lag_Batch(y, X, w, subsets=[[0], [0, 1]], w_lags=2, name_y=['crime', 'hoval'], name_x=['inc', 'discbd'], name_ds='columbus')
+
+    The coefficients of the regressions of crime, the last one being the
+    spatial autoregressive coefficient
+
+    >>> np.around(reg.betas[:, 0], 4)
+    array([[ 39.1142,  -1.4198,      nan,   0.4686],
+           [ 88.0412,  -1.2453,  -8.1573,  -0.3351]])
+    >>> np.around(reg.std_err[:, 0, -1], 4)
+    array([ 0.1978,  0.4026])
+    >>> print reg.model(0, s=1).name_z
+    ['CONSTANT', 'inc', 'discbd', 'W_crime']
+    """
+
+    def __init__(self, y, x, w, subsets=None, w_lags=1, sig2n_k=False,
+                 spat_diag=False, vm=False, name_y=None, name_x=None,
+                 name_w=None, name_ds=None, inv_method='power_exp'):
+
+        n = USER.check_arrays(x)
+        _check_y(y, n)
+        USER.check_weights(w, y, w_required=True)
+        x_constant = USER.check_constant(x)
+        BaseGM_Lag_Batch.__init__(self, y=y, x=x_constant, w=w.sparse,
+                                  subsets=_set_subsets(subsets, x),
+                                  w_lags=w_lags, sig2n_k=sig2n_k)
+        self.w = w
+        self.w_lags = w_lags
+        self.inv_method = inv_method
+        self.title = "SPATIAL TWO STAGE LEAST SQUARES"
+        self.name_ds = USER.set_name_ds(name_ds)
+        self.name_y = _set_name_y(name_y, y)
+        self.name_x = USER.set_name_x(name_x, x)
+        self.name_w = USER.set_name_w(name_w, w)
+        self._model_class = _GM_Lag_Model
+        self._summary_opts = {'vm': vm, 'spat_diag': spat_diag}
+
+
+class BaseGM_Error_Batch(BatchProps):
+    """
+    GMM method for a spatial error model of many dependent variables on
+    subsets of the same regressors (note: no consistency checks,
+    diagnostics or constant added); based on Kelejian and Prucha (1998,
+    1999)[1]_ [2]_.
+
+    The spatial lags of the regressors and the cross products of the
+    regressors, the dependent variables and their lags are computed once
+    for all the regressions. The spatially filtered regressions then only
+    need small kxk systems for each dependent variable, and the spatial
+    filter itself is never applied to x.
+
+    Parameters
+    ----------
+    y            : array
+                   nxm array with one column for each dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    w            : Sparse matrix
+                   Spatial weights sparse matrix
+    subsets      : list
+                   Arrays with the columns of x in each subset of the
+                   regressors. Default set to None, a single subset with
+                   all the columns of x.
+
+    Attributes
+    ----------
+    betas        : array
+                   sxmx(K+1) array of estimated coefficients, one row for
+                   each subset and dependent variable, one column for each
+                   column of x and the last one for lambda. The coefficients
+                   of the columns not in a subset are nan.
+    std_err      : array
+                   sxmx(K+1) array of the standard errors of betas (nan for
+                   lambda)
+    z_stat       : array
+                   sxmx(K+1)x2 array of the z statistics of betas and their
+                   p-values (nan for lambda)
+    sig2         : array
+                   sxm array of the sigma squared used in computations
+    pr2          : array
+                   sxm array of the pseudo R squared (squared correlation
+                   between y and the predicted values)
+    n            : integer
+                   Number of observations
+    m            : integer
+                   Number of dependent variables
+    k            : array
+                   Number of variables for which coefficients are estimated
+                   (including the constant) in each subset
+    subsets      : list
+                   Arrays with the columns of x in each subset
+    y            : array
+                   nxm array of dependent variables
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+
+    References
+    ----------
+
+    .. [1] Kelejian, H.R., Prucha, I.R. (1998) "A generalized spatial
+    two-stage least squares procedure for estimating a spatial autoregressive
+    model with autoregressive disturbances". The Journal of Real State
+    Finance and Economics, 17, 1.
+
+    .. [2] Kelejian, H.R., Prucha, I.R. (1999) "A Generalized Moments
+    Estimator for the Autoregressive Parameter in a Spatial Model".
+    International Economic Review, 40, 2.
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> y = np.array([db.by_col(name) for name in ['CRIME', 'HOVAL']]).T
+    >>> X = np.array([db.by_col(name) for name in ['INC', 'DISCBD']]).T
+    >>> X = np.hstack((np.ones((49, 1)), X))
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+    >>> reg = BaseGM_Error_Batch(y, X, w.sparse)
+    >>> options = np.get_printoptions()
+    >>> np.set_printoptions(suppress=True)
+    >>> np.around(reg.betas[0], 4)
+    array([[ 68.3744,  -1.1506,  -5.8568,   0.0089],
+           [ 10.0264,   1.1811,   4.0129,   0.226 ]])
+    >>> np.set_printoptions(**options)
+    """
+
+    def __init__(self, y, x, w, subsets=None):
+        self.y = y
+        self.x = x
+        self.n, self.m = y.shape
+        n, m, kx = self.n, self.m, x.shape[1]
+        if subsets is None:
+            subsets = [np.arange(kx)]
+        self.subsets = subsets
+        self.k = np.array([len(cols) for cols in subsets])
+        self._wx = w * x
+        self._wy = w * y
+        # cross products of [x, Wx] and [y, Wy]
+        xx = np.hstack((x, self._wx))
+        xxtxx = np.dot(xx.T, xx)
+        xxtyy = np.dot(xx.T, np.hstack((y, self._wy)))
+        trWtW = sparse_moments(w)['trcWtW']
+        self._xsxsi = []
+        shape = (len(subsets), m)
+        self.betas = np.empty(shape + (kx + 1, ))
+        self.betas.fill(np.nan)
+        self.std_err = self.betas.copy()
+        self.z_stat = np.empty(shape + (kx + 1, 2))
+        self.z_stat.fill(np.nan)
+        self.sig2 = np.zeros(shape)
+        self.pr2 = np.zeros(shape)
+        yc = y - y.mean(0)
+        for s, cols in enumerate(subsets):
+            wcols = cols + kx
+            k = len(cols)
+            xtx = xxtxx[np.ix_(cols, cols)]
+            xtwx = xxtxx[np.ix_(cols, wcols)]
+            wxtwx = xxtxx[np.ix_(wcols, wcols)]
+            xty, xtwy = xxtyy[cols, :m], xxtyy[cols, m:]
+            wxty, wxtwy = xxtyy[wcols, :m], xxtyy[wcols, m:]
+
+            #1a. OLS --> \tilde{betas}
+            betas = np.dot(la.inv(xtx), xty)
+            u = y - np.dot(x[:, cols], betas)
+            wu = self._wy - np.dot(self._wx[:, cols], betas)
+
+            #1b. GMM --> \tilde{\lambda1}
+            moments = _momentsGM_Error_Batch(u, wu, w * wu, trWtW)
+            lambdas = np.array([optim_moments(mom) for mom in moments])
+
+            #2a. OLS -->\hat{betas}, from the cross products of the
+            # spatially filtered variables
+            xsxsi = np.zeros((m, k, k))
+            for j, lamb in enumerate(lambdas):
+                xsxs = xtx - lamb * (xtwx + xtwx.T) + lamb ** 2 * wxtwx
+                xsys = (xty[:, j] - lamb * (xtwy[:, j] + wxty[:, j]) +
+                        lamb ** 2 * wxtwy[:, j])
+                xsxsi[j] = la.inv(xsxs)
+                betas[:, j] = np.dot(xsxsi[j], xsys)
+            self._xsxsi.append(xsxsi)
+
+            #Output
+            predy = np.dot(x[:, cols], betas)
+            u = y - predy
+            e_filtered = u - lambdas * (self._wy -
+                                        np.dot(self._wx[:, cols], betas))
+            sig2 = (e_filtered ** 2).sum(0) / n
+            std_err = np.sqrt(np.diagonal(xsxsi, axis1=1, axis2=2).T * sig2)
+            z_stat = betas / std_err
+            pc = predy - predy.mean(0)
+            self.betas[s][:, cols] = betas.T
+            self.betas[s][:, kx] = lambdas
+            self.std_err[s][:, cols] = std_err.T
+            self.z_stat[s][:, cols, 0] = z_stat.T
+            self.z_stat[s][:, cols, 1] = stats.norm.sf(abs(z_stat)).T * 2
+            self.sig2[s] = sig2
+            self.pr2[s] = (yc * pc).sum(0) ** 2 / ((yc ** 2).sum(0) *
+                                                   (pc ** 2).sum(0))
+        self._cache = {}
+        self._models = {}
+
+
+class GM_Error_Batch(BaseGM_Error_Batch):
+    """
+    GMM method for a spatial error model of many dependent variables on
+    subsets of the same regressors, with results and diagnostics; based on
+    Kelejian and Prucha (1998, 1999)[1]_ [2]_.
+
+    The spatial lags and cross products of the regressors and the
+    dependent variables are computed once for all the regressions; only
+    the estimation of lambda and small kxk systems are left for each
+    dependent variable. The results of all the regressions are held in
+    arrays; the regression object of any of them, with its summary, is
+    built on demand by the model method.
+
+    Parameters
+    ----------
+    y            : array
+                   nxm array with one column for each dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, excluding the constant
+    w            : pysal W object
+                   Spatial weights object (always needed)
+    subsets      : list
+                   Lists with the columns of x (excluding the constant) of
+                   each subset of the regressors; the constant is added to
+                   all the subsets. Default set to None, a single subset with
+                   all the columns of x.
+    vm           : boolean
+                   If True, include variance-covariance matrix in the
+                   summaries
+    name_y       : list of strings
+                   Names of the dependent variables for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    Attributes
+    ----------
+    summary      : string
+                   Summaries of all the regressions, built the first time
+                   the attribute is accessed (note: use in conjunction with
+                   the print command)
+    betas        : array
+                   sxmx(K+1) array of estimated coefficients, one row for
+                   each subset and dependent variable, one column for each
+                   variable in name_x, the last one being lambda. The
+                   coefficients of the variables not in a subset are nan.
+    std_err      : array
+                   sxmx(K+1) array of the standard errors of betas (nan for
+                   lambda)
+    z_stat       : array
+                   sxmx(K+1)x2 array of the z statistics of betas and their
+                   p-values (nan for lambda)
+    sig2         : array
+                   sxm array of the sigma squared used in computations
+    pr2          : array
+                   sxm array of the pseudo R squared (squared correlation
+                   between y and the predicted values)
+    n            : integer
+                   Number of observations
+    m            : integer
+                   Number of dependent variables
+    k            : array
+                   Number of variables for which coefficients are estimated
+                   (including the constant) in each subset
+    subsets      : list
+                   Arrays with the columns of x, including the constant, in
+                   each subset
+    y            : array
+                   nxm array of dependent variables
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    title        : string
+                   Name of the regression method used
+    name_y       : list of strings
+                   Names of the dependent variables for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output, the
+                   last one being lambda
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    References
+    ----------
+
+    .. [1] Kelejian, H.R., Prucha, I.R. (1998) "A generalized spatial
+    two-stage least squares procedure for estimating a spatial autoregressive
+    model with autoregressive disturbances". The Journal of Real State
+    Finance and Economics, 17, 1.
+
+    .. [2] Kelejian, H.R., Prucha, I.R. (1999) "A Generalized Moments
+    Estimator for the Autoregressive Parameter in a Spatial Model".
+    International Economic Review, 40, 2.
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> y = np.array([db.by_col(name) for name in ['CRIME', 'HOVAL']]).T
+    >>> X = np.array([db.by_col(name) for name in ['INC', 'DISCBD']]).T
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+    >>> reg = GM_Error_Batch(y, X, w, subsets=[[0], [0, 1]], name_y=['crime', 'hoval'], name_x=['inc', 'discbd'], name_ds='columbus')
+
+    The coefficients of the regressions of hoval, the last one being lambda
+
+    >>> np.around(reg.betas[:, 1], 4)
+    array([[ 14.9957,   1.6434,      nan,   0.2483],
+           [ 10.0264,   1.1811,   4.0129,   0.226 ]])
+    >>> print reg.model(1, s=1).name_x
+    ['CONSTANT', 'inc', 'discbd', 'lambda']
+    """
+
+    def __init__(self, y, x, w, subsets=None, vm=False, name_y=None,
+                 name_x=None, name_w=None, name_ds=None):
+
+        n = USER.check_arrays(x)
+        _check_y(y, n)
+        USER.check_weights(w, y, w_required=True)
+        x_constant = USER.check_constant(x)
+        BaseGM_Error_Batch.__init__(self, y=y, x=x_constant, w=w.sparse,
+                                    subsets=_set_subsets(subsets, x))
+        self.w = w
+        self.title = "SPATIALLY WEIGHTED LEAST SQUARES"
+        self.name_ds = USER.set_name_ds(name_ds)
+        self.name_y = _set_name_y(name_y, y)
+        self.name_x = USER.set_name_x(name_x, x)
+        self.name_x.append('lambda')
+        self.name_w = USER.set_name_w(name_w, w)
+        self._model_class = _GM_Error_Model
+        self._summary_opts = {'vm': vm}
+
+
+class _OLS_Model(OLS.BaseOLS):
+    """
+    OLS regression of one dependent variable of an OLS_Batch, set from the
+    estimates of the batch
+    """
+
+    def __init__(self, batch, j, s):
+        cols = batch.subsets[s]
+        self.x = batch.x[:, cols]
+        self.y = batch.y[:, j:j + 1]
+        self.n, self.k = self.x.shape
+        self.xtx = batch._xtx[np.ix_(cols, cols)]
+        self.xtxi = batch._xtxi[s]
+        self.betas = batch.betas[s, j, cols].reshape(self.k, 1)
+        self.predy = np.dot(self.x, self.betas)
+        self.u = self.y - self.predy
+        self._cache = {}
+        self.sig2 = batch.sig2[s, j]
+        self.title = batch.title
+        self.name_ds = batch.name_ds
+        self.name_y = batch.name_y[j]
+        self.name_x = [batch.name_x[i] for i in cols]
+        self.robust = USER.set_robust(None)
+        self.name_w = batch.name_w
+        self.name_gwk = None
+        SUMMARY.OLS(reg=self, w=batch.w, moran=False, white_test=False,
+                    **batch._summary_opts)
+
+
+class _GM_Lag_Model(TSLS_SP.BaseGM_Lag):
+    """
+    Spatial two stage least squares regression of one dependent variable of
+    a GM_Lag_Batch, set from the estimates of the batch
+    """
+
+    def __init__(self, batch, j, s):
+        cols = batch.subsets[s]
+        hcols = batch._hcols[s]
+        self.y = batch.y[:, j:j + 1]
+        self.n = batch.n
+        self.x = batch.x[:, cols]
+        self.yend = batch._wy[:, j:j + 1]
+        self.kstar = 1
+        self.z = np.hstack((self.x, self.yend))
+        self.h = batch._h[:, hcols]
+        self.q = self.h[:, len(cols):]
+        self.k = self.z.shape[1]
+        self.hth = batch._hth[np.ix_(hcols, hcols)]
+        self.hthi = batch._hthi[s]
+        zth = np.dot(self.z.T, self.h)
+        self.zthhthi = np.dot(zth, self.hthi)
+        self.varb = la.inv(np.dot(self.zthhthi, zth.T))
+        self.htz = zth.T
+        pos = np.hstack((cols, [batch.x.shape[1]]))
+        self.betas = batch.betas[s, j, pos].reshape(self.k, 1)
+        self.predy = np.dot(self.z, self.betas)
+        self.u = self.y - self.predy
+        self._cache = {}
+        self.sig2 = batch.sig2[s, j]
+        self.predy_e, self.e_pred, warn = sp_att(batch.w, self.y,
+                self.predy, self.yend, self.betas[-1],
+                inv_method=batch.inv_method)
+        set_warn(self, warn)
+        self.title = batch.title
+        self.name_ds = batch.name_ds
+        self.name_y = batch.name_y[j]
+        self.name_x = [batch.name_x[i] for i in cols]
+        self.name_yend = [USER.set_name_yend_sp(self.name_y)]
+        self.name_z = self.name_x + self.name_yend
+        self.name_q = USER.set_name_q_sp(self.name_x, batch.w_lags, [], True)
+        self.name_h = USER.set_name_h(self.name_x, self.name_q)
+        self.robust = USER.set_robust(None)
+        self.name_w = batch.name_w
+        self.name_gwk = None
+        SUMMARY.GM_Lag(reg=self, w=batch.w, **batch._summary_opts)
+
+
+class _GM_Error_Model(ERROR_SP.BaseGM_Error):
+    """
+    Spatial error regression of one dependent variable of a GM_Error_Batch,
+    set from the estimates of the batch
+    """
+
+    def __init__(self, batch, j, s):
+        cols = batch.subsets[s]
+        self.x = batch.x[:, cols]
+        self.y = batch.y[:, j:j + 1]
+        self.n, self.k = self.x.shape
+        pos = np.hstack((cols, [batch.x.shape[1]]))
+        self.betas = batch.betas[s, j, pos].reshape(self.k + 1, 1)
+        self.predy = np.dot(self.x, self.betas[:-1])
+        self.u = self.y - self.predy
+        self.sig2 = batch.sig2[s, j]
+        self.e_filtered = self.u - self.betas[-1][0] * (batch.w.sparse *
+                                                        self.u)
+        self.vm = self.sig2 * batch._xsxsi[s][j]
+        self._cache = {}
+        self.title = batch.title
+        self.name_ds = batch.name_ds
+        self.name_y = batch.name_y[j]
+        self.name_x = [batch.name_x[i] for i in pos]
+        self.name_w = batch.name_w
+        SUMMARY.GM_Error(reg=self, w=batch.w, **batch._summary_opts)
+
+
+def _momentsGM_Error_Batch(u, wu, wwu, trWtW):
+    """
+    Moments of _momentsGM_Error for each column of the residuals u, given
+    their spatial lags wu and wwu
+    """
+    n = u.shape[0]
+    u2 = (u * u).sum(0)
+    uwu = (u * wu).sum(0)
+    wu2 = (wu * wu).sum(0)
+    uwwu = (u * wwu).sum(0)
+    wwu2 = (wwu * wwu).sum(0)
+    wuwwu = (wu * wwu).sum(0)
+    moments = []
+    for j in range(u.shape[1]):
+        g = np.array([[u2[j], wu2[j], uwu[j]]]).T / n
+        G = np.array([[2 * uwu[j], -wu2[j], n],
+                      [2 * wuwwu[j], -wwu2[j], trWtW],
+                      [uwwu[j] + wu2[j], -wuwwu[j], 0.]]) / n
+        moments.append([G, g])
+    return moments
+
+
+def _check_y(y, n):
+    """
+    Check that y is a two dimensional array with one row per observation
+    """
+    if y.__class__.__name__ != 'ndarray':
+        raise Exception, "y must be a numpy array"
+    if len(y.shape) != 2:
+        raise Exception, "y must have exactly two dimensions, one column for each dependent variable"
+    if y.shape[0] != n:
+        raise Exception, "y must have as many rows as x"
+
+
+def _set_subsets(subsets, x):
+    """
+    Columns of the subsets of x in the array with the constant
+    """
+    k = x.shape[1]
+    if subsets is None:
+        return [np.arange(k + 1)]
+    cols = []
+    for subset in subsets:
+        subset = np.unique(np.asarray(subset, int))
+        if len(subset) and (subset[0] < 0 or subset[-1] >= k):
+            raise Exception, "subsets must hold columns of x"
+        cols.append(np.hstack(([0], subset + 1)))
+    return cols
+
+
+def _set_name_y(name_y, y):
+    if not name_y:
+        return ['dep_var_' + str(j + 1) for j in range(y.shape[1])]
+    if len(name_y) != y.shape[1]:
+        raise Exception, "name_y must hold one name for each column of y"
+    return name_y[:]
+
+
+def _test():
+    import doctest
+    start_suppress = np.get_printoptions()['suppress']
+    np.set_printoptions(suppress=True)
+    doctest.testmod()
+    np.set_printoptions(suppress=start_suppress)
+
+if __name__ == '__main__':
+    _test()
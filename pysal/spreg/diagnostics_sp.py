@@ -491,8 +491,7 @@ class spDcache:
     @property
     def t(self):
         if 't' not in self._cache:
-            prod = (self.w.sparse.T + self.w.sparse) * self.w.sparse 
-            self._cache['t'] = np.sum(prod.diagonal())
+            self._cache['t'] = self.w.trcWtW_WW
         return self._cache['t']
     @property
     def trA(self):
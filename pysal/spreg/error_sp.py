@@ -10,6 +10,7 @@ import numpy as np
 from numpy import linalg as la
 import ols as OLS
 from pysal import lag_spatial
+from pysal.weights.weights import sparse_moments
 from utils import power_expansion, set_endog, iter_msg, sp_att
 from utils import get_A1_hom, get_A2_hom, get_A1_het, optim_moments, get_spFilter, get_lags, _moments2eqs
 from utils import spdot, RegressionPropsY, set_warn
@@ -842,6 +843,10 @@ class GM_Combo(BaseGM_Combo):
                    Name of weights matrix for use in output
     name_ds      : string
                    Name of dataset for use in output
+    inv_method   : string
+                   Method used to compute predy_e, the predictions from the
+                   reduced form: "power_exp" (default), "true_inv", "splu"
+                   or "krylov" (see utils.inverse_prod)
 
     Attributes
     ----------
@@ -1043,7 +1048,7 @@ class GM_Combo(BaseGM_Combo):
                  w=None, w_lags=1, lag_q=True,\
                  vm=False, name_y=None, name_x=None,\
                  name_yend=None, name_q=None,\
-                 name_w=None, name_ds=None):
+                 name_w=None, name_ds=None, inv_method='power_exp'):
 
         n = USER.check_arrays(y, x, yend, q)
         USER.check_y(y, n)
@@ -1053,7 +1058,8 @@ class GM_Combo(BaseGM_Combo):
         BaseGM_Combo.__init__(self, y=y, x=x_constant, w=w.sparse, yend=yend2, q=q2,\
                                 w_lags=w_lags, lag_q=lag_q)
         self.predy_e, self.e_pred, warn = sp_att(w,self.y,\
-                   self.predy,yend2[:,-1].reshape(self.n,1),self.betas[-2])
+                   self.predy,yend2[:,-1].reshape(self.n,1),self.betas[-2],\
+                   inv_method=inv_method)
         set_warn(self, warn)
         self.title = "SPATIALLY WEIGHTED TWO STAGE LEAST SQUARES"        
         self.name_ds = USER.set_name_ds(name_ds)
@@ -1083,8 +1089,7 @@ def _momentsGM_Error(w, u):
     uwwu = np.dot(u.T, wwu)
     wwu2 = np.dot(wwu.T, wwu)
     wuwwu = np.dot(wu.T, wwu)
-    wtw = wsparse.T * wsparse
-    trWtW = np.sum(wtw.diagonal())
+    trWtW = sparse_moments(wsparse)['trcWtW']
     g = np.array([[u2[0][0], wu2[0][0], uwu[0][0]]]).T / n
     G = np.array([[2 * uwu[0][0], -wu2[0][0], n], [2 * wuwwu[0][0], -wwu2[0][0], trWtW], [uwwu[0][0] + wu2[0][0], -wuwwu[0][0], 0.]]) / n
     return [G, g]
@@ -398,7 +398,10 @@ class BaseGM_Endog_Error_Het(RegressionPropsY):
     inv_method   : string
                    If "power_exp", then compute inverse using the power
                    expansion. If "true_inv", then compute the true inverse.
-                   Note that true_inv will fail for large n.
+                   Note that true_inv will fail for large n. If "splu" or
+                   "krylov", then solve with a sparse LU factorization or
+                   a preconditioned Krylov method (see utils.inverse_prod),
+                   both suited to large n.
 
 
     Attributes
@@ -570,7 +573,10 @@ class GM_Endog_Error_Het(BaseGM_Endog_Error_Het):
     inv_method   : string
                    If "power_exp", then compute inverse using the power
                    expansion. If "true_inv", then compute the true inverse.
-                   Note that true_inv will fail for large n.
+                   Note that true_inv will fail for large n. If "splu" or
+                   "krylov", then solve with a sparse LU factorization or
+                   a preconditioned Krylov method (see utils.inverse_prod),
+                   both suited to large n.
     vm           : boolean
                    If True, include variance-covariance matrix in summary
                    results
@@ -832,7 +838,10 @@ class BaseGM_Combo_Het(BaseGM_Endog_Error_Het):
     inv_method   : string
                    If "power_exp", then compute inverse using the power
                    expansion. If "true_inv", then compute the true inverse.
-                   Note that true_inv will fail for large n.
+                   Note that true_inv will fail for large n. If "splu" or
+                   "krylov", then solve with a sparse LU factorization or
+                   a preconditioned Krylov method (see utils.inverse_prod),
+                   both suited to large n.
 
 
     Attributes
@@ -986,7 +995,10 @@ class GM_Combo_Het(BaseGM_Combo_Het):
     inv_method   : string
                    If "power_exp", then compute inverse using the power
                    expansion. If "true_inv", then compute the true inverse.
-                   Note that true_inv will fail for large n.
+                   Note that true_inv will fail for large n. If "splu" or
+                   "krylov", then solve with a sparse LU factorization or
+                   a preconditioned Krylov method (see utils.inverse_prod),
+                   both suited to large n.
     vm           : boolean
                    If True, include variance-covariance matrix in summary
                    results
@@ -1400,8 +1412,8 @@ def get_a1a2(w, wA1, reg, lambdapar, P, zs, inv_method, filt):
     a1 = np.dot(spdot(reg.h, P), alpha1)
     a2 = np.dot(spdot(reg.h, P), alpha2)
     if not filt:
-        a1 = UTILS.inverse_prod(w, a1, lambdapar, post_multiply=True, inv_method=inv_method).T
-        a2 = UTILS.inverse_prod(w, a2, lambdapar, post_multiply=True, inv_method=inv_method).T
+        a12 = UTILS.inverse_prod(w, np.hstack((a1, a2)), lambdapar, post_multiply=True, inv_method=inv_method).T
+        a1, a2 = a12[:,0:1], a12[:,1:2]
     return [a1, a2]
 
 def get_vc_het_tsls(w, wA1, reg, lambdapar, P, zs, inv_method, filt=True, save_a1a2=False):
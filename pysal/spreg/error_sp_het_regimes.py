@@ -4,7 +4,6 @@ Spatial Error with Heteroskedasticity and Regimes family of models
 __author__ = "Luc Anselin luc.anselin@asu.edu, Pedro V. Amaral pedro.amaral@asu.edu"
 
 import numpy as np
-import multiprocessing as mp
 import user_output as USER
 import summary_output as SUMMARY
 import utils as UTILS
@@ -15,7 +14,6 @@ from pysal.spreg.error_sp_het import BaseGM_Error_Het, BaseGM_Endog_Error_Het, g
 from utils import RegressionPropsY, spdot, set_endog, sphstack, set_warn
 from scipy import sparse as SP
 from pysal import lag_spatial
-from platform import system
 
 class GM_Error_Het_Regimes(RegressionPropsY, REGI.Regimes_Frame):
     """
@@ -380,16 +378,9 @@ class GM_Error_Het_Regimes(RegressionPropsY, REGI.Regimes_Frame):
 
         w_i,regi_ids,warn = REGI.w_regimes(w, regimes, self.regimes_set, transform=True, get_ids=True)
         set_warn(self, warn)
-        pool = mp.Pool(cores)
-        results_p = {}
-        for r in self.regimes_set:
-            w_r = w_i[r].sparse
-            if system() == 'Windows':
-                is_win = True
-                results_p[r] = _work_error(*(y,x,regi_ids,r,w_r,max_iter,epsilon,step1c,self.name_ds,self.name_y,name_x+['lambda'],self.name_w,self.name_regimes))
-            else:
-                results_p[r] = pool.apply_async(_work_error,args=(y,x,regi_ids,r,w_r,max_iter,epsilon,step1c,self.name_ds,self.name_y,name_x+['lambda'],self.name_w,self.name_regimes, ))
-                is_win = False
+        results = REGI._run_regimes(_work_error, regi_ids, self.regimes_set, cores,\
+                  {'y': y, 'x': x}, w_i=w_i,\
+                  args=(max_iter,epsilon,step1c,self.name_ds,self.name_y,name_x+['lambda'],self.name_w,self.name_regimes))
         self.kryd = 0
         self.kr = len(cols2regi)+1
         self.kf = 0
@@ -399,17 +390,9 @@ class GM_Error_Het_Regimes(RegressionPropsY, REGI.Regimes_Frame):
         self.u = np.zeros((self.n,1),float)
         self.predy = np.zeros((self.n,1),float)
         self.e_filtered = np.zeros((self.n,1),float)
-        if not is_win:
-            pool.close()
-            pool.join()
-        results = {}
         self.name_y, self.name_x = [],[]
         counter = 0
         for r in self.regimes_set:
-            if is_win:
-                results[r] = results_p[r]
-            else:
-                results[r] = results_p[r].get()
             results[r].w = w_i[r]
             self.vm[(counter*self.kr):((counter+1)*self.kr),(counter*self.kr):((counter+1)*self.kr)] = results[r].vm
             self.betas[(counter*self.kr):((counter+1)*self.kr),] = results[r].betas
@@ -476,7 +459,10 @@ class GM_Endog_Error_Het_Regimes(RegressionPropsY, REGI.Regimes_Frame):
     inv_method   : string
                    If "power_exp", then compute inverse using the power
                    expansion. If "true_inv", then compute the true inverse.
-                   Note that true_inv will fail for large n.
+                   Note that true_inv will fail for large n. If "splu" or
+                   "krylov", then solve with a sparse LU factorization or
+                   a preconditioned Krylov method (see utils.inverse_prod),
+                   both suited to large n.
     vm           : boolean
                    If True, include variance-covariance matrix in summary
                    results
@@ -868,16 +854,9 @@ class GM_Endog_Error_Het_Regimes(RegressionPropsY, REGI.Regimes_Frame):
         else:
             w_i,regi_ids,warn = REGI.w_regimes(w, regimes, self.regimes_set, transform=True, get_ids=True)
             set_warn(self, warn)
-        pool = mp.Pool(cores)
-        results_p = {}
-        for r in self.regimes_set:
-            w_r = w_i[r].sparse
-            if system() == 'Windows':
-                is_win = True
-                results_p[r] = _work_endog_error(*(y,x,yend,q,regi_ids,r,w_r,max_iter,epsilon,step1c,inv_method,self.name_ds,self.name_y,name_x,name_yend,name_q,self.name_w,self.name_regimes))
-            else:
-                results_p[r] = pool.apply_async(_work_endog_error,args=(y,x,yend,q,regi_ids,r,w_r,max_iter,epsilon,step1c,inv_method,self.name_ds,self.name_y,name_x,name_yend,name_q,self.name_w,self.name_regimes, ))
-                is_win = False
+        results = REGI._run_regimes(_work_endog_error, regi_ids, self.regimes_set, cores,\
+                  {'y': y, 'x': x, 'yend': yend, 'q': q}, w_i=w_i,\
+                  args=(max_iter,epsilon,step1c,inv_method,self.name_ds,self.name_y,name_x,name_yend,name_q,self.name_w,self.name_regimes))
         self.kryd,self.kf = 0,0
         self.kr = len(cols2regi)+1
         self.nr = len(self.regimes_set)
@@ -886,17 +865,9 @@ class GM_Endog_Error_Het_Regimes(RegressionPropsY, REGI.Regimes_Frame):
         self.u = np.zeros((self.n,1),float)
         self.predy = np.zeros((self.n,1),float)
         self.e_filtered = np.zeros((self.n,1),float)
-        if not is_win:
-            pool.close()
-            pool.join()
-        results = {}
         self.name_y, self.name_x, self.name_yend, self.name_q, self.name_z, self.name_h = [],[],[],[],[],[]
         counter = 0
         for r in self.regimes_set:
-            if is_win:
-                results[r] = results_p[r]
-            else:
-                results[r] = results_p[r].get()
             results[r].w = w_i[r]
             self.vm[(counter*self.kr):((counter+1)*self.kr),(counter*self.kr):((counter+1)*self.kr)] = results[r].vm
             self.betas[(counter*self.kr):((counter+1)*self.kr),] = results[r].betas
@@ -979,7 +950,10 @@ class GM_Combo_Het_Regimes(GM_Endog_Error_Het_Regimes):
     inv_method   : string
                    If "power_exp", then compute inverse using the power
                    expansion. If "true_inv", then compute the true inverse.
-                   Note that true_inv will fail for large n.
+                   Note that true_inv will fail for large n. If "splu" or
+                   "krylov", then solve with a sparse LU factorization or
+                   a preconditioned Krylov method (see utils.inverse_prod),
+                   both suited to large n.
     vm           : boolean
                    If True, include variance-covariance matrix in summary
                    results
@@ -1340,9 +1314,11 @@ class GM_Combo_Het_Regimes(GM_Endog_Error_Het_Regimes):
             self.title = "SPATIALLY WEIGHTED TWO STAGE LEAST SQUARES (HET) - REGIMES"
             SUMMARY.GM_Combo_Het(reg=self, w=w, vm=vm, regimes=True)
 
-def _work_error(y,x,regi_ids,r,w_r,max_iter,epsilon,step1c,name_ds,name_y,name_x,name_w,name_regimes):
-    y_r = y[regi_ids[r]]
-    x_r = x[regi_ids[r]]
+def _work_error(handle,r,max_iter,epsilon,step1c,name_ds,name_y,name_x,name_w,name_regimes):
+    data = REGI._regime_data(handle)
+    y_r = data['y']
+    x_r = data['x']
+    w_r = data['w']
     x_constant = USER.check_constant(x_r)
     model = BaseGM_Error_Het(y_r,x_constant,w_r,max_iter=max_iter,epsilon=epsilon,step1c=step1c)
     model.title = "SPATIALLY WEIGHTED LEAST SQUARES ESTIMATION (HET) - REGIME %s" %r
@@ -1353,11 +1329,13 @@ def _work_error(y,x,regi_ids,r,w_r,max_iter,epsilon,step1c,name_ds,name_y,name_x
     model.name_regimes = name_regimes       
     return model
 
-def _work_endog_error(y,x,yend,q,regi_ids,r,w_r,max_iter,epsilon,step1c,inv_method,name_ds,name_y,name_x,name_yend,name_q,name_w,name_regimes):
-    y_r = y[regi_ids[r]]
-    x_r = x[regi_ids[r]]
-    yend_r = yend[regi_ids[r]]
-    q_r = q[regi_ids[r]]
+def _work_endog_error(handle,r,max_iter,epsilon,step1c,inv_method,name_ds,name_y,name_x,name_yend,name_q,name_w,name_regimes):
+    data = REGI._regime_data(handle)
+    y_r = data['y']
+    x_r = data['x']
+    yend_r = data['yend']
+    q_r = data['q']
+    w_r = data['w']
     x_constant = USER.check_constant(x_r)
     model = BaseGM_Endog_Error_Het(y_r,x_constant,yend_r,q_r,w_r,max_iter=max_iter,epsilon=epsilon,step1c=step1c,inv_method=inv_method)
     model.title = "SPATIALLY WEIGHTED TWO STAGE LEAST SQUARES (HET) - REGIME %s" %r
@@ -5,7 +5,6 @@ Spatial Error Models with regimes module
 __author__ = "Luc Anselin luc.anselin@asu.edu, Pedro V. Amaral pedro.amaral@asu.edu"
 
 import numpy as np
-import multiprocessing as mp
 import regimes as REGI
 import user_output as USER
 import summary_output as SUMMARY
@@ -16,7 +15,6 @@ from pysal.spreg.error_sp import BaseGM_Error, BaseGM_Endog_Error, _momentsGM_Er
 from pysal.spreg.utils import set_endog, iter_msg, sp_att, set_warn
 from pysal.spreg.utils import optim_moments, get_spFilter, get_lags
 from pysal.spreg.utils import spdot, RegressionPropsY
-from platform import system
 
 class GM_Error_Regimes(RegressionPropsY, REGI.Regimes_Frame):
     """
@@ -342,16 +340,9 @@ class GM_Error_Regimes(RegressionPropsY, REGI.Regimes_Frame):
                  cols2regi, vm, name_x):
         w_i,regi_ids,warn = REGI.w_regimes(w, regimes, self.regimes_set, transform=True, get_ids=True)
         set_warn(self, warn)
-        pool = mp.Pool(cores)
-        results_p = {}
-        for r in self.regimes_set:
-            w_r = w_i[r].sparse
-            if system() == 'Windows':
-                results_p[r] = _work_error(*(y,x,regi_ids,r,w_r,self.name_ds,self.name_y,name_x+['lambda'],self.name_w,self.name_regimes))
-                is_win = True
-            else:
-                results_p[r] = pool.apply_async(_work_error,args=(y,x,regi_ids,r,w_r,self.name_ds,self.name_y,name_x+['lambda'],self.name_w,self.name_regimes, ))
-                is_win = False
+        results = REGI._run_regimes(_work_error, regi_ids, self.regimes_set, cores,\
+                  {'y': y, 'x': x}, w_i=w_i,\
+                  args=(self.name_ds,self.name_y,name_x+['lambda'],self.name_w,self.name_regimes))
         self.kryd = 0
         self.kr = len(cols2regi)
         self.kf = 0
@@ -361,17 +352,9 @@ class GM_Error_Regimes(RegressionPropsY, REGI.Regimes_Frame):
         self.u = np.zeros((self.n,1),float)
         self.predy = np.zeros((self.n,1),float)
         self.e_filtered = np.zeros((self.n,1),float)
-        if not is_win:
-            pool.close()
-            pool.join()
-        results = {}
         self.name_y, self.name_x = [],[]
         counter = 0
         for r in self.regimes_set:
-            if is_win:
-                results[r] = results_p[r]
-            else:
-                results[r] = results_p[r].get()
             results[r].w = w_i[r]
             self.vm[(counter*self.kr):((counter+1)*self.kr),(counter*self.kr):((counter+1)*self.kr)] = results[r].vm
             self.betas[(counter*(self.kr+1)):((counter+1)*(self.kr+1)),] = results[r].betas
@@ -772,16 +755,9 @@ class GM_Endog_Error_Regimes(RegressionPropsY, REGI.Regimes_Frame):
         else:
             w_i,regi_ids,warn = REGI.w_regimes(w, regimes, self.regimes_set, transform=True, get_ids=True)
             set_warn(self, warn)
-        pool = mp.Pool(cores)
-        results_p = {}
-        for r in self.regimes_set:
-            w_r = w_i[r].sparse
-            if system() == 'Windows':
-                results_p[r] = _work_endog_error(*(y,x,yend,q,regi_ids,r,w_r,self.name_ds,self.name_y,name_x,name_yend,name_q,self.name_w,self.name_regimes))
-                is_win = True
-            else:
-                results_p[r] = pool.apply_async(_work_endog_error,args=(y,x,yend,q,regi_ids,r,w_r,self.name_ds,self.name_y,name_x,name_yend,name_q,self.name_w,self.name_regimes, ))
-                is_win = False
+        results = REGI._run_regimes(_work_endog_error, regi_ids, self.regimes_set, cores,\
+                  {'y': y, 'x': x, 'yend': yend, 'q': q}, w_i=w_i,\
+                  args=(self.name_ds,self.name_y,name_x,name_yend,name_q,self.name_w,self.name_regimes))
         self.kryd,self.kf = 0,0
         self.kr = len(cols2regi)
         self.nr = len(self.regimes_set)
@@ -790,17 +766,9 @@ class GM_Endog_Error_Regimes(RegressionPropsY, REGI.Regimes_Frame):
         self.u = np.zeros((self.n,1),float)
         self.predy = np.zeros((self.n,1),float)
         self.e_filtered = np.zeros((self.n,1),float)
-        if not is_win:
-            pool.close()
-            pool.join()
-        results = {}
         self.name_y, self.name_x, self.name_yend, self.name_q, self.name_z, self.name_h = [],[],[],[],[],[]
         counter = 0
         for r in self.regimes_set:
-            if is_win:
-                results[r] = results_p[r]
-            else:
-                results[r] = results_p[r].get()
             results[r].w = w_i[r]
             self.vm[(counter*self.kr):((counter+1)*self.kr),(counter*self.kr):((counter+1)*self.kr)] = results[r].vm
             self.betas[(counter*(self.kr+1)):((counter+1)*(self.kr+1)),] = results[r].betas
@@ -1222,9 +1190,11 @@ class GM_Combo_Regimes(GM_Endog_Error_Regimes, REGI.Regimes_Frame):
             self.title = "SPATIALLY WEIGHTED TWO STAGE LEAST SQUARES - REGIMES"
             SUMMARY.GM_Combo(reg=self, w=w, vm=vm, regimes=True)
 
-def _work_error(y,x,regi_ids,r,w_r,name_ds,name_y,name_x,name_w,name_regimes):
-    y_r = y[regi_ids[r]]
-    x_r = x[regi_ids[r]]
+def _work_error(handle,r,name_ds,name_y,name_x,name_w,name_regimes):
+    data = REGI._regime_data(handle)
+    y_r = data['y']
+    x_r = data['x']
+    w_r = data['w']
     x_constant = USER.check_constant(x_r)
     model = BaseGM_Error(y_r, x_constant, w_r)
     model.title = "SPATIALLY WEIGHTED LEAST SQUARES ESTIMATION - REGIME %s" %r
@@ -1235,11 +1205,13 @@ def _work_error(y,x,regi_ids,r,w_r,name_ds,name_y,name_x,name_w,name_regimes):
     model.name_regimes = name_regimes       
     return model
 
-def _work_endog_error(y,x,yend,q,regi_ids,r,w_r,name_ds,name_y,name_x,name_yend,name_q,name_w,name_regimes):
-    y_r = y[regi_ids[r]]
-    x_r = x[regi_ids[r]]
-    yend_r = yend[regi_ids[r]]
-    q_r = q[regi_ids[r]]
+def _work_endog_error(handle,r,name_ds,name_y,name_x,name_yend,name_q,name_w,name_regimes):
+    data = REGI._regime_data(handle)
+    y_r = data['y']
+    x_r = data['x']
+    yend_r = data['yend']
+    q_r = data['q']
+    w_r = data['w']
     x_constant = USER.check_constant(x_r)
     model = BaseGM_Endog_Error(y_r, x_constant, yend_r, q_r, w_r)
     model.title = "SPATIALLY WEIGHTED TWO STAGE LEAST SQUARES - REGIME %s" %r
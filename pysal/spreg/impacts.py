@@ -0,0 +1,330 @@
+'''
+Direct, indirect and total impacts of the regressors in spatial lag models
+'''
+
+import hashlib
+import numpy as np
+from scipy.stats import norm
+import user_output as USER
+from pysal.weights.weights import sparse_moments
+
+__all__ = ["Impacts", "trace_powers"]
+
+# highest power of W in the series expansion of (I - rho W)^-1
+POWERS = 30
+# number of random vectors of the Monte Carlo estimates of the traces
+PROBES = 50
+# number of draws of the coefficients for the inference on the impacts
+SIMS = 1000
+
+
+class Impacts(object):
+    """
+    Direct, indirect and total impacts of the regressors in a spatial lag
+    model; LeSage and Pace (2009) [1]_
+
+    Parameters
+    ----------
+    reg          : regression object
+                   spatial lag model estimated with GM_Lag or
+                   GM_Lag_Regimes (or their base classes), where the spatial
+                   lag of y is the last endogenous variable
+    w            : pysal W object
+                   Spatial weights object used in the estimation of reg
+    powers       : integer
+                   Highest power of W in the expansion of (I - rho W)^-1
+    probes       : integer
+                   Number of random vectors used to estimate the traces of
+                   the powers of W; when it is not lower than n, the traces
+                   are exact
+    sims         : integer
+                   Number of draws of the coefficients from their estimated
+                   distribution for the inference on the impacts; if 0, only
+                   the point estimates are computed
+    seed         : integer
+                   Seed of the random numbers of the traces and the draws
+
+    Attributes
+    ----------
+    names        : list of strings
+                   Names of the variables whose impacts are computed, all
+                   the regressors but the constant(s) and the spatial lag
+    direct       : array
+                   Average direct impact of each variable
+    indirect     : array
+                   Average indirect (spillover) impact of each variable
+    total        : array
+                   Average total impact of each variable
+    direct_std_err   : array
+                       Standard deviation of the simulated direct impacts
+                       (only if sims > 0)
+    indirect_std_err : array
+                       Standard deviation of the simulated indirect impacts
+                       (only if sims > 0)
+    total_std_err    : array
+                       Standard deviation of the simulated total impacts
+                       (only if sims > 0)
+    direct_z_stat    : list of tuples
+                       z statistic and p-value of the direct impacts (only
+                       if sims > 0)
+    indirect_z_stat  : list of tuples
+                       z statistic and p-value of the indirect impacts (only
+                       if sims > 0)
+    total_z_stat     : list of tuples
+                       z statistic and p-value of the total impacts (only
+                       if sims > 0)
+    powers       : integer
+                   Highest power of W in the expansion of (I - rho W)^-1
+    sims         : integer
+                   Number of draws kept for the inference, those of the
+                   spatial autoregressive coefficients in (-1, 1)
+
+    Notes
+    -----
+
+    The matrix of impacts of variable k is
+    :math:`S_k = (I - \\rho W)^{-1} \\beta_k = \\sum_p \\rho^p W^p \\beta_k`.
+    Its average diagonal element is the direct impact and its average column
+    sum the total impact. Both only depend on the traces and the column sums
+    of the powers of W (see trace_powers), which are computed once for each
+    weights object, so that neither the inverse nor its diagonal are
+    needed. The terms of the series beyond the highest power are
+    approximated by a geometric tail.
+
+    The draws of the coefficients are computed all at once from a normal
+    distribution centered on the estimates, with the estimated variance
+    matrix. The draws of rho outside (-1, 1), for which the series does not
+    converge with a row-standardized W, are discarded.
+
+    When a coefficient is specific to a regime, its impacts are averaged
+    over the observations of the regime; when rho is specific to a regime,
+    it applies to the rows of W of the regime.
+
+    References
+    ----------
+
+    .. [1] LeSage, J. and Pace, R. K. (2009) Introduction to Spatial
+    Econometrics. CRC Press, Boca Raton.
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> from twosls_sp import GM_Lag
+    >>> db = pysal.open(pysal.examples.get_path("columbus.dbf"),'r')
+    >>> y = np.array(db.by_col("CRIME")).reshape(49, 1)
+    >>> X = np.array([db.by_col(name) for name in ['INC', 'HOVAL']]).T
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+    >>> reg = GM_Lag(y, X, w=w, name_x=['INC', 'HOVAL'])
+    >>> imp = Impacts(reg, w, seed=12345)
+    >>> imp.names
+    ['INC', 'HOVAL']
+
+    The columbus weights have fewer observations than probes, so the traces
+    are exact and so are the impacts at the estimated coefficients
+
+    >>> imp.direct
+    array([-1.06894042, -0.28140545])
+    >>> imp.indirect
+    array([-0.77848904, -0.20494225])
+    >>> imp.total
+    array([-1.84742946, -0.4863477 ])
+    """
+    def __init__(self, reg, w, powers=POWERS, probes=PROBES, sims=SIMS,
+                 seed=None):
+        coefs, rhos, members, groups = _coefs(reg)
+        self.names = [reg.name_z[i] for i in coefs]
+        self.powers = powers
+        trW, sumW = trace_powers(w, powers, probes, groups=groups, seed=seed)
+        betas = reg.betas.flatten()
+        direct, total = _impacts(betas[coefs].reshape(1, -1),
+                                 betas[rhos].reshape(1, -1), trW, sumW,
+                                 members)
+        self.direct = direct[0]
+        self.total = total[0]
+        self.indirect = self.total - self.direct
+        if sims:
+            rs = np.random.RandomState(seed)
+            draws = rs.multivariate_normal(betas, reg.vm, sims)
+            draws = draws[(np.abs(draws[:, rhos]) < 1).all(1)]
+            self.sims = draws.shape[0]
+            direct, total = _impacts(draws[:, coefs], draws[:, rhos], trW,
+                                     sumW, members)
+            self.direct_std_err = direct.std(0, ddof=1)
+            self.indirect_std_err = (total - direct).std(0, ddof=1)
+            self.total_std_err = total.std(0, ddof=1)
+            self.direct_z_stat = _z_stat(self.direct, self.direct_std_err)
+            self.indirect_z_stat = _z_stat(self.indirect,
+                                           self.indirect_std_err)
+            self.total_z_stat = _z_stat(self.total, self.total_std_err)
+        else:
+            self.sims = 0
+
+
+def trace_powers(w, powers=POWERS, probes=PROBES, groups=None, seed=None):
+    """
+    Traces and column sums of the powers of W, by groups of observations
+
+    Parameters
+    ----------
+    w            : pysal W object
+                   Spatial weights
+    powers       : integer
+                   Highest power of W
+    probes       : integer
+                   Number of random vectors of the Monte Carlo estimates of
+                   the traces; when it is not lower than n, the unit vectors
+                   are used instead and the traces are exact
+    groups       : array
+                   nx1 array with the group (an integer from 0) of each
+                   observation; if None, all the observations form one group
+    seed         : integer
+                   Seed of the random vectors
+
+    Returns
+    -------
+    trW          : array
+                   G x (powers + 1) array, with the sum over the observations
+                   of group g of the diagonal elements of W^p in row g,
+                   column p
+    sumW         : array
+                   G x (powers + 1) array, with the sum over the columns of
+                   group g of the elements of W^p in row g, column p
+
+    Notes
+    -----
+
+    The diagonal of W^p is estimated with Hutchinson's estimator,
+    :math:`E[z \\circ W^p z]` for random vectors z of independent +/-1
+    elements, so that each power costs one sparse product of W with the
+    n x probes matrix of the vectors. The diagonals of W^0, W^1 and W^2 are
+    computed exactly. The column sums, :math:`(W^{'})^p 1`, are exact.
+    The results are cached on w for each seed, and computed again if its
+    transformation changes.
+
+    Examples
+    --------
+
+    >>> import pysal
+    >>> w = pysal.lat2W(3, 3)
+    >>> w.transform = 'r'
+    >>> trW, sumW = trace_powers(w, powers=3)
+    >>> trW
+    array([[ 9.        ,  0.        ,  3.33333333,  0.        ]])
+    >>> sumW
+    array([[ 9.,  9.,  9.,  9.]])
+    """
+    sparse = w.sparse.tocsr()
+    n = sparse.shape[0]
+    if groups is None:
+        groups = np.zeros(n, int)
+    groups = np.asarray(groups, int).flatten()
+    # the random vectors only depend on seed when the traces are estimated
+    key = ('trace_powers', powers, probes, seed if probes < n else None,
+           hashlib.sha1(np.ascontiguousarray(groups)).hexdigest())
+    if key in w._cache:
+        return w._cache[key]
+    ng = groups.max() + 1
+    if probes >= n:
+        z = np.eye(n)
+        scale = 1.
+    else:
+        rs = np.random.RandomState(seed)
+        z = rs.randint(0, 2, (n, probes)) * 2. - 1
+        scale = 1. / probes
+    sparse_t = sparse.T.tocsr()
+    trW = np.zeros((ng, powers + 1))
+    sumW = np.zeros((ng, powers + 1))
+    wz = z
+    colsum = np.ones(n)
+    for p in range(powers + 1):
+        if p > 0:
+            wz = sparse * wz
+            colsum = sparse_t * colsum
+        if p == 0:
+            diag = np.ones(n)
+        elif p == 1:
+            diag = sparse.diagonal()
+        elif p == 2:
+            diag = sparse_moments(sparse)['diagW2']
+        else:
+            diag = (z * wz).sum(1) * scale
+        trW[:, p] = np.bincount(groups, diag, minlength=ng)
+        sumW[:, p] = np.bincount(groups, colsum, minlength=ng)
+    w._cache[key] = (trW, sumW)
+    return trW, sumW
+
+
+def _coefs(reg):
+    """
+    Positions in the betas of the variables with impacts and of the spatial
+    autoregressive coefficient of each group of observations, membership of
+    the variables to the groups, and group of each observation
+    """
+    k = reg.betas.shape[0]
+    if not hasattr(reg, 'regimes_set'):
+        return range(1, k - 1), [k - 1], np.ones((k - 2, 1), bool), None
+    regimes_set = list(reg.regimes_set)
+    nr = len(regimes_set)
+    name_lag = USER.set_name_yend_sp(reg.name_y)
+    coefs, members = [], []
+    rhos = np.zeros(nr, int)
+    for i, name in enumerate(reg.name_z):
+        if name.startswith('_Global_'):
+            member = np.ones(nr, bool)
+            base = name[len('_Global_'):]
+        else:
+            for g, r in enumerate(regimes_set):
+                prefix = '%s_' % r
+                if name.startswith(prefix):
+                    break
+            member = np.arange(nr) == g
+            base = name[len(prefix):]
+        if base == name_lag:
+            rhos[member] = i
+        elif base != 'CONSTANT':
+            coefs.append(i)
+            members.append(member)
+    index = dict((r, g) for g, r in enumerate(regimes_set))
+    groups = np.array([index[r] for r in reg.regimes])
+    return coefs, list(rhos), np.array(members), groups
+
+
+def _impacts(betas, rhos, trW, sumW, members):
+    """
+    Direct and total impacts (draws x variables) for draws of the
+    coefficients (draws x variables) and of rho (draws x groups)
+    """
+    ng = np.dot(members, trW[:, 0])
+    direct = betas * np.dot(_series(rhos, trW), members.T) / ng
+    total = betas * np.dot(_series(rhos, sumW), members.T) / ng
+    return direct, total
+
+
+def _series(rhos, a):
+    """
+    Sum over p of rho^p a[g, p] (draws x groups), with the terms beyond the
+    last power approximated from the mean of the last two
+    """
+    powers = a.shape[1] - 1
+    rp = rhos[:, :, None] ** np.arange(powers + 1)
+    tail = a[:, -2:].mean(1) * rhos ** (powers + 1) / (1 - rhos)
+    return (rp * a).sum(2) + tail
+
+
+def _z_stat(impacts, std_err):
+    z = impacts / std_err
+    return [(zi, norm.sf(abs(zi)) * 2) for zi in z]
+
+
+def _test():
+    import doctest
+    start_suppress = np.get_printoptions()['suppress']
+    np.set_printoptions(suppress=True)
+    doctest.testmod()
+    np.set_printoptions(suppress=start_suppress)
+
+if __name__ == '__main__':
+    _test()
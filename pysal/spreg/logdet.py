@@ -0,0 +1,378 @@
+"""
+Log-determinant of the spatial filter I - rho W for maximum likelihood
+estimation
+"""
+
+import numpy as np
+import numpy.linalg as la
+import scipy.sparse as SP
+from scipy.sparse.linalg import splu
+
+__all__ = ["get_logdet", "EigLogDet", "LULogDet", "ChebyshevLogDet",
+           "MCLogDet"]
+
+# largest n for which method 'auto' uses the eigenvalues of W
+FULL_MAX = 1000
+# largest n for which method 'auto' uses a sparse LU factorization
+LU_MAX = 100000
+# number of random probe vectors used by the stochastic traces
+PROBES = 50
+# seed of the probe vectors, so estimates do not depend on the global state
+SEED = 12345
+
+
+def get_logdet(w, method='auto'):
+    """
+    Log-determinant backend of a weights object, cached on the weights
+
+    Parameters
+    ----------
+    w            : W
+                   spatial weights object
+    method       : string
+                   'full' for the eigenvalues of W, 'lu' for a sparse LU
+                   factorization of I - rho W at every evaluation, 'cheb' for
+                   the Chebyshev approximation and 'mc' for the Monte Carlo
+                   power series approximation. 'auto' (default) uses 'full'
+                   up to FULL_MAX observations, 'lu' up to LU_MAX and 'cheb'
+                   beyond.
+
+    Returns
+    -------
+    logdet       : LogDet
+                   instance such that logdet(rho) is ln|I - rho W|. It is
+                   kept in the cache of w, so a model estimated again on the
+                   same weights does not rebuild it (the cache is cleared when
+                   the transformation of w changes).
+
+    Examples
+    --------
+    >>> import pysal
+    >>> w = pysal.lat2W(10, 10)
+    >>> w.transform = 'r'
+    >>> logdet = get_logdet(w)
+    >>> logdet.method
+    'full'
+    >>> get_logdet(w) is logdet
+    True
+    >>> round(logdet(0.5), 6) == round(get_logdet(w, 'lu')(0.5), 6)
+    True
+    """
+    if method == 'auto':
+        if w.n <= FULL_MAX:
+            method = 'full'
+        elif w.n <= LU_MAX:
+            method = 'lu'
+        else:
+            method = 'cheb'
+    if method not in BACKENDS:
+        raise Exception, "Invalid method selected for the log-determinant."
+    key = 'logdet_' + method
+    if key not in w._cache:
+        w._cache[key] = BACKENDS[method](w.sparse)
+    return w._cache[key]
+
+
+class LogDet(object):
+    """
+    Base class of the backends of ln|I - rho W|
+
+    Parameters
+    ----------
+    sparse       : sparse matrix
+                   nxn spatial weights
+
+    Attributes
+    ----------
+    n            : integer
+                   number of observations
+    radius       : float
+                   largest absolute row sum of W, an upper bound of its
+                   spectral radius
+    bounds       : tuple
+                   (-1 / radius, 1 / radius), interval of rho over which
+                   I - rho W is known to be non-singular
+    """
+    method = None
+
+    def __init__(self, sparse):
+        self.sparse = SP.csr_matrix(sparse)
+        self.n = self.sparse.shape[0]
+        self.radius = float(abs(self.sparse).sum(1).max())
+        self.bounds = (-1.0 / self.radius, 1.0 / self.radius)
+
+    def __call__(self, rho):
+        raise NotImplementedError
+
+    def solve(self, rho, b):
+        """
+        Solution x of (I - rho W) x = b, from a sparse LU factorization
+
+        Parameters
+        ----------
+        rho          : float
+                       spatial parameter
+        b            : array
+                       n or nxk array
+
+        Returns
+        -------
+        x            : array
+                       array of the shape of b
+        """
+        return splu(self._filter(rho)).solve(np.asarray(b, float))
+
+    def traces(self, rho):
+        """
+        Traces of WA, WAWA and WA'WA, with A the inverse of I - rho W
+
+        The inverse is never built: each trace is averaged over PROBES
+        random vectors (Hutchinson estimator), using one sparse LU
+        factorization of I - rho W for all the products with A. The leading
+        terms of the power series of A, whose traces are known exactly, are
+        taken out of the average, which cuts most of its variance.
+
+        Parameters
+        ----------
+        rho          : float
+                       spatial parameter
+
+        Returns
+        -------
+        traces       : tuple
+                       tr(WA), tr(WAWA), tr(WA'WA)
+        """
+        sparse = self.sparse
+        tr_w = sparse.diagonal().sum()
+        tr_ww = sparse.multiply(sparse.T).sum()
+        tr_wtw = sparse.multiply(sparse).sum()
+        lu = splu(self._filter(rho))
+        u = _probes(self.n)
+        wu = sparse * u
+        wwu = sparse * wu
+        wau = sparse * lu.solve(u)
+        wawau = sparse * lu.solve(wau)
+        tr1 = tr_w + rho * tr_ww + \
+            (u * (wau - wu - rho * wwu)).sum() / PROBES
+        tr2 = tr_ww + (u * (wawau - wwu)).sum() / PROBES
+        tr3 = tr_wtw + (wau * wau - wu * wu).sum() / PROBES
+        return tr1, tr2, tr3
+
+    def _filter(self, rho):
+        return (SP.identity(self.n, format='csc') - rho * self.sparse).tocsc()
+
+
+class EigLogDet(LogDet):
+    """
+    Exact ln|I - rho W| from the eigenvalues of W
+
+    The eigenvalues are computed once, in O(n^3), after which every
+    evaluation is a sum over n values. Suited to small n.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> import numpy as np
+    >>> w = pysal.lat2W(5, 5)
+    >>> w.transform = 'r'
+    >>> logdet = EigLogDet(w.sparse)
+    >>> exact = np.log(la.det(np.eye(w.n) - 0.3 * w.full()[0]))
+    >>> np.allclose(logdet(0.3), exact)
+    True
+    """
+    method = 'full'
+
+    def __init__(self, sparse):
+        LogDet.__init__(self, sparse)
+        self.eig = la.eigvals(self.sparse.toarray())
+
+    def __call__(self, rho):
+        return np.log(1.0 - rho * self.eig).sum().real
+
+    def traces(self, rho):
+        """
+        Exact traces of WA, WAWA and WA'WA, with A the inverse of I - rho W
+        """
+        wf = self.sparse.toarray()
+        wa = np.dot(wf, la.inv(np.eye(self.n) - rho * wf))
+        d = self.eig / (1.0 - rho * self.eig)
+        return d.sum().real, (d * d).sum().real, (wa * wa).sum()
+
+
+class LULogDet(LogDet):
+    """
+    Exact ln|I - rho W| from a sparse LU factorization of I - rho W
+
+    Every evaluation factorizes the sparse filter and sums the logs of the
+    diagonal of U, which is linear in n for the sparse weights of
+    contiguity or k nearest neighbors. Suited to medium n.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> import numpy as np
+    >>> w = pysal.lat2W(5, 5)
+    >>> w.transform = 'r'
+    >>> logdet = LULogDet(w.sparse)
+    >>> exact = np.log(la.det(np.eye(w.n) - 0.3 * w.full()[0]))
+    >>> np.allclose(logdet(0.3), exact)
+    True
+    """
+    method = 'lu'
+
+    def __call__(self, rho):
+        lu = splu(self._filter(rho))
+        return np.log(np.abs(lu.U.diagonal())).sum()
+
+
+class ChebyshevLogDet(LogDet):
+    """
+    Chebyshev approximation of ln|I - rho W| (Pace and LeSage 2004) [1]_
+
+    W is scaled by its radius so its eigenvalues x lie in [-1, 1], and
+    ln(1 - rho x) is interpolated by a Chebyshev polynomial of the given
+    order. The log-determinant is then a weighted sum of the traces of the
+    Chebyshev polynomials T_j(W), which are computed once: exactly for j < 3
+    and averaged over PROBES random vectors otherwise. Every evaluation
+    costs O(order^2) operations, whatever n. Suited to large n.
+
+    Parameters
+    ----------
+    sparse       : sparse matrix
+                   nxn spatial weights
+    order        : integer
+                   order of the polynomial
+
+    References
+    ----------
+
+    .. [1] Pace, R.K., LeSage, J.P. (2004) "Chebyshev approximation of
+    log-determinants of spatial weight matrices". Computational Statistics
+    and Data Analysis, 45, 2.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> import numpy as np
+    >>> w = pysal.lat2W(20, 20)
+    >>> w.transform = 'r'
+    >>> logdet = ChebyshevLogDet(w.sparse)
+    >>> exact = EigLogDet(w.sparse)
+    >>> abs(logdet(0.5) - exact(0.5)) < 0.01 * abs(exact(0.5))
+    True
+    """
+    method = 'cheb'
+
+    def __init__(self, sparse, order=20):
+        LogDet.__init__(self, sparse)
+        self.order = order
+        self.trace_t = _power_traces(self.sparse / self.radius, order,
+                                     chebyshev=True)
+        j = np.arange(order + 1)
+        self.nodes = np.cos(np.pi * (np.arange(order + 1) + 0.5) / (order + 1))
+        # T_j at the Chebyshev nodes, one row per j
+        self.t_nodes = np.cos(np.outer(j, np.arccos(self.nodes)))
+
+    def __call__(self, rho):
+        f = np.log(1.0 - rho * self.radius * self.nodes)
+        c = 2.0 * np.dot(self.t_nodes, f) / (self.order + 1)
+        return np.dot(c, self.trace_t) - 0.5 * c[0] * self.n
+
+
+class MCLogDet(LogDet):
+    """
+    Monte Carlo approximation of ln|I - rho W| (Barry and Pace 1999) [1]_
+
+    The power series ln|I - rho W| = -sum_k rho^k tr(W^k) / k is truncated
+    at the given order. The traces are computed once: exactly for k < 3 and
+    averaged over PROBES random vectors otherwise. Every evaluation costs
+    O(order) operations, whatever n. Suited to large n when rho is not close
+    to the bounds, where the truncated series converges slowly.
+
+    Parameters
+    ----------
+    sparse       : sparse matrix
+                   nxn spatial weights
+    order        : integer
+                   number of terms of the series
+
+    References
+    ----------
+
+    .. [1] Barry, R.P., Pace, R.K. (1999) "Monte Carlo estimates of the log
+    determinant of large sparse matrices". Linear Algebra and its
+    Applications, 289.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> import numpy as np
+    >>> w = pysal.lat2W(20, 20)
+    >>> w.transform = 'r'
+    >>> logdet = MCLogDet(w.sparse)
+    >>> exact = EigLogDet(w.sparse)
+    >>> abs(logdet(0.5) - exact(0.5)) < 0.01 * abs(exact(0.5))
+    True
+    """
+    method = 'mc'
+
+    def __init__(self, sparse, order=50):
+        LogDet.__init__(self, sparse)
+        self.order = order
+        self.trace_p = _power_traces(self.sparse / self.radius, order)
+        self.k = np.arange(1, order + 1)
+
+    def __call__(self, rho):
+        r = rho * self.radius
+        return -(r ** self.k * self.trace_p[1:] / self.k).sum()
+
+
+BACKENDS = {'full': EigLogDet, 'lu': LULogDet, 'cheb': ChebyshevLogDet,
+            'mc': MCLogDet}
+
+
+def _probes(n):
+    """
+    n x PROBES random vectors of -1 and 1, drawn from their own stream
+    """
+    rs = np.random.RandomState(SEED)
+    return rs.randint(0, 2, (n, PROBES)) * 2.0 - 1.0
+
+
+def _power_traces(sparse, order, chebyshev=False):
+    """
+    Traces of W^j, or of the Chebyshev polynomials T_j(W), for j up to order
+
+    The first three traces are exact, the others are averaged over PROBES
+    random vectors u as u'W^ju, which only takes products of W with the
+    n x PROBES block of vectors.
+    """
+    n = sparse.shape[0]
+    tr_w = sparse.diagonal().sum()
+    tr_w2 = sparse.multiply(sparse.T).sum()
+    traces = np.zeros(order + 1)
+    traces[:3] = [n, tr_w, tr_w2]
+    if chebyshev:
+        # T_2(W) = 2W^2 - I
+        traces[2] = 2 * tr_w2 - n
+    u = _probes(n)
+    prev, cur = u, sparse * u
+    for j in xrange(2, order + 1):
+        if chebyshev:
+            prev, cur = cur, 2 * (sparse * cur) - prev
+        else:
+            prev, cur = cur, sparse * cur
+        if j > 2:
+            traces[j] = (u * cur).sum() / PROBES
+    return traces[:order + 1]
+
+
+def _test():
+    import doctest
+    start_suppress = np.get_printoptions()['suppress']
+    np.set_printoptions(suppress=True)
+    doctest.testmod()
+    np.set_printoptions(suppress=start_suppress)
+
+if __name__ == '__main__':
+    _test()
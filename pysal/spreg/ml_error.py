@@ -0,0 +1,312 @@
+"""
+ML Estimation of Spatial Error Model
+"""
+
+import numpy as np
+import numpy.linalg as la
+from scipy.optimize import fminbound
+from utils import RegressionPropsY, spdot
+from logdet import get_logdet
+import user_output as USER
+import summary_output as SUMMARY
+
+__all__ = ["ML_Error"]
+
+
+class BaseML_Error(RegressionPropsY):
+    """
+    ML estimation of the spatial error model (note: no consistency checks,
+    diagnostics or constant added); Anselin (1988) [1]_
+
+    The likelihood is concentrated on lambda, which is found by a bounded
+    line search. The cross products of x, y and their spatial lags are
+    computed once, so each step only evaluates ln|I - lambda W| with the
+    backend of w (see logdet.get_logdet) and solves a kxk system.
+
+    Parameters
+    ----------
+    y            : array
+                   nx1 array for dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    w            : W
+                   Spatial weights object, its log-determinant backend is
+                   cached and reused by later models
+    method       : string
+                   log-determinant backend: 'full' (eigenvalues), 'lu'
+                   (sparse LU), 'cheb' (Chebyshev approximation), 'mc'
+                   (Monte Carlo approximation) or 'auto' (default), which
+                   picks one from the number of observations
+    epsilon      : float
+                   tolerance of the line search on lambda
+
+    Attributes
+    ----------
+    betas        : array
+                   (k+1)x1 array of estimated coefficients (lambda last)
+    lam          : float
+                   estimate of the spatial autoregressive coefficient
+    u            : array
+                   nx1 array of residuals
+    e_filtered   : array
+                   nx1 array of spatially filtered residuals
+    predy        : array
+                   nx1 array of predicted y values
+    n            : integer
+                   Number of observations
+    k            : integer
+                   Number of variables for which coefficients are estimated
+                   (including the constant, excluding lambda)
+    y            : array
+                   nx1 array for dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    method       : string
+                   log-determinant backend used
+    mean_y       : float
+                   Mean of dependent variable
+    std_y        : float
+                   Standard deviation of dependent variable
+    vm           : array
+                   Variance covariance matrix ((k+1)x(k+1)), lambda last
+    vm1          : array
+                   2x2 variance covariance matrix of lambda and sigma squared
+    sig2         : float
+                   ML estimate of sigma squared
+    logll        : float
+                   maximized log-likelihood (including constant terms)
+
+    References
+    ----------
+
+    .. [1] Anselin, L. (1988) "Spatial Econometrics: Methods and Models".
+    Kluwer, Dordrecht.
+
+    Examples
+    --------
+
+    >>> import pysal
+    >>> import numpy as np
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> y = np.array([db.by_col('CRIME')]).T
+    >>> x = np.array([db.by_col('INC'), db.by_col('HOVAL')]).T
+    >>> x = np.hstack((np.ones(y.shape), x))
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+    >>> model = BaseML_Error(y, x, w)
+    >>> np.around(model.betas, decimals=4)
+    array([[ 60.2795],
+           [ -0.9573],
+           [ -0.3046],
+           [  0.5468]])
+    >>> np.around(np.sqrt(model.vm.diagonal()), decimals=4)
+    array([ 5.3656,  0.3342,  0.092 ,  0.1381])
+    """
+    def __init__(self, y, x, w, method='auto', epsilon=0.0000001):
+        self.y = y
+        self.x = x
+        self.n, self.k = x.shape
+        logdet = get_logdet(w, method)
+        self.method = logdet.method
+        n = self.n
+
+        # cross products of [x, y] and of their spatial lags, so that the
+        # filtered cross products are quadratic in lambda
+        xy = np.hstack((x, y))
+        wxy = w.sparse * xy
+        c0 = spdot(xy.T, xy)
+        c1 = spdot(xy.T, wxy)
+        c1 = c1 + c1.T
+        c2 = spdot(wxy.T, wxy)
+        k = self.k
+
+        def filtered_ols(lam):
+            c = c0 - lam * c1 + lam * lam * c2
+            b = la.solve(c[:k, :k], c[:k, k:])
+            utu = float(c[k, k] - np.dot(b.T, c[:k, k:]))
+            return b, utu, c[:k, :k]
+
+        def neg_concentrated_ll(lam):
+            utu = filtered_ols(lam)[1]
+            return 0.5 * n * np.log(utu / n) - logdet(lam)
+
+        lam = fminbound(neg_concentrated_ll, logdet.bounds[0],
+                        logdet.bounds[1], xtol=epsilon)
+        self.lam = float(lam)
+        b, utu, xsxs = filtered_ols(self.lam)
+        self.betas = np.vstack((b, np.array([[self.lam]])))
+        self.predy = spdot(x, b)
+        self.u = y - self.predy
+        self.e_filtered = self.u - self.lam * (w.sparse * self.u)
+        self.sig2 = float(np.dot(self.e_filtered.T, self.e_filtered)) / n
+        self.logll = -0.5 * n * (np.log(2 * np.pi) + np.log(self.sig2) + 1) \
+            + logdet(self.lam)
+
+        # information matrix of lambda and sigma squared, with the traces of
+        # W(I - lambda W)^-1 from the backend
+        tr1, tr2, tr3 = logdet.traces(self.lam)
+        sig2 = self.sig2
+        info = np.array([[tr2 + tr3, tr1 / sig2],
+                         [tr1 / sig2, n / (2.0 * sig2 ** 2)]])
+        self.vm1 = la.inv(info)
+        self.vm = np.zeros((k + 1, k + 1))
+        self.vm[:k, :k] = sig2 * la.inv(xsxs)
+        self.vm[k, k] = self.vm1[0, 0]
+        self._cache = {}
+
+
+class ML_Error(BaseML_Error):
+    """
+    ML estimation of the spatial error model with results and diagnostics;
+    Anselin (1988) [1]_
+
+    Parameters
+    ----------
+    y            : array
+                   nx1 array for dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, excluding the constant
+    w            : W
+                   Spatial weights object
+    method       : string
+                   log-determinant backend: 'full' (eigenvalues), 'lu'
+                   (sparse LU), 'cheb' (Chebyshev approximation), 'mc'
+                   (Monte Carlo approximation) or 'auto' (default), which
+                   picks one from the number of observations
+    epsilon      : float
+                   tolerance of the line search on lambda
+    vm           : boolean
+                   if True, include variance-covariance matrix in summary
+                   results
+    name_y       : string
+                   Name of dependent variable for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    Attributes
+    ----------
+    summary      : string
+                   Summary of regression results and diagnostics (note: use in
+                   conjunction with the print command)
+    betas        : array
+                   (k+1)x1 array of estimated coefficients (lambda last)
+    lam          : float
+                   estimate of the spatial autoregressive coefficient
+    u            : array
+                   nx1 array of residuals
+    e_filtered   : array
+                   nx1 array of spatially filtered residuals
+    predy        : array
+                   nx1 array of predicted y values
+    n            : integer
+                   Number of observations
+    k            : integer
+                   Number of variables for which coefficients are estimated
+                   (including the constant, excluding lambda)
+    y            : array
+                   nx1 array for dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    method       : string
+                   log-determinant backend used
+    mean_y       : float
+                   Mean of dependent variable
+    std_y        : float
+                   Standard deviation of dependent variable
+    vm           : array
+                   Variance covariance matrix ((k+1)x(k+1)), lambda last
+    vm1          : array
+                   2x2 variance covariance matrix of lambda and sigma squared
+    sig2         : float
+                   ML estimate of sigma squared
+    logll        : float
+                   maximized log-likelihood (including constant terms)
+    aic          : float
+                   Akaike information criterion
+    schwarz      : float
+                   Schwarz criterion
+    std_err      : array
+                   1x(k+1) array of standard errors of the betas
+    z_stat       : list of tuples
+                   z statistic; each tuple contains the pair (statistic,
+                   p-value), where each is a float
+    pr2          : float
+                   Pseudo R squared (squared correlation between y and ypred)
+    name_y       : string
+                   Name of dependent variable for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output, with
+                   lambda last
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+    title        : string
+                   Name of the regression method used
+
+    References
+    ----------
+
+    .. [1] Anselin, L. (1988) "Spatial Econometrics: Methods and Models".
+    Kluwer, Dordrecht.
+
+    Examples
+    --------
+
+    >>> import pysal
+    >>> import numpy as np
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> y = np.array([db.by_col('CRIME')]).T
+    >>> x = np.array([db.by_col('INC'), db.by_col('HOVAL')]).T
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+    >>> model = ML_Error(y, x, w, name_y='crime', name_x=['income', 'hoval'], name_ds='columbus')
+    >>> print model.name_x
+    ['CONSTANT', 'income', 'hoval', 'lambda']
+    >>> np.around(model.betas, decimals=4)
+    array([[ 60.2795],
+           [ -0.9573],
+           [ -0.3046],
+           [  0.5468]])
+    >>> round(model.logll, 3)
+    -183.749
+    """
+    def __init__(self, y, x, w, method='auto', epsilon=0.0000001,
+                 vm=False, name_y=None, name_x=None,
+                 name_w=None, name_ds=None):
+        n = USER.check_arrays(y, x)
+        USER.check_y(y, n)
+        USER.check_weights(w, y, w_required=True)
+        x_constant = USER.check_constant(x)
+        BaseML_Error.__init__(self, y=y, x=x_constant, w=w, method=method,
+                              epsilon=epsilon)
+        # lambda counts as a parameter in the information criteria
+        self.aic = -2.0 * self.logll + 2.0 * (self.k + 1)
+        self.schwarz = -2.0 * self.logll + (self.k + 1) * np.log(self.n)
+        self.title = "MAXIMUM LIKELIHOOD SPATIAL ERROR" + \
+            " (METHOD = " + self.method.upper() + ")"
+        self.name_ds = USER.set_name_ds(name_ds)
+        self.name_y = USER.set_name_y(name_y)
+        self.name_x = USER.set_name_x(name_x, x)
+        self.name_x.append('lambda')
+        self.name_w = USER.set_name_w(name_w, w)
+        SUMMARY.ML_Error(reg=self, w=w, vm=vm)
+
+
+def _test():
+    import doctest
+    start_suppress = np.get_printoptions()['suppress']
+    np.set_printoptions(suppress=True)
+    doctest.testmod()
+    np.set_printoptions(suppress=start_suppress)
+
+if __name__ == '__main__':
+    _test()
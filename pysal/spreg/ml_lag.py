@@ -0,0 +1,324 @@
+"""
+ML Estimation of Spatial Lag Model
+"""
+
+import numpy as np
+import numpy.linalg as la
+from scipy.optimize import fminbound
+from utils import RegressionPropsY, spdot, sp_att, set_warn
+from logdet import get_logdet
+import user_output as USER
+import summary_output as SUMMARY
+
+__all__ = ["ML_Lag"]
+
+
+class BaseML_Lag(RegressionPropsY):
+    """
+    ML estimation of the spatial lag model (note: no consistency checks,
+    diagnostics or constant added); Anselin (1988) [1]_
+
+    The likelihood is concentrated on rho, which is found by a bounded line
+    search. Each step only evaluates ln|I - rho W| with the backend of w
+    (see logdet.get_logdet) and a few scalar products of OLS residuals.
+
+    Parameters
+    ----------
+    y            : array
+                   nx1 array for dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    w            : W
+                   Spatial weights object, its log-determinant backend is
+                   cached and reused by later models
+    method       : string
+                   log-determinant backend: 'full' (eigenvalues), 'lu'
+                   (sparse LU), 'cheb' (Chebyshev approximation), 'mc'
+                   (Monte Carlo approximation) or 'auto' (default), which
+                   picks one from the number of observations
+    epsilon      : float
+                   tolerance of the line search on rho
+
+    Attributes
+    ----------
+    betas        : array
+                   (k+1)x1 array of estimated coefficients (rho last)
+    rho          : float
+                   estimate of the spatial autoregressive coefficient
+    u            : array
+                   nx1 array of residuals
+    predy        : array
+                   nx1 array of predicted y values
+    n            : integer
+                   Number of observations
+    k            : integer
+                   Number of variables for which coefficients are estimated
+                   (including the constant, excluding rho)
+    y            : array
+                   nx1 array for dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    method       : string
+                   log-determinant backend used
+    mean_y       : float
+                   Mean of dependent variable
+    std_y        : float
+                   Standard deviation of dependent variable
+    vm           : array
+                   Variance covariance matrix ((k+1)x(k+1)), rho last
+    vm1          : array
+                   Variance covariance matrix ((k+2)x(k+2)) including sigma
+                   squared
+    sig2         : float
+                   ML estimate of sigma squared
+    logll        : float
+                   maximized log-likelihood (including constant terms)
+
+    References
+    ----------
+
+    .. [1] Anselin, L. (1988) "Spatial Econometrics: Methods and Models".
+    Kluwer, Dordrecht.
+
+    Examples
+    --------
+
+    >>> import pysal
+    >>> import numpy as np
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> y = np.array([db.by_col('CRIME')]).T
+    >>> x = np.array([db.by_col('INC'), db.by_col('HOVAL')]).T
+    >>> x = np.hstack((np.ones(y.shape), x))
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+    >>> model = BaseML_Lag(y, x, w)
+    >>> np.around(model.betas, decimals=4)
+    array([[ 45.6032],
+           [ -1.0487],
+           [ -0.2663],
+           [  0.4233]])
+    >>> np.around(np.sqrt(model.vm.diagonal()), decimals=4)
+    array([ 7.2574,  0.3074,  0.0891,  0.1195])
+    """
+    def __init__(self, y, x, w, method='auto', epsilon=0.0000001):
+        self.y = y
+        self.x = x
+        self.n, self.k = x.shape
+        logdet = get_logdet(w, method)
+        self.method = logdet.method
+        n = self.n
+
+        # residuals of y and of its spatial lag on x
+        ylag = w.sparse * y
+        xtxi = la.inv(spdot(x.T, x))
+        b0 = np.dot(xtxi, spdot(x.T, y))
+        b1 = np.dot(xtxi, spdot(x.T, ylag))
+        e0 = y - spdot(x, b0)
+        e1 = ylag - spdot(x, b1)
+        e0e0 = float(np.dot(e0.T, e0))
+        e0e1 = float(np.dot(e0.T, e1))
+        e1e1 = float(np.dot(e1.T, e1))
+
+        def neg_concentrated_ll(rho):
+            utu = e0e0 - 2.0 * rho * e0e1 + rho * rho * e1e1
+            return 0.5 * n * np.log(utu / n) - logdet(rho)
+
+        rho = fminbound(neg_concentrated_ll, logdet.bounds[0],
+                        logdet.bounds[1], xtol=epsilon)
+        self.rho = float(rho)
+        b = b0 - self.rho * b1
+        self.betas = np.vstack((b, np.array([[self.rho]])))
+        self.u = e0 - self.rho * e1
+        self.predy = self.y - self.u
+        self.sig2 = float(np.dot(self.u.T, self.u)) / n
+        self.logll = -0.5 * n * (np.log(2 * np.pi) + np.log(self.sig2) + 1) \
+            + logdet(self.rho)
+
+        # information matrix, with the traces and the products with
+        # W(I - rho W)^-1 from the backend
+        waxb = w.sparse * logdet.solve(self.rho, spdot(x, b))
+        tr1, tr2, tr3 = logdet.traces(self.rho)
+        sig2 = self.sig2
+        k = self.k
+        info = np.zeros((k + 2, k + 2))
+        info[:k, :k] = spdot(x.T, x) / sig2
+        info[:k, k] = info[k, :k] = spdot(x.T, waxb).flatten() / sig2
+        info[k, k] = tr2 + tr3 + float(np.dot(waxb.T, waxb)) / sig2
+        info[k, k + 1] = info[k + 1, k] = tr1 / sig2
+        info[k + 1, k + 1] = n / (2.0 * sig2 ** 2)
+        self.vm1 = la.inv(info)
+        self.vm = self.vm1[:-1, :-1]
+        self._cache = {}
+
+
+class ML_Lag(BaseML_Lag):
+    """
+    ML estimation of the spatial lag model with results and diagnostics;
+    Anselin (1988) [1]_
+
+    Parameters
+    ----------
+    y            : array
+                   nx1 array for dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, excluding the constant
+    w            : W
+                   Spatial weights object
+    method       : string
+                   log-determinant backend: 'full' (eigenvalues), 'lu'
+                   (sparse LU), 'cheb' (Chebyshev approximation), 'mc'
+                   (Monte Carlo approximation) or 'auto' (default), which
+                   picks one from the number of observations
+    epsilon      : float
+                   tolerance of the line search on rho
+    vm           : boolean
+                   if True, include variance-covariance matrix in summary
+                   results
+    name_y       : string
+                   Name of dependent variable for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    Attributes
+    ----------
+    summary      : string
+                   Summary of regression results and diagnostics (note: use in
+                   conjunction with the print command)
+    betas        : array
+                   (k+1)x1 array of estimated coefficients (rho last)
+    rho          : float
+                   estimate of the spatial autoregressive coefficient
+    u            : array
+                   nx1 array of residuals
+    predy        : array
+                   nx1 array of predicted y values
+    predy_e      : array
+                   nx1 array of predicted y values from the reduced form
+    e_pred       : array
+                   nx1 array of residuals from the reduced form
+    n            : integer
+                   Number of observations
+    k            : integer
+                   Number of variables for which coefficients are estimated
+                   (including the constant, excluding rho)
+    y            : array
+                   nx1 array for dependent variable
+    x            : array
+                   Two dimensional array with n rows and one column for each
+                   independent (exogenous) variable, including the constant
+    method       : string
+                   log-determinant backend used
+    mean_y       : float
+                   Mean of dependent variable
+    std_y        : float
+                   Standard deviation of dependent variable
+    vm           : array
+                   Variance covariance matrix ((k+1)x(k+1)), rho last
+    vm1          : array
+                   Variance covariance matrix ((k+2)x(k+2)) including sigma
+                   squared
+    sig2         : float
+                   ML estimate of sigma squared
+    logll        : float
+                   maximized log-likelihood (including constant terms)
+    aic          : float
+                   Akaike information criterion
+    schwarz      : float
+                   Schwarz criterion
+    std_err      : array
+                   1x(k+1) array of standard errors of the betas
+    z_stat       : list of tuples
+                   z statistic; each tuple contains the pair (statistic,
+                   p-value), where each is a float
+    pr2          : float
+                   Pseudo R squared (squared correlation between y and ypred)
+    pr2_e        : float
+                   Pseudo R squared (squared correlation between y and ypred_e
+                   (using reduced form))
+    name_y       : string
+                   Name of dependent variable for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output, with the
+                   spatial lag of y last
+    name_w       : string
+                   Name of weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+    title        : string
+                   Name of the regression method used
+
+    References
+    ----------
+
+    .. [1] Anselin, L. (1988) "Spatial Econometrics: Methods and Models".
+    Kluwer, Dordrecht.
+
+    Examples
+    --------
+
+    >>> import pysal
+    >>> import numpy as np
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> y = np.array([db.by_col('CRIME')]).T
+    >>> x = np.array([db.by_col('INC'), db.by_col('HOVAL')]).T
+    >>> w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+    >>> w.transform = 'r'
+    >>> model = ML_Lag(y, x, w, name_y='crime', name_x=['income', 'hoval'], name_ds='columbus')
+    >>> print model.name_x
+    ['CONSTANT', 'income', 'hoval', 'W_crime']
+    >>> np.around(model.betas, decimals=4)
+    array([[ 45.6032],
+           [ -1.0487],
+           [ -0.2663],
+           [  0.4233]])
+    >>> round(model.logll, 3)
+    -182.674
+
+    With the sparse LU backend, the traces in the variance are estimated
+    from random vectors instead of the exact inverse
+
+    >>> model = ML_Lag(y, x, w, method='lu')
+    >>> round(model.rho, 4)
+    0.4233
+    """
+    def __init__(self, y, x, w, method='auto', epsilon=0.0000001,
+                 vm=False, name_y=None, name_x=None,
+                 name_w=None, name_ds=None):
+        n = USER.check_arrays(y, x)
+        USER.check_y(y, n)
+        USER.check_weights(w, y, w_required=True)
+        x_constant = USER.check_constant(x)
+        BaseML_Lag.__init__(self, y=y, x=x_constant, w=w, method=method,
+                            epsilon=epsilon)
+        self.predy_e, self.e_pred, warn = sp_att(w.sparse, self.y,
+                    self.predy, w.sparse * self.y, self.rho)
+        set_warn(self, warn)
+        # rho counts as a parameter in the information criteria
+        self.aic = -2.0 * self.logll + 2.0 * (self.k + 1)
+        self.schwarz = -2.0 * self.logll + (self.k + 1) * np.log(self.n)
+        self.title = "MAXIMUM LIKELIHOOD SPATIAL LAG" + \
+            " (METHOD = " + self.method.upper() + ")"
+        self.name_ds = USER.set_name_ds(name_ds)
+        self.name_y = USER.set_name_y(name_y)
+        self.name_x = USER.set_name_x(name_x, x)
+        self.name_x.append(USER.set_name_yend_sp(self.name_y))
+        self.name_w = USER.set_name_w(name_w, w)
+        SUMMARY.ML_Lag(reg=self, w=w, vm=vm)
+
+
+def _test():
+    import doctest
+    start_suppress = np.get_printoptions()['suppress']
+    np.set_printoptions(suppress=True)
+    doctest.testmod()
+    np.set_printoptions(suppress=start_suppress)
+
+if __name__ == '__main__':
+    _test()
@@ -6,13 +6,11 @@ __author__ = "Luc Anselin luc.anselin@asu.edu, Pedro V. Amaral pedro.amaral@asu.
 
 import regimes as REGI
 import user_output as USER
-import multiprocessing as mp
 from ols import BaseOLS
 from utils import set_warn, spbroadcast, RegressionProps_basic, RegressionPropsY
 from robust import hac_multi
 import summary_output as SUMMARY
 import numpy as np
-from platform import system
 import scipy.sparse as SP
 
 
@@ -408,15 +406,9 @@ class OLS_Regimes(BaseOLS, REGI.Regimes_Frame, RegressionPropsY):
 
     def _ols_regimes_multi(self, x, w_i, regi_ids, cores,\
                  gwk, sig2n_k, robust, nonspat_diag, spat_diag, vm, name_x, moran, white_test):
-        pool = mp.Pool(cores)
-        results_p = {}
-        for r in self.regimes_set:
-            if system() == 'Windows':
-                is_win = True
-                results_p[r] = _work(*(self.y,x,regi_ids,r,robust,sig2n_k,self.name_ds,self.name_y,name_x,self.name_w,self.name_regimes))
-            else:
-                results_p[r] = pool.apply_async(_work,args=(self.y,x,regi_ids,r,robust,sig2n_k,self.name_ds,self.name_y,name_x,self.name_w,self.name_regimes))
-                is_win = False
+        results = REGI._run_regimes(_work, regi_ids, self.regimes_set, cores,\
+                  {'y': self.y, 'x': x},\
+                  args=(robust,sig2n_k,self.name_ds,self.name_y,name_x,self.name_w,self.name_regimes))
         self.kryd = 0
         self.kr = x.shape[1]+1
         self.kf = 0
@@ -425,17 +417,9 @@ class OLS_Regimes(BaseOLS, REGI.Regimes_Frame, RegressionPropsY):
         self.betas = np.zeros((self.nr*self.kr,1),float)
         self.u = np.zeros((self.n,1),float)
         self.predy = np.zeros((self.n,1),float)
-        if not is_win:
-            pool.close()
-            pool.join()
-        results = {}
         self.name_y, self.name_x = [],[]
         counter = 0
         for r in self.regimes_set:
-            if is_win:
-                results[r] = results_p[r]
-            else:
-                results[r] = results_p[r].get()
             if w_i:
                 results[r].w = w_i[r]
             else:
@@ -454,9 +438,10 @@ class OLS_Regimes(BaseOLS, REGI.Regimes_Frame, RegressionPropsY):
         self.chow = REGI.Chow(self)            
         SUMMARY.OLS_multi(reg=self, multireg=self.multi, vm=vm, nonspat_diag=nonspat_diag, spat_diag=spat_diag, moran=moran, white_test=white_test, regimes=True)
 
-def _work(y,x,regi_ids,r,robust,sig2n_k,name_ds,name_y,name_x,name_w,name_regimes):
-    y_r = y[regi_ids[r]]
-    x_r = x[regi_ids[r]]
+def _work(handle,r,robust,sig2n_k,name_ds,name_y,name_x,name_w,name_regimes):
+    data = REGI._regime_data(handle)
+    y_r = data['y']
+    x_r = data['x']
     x_constant = USER.check_constant(x_r)
     if robust == 'hac':
         robust = None
@@ -6,7 +6,6 @@ import numpy as np
 import numpy.linalg as la
 import scipy.optimize as op
 from scipy.stats import norm, chisqprob
-import scipy.sparse as SP
 import user_output as USER
 import summary_output as SUMMARY
 
@@ -579,8 +578,8 @@ def sp_tests(reg):
         u_gen = reg.u_gen
         sig2 = np.sum((phi * phi) / Phi_prod) / reg.n
         LM_err_num = np.dot(u_gen.T,(w * u_gen))**2
-        trWW = np.sum((w*w).diagonal())
-        trWWWWp = trWW + np.sum((w*w.T).diagonal())
+        trWW = reg.w.trcW2
+        trWWWWp = reg.w.trcWtW_WW
         LM_err = float(1.0 * LM_err_num / (sig2**2 * trWWWWp))
         LM_err = np.array([LM_err,chisqprob(LM_err,1)])
         #KP_error:
@@ -588,7 +587,7 @@ def sp_tests(reg):
         #Pinkse-Slade_error:
         u_std = u_naive / np.sqrt(Phi_prod)
         ps_num = np.dot(u_std.T, (w * u_std))**2
-        trWpW = np.sum((w.T*w).diagonal())
+        trWpW = reg.w.trcWtW
         ps = float(ps_num / (trWW + trWpW))
         ps = np.array([ps,chisqprob(ps,1)]) #chi-square instead of bootstrap.
     else:
@@ -611,11 +610,10 @@ def moran_KP(w,u,sig2i):
     """
     w = w.sparse
     moran_num = np.dot(u.T, (w * u))
-    E = SP.lil_matrix(w.get_shape())
-    E.setdiag(sig2i.flat)
-    E = E.asformat('csr')
-    WE = w*E
-    moran_den = np.sqrt(np.sum((WE*WE + (w.T*E)*WE).diagonal()))      
+    # tr(WEWE + W'EWE) = e'(W o W' + W o W)e, with E = diag(e) and o the
+    # elementwise product
+    e = sig2i.flatten()
+    moran_den = np.sqrt(np.dot(e, (w.multiply(w.T) + w.multiply(w)) * e))
     moran = float(1.0*moran_num / moran_den)
     moran = np.array([moran,norm.sf(abs(moran)) * 2.])
     return moran
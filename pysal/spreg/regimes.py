@@ -1,9 +1,13 @@
+import os
+import tempfile
+import multiprocessing as mp
 import numpy as np
 import pysal
 import scipy.sparse as SP
 import itertools as iter
 from scipy.stats import f, chisqprob
 import numpy.linalg as la
+from platform import system
 from utils import spbroadcast
 
 """
@@ -467,11 +471,14 @@ def w_regimes(w, regimes, regimes_set, transform=True, get_ids=None, min_n=None)
                   Dictionary containing the subsets of W according to regimes: [r1:w1, r2:w2, ..., rR:wR]
     '''
     regi_ids = dict((r, list(np.where(np.array(regimes) == r)[0])) for r in regimes_set)
-    w_ids = dict((r, map(w.id_order.__getitem__, regi_ids[r])) for r in regimes_set)
+    sparse = w.sparse.tocsr()
     w_regi_i = {}
     warn = None
     for r in regimes_set:
-        w_regi_i[r] = pysal.weights.w_subset(w, w_ids[r])
+        # binary subset of W, sliced from the rows and columns of the regime
+        w_r = sparse[regi_ids[r]][:, regi_ids[r]]
+        w_r.data = np.ones_like(w_r.data)
+        w_regi_i[r] = pysal.weights.WCSR(w_r, map(w.id_order.__getitem__, regi_ids[r]))
         if min_n:
             if w_regi_i[r].n < min_n:
                 raise Exception, "There are less observations than variables in regime %s." %r
@@ -502,14 +509,130 @@ def w_regimes_union(w, w_regi_i, regimes_set):
     w_regi      : pysal W object
                   Spatial weights object containing the union of the subsets of W
     '''
-    w_regi = pysal.weights.w_union(w_regi_i[regimes_set[0]], w_regi_i[regimes_set[1]])
-    if len(regimes_set)>2:
-        for i in range(len(regimes_set))[2:]:
-            w_regi = pysal.weights.w_union(w_regi, w_regi_i[regimes_set[i]])
-    w_regi = pysal.weights.remap_ids(w_regi, dict((i,i) for i in w_regi.id_order),w.id_order)
+    rows, cols = [], []
+    for r in regimes_set:
+        pos = np.array([w.id2i[i] for i in w_regi_i[r].id_order])
+        w_r = w_regi_i[r].sparse.tocoo()
+        rows.append(pos[w_r.row])
+        cols.append(pos[w_r.col])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    w_regi = SP.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(w.n, w.n))
+    w_regi = pysal.weights.WCSR(w_regi, w.id_order)
     w_regi.transform = w.get_transform()
     return w_regi
 
+class _SharedData(object):
+    """
+    Blocks of the arrays and weights of each regime, written once to a
+    temporary file that the workers memory map
+
+    Parameters
+    ----------
+    regi_ids    : dictionary
+                  Positions of the observations of each regime
+    regimes_set : list
+                  List of ordered regimes tags
+    arrays      : dictionary
+                  Arrays with one row per observation (None values are
+                  skipped)
+    w_i         : dictionary
+                  Weights object of each regime, stored as CSR arrays
+
+    Attributes
+    ----------
+    path        : string
+                  Path of the temporary file
+    handles     : dictionary
+                  Handle of the data of each regime: the path, and the
+                  offset, dtype and shape of each block. This is all that
+                  is sent to the workers
+    """
+    def __init__(self, regi_ids, regimes_set, arrays, w_i=None):
+        f = tempfile.NamedTemporaryFile(suffix='.regimes', delete=False)
+        self.path = f.name
+        self.handles = {}
+        offset = 0
+        try:
+            for r in regimes_set:
+                blocks = [(name, arrays[name][regi_ids[r]]) for name in arrays
+                          if arrays[name] is not None]
+                if w_i:
+                    w_r = w_i[r].sparse.tocsr()
+                    blocks += [('w_data', w_r.data), ('w_indices', w_r.indices),
+                               ('w_indptr', w_r.indptr)]
+                specs = {}
+                for name, block in blocks:
+                    block = np.ascontiguousarray(block)
+                    specs[name] = (offset, block.dtype.str, block.shape)
+                    f.write(block.tostring())
+                    offset += block.nbytes
+                self.handles[r] = (self.path, specs)
+        finally:
+            f.close()
+
+    def close(self):
+        os.remove(self.path)
+
+def _regime_data(handle):
+    """
+    Reads the blocks of a regime from the file of a _SharedData object;
+    the weights, if any, are returned as a CSR matrix under key 'w'
+    """
+    path, specs = handle
+    data = {}
+    for name in specs:
+        offset, dtype, shape = specs[name]
+        if np.prod(shape):
+            data[name] = np.array(np.memmap(path, dtype, 'r', offset, shape))
+        else:
+            data[name] = np.zeros(shape, dtype)
+    if 'w_indptr' in data:
+        n = data['w_indptr'].shape[0] - 1
+        data['w'] = SP.csr_matrix((data.pop('w_data'), data.pop('w_indices'),
+                                   data.pop('w_indptr')), shape=(n, n))
+    return data
+
+# pool of worker processes kept across the estimations with regimes
+_POOL = None
+_POOL_CORES = None
+
+def _get_pool(cores=None):
+    """
+    Returns the pool of worker processes, created again only when the
+    number of cores changes
+    """
+    global _POOL, _POOL_CORES
+    if _POOL is None or cores != _POOL_CORES:
+        if _POOL is not None:
+            _POOL.terminate()
+        _POOL = mp.Pool(cores)
+        _POOL_CORES = cores
+    return _POOL
+
+def _run_regimes(work, regi_ids, regimes_set, cores, arrays, w_i=None, args=()):
+    """
+    Runs work(handle, r, *args) for each regime r, in parallel except on
+    Windows, and returns the results in a dictionary keyed on the regimes.
+    The handle is read with _regime_data.
+
+    The arrays and weights are written once to a temporary file, by blocks
+    of regime, instead of being pickled to the workers, and the pool of
+    workers is reused from one estimation to the next.
+    """
+    shared = _SharedData(regi_ids, regimes_set, arrays, w_i)
+    try:
+        if system() == 'Windows':
+            results = dict((r, work(shared.handles[r], r, *args)) for r in regimes_set)
+        else:
+            pool = _get_pool(cores)
+            results_p = dict((r, pool.apply_async(work, (shared.handles[r], r) + tuple(args)))
+                             for r in regimes_set)
+            results = dict((r, results_p[r].get()) for r in regimes_set)
+    finally:
+        shared.close()
+    return results
+
 def x2xsp(x, regimes, regimes_set):
     '''
     Convert X matrix with regimes into a sparse X matrix that accounts for the
@@ -0,0 +1,743 @@
+"""
+Ordinary and two stage least squares estimated from data read in chunks.
+"""
+
+import tempfile
+import numpy as np
+import numpy.linalg as la
+import diagnostics
+import user_output as USER
+from utils import RegressionPropsY, RegressionPropsVM
+from pysal.core.Tables import DataTable
+
+__all__ = ["OLS_Stream", "TSLS_Stream"]
+
+# default number of rows read at once from a DataTable
+CHUNKSIZE = 100000
+
+
+class BaseOLS_Stream(RegressionPropsY, RegressionPropsVM):
+    """
+    Ordinary least squares (OLS) from data read in chunks (note: no
+    consistency checks, diagnostics or constant added)
+
+    Only the cross products of x and y are accumulated as the chunks are
+    read, so that the memory used does not depend on the number of
+    observations. A robust variance-covariance matrix takes a second pass
+    over the data.
+
+    Parameters
+    ----------
+    chunks       : function
+                   Returns, every time it is called, an iterator over the
+                   chunks of the data, as (y, x) tuples of arrays with the
+                   same number of rows: y with one column for the dependent
+                   variable and x with one column for each independent
+                   (exogenous) variable, including the constant
+    robust       : string
+                   If 'white', then a White consistent estimator of the
+                   variance-covariance matrix is given.  If 'hac', then a
+                   HAC consistent estimator of the variance-covariance
+                   matrix is given. Default set to None.
+    gwk          : pysal W object
+                   Kernel spatial weights needed for HAC estimation, with
+                   the observations in the order of the rows of the chunks.
+                   Note: matrix must have ones along the main diagonal.
+    sig2n_k      : boolean
+                   If True, then use n-k to estimate sigma^2. If False, use n.
+
+    Attributes
+    ----------
+    betas        : array
+                   kx1 array of estimated coefficients
+    n            : integer
+                   Number of observations
+    k            : integer
+                   Number of variables for which coefficients are estimated
+                   (including the constant)
+    mean_y       : float
+                   Mean of dependent variable
+    std_y        : float
+                   Standard deviation of dependent variable
+    vm           : array
+                   Variance covariance matrix (kxk)
+    utu          : float
+                   Sum of squared residuals
+    sig2         : float
+                   Sigma squared used in computations
+    sig2n        : float
+                   Sigma squared (computed with n in the denominator)
+    sig2n_k      : float
+                   Sigma squared (computed with n-k in the denominator)
+    xtx          : float
+                   X'X
+    xtxi         : float
+                   (X'X)^-1
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> data = db.by_col_array('HOVAL', 'INC', 'CRIME')
+    >>> data = np.hstack((data, np.ones((49, 1))))
+    >>> chunks = lambda: ((c[:, :1], c[:, 1:]) for c in np.split(data, [20, 40]))
+    >>> ols = BaseOLS_Stream(chunks)
+    >>> ols.betas
+    array([[  0.62898397],
+           [ -0.48488854],
+           [ 46.42818268]])
+    >>> ols.n
+    49
+    """
+
+    def __init__(self, chunks, robust=None, gwk=None, sig2n_k=True):
+        self.n, sizes, ata, mean_y, ss_y = _cross_products(chunks())
+        self.k = sizes[0]
+        self.xtx = ata[:-1, :-1]
+        xty = ata[:-1, -1:]
+        self.xtxi = la.inv(self.xtx)
+        self.betas = np.dot(self.xtxi, xty)
+        self._cache = {}
+        self._cache['mean_y'] = mean_y
+        self._cache['std_y'] = np.sqrt(ss_y / (self.n - 1))
+        # y'y - 2b'X'y + b'X'Xb, with X'Xb = X'y
+        self._cache['utu'] = ata[-1, -1] - np.dot(self.betas.T, xty)[0][0]
+
+        if robust:
+            residuals = lambda y, x: (y - np.dot(x, self.betas), x)
+            psi0, self._cache['utu'] = _psi0(chunks(), residuals, self.n,
+                                             self.k, gwk)
+            self._cache['vm'] = np.dot(self.xtxi,
+                                       np.dot(psi0, self.xtxi))
+
+        if sig2n_k:
+            self.sig2 = self.sig2n_k
+        else:
+            self.sig2 = self.sig2n
+
+
+class OLS_Stream(BaseOLS_Stream):
+    """
+    Ordinary least squares from data read in chunks, from a DataTable or a
+    generator, with results.
+
+    The cross products of the variables are accumulated chunk by chunk, so
+    that the memory used does not depend on the number of observations:
+    tables larger than memory can be used. The robust
+    variance-covariance matrices take a second pass over the data, which
+    then has to be readable twice. The residuals and predicted values are
+    not kept.
+
+    Parameters
+    ----------
+    data         : DataTable, function or iterable
+                   Source of the data. Either a pysal DataTable (e.g. a DBF
+                   or CSV file opened with pysal.open), read chunksize rows
+                   at a time, or an iterable over the chunks of the data,
+                   as (y, x) tuples of arrays with the same number of rows:
+                   y with one column for the dependent variable and x with
+                   one column for each independent (exogenous) variable,
+                   excluding the constant. A function returning such an
+                   iterator every time it is called (e.g. a generator
+                   function) can be read twice, as robust estimation needs.
+    name_y       : string
+                   Name of dependent variable, the column read from a
+                   DataTable
+    name_x       : list of strings
+                   Names of independent variables, the columns read from a
+                   DataTable
+    chunksize    : integer
+                   Number of rows read at once from a DataTable
+    robust       : string
+                   If 'white', then a White consistent estimator of the
+                   variance-covariance matrix is given.  If 'hac', then a
+                   HAC consistent estimator of the variance-covariance
+                   matrix is given. Default set to None.
+    gwk          : pysal W object
+                   Kernel spatial weights needed for HAC estimation, with
+                   the observations in the order of the rows of the data.
+                   Note: matrix must have ones along the main diagonal.
+    sig2n_k      : boolean
+                   If True, then use n-k to estimate sigma^2. If False, use n.
+    name_gwk     : string
+                   Name of kernel weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    Attributes
+    ----------
+    betas        : array
+                   kx1 array of estimated coefficients
+    std_err      : array
+                   1xk array of standard errors of the betas
+    t_stat       : list of tuples
+                   t statistic; each tuple contains the pair (statistic,
+                   p-value), where each is a float
+    r2           : float
+                   R squared
+    ar2          : float
+                   Adjusted R squared
+    n            : integer
+                   Number of observations
+    k            : integer
+                   Number of variables for which coefficients are estimated
+                   (including the constant)
+    mean_y       : float
+                   Mean of dependent variable
+    std_y        : float
+                   Standard deviation of dependent variable
+    vm           : array
+                   Variance covariance matrix (kxk)
+    utu          : float
+                   Sum of squared residuals
+    sig2         : float
+                   Sigma squared used in computations
+    sig2n        : float
+                   Sigma squared (computed with n in the denominator)
+    sig2n_k      : float
+                   Sigma squared (computed with n-k in the denominator)
+    xtx          : float
+                   X'X
+    xtxi         : float
+                   (X'X)^-1
+    robust       : string
+                   Adjustment for robust standard errors
+    title        : string
+                   Name of the regression method used
+    name_y       : string
+                   Name of dependent variable for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output
+    name_gwk     : string
+                   Name of kernel weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+
+    Read the columns of the regression from the DBF file, 20 rows at a time
+
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> ols = OLS_Stream(db, 'HOVAL', ['INC', 'CRIME'], chunksize=20, robust='white')
+    >>> ols.betas
+    array([[ 46.42818268],
+           [  0.62898397],
+           [ -0.48488854]])
+    >>> ols.n
+    49
+    >>> np.around(ols.std_err, 4)
+    array([ 13.9003,   0.4926,   0.1878])
+
+    The chunks can also come from a generator function
+
+    >>> data = db.by_col_array('HOVAL', 'INC', 'CRIME')
+    >>> def chunks():
+    ...     for c in np.split(data, [20, 40]):
+    ...         yield c[:, :1], c[:, 1:]
+    >>> ols = OLS_Stream(chunks, name_y='hoval', name_x=['income', 'crime'])
+    >>> round(ols.r2, 6)
+    0.349514
+    """
+
+    def __init__(self, data, name_y=None, name_x=None, chunksize=CHUNKSIZE,
+                 robust=None, gwk=None, sig2n_k=True, name_gwk=None,
+                 name_ds=None):
+
+        USER.check_robust(robust, gwk)
+        chunks = _set_chunks(data, [[name_y], name_x], chunksize, robust)
+        BaseOLS_Stream.__init__(self, chunks, robust=robust, gwk=gwk,
+                                sig2n_k=sig2n_k)
+        self.std_err = diagnostics.se_betas(self)
+        self.t_stat = diagnostics.t_stat(self)
+        self.r2 = 1 - self.utu / (self.std_y ** 2 * (self.n - 1))
+        self.ar2 = 1 - (1 - self.r2) * (self.n - 1) / (self.n - self.k)
+        self.title = "ORDINARY LEAST SQUARES"
+        self.name_ds = USER.set_name_ds(name_ds)
+        self.name_y = USER.set_name_y(name_y)
+        self.name_x = _set_name_x(name_x, self.k - 1)
+        self.robust = USER.set_robust(robust)
+        self.name_gwk = USER.set_name_w(name_gwk, gwk)
+
+
+class BaseTSLS_Stream(RegressionPropsY, RegressionPropsVM):
+    """
+    Two stage least squares (2SLS) from data read in chunks (note: no
+    consistency checks, diagnostics or constant added)
+
+    Only the cross products of the instruments, the regressors and y are
+    accumulated as the chunks are read, so that the memory used does not
+    depend on the number of observations. A robust variance-covariance
+    matrix takes a second pass over the data.
+
+    Parameters
+    ----------
+    chunks       : function
+                   Returns, every time it is called, an iterator over the
+                   chunks of the data, as (y, x, yend, q) tuples of arrays
+                   with the same number of rows: y with one column for the
+                   dependent variable, x with one column for each
+                   independent (exogenous) variable, including the
+                   constant, yend with one column for each endogenous
+                   variable and q with one column for each external
+                   exogenous variable to use as instruments
+    robust       : string
+                   If 'white', then a White consistent estimator of the
+                   variance-covariance matrix is given.  If 'hac', then a
+                   HAC consistent estimator of the variance-covariance
+                   matrix is given. Default set to None.
+    gwk          : pysal W object
+                   Kernel spatial weights needed for HAC estimation, with
+                   the observations in the order of the rows of the chunks.
+                   Note: matrix must have ones along the main diagonal.
+    sig2n_k      : boolean
+                   If True, then use n-k to estimate sigma^2. If False, use n.
+
+    Attributes
+    ----------
+    betas        : array
+                   kx1 array of estimated coefficients
+    n            : integer
+                   Number of observations
+    k            : integer
+                   Number of variables for which coefficients are estimated
+                   (including the constant)
+    kstar        : integer
+                   Number of endogenous variables.
+    mean_y       : float
+                   Mean of dependent variable
+    std_y        : float
+                   Standard deviation of dependent variable
+    vm           : array
+                   Variance covariance matrix (kxk)
+    utu          : float
+                   Sum of squared residuals
+    sig2         : float
+                   Sigma squared used in computations
+    sig2n        : float
+                   Sigma squared (computed with n in the denominator)
+    sig2n_k      : float
+                   Sigma squared (computed with n-k in the denominator)
+    hth          : float
+                   H'H
+    hthi         : float
+                   (H'H)^-1
+    varb         : array
+                   (Z'H (H'H)^-1 H'Z)^-1
+    zthhthi      : array
+                   Z'H(H'H)^-1
+    htz          : array
+                   H'Z
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> data = db.by_col_array('CRIME', 'INC', 'HOVAL', 'DISCBD')
+    >>> data = np.hstack((data[:, :1], np.ones((49, 1)), data[:, 1:]))
+    >>> chunks = lambda: ((c[:, :1], c[:, 1:3], c[:, 3:4], c[:, 4:]) for c in np.split(data, [20, 40]))
+    >>> reg = BaseTSLS_Stream(chunks)
+    >>> print reg.betas
+    [[ 88.46579584]
+     [  0.5200379 ]
+     [ -1.58216593]]
+    """
+
+    def __init__(self, chunks, robust=None, gwk=None, sig2n_k=False):
+        self.n, sizes, ata, mean_y, ss_y = _cross_products(chunks())
+        kx, self.kstar, kq = sizes
+        self.k = kx + self.kstar
+        z = np.arange(self.k)
+        h = np.hstack((np.arange(kx), np.arange(self.k, self.k + kq)))
+        self.hth = ata[np.ix_(h, h)]
+        self.hthi = la.inv(self.hth)
+        zth = ata[np.ix_(z, h)]
+        hty = ata[h, -1:]
+        zty = ata[z, -1:]
+
+        factor_1 = np.dot(zth, self.hthi)
+        factor_2 = np.dot(factor_1, zth.T)
+        self.varb = la.inv(factor_2)
+        factor_3 = np.dot(self.varb, factor_1)
+        self.betas = np.dot(factor_3, hty)
+        self.zthhthi = factor_1
+        self.htz = zth.T
+        self._cache = {}
+        self._cache['mean_y'] = mean_y
+        self._cache['std_y'] = np.sqrt(ss_y / (self.n - 1))
+        self._cache['utu'] = (ata[-1, -1] -
+                              2 * np.dot(self.betas.T, zty)[0][0] +
+                              np.dot(self.betas.T,
+                                     np.dot(ata[np.ix_(z, z)],
+                                            self.betas))[0][0])
+
+        if robust:
+            def residuals(y, x, yend, q):
+                u = y - np.dot(np.hstack((x, yend)), self.betas)
+                return u, np.hstack((x, q))
+            psi0, self._cache['utu'] = _psi0(chunks(), residuals, self.n,
+                                             len(h), gwk)
+            psi1 = np.dot(self.varb, self.zthhthi)
+            self._cache['vm'] = np.dot(psi1, np.dot(psi0, psi1.T))
+
+        if sig2n_k:
+            self.sig2 = self.sig2n_k
+        else:
+            self.sig2 = self.sig2n
+
+    @property
+    def vm(self):
+        if 'vm' not in self._cache:
+            self._cache['vm'] = np.dot(self.sig2, self.varb)
+        return self._cache['vm']
+
+
+class TSLS_Stream(BaseTSLS_Stream):
+    """
+    Two stage least squares from data read in chunks, from a DataTable or
+    a generator, with results.
+
+    The cross products of the instruments, the regressors and y are
+    accumulated chunk by chunk, so that the memory used does not depend on
+    the number of observations: tables larger than memory can be used. The
+    robust variance-covariance matrices take a second pass over the data,
+    which then has to be readable twice. The residuals and predicted values
+    are not kept.
+
+    Parameters
+    ----------
+    data         : DataTable, function or iterable
+                   Source of the data. Either a pysal DataTable (e.g. a DBF
+                   or CSV file opened with pysal.open), read chunksize rows
+                   at a time, or an iterable over the chunks of the data,
+                   as (y, x, yend, q) tuples of arrays with the same number
+                   of rows: y with one column for the dependent variable,
+                   x with one column for each independent (exogenous)
+                   variable, excluding the constant, yend with one column
+                   for each endogenous variable and q with one column for
+                   each external exogenous variable to use as instruments.
+                   A function returning such an iterator every time it is
+                   called (e.g. a generator function) can be read twice,
+                   as robust estimation needs.
+    name_y       : string
+                   Name of dependent variable, the column read from a
+                   DataTable
+    name_x       : list of strings
+                   Names of independent variables, the columns read from a
+                   DataTable
+    name_yend    : list of strings
+                   Names of endogenous variables, the columns read from a
+                   DataTable
+    name_q       : list of strings
+                   Names of instruments, the columns read from a DataTable
+    chunksize    : integer
+                   Number of rows read at once from a DataTable
+    robust       : string
+                   If 'white', then a White consistent estimator of the
+                   variance-covariance matrix is given.  If 'hac', then a
+                   HAC consistent estimator of the variance-covariance
+                   matrix is given. Default set to None.
+    gwk          : pysal W object
+                   Kernel spatial weights needed for HAC estimation, with
+                   the observations in the order of the rows of the data.
+                   Note: matrix must have ones along the main diagonal.
+    sig2n_k      : boolean
+                   If True, then use n-k to estimate sigma^2. If False, use n.
+    name_gwk     : string
+                   Name of kernel weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    Attributes
+    ----------
+    betas        : array
+                   kx1 array of estimated coefficients
+    std_err      : array
+                   1xk array of standard errors of the betas
+    z_stat       : list of tuples
+                   z statistic; each tuple contains the pair (statistic,
+                   p-value), where each is a float
+    n            : integer
+                   Number of observations
+    k            : integer
+                   Number of variables for which coefficients are estimated
+                   (including the constant)
+    kstar        : integer
+                   Number of endogenous variables.
+    mean_y       : float
+                   Mean of dependent variable
+    std_y        : float
+                   Standard deviation of dependent variable
+    vm           : array
+                   Variance covariance matrix (kxk)
+    utu          : float
+                   Sum of squared residuals
+    sig2         : float
+                   Sigma squared used in computations
+    sig2n        : float
+                   Sigma squared (computed with n in the denominator)
+    sig2n_k      : float
+                   Sigma squared (computed with n-k in the denominator)
+    hth          : float
+                   H'H
+    hthi         : float
+                   (H'H)^-1
+    varb         : array
+                   (Z'H (H'H)^-1 H'Z)^-1
+    zthhthi      : array
+                   Z'H(H'H)^-1
+    htz          : array
+                   H'Z
+    robust       : string
+                   Adjustment for robust standard errors
+    title        : string
+                   Name of the regression method used
+    name_y       : string
+                   Name of dependent variable for use in output
+    name_x       : list of strings
+                   Names of independent variables for use in output
+    name_yend    : list of strings
+                   Names of endogenous variables for use in output
+    name_z       : list of strings
+                   Names of exogenous and endogenous variables for use in
+                   output
+    name_q       : list of strings
+                   Names of external instruments
+    name_h       : list of strings
+                   Names of all instruments used in ouput
+    name_gwk     : string
+                   Name of kernel weights matrix for use in output
+    name_ds      : string
+                   Name of dataset for use in output
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> import pysal
+    >>> db = pysal.open(pysal.examples.get_path('columbus.dbf'),'r')
+    >>> reg = TSLS_Stream(db, 'CRIME', ['INC'], ['HOVAL'], ['DISCBD'], chunksize=20, robust='white')
+    >>> print reg.betas
+    [[ 88.46579584]
+     [  0.5200379 ]
+     [ -1.58216593]]
+    >>> np.around(reg.std_err, 4)
+    array([ 14.4316,   1.5063,   0.9052])
+    >>> reg.name_z
+    ['CONSTANT', 'INC', 'HOVAL']
+    """
+
+    def __init__(self, data, name_y=None, name_x=None, name_yend=None,
+                 name_q=None, chunksize=CHUNKSIZE, robust=None, gwk=None,
+                 sig2n_k=False, name_gwk=None, name_ds=None):
+
+        USER.check_robust(robust, gwk)
+        chunks = _set_chunks(data, [[name_y], name_x, name_yend, name_q],
+                             chunksize, robust)
+        BaseTSLS_Stream.__init__(self, chunks, robust=robust, gwk=gwk,
+                                 sig2n_k=sig2n_k)
+        self.std_err = diagnostics.se_betas(self)
+        self.z_stat = diagnostics.t_stat(self, z_stat=True)
+        self.title = "TWO STAGE LEAST SQUARES"
+        self.name_ds = USER.set_name_ds(name_ds)
+        self.name_y = USER.set_name_y(name_y)
+        self.name_x = _set_name_x(name_x, self.k - self.kstar - 1)
+        if name_yend:
+            self.name_yend = name_yend[:]
+        else:
+            self.name_yend = ['endogenous_' + str(i + 1)
+                              for i in range(self.kstar)]
+        self.name_z = self.name_x + self.name_yend
+        if name_q:
+            self.name_q = name_q[:]
+        else:
+            self.name_q = ['instrument_' + str(i + 1)
+                           for i in range(self.hth.shape[0] - len(self.name_x))]
+        self.name_h = USER.set_name_h(self.name_x, self.name_q)
+        self.robust = USER.set_robust(robust)
+        self.name_gwk = USER.set_name_w(name_gwk, gwk)
+
+
+def _cross_products(chunks):
+    """
+    Accumulate, over the chunks of a regression, the number of rows, the
+    cross products of the regressors and y, and the mean and sum of squared
+    deviations of y
+
+    Parameters
+    ----------
+    chunks      : iterable
+                  Chunks of the data, as tuples of arrays (y, v1, v2, ...)
+
+    Returns
+    -------
+    n           : integer
+                  Number of rows
+    sizes       : list
+                  Number of columns of v1, v2, ...
+    ata         : array
+                  A'A, with A = [v1, v2, ..., y]
+    mean_y      : float
+                  Mean of y
+    ss_y        : float
+                  Sum of squared deviations of y from its mean
+    """
+    n = 0
+    mean_y = ss_y = 0.
+    ata = None
+    for chunk in chunks:
+        y = np.asarray(chunk[0], float)
+        if ata is None:
+            sizes = [v.shape[1] for v in chunk[1:]]
+            ata = np.zeros((sum(sizes) + 1, sum(sizes) + 1))
+        nc = y.shape[0]
+        if not nc:
+            continue
+        a = np.asarray(np.hstack(tuple(chunk[1:]) + (y, )), float)
+        ata += np.dot(a.T, a)
+        # the mean and squared deviations of the chunk are combined with
+        # those of the previous chunks (Chan et al.), which is more stable
+        # than the sums of y and y**2
+        mean_c = y.mean()
+        delta = mean_c - mean_y
+        ss_y += ((y - mean_c) ** 2).sum() + delta ** 2 * n * nc / (n + nc)
+        mean_y += delta * nc / (n + nc)
+        n += nc
+    if not n:
+        raise Exception, "no observations were read from the data"
+    return n, sizes, ata, mean_y, ss_y
+
+
+def _psi0(chunks, residuals, n, k, gwk=None):
+    """
+    Middle term of the White (or, with gwk, HAC) variance-covariance
+    estimator and sum of squared residuals, from a second pass over the
+    chunks
+
+    Parameters
+    ----------
+    chunks      : iterable
+                  Chunks of the data
+    residuals   : function
+                  Returns the residuals and regressors (or instruments) of
+                  a chunk
+    n           : integer
+                  Number of rows
+    k           : integer
+                  Number of regressors (or instruments)
+    gwk         : pysal W object
+                  Kernel spatial weights for the HAC estimator
+
+    Returns
+    -------
+    psi0        : array
+                  kxk array, X'diag(u**2)X for White, (X*u)'K(X*u) for HAC
+    utu         : float
+                  Sum of squared residuals
+    """
+    psi0 = np.zeros((k, k))
+    utu = 0.
+    if gwk:
+        # the lags of x*u can need any row, so that x*u is kept in a
+        # temporary file rather than in memory
+        store = tempfile.TemporaryFile()
+    for chunk in chunks:
+        u, x = residuals(*chunk)
+        u = np.asarray(u, float)
+        xu = np.asarray(x, float) * u
+        utu += (u ** 2).sum()
+        if gwk:
+            np.ascontiguousarray(xu, float).tofile(store)
+        else:
+            psi0 += np.dot(xu.T, xu)
+    if gwk:
+        store.flush()
+        xu = np.memmap(store, float, 'r', shape=(n, k))
+        wk = gwk.sparse
+        for start in range(0, n, CHUNKSIZE):
+            stop = min(start + CHUNKSIZE, n)
+            psi0 += np.dot(np.asarray(xu[start:stop]).T, wk[start:stop] * xu)
+        del xu
+        store.close()
+    return psi0, utu
+
+
+def _set_chunks(data, names, chunksize, robust=None):
+    """
+    Function returning an iterator over the chunks of data, with the
+    constant added to x (the second array of the chunks)
+
+    Parameters
+    ----------
+    data        : DataTable, function or iterable
+                  Source of the data
+    names       : list
+                  Lists of the names of the columns of each array of the
+                  chunks, read from a DataTable
+    chunksize   : integer
+                  Number of rows read at once from a DataTable
+    robust      : string
+                  Robust estimator, which needs a second pass over the data
+    """
+    if isinstance(data, DataTable):
+        for group in names:
+            if not group or None in group:
+                raise Exception, "the names of the columns must be given to read a DataTable"
+        keys = sum(names, [])
+        splits = np.cumsum([len(group) for group in names])[:-1]
+
+        def table_chunks():
+            n = len(data)
+            for start in range(0, n, chunksize):
+                rows = slice(start, min(start + chunksize, n))
+                a = data.by_col_array(keys, rows=rows)
+                if np.ma.isMaskedArray(a) and a.mask.any():
+                    raise Exception, "missing values in rows %d to %d" % (
+                        rows.start, rows.stop)
+                yield np.split(np.asarray(a, float), splits, axis=1)
+        read = table_chunks
+    elif hasattr(data, '__call__'):
+        read = data
+    else:
+        if robust:
+            raise Exception, "robust estimation reads the data twice: pass a DataTable, or a function returning the chunks"
+        read = lambda: data
+
+    def chunks():
+        for chunk in read():
+            for a in chunk:
+                if np.ma.isMaskedArray(a) and a.mask.any():
+                    raise Exception, "missing values in the chunks of data"
+            # masked arrays, as given by by_col_array, are used as plain
+            # arrays
+            chunk = [np.asarray(a) for a in chunk]
+            chunk[1] = USER.check_constant(chunk[1])
+            yield tuple(chunk)
+    return chunks
+
+
+def _set_name_x(name_x, k):
+    if name_x and len(name_x) == k:
+        name_x = name_x[:]
+    else:
+        name_x = ['var_' + str(i + 1) for i in range(k)]
+    name_x.insert(0, 'CONSTANT')
+    return name_x
+
+
+def _test():
+    import doctest
+    start_suppress = np.get_printoptions()['suppress']
+    np.set_printoptions(suppress=True)
+    doctest.testmod()
+    np.set_printoptions(suppress=start_suppress)
+
+if __name__ == '__main__':
+    _test()
@@ -127,7 +127,7 @@ def TSLS_multi(reg, multireg, vm, spat_diag, regimes=False, sur=False):
     summary_warning(reg)
     summary_multi(reg=reg, multireg=multireg, vm=vm, instruments=True, nonspat_diag=False, spat_diag=spat_diag)
 
-def GM_Lag(reg, vm, w, spat_diag, regimes=False):
+def GM_Lag(reg, vm, w, spat_diag, regimes=False, spat_impacts=False):
     reg.__summary = {}
     # compute diagnostics and organize summary output
     beta_diag_lag(reg, reg.robust, error=False)
@@ -139,10 +139,12 @@ def GM_Lag(reg, vm, w, spat_diag, regimes=False):
     summary_coefs_instruments(reg)
     if regimes:
         summary_regimes(reg)
+    if spat_impacts:
+        summary_impacts(reg)
     summary_warning(reg)
     summary(reg=reg, vm=vm, instruments=True, nonspat_diag=False, spat_diag=spat_diag)
 
-def GM_Lag_multi(reg, multireg, vm, spat_diag, regimes=False, sur=False):
+def GM_Lag_multi(reg, multireg, vm, spat_diag, regimes=False, sur=False, spat_impacts=False):
     for m in multireg:
         mreg = multireg[m]
         mreg.__summary = {}
@@ -158,6 +160,8 @@ def GM_Lag_multi(reg, multireg, vm, spat_diag, regimes=False, sur=False):
             summary_regimes(mreg,chow=False)
         if sur:
             summary_sur(mreg)            
+        if spat_impacts:
+            summary_impacts(mreg)
         multireg[m].__summary = mreg.__summary
     reg.__summary = {}
     if regimes:
@@ -390,6 +394,31 @@ def GM_Combo_Het(reg, vm, w, regimes=False):
     summary_warning(reg)
     summary(reg=reg, vm=vm, instruments=True, nonspat_diag=False, spat_diag=False)
 
+def ML_Lag(reg, vm, w, regimes=False):
+    reg.__summary = {}
+    # compute diagnostics and organize summary output
+    beta_diag_lag(reg, None, error=False)
+    summary_ml(reg)
+    # build coefficients table body
+    summary_coefs_allx(reg, reg.z_stat)
+    if regimes:
+        summary_regimes(reg)
+    summary_warning(reg)
+    summary(reg=reg, vm=vm, instruments=False, nonspat_diag=False, spat_diag=False)
+
+def ML_Error(reg, vm, w, regimes=False):
+    reg.__summary = {}
+    # compute diagnostics and organize summary output
+    beta_diag(reg, None)
+    summary_ml(reg)
+    # build coefficients table body
+    summary_coefs_allx(reg, reg.z_stat, lambd=True)
+    summary_coefs_lambda(reg, reg.z_stat)
+    if regimes:
+        summary_regimes(reg)
+    summary_warning(reg)
+    summary(reg=reg, vm=vm, instruments=False, nonspat_diag=False, spat_diag=False)
+
 def Probit(reg, vm, w, spat_diag):
     reg.__summary = {}
     # compute diagnostics and organize summary output
@@ -779,6 +808,8 @@ def summary_chow(reg,lambd=False):
     reg.__summary['summary_chow'] += "%25s        %2d    %12.6f        %9.7f\n" %('Global test',reg.kr*(reg.nr-1),reg.chow.joint[0],reg.chow.joint[1])
 
 def summary_warning(reg):
+    if getattr(reg, 'warning', None) is None:
+        return
     try:
         try:
             reg.__summary['summary_other_mid'] += reg.warning
@@ -787,6 +818,34 @@ def summary_warning(reg):
     except:
         pass
 
+def summary_impacts(reg):
+    """Lists the direct, indirect and total impacts of a spatial lag model.
+    """
+    imp = reg.impacts
+    strSummary = "\nSPATIAL IMPACTS\n"
+    strSummary += "Method: traces of the powers of W up to %d" %imp.powers
+    if imp.sims:
+        strSummary += ", inference from %d simulated draws" %imp.sims
+    strSummary += "\n------------------------------------------------------------------------------------\n"
+    strSummary += "            Variable          Impact       Std.Error     z-Statistic     Probability\n"
+    strSummary += "------------------------------------------------------------------------------------\n"
+    for i in range(len(imp.names)):
+        for kind in ['direct', 'indirect', 'total']:
+            name = "%s (%s)" %(imp.names[i], kind)
+            impact = getattr(imp, kind)[i]
+            if imp.sims:
+                strSummary += "%20s    %12.7f    %12.7f    %12.7f    %12.7f\n"   \
+                             % (name, impact, getattr(imp, kind+'_std_err')[i],\
+                                getattr(imp, kind+'_z_stat')[i][0],\
+                                getattr(imp, kind+'_z_stat')[i][1])
+            else:
+                strSummary += "%20s    %12.7f\n" % (name, impact)
+    strSummary += "------------------------------------------------------------------------------------\n"
+    try:
+        reg.__summary['summary_other_mid'] += strSummary
+    except:
+        reg.__summary['summary_other_mid'] = strSummary
+
 def summary_coefs_slopes(reg):
     strSummary = "\nMARGINAL EFFECTS\n"
     if reg.scalem == 'phimean':
@@ -812,6 +871,13 @@ def summary_r2(reg, ols, spatial_lag):
                 strSummary += "%-20s:%12.4f\n" % ('Spatial Pseudo R-squared',reg.pr2_e)
     return strSummary
 """
+def summary_ml(reg):
+    strSummary = ""
+    strSummary += "%-20s:%12.3f               %-22s:%12.3f\n" % ('Sigma-square ML',reg.sig2,'Log likelihood',reg.logll)
+    strSummary += "%-20s:%12.4f               %-22s:%12.3f\n" % ('S.E of regression',np.sqrt(reg.sig2),'Akaike info criterion',reg.aic)
+    strSummary += "%-20s %12s               %-22s:%12.3f\n" % ('','','Schwarz criterion',reg.schwarz)
+    reg.__summary['summary_r2'] += strSummary
+
 def summary_nonspat_diag_1(reg):
     strSummary = ""
     strSummary += "%-20s:%12.3f               %-22s:%12.4f\n" % ('Sum squared residual',reg.utu,'F-statistic',reg.f_stat[0])
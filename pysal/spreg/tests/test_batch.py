@@ -0,0 +1,91 @@
+import unittest
+import numpy as np
+import pysal
+from pysal.spreg.ols import OLS
+from pysal.spreg.twosls_sp import GM_Lag
+from pysal.spreg.error_sp import GM_Error
+from pysal.spreg.batch import OLS_Batch, GM_Lag_Batch, GM_Error_Batch
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        db = pysal.open(pysal.examples.get_path("columbus.dbf"), 'r')
+        self.y = np.array([db.by_col(name) for name in ['CRIME', 'HOVAL']]).T
+        self.X = np.array([db.by_col(name) for name in ['INC', 'DISCBD']]).T
+        self.w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+        self.w.transform = 'r'
+        self.subsets = [[0], [1], [0, 1]]
+
+    def test_OLS_Batch(self):
+        batch = OLS_Batch(self.y, self.X, self.w, subsets=self.subsets,
+                          spat_diag=True)
+        self.assertEqual(batch.betas.shape, (3, 2, 3))
+        for s, subset in enumerate(self.subsets):
+            cols = [0] + [i + 1 for i in subset]
+            for j in range(2):
+                reg = OLS(self.y[:, j:j + 1], self.X[:, subset], w=self.w,
+                          spat_diag=True)
+                np.testing.assert_array_almost_equal(batch.betas[s, j, cols],
+                                                     reg.betas.flatten(), 7)
+                np.testing.assert_array_almost_equal(
+                    batch.std_err[s, j, cols], reg.std_err, 7)
+                np.testing.assert_array_almost_equal(batch.t_stat[s, j, cols],
+                                                     np.array(reg.t_stat), 7)
+                self.assertAlmostEqual(batch.r2[s, j], reg.r2, 7)
+                self.assertAlmostEqual(batch.ar2[s, j], reg.ar2, 7)
+                for test in ['lm_error', 'lm_lag', 'rlm_error', 'rlm_lag',
+                             'lm_sarma']:
+                    np.testing.assert_array_almost_equal(
+                        getattr(batch, test)[s, j], getattr(reg, test), 7)
+                model = batch.model(j, s)
+                self.assertAlmostEqual(model.jarque_bera['jb'],
+                                       reg.jarque_bera['jb'], 7)
+        self.assertTrue(np.isnan(batch.betas[0, 0, 2]))
+
+    def test_GM_Lag_Batch(self):
+        batch = GM_Lag_Batch(self.y, self.X, self.w, subsets=self.subsets,
+                             w_lags=2)
+        for s, subset in enumerate(self.subsets):
+            cols = [0] + [i + 1 for i in subset] + [3]
+            for j in range(2):
+                reg = GM_Lag(self.y[:, j:j + 1], self.X[:, subset], w=self.w,
+                             w_lags=2)
+                np.testing.assert_array_almost_equal(batch.betas[s, j, cols],
+                                                     reg.betas.flatten(), 7)
+                np.testing.assert_array_almost_equal(
+                    batch.std_err[s, j, cols], reg.std_err, 7)
+                np.testing.assert_array_almost_equal(batch.z_stat[s, j, cols],
+                                                     np.array(reg.z_stat), 7)
+                self.assertAlmostEqual(batch.pr2[s, j], reg.pr2, 7)
+                model = batch.model(j, s)
+                np.testing.assert_array_almost_equal(model.vm, reg.vm, 7)
+                np.testing.assert_array_almost_equal(model.predy_e,
+                                                     reg.predy_e, 7)
+
+    def test_GM_Error_Batch(self):
+        names = ['inc', 'discbd']
+        batch = GM_Error_Batch(self.y, self.X, self.w, subsets=self.subsets,
+                               name_x=names)
+        for s, subset in enumerate(self.subsets):
+            cols = [0] + [i + 1 for i in subset]
+            for j in range(2):
+                reg = GM_Error(self.y[:, j:j + 1], self.X[:, subset],
+                               w=self.w, name_x=[names[i] for i in subset])
+                np.testing.assert_array_almost_equal(
+                    batch.betas[s, j, cols + [3]], reg.betas.flatten(), 6)
+                np.testing.assert_array_almost_equal(
+                    batch.std_err[s, j, cols], reg.std_err, 6)
+                self.assertAlmostEqual(batch.pr2[s, j], reg.pr2, 6)
+                model = batch.model(j, s)
+                np.testing.assert_array_almost_equal(model.e_filtered,
+                                                     reg.e_filtered, 6)
+                self.assertEqual(model.name_x, reg.name_x)
+
+    def test_check_y(self):
+        self.assertRaises(Exception, OLS_Batch, self.y.flatten(), self.X)
+        self.assertRaises(Exception, OLS_Batch, self.y, self.X,
+                          subsets=[[2]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -182,6 +182,13 @@ class TestBaseGMEndogErrorHet(unittest.TestCase):
                [   704.371999  ,  11686.67338121,   2246.12800625],
                [   139.75      ,   2246.12800625,    498.5851    ]])
         np.testing.assert_array_almost_equal(reg.hth,hth,6)
+
+    def test_inv_method(self):
+        reg = HET.BaseGM_Endog_Error_Het(self.y, self.X, self.yd, self.q, self.w.sparse, step1c=True)
+        for inv_method in ['true_inv', 'splu', 'krylov']:
+            reg_i = HET.BaseGM_Endog_Error_Het(self.y, self.X, self.yd, self.q, self.w.sparse, step1c=True, inv_method=inv_method)
+            np.testing.assert_array_almost_equal(reg_i.betas,reg.betas,6)
+            np.testing.assert_array_almost_equal(reg_i.vm,reg.vm,6)
         
 class TestGMEndogErrorHet(unittest.TestCase):
     def setUp(self):
@@ -0,0 +1,111 @@
+import unittest
+import numpy as np
+import pysal
+from pysal.spreg.twosls_sp import GM_Lag
+from pysal.spreg.twosls_sp_regimes import GM_Lag_Regimes
+from pysal.spreg.impacts import Impacts, trace_powers
+
+
+def dense_impacts(w, rho):
+    S = np.linalg.inv(np.eye(w.n) - rho * w.full()[0])
+    return S.diagonal(), S.sum(0)
+
+
+class TestImpacts(unittest.TestCase):
+    def setUp(self):
+        db = pysal.open(pysal.examples.get_path("columbus.dbf"), 'r')
+        self.y = np.array(db.by_col("CRIME")).reshape(49, 1)
+        self.X = np.array([db.by_col(name) for name in ['INC', 'HOVAL']]).T
+        self.regimes = db.by_col('NSA')
+        self.w = pysal.open(pysal.examples.get_path("columbus.gal"), 'r').read()
+        self.w.transform = 'r'
+
+    def test_GM_Lag(self):
+        reg = GM_Lag(self.y, self.X, w=self.w, spat_impacts=True,
+                     name_x=['INC', 'HOVAL'])
+        imp = reg.impacts
+        self.assertEqual(imp.names, ['INC', 'HOVAL'])
+        diag, colsum = dense_impacts(self.w, reg.betas[-1][0])
+        np.testing.assert_array_almost_equal(
+            imp.direct, reg.betas[1:3].flatten() * diag.mean(), 7)
+        np.testing.assert_array_almost_equal(
+            imp.total, reg.betas[1:3].flatten() * colsum.mean(), 7)
+        np.testing.assert_array_almost_equal(imp.indirect,
+                                             imp.total - imp.direct, 7)
+        self.assertTrue(0 < imp.sims <= 1000)
+        z = imp.total / imp.total_std_err
+        np.testing.assert_array_almost_equal(
+            np.array(imp.total_z_stat)[:, 0], z, 7)
+        self.assertTrue('SPATIAL IMPACTS' in reg.summary)
+
+    def test_sims(self):
+        reg = GM_Lag(self.y, self.X, w=self.w)
+        imp = Impacts(reg, self.w, sims=0)
+        self.assertEqual(imp.sims, 0)
+        self.assertFalse(hasattr(imp, 'direct_std_err'))
+        imp1 = Impacts(reg, self.w, sims=500, seed=1)
+        imp2 = Impacts(reg, self.w, sims=500, seed=1)
+        np.testing.assert_array_equal(imp1.direct_std_err,
+                                      imp2.direct_std_err)
+        np.testing.assert_array_equal(imp1.direct, imp.direct)
+
+    def test_trace_powers(self):
+        w = pysal.lat2W(30, 30)
+        w.transform = 'r'
+        groups = np.arange(w.n) % 2
+        trW, sumW = trace_powers(w, powers=8, probes=w.n, groups=groups)
+        full = w.full()[0]
+        wp = np.eye(w.n)
+        for p in range(9):
+            np.testing.assert_array_almost_equal(
+                trW[:, p], [wp.diagonal()[groups == g].sum() for g in [0, 1]])
+            np.testing.assert_array_almost_equal(
+                sumW[:, p], [wp.sum(0)[groups == g].sum() for g in [0, 1]])
+            wp = np.dot(wp, full)
+        self.assertTrue(trace_powers(w, powers=8, probes=w.n,
+                                     groups=groups)[0] is trW)
+        mc, mc_sum = trace_powers(w, powers=8, probes=50, seed=10)
+        np.testing.assert_array_almost_equal(mc_sum[0], sumW.sum(0))
+        np.testing.assert_array_almost_equal(mc[0, :3], trW.sum(0)[:3])
+        np.testing.assert_allclose(mc[0, 3:], trW.sum(0)[3:], rtol=0.05,
+                                   atol=5.)
+        # the estimates of another seed are not taken from the cache
+        mc2 = trace_powers(w, powers=8, probes=50, seed=11)[0]
+        self.assertTrue((mc2[0, 3:] != mc[0, 3:]).all())
+        np.testing.assert_array_almost_equal(mc2[0, :3], mc[0, :3])
+        self.assertTrue(trace_powers(w, powers=8, probes=50, seed=10)[0] is mc)
+        w.transform = 'b'
+        self.assertNotEqual(trace_powers(w, powers=8, probes=50)[1][0, 1],
+                            mc_sum[0, 1])
+
+    def test_GM_Lag_Regimes(self):
+        reg = GM_Lag_Regimes(self.y, self.X, self.regimes, w=self.w,
+                             regime_err_sep=False, spat_impacts=True,
+                             name_x=['INC', 'HOVAL'])
+        imp = reg.impacts
+        self.assertEqual(imp.names, ['0_INC', '0_HOVAL', '1_INC', '1_HOVAL'])
+        diag, colsum = dense_impacts(self.w, reg.betas[-1][0])
+        regimes = np.array(self.regimes)
+        for i, name in enumerate(imp.names):
+            beta = reg.betas[reg.name_z.index(name)][0]
+            rows = regimes == int(name[0])
+            self.assertAlmostEqual(imp.direct[i], beta * diag[rows].mean(), 7)
+            self.assertAlmostEqual(imp.total[i], beta * colsum[rows].mean(), 7)
+
+    def test_GM_Lag_Regimes_multi(self):
+        reg = GM_Lag_Regimes(self.y, self.X, self.regimes, w=self.w,
+                             regime_lag_sep=True, regime_err_sep=True,
+                             spat_impacts=True)
+        for r in reg.regimes_set:
+            mreg = reg.multi[r]
+            imp = mreg.impacts
+            diag, colsum = dense_impacts(mreg.w, mreg.betas[-1][0])
+            np.testing.assert_array_almost_equal(
+                imp.direct, mreg.betas[1:3].flatten() * diag.mean(), 7)
+            np.testing.assert_array_almost_equal(
+                imp.total, mreg.betas[1:3].flatten() * colsum.mean(), 7)
+        self.assertEqual(reg.summary.count('SPATIAL IMPACTS'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
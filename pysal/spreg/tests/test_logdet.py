@@ -0,0 +1,43 @@
+import unittest
+import pysal
+import numpy as np
+import numpy.linalg as la
+from pysal.spreg import logdet as LD
+
+class TestLogDet(unittest.TestCase):
+    def setUp(self):
+        self.w = pysal.lat2W(10, 10)
+        self.w.transform = 'r'
+        self.full = self.w.full()[0]
+
+    def test_exact(self):
+        for rho in [-0.9, -0.2, 0.3, 0.9]:
+            exact = np.log(la.det(np.eye(self.w.n) - rho * self.full))
+            self.assertAlmostEqual(LD.EigLogDet(self.w.sparse)(rho), exact, 10)
+            self.assertAlmostEqual(LD.LULogDet(self.w.sparse)(rho), exact, 10)
+
+    def test_approximations(self):
+        exact = LD.EigLogDet(self.w.sparse)
+        for backend in [LD.ChebyshevLogDet, LD.MCLogDet]:
+            approx = backend(self.w.sparse)
+            for rho in [-0.5, 0.3, 0.7]:
+                self.assertTrue(abs(approx(rho) - exact(rho)) < 0.02 * abs(exact(rho)))
+
+    def test_traces(self):
+        rho = 0.4
+        wa = np.dot(self.full, la.inv(np.eye(self.w.n) - rho * self.full))
+        exact = [np.trace(wa), np.trace(np.dot(wa, wa)), np.trace(np.dot(wa.T, wa))]
+        np.testing.assert_array_almost_equal(LD.EigLogDet(self.w.sparse).traces(rho), exact, 8)
+        approx = LD.LULogDet(self.w.sparse).traces(rho)
+        for a, e in zip(approx, exact):
+            self.assertTrue(abs(a - e) < 0.05 * e)
+
+    def test_cache(self):
+        logdet = LD.get_logdet(self.w, 'lu')
+        self.assertTrue(LD.get_logdet(self.w, 'lu') is logdet)
+        self.w.transform = 'b'
+        self.assertFalse(LD.get_logdet(self.w, 'lu') is logdet)
+        self.assertRaises(Exception, LD.get_logdet, self.w, 'qr')
+
+if __name__ == '__main__':
+    unittest.main()
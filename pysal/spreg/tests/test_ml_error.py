@@ -0,0 +1,37 @@
+import unittest
+import pysal
+import numpy as np
+from pysal.spreg.ml_error import BaseML_Error, ML_Error
+
+class TestMLError(unittest.TestCase):
+    def setUp(self):
+        db = pysal.open(pysal.examples.get_path("columbus.dbf"), "r")
+        self.y = np.array(db.by_col("CRIME")).reshape(49, 1)
+        X = []
+        X.append(db.by_col("INC"))
+        X.append(db.by_col("HOVAL"))
+        self.X = np.array(X).T
+        self.w = pysal.open(pysal.examples.get_path("columbus.gal"), "r").read()
+        self.w.transform = 'r'
+
+    def test_model(self):
+        reg = ML_Error(self.y, self.X, self.w)
+        betas = np.array([[ 60.2794697 ], [ -0.95730534], [ -0.30455926], [ 0.54675303]])
+        np.testing.assert_array_almost_equal(reg.betas, betas, 5)
+        self.assertEqual(reg.name_x[-1], 'lambda')
+        self.assertAlmostEqual(reg.logll, -183.749428062, 5)
+        std_err = np.array([ 5.36559381,  0.33423075,  0.09204732,  0.13805078])
+        np.testing.assert_array_almost_equal(reg.std_err, std_err, 5)
+        e = reg.u - reg.betas[-1] * (self.w.sparse * reg.u)
+        np.testing.assert_array_almost_equal(reg.e_filtered, e, 10)
+
+    def test_methods(self):
+        x = np.hstack((np.ones(self.y.shape), self.X))
+        full = BaseML_Error(self.y, x, self.w, method='full')
+        for method, decimal in [('lu', 6), ('cheb', 1), ('mc', 1)]:
+            reg = BaseML_Error(self.y, x, self.w, method=method)
+            np.testing.assert_array_almost_equal(reg.betas[-1], full.betas[-1], decimal)
+            self.assertAlmostEqual(reg.logll, full.logll, decimal)
+
+if __name__ == '__main__':
+    unittest.main()
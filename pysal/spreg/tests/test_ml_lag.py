@@ -0,0 +1,40 @@
+import unittest
+import pysal
+import numpy as np
+from pysal.spreg.ml_lag import BaseML_Lag, ML_Lag
+
+class TestMLLag(unittest.TestCase):
+    def setUp(self):
+        db = pysal.open(pysal.examples.get_path("columbus.dbf"), "r")
+        self.y = np.array(db.by_col("CRIME")).reshape(49, 1)
+        X = []
+        X.append(db.by_col("INC"))
+        X.append(db.by_col("HOVAL"))
+        self.X = np.array(X).T
+        self.w = pysal.open(pysal.examples.get_path("columbus.gal"), "r").read()
+        self.w.transform = 'r'
+
+    def test_model(self):
+        reg = ML_Lag(self.y, self.X, self.w, name_y='crime')
+        betas = np.array([[ 45.60324901], [ -1.04872817], [ -0.26633481], [ 0.42332542]])
+        np.testing.assert_array_almost_equal(reg.betas, betas, 5)
+        self.assertEqual(reg.method, 'full')
+        self.assertEqual(reg.name_x[-1], 'W_crime')
+        self.assertAlmostEqual(reg.logll, -182.67397201, 5)
+        self.assertAlmostEqual(reg.sig2, 96.85718139, 6)
+        std_err = np.array([ 7.2574039 ,  0.30740592,  0.08909629,  0.11951045])
+        np.testing.assert_array_almost_equal(reg.std_err, std_err, 5)
+        self.assertAlmostEqual(reg.aic, -2 * reg.logll + 8, 10)
+        u = reg.y - reg.predy
+        np.testing.assert_array_almost_equal(reg.u, u, 10)
+
+    def test_methods(self):
+        full = BaseML_Lag(self.y, np.hstack((np.ones(self.y.shape), self.X)), self.w)
+        for method, decimal in [('lu', 6), ('cheb', 1), ('mc', 1)]:
+            reg = BaseML_Lag(self.y, np.hstack((np.ones(self.y.shape), self.X)), self.w, method=method)
+            self.assertEqual(reg.method, method)
+            np.testing.assert_array_almost_equal(reg.betas[-1], full.betas[-1], decimal)
+            self.assertAlmostEqual(reg.logll, full.logll, decimal)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import unittest
+import numpy as np
+import pysal
+import pysal.spreg.regimes as REGI
+from pysal.spreg.ols import BaseOLS
+from pysal.spreg.ols_regimes import _work as ols_work
+from pysal.spreg.error_sp import BaseGM_Error
+from pysal.spreg.error_sp_regimes import _work_error
+
+
+class TestRegimes(unittest.TestCase):
+    def setUp(self):
+        db = pysal.open(pysal.examples.get_path('columbus.dbf'), 'r')
+        self.y = np.array([db.by_col('CRIME')]).reshape(49, 1)
+        self.x = np.array([db.by_col(name) for name in ['INC', 'HOVAL']]).T
+        self.regimes = db.by_col('NSA')
+        self.regimes_set = REGI._get_regimes_set(self.regimes)
+        self.w = pysal.rook_from_shapefile(pysal.examples.get_path("columbus.shp"))
+        self.w.transform = 'r'
+
+    def test_w_regimes(self):
+        w_i, regi_ids, warn = REGI.w_regimes(self.w, self.regimes,
+                                             self.regimes_set, get_ids=True)
+        for r in self.regimes_set:
+            ids = [self.w.id_order[i] for i in regi_ids[r]]
+            w_r = pysal.weights.w_subset(self.w, ids)
+            w_r.transform = 'r'
+            self.assertEqual(w_i[r].id_order, ids)
+            np.testing.assert_array_almost_equal(w_i[r].full()[0],
+                                                 w_r.full()[0])
+        w_union = REGI.w_regimes_union(self.w, w_i, self.regimes_set)
+        full = self.w.full()[0] > 0
+        regimes = np.array(self.regimes)
+        full = full * (regimes[:, None] == regimes[None, :])
+        full = full / np.maximum(full.sum(1), 1).reshape(49, 1).astype(float)
+        self.assertEqual(w_union.id_order, self.w.id_order)
+        np.testing.assert_array_almost_equal(w_union.full()[0], full)
+
+    def test_run_regimes(self):
+        w_i, regi_ids, warn = REGI.w_regimes(self.w, self.regimes,
+                                             self.regimes_set, get_ids=True)
+        args = (None, False, 'columbus', 'CRIME', ['INC', 'HOVAL'], 'w', 'NSA')
+        for cores in [None, None, 1]:
+            results = REGI._run_regimes(ols_work, regi_ids, self.regimes_set,
+                                        cores, {'y': self.y, 'x': self.x},
+                                        args=args)
+            for r in self.regimes_set:
+                x_r = pysal.spreg.user_output.check_constant(self.x[regi_ids[r]])
+                ols = BaseOLS(self.y[regi_ids[r]], x_r)
+                np.testing.assert_array_almost_equal(results[r].betas,
+                                                     ols.betas, 7)
+                np.testing.assert_array_almost_equal(results[r].x, ols.x, 7)
+                self.assertEqual(results[r].name_y, '%s_CRIME' % r)
+        self.assertEqual(REGI._POOL_CORES, 1)
+        results = REGI._run_regimes(_work_error, regi_ids, self.regimes_set,
+                                    None, {'y': self.y, 'x': self.x}, w_i=w_i,
+                                    args=('columbus', 'CRIME',
+                                          ['CONSTANT', 'INC', 'HOVAL', 'lambda'],
+                                          'w', 'NSA'))
+        for r in self.regimes_set:
+            x_r = pysal.spreg.user_output.check_constant(self.x[regi_ids[r]])
+            reg = BaseGM_Error(self.y[regi_ids[r]], x_r, w_i[r].sparse)
+            np.testing.assert_array_almost_equal(results[r].betas,
+                                                 reg.betas, 7)
+
+    def test_shared_data(self):
+        regi_ids = {'a': [0, 2, 4], 'b': [1, 3]}
+        y = np.arange(5.).reshape(5, 1)
+        shared = REGI._SharedData(regi_ids, ['a', 'b'], {'y': y, 'q': None})
+        data = REGI._regime_data(shared.handles['b'])
+        self.assertEqual(data.keys(), ['y'])
+        np.testing.assert_array_equal(data['y'], [[1.], [3.]])
+        self.assertTrue(os.path.exists(shared.path))
+        shared.close()
+        self.assertFalse(os.path.exists(shared.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
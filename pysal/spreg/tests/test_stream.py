@@ -0,0 +1,103 @@
+import unittest
+import numpy as np
+import pysal
+from pysal.spreg.ols import OLS
+from pysal.spreg.twosls import TSLS
+from pysal.spreg.stream import OLS_Stream, TSLS_Stream
+
+
+class TestOLS_Stream(unittest.TestCase):
+    def setUp(self):
+        self.db = pysal.open(pysal.examples.get_path("columbus.dbf"), 'r')
+        self.y = np.array(self.db.by_col("HOVAL")).reshape(49, 1)
+        self.X = np.array([self.db.by_col(name) for name in ['INC', 'CRIME']]).T
+
+    def test_table(self):
+        ols = OLS(self.y, self.X)
+        for chunksize in [10, 49, 100]:
+            reg = OLS_Stream(self.db, 'HOVAL', ['INC', 'CRIME'],
+                             chunksize=chunksize)
+            self.assertEqual(reg.n, 49)
+            self.assertEqual(reg.k, 3)
+            np.testing.assert_array_almost_equal(reg.betas, ols.betas, 7)
+            np.testing.assert_array_almost_equal(reg.vm, ols.vm, 7)
+            np.testing.assert_array_almost_equal(reg.xtx, ols.xtx, 7)
+            self.assertAlmostEqual(reg.utu, ols.utu, 7)
+            self.assertAlmostEqual(reg.mean_y, ols.mean_y, 7)
+            self.assertAlmostEqual(reg.std_y, ols.std_y, 7)
+            self.assertAlmostEqual(reg.r2, ols.r2, 7)
+            self.assertAlmostEqual(reg.ar2, ols.ar2, 7)
+            np.testing.assert_array_almost_equal(np.array(reg.t_stat),
+                                                 np.array(ols.t_stat), 7)
+        self.assertEqual(reg.name_x, ['CONSTANT', 'INC', 'CRIME'])
+
+    def test_robust(self):
+        ols = OLS(self.y, self.X, robust='white')
+        reg = OLS_Stream(self.db, 'HOVAL', ['INC', 'CRIME'], chunksize=10,
+                         robust='white')
+        np.testing.assert_array_almost_equal(reg.vm, ols.vm, 7)
+        gwk = pysal.kernelW_from_shapefile(pysal.examples.get_path('columbus.shp'), k=5, function='triangular', fixed=False)
+        ols = OLS(self.y, self.X, robust='hac', gwk=gwk)
+        reg = OLS_Stream(self.db, 'HOVAL', ['INC', 'CRIME'], chunksize=10,
+                         robust='hac', gwk=gwk)
+        np.testing.assert_array_almost_equal(reg.vm, ols.vm, 7)
+
+    def test_generator(self):
+        ols = OLS(self.y, self.X, robust='white')
+        def chunks():
+            for start in range(0, 49, 15):
+                yield self.y[start:start + 15], self.X[start:start + 15]
+        reg = OLS_Stream(chunks, robust='white')
+        np.testing.assert_array_almost_equal(reg.betas, ols.betas, 7)
+        np.testing.assert_array_almost_equal(reg.vm, ols.vm, 7)
+        self.assertEqual(reg.name_x, ['CONSTANT', 'var_1', 'var_2'])
+        reg = OLS_Stream(chunks())
+        np.testing.assert_array_almost_equal(reg.betas, ols.betas, 7)
+        self.assertRaises(Exception, OLS_Stream, chunks(), robust='white')
+        # masked arrays, as read with by_col_array
+        y, X = np.ma.masked_array(self.y), np.ma.masked_array(self.X)
+        reg = OLS_Stream([(y, X)])
+        np.testing.assert_array_almost_equal(reg.betas, ols.betas, 7)
+        X[3, 0] = np.ma.masked
+        self.assertRaises(Exception, OLS_Stream, [(y, X)])
+
+
+class TestTSLS_Stream(unittest.TestCase):
+    def setUp(self):
+        self.db = pysal.open(pysal.examples.get_path("columbus.dbf"), 'r')
+        self.y = np.array(self.db.by_col("CRIME")).reshape(49, 1)
+        self.X = np.array(self.db.by_col("INC")).reshape(49, 1)
+        self.yd = np.array(self.db.by_col("HOVAL")).reshape(49, 1)
+        self.q = np.array(self.db.by_col("DISCBD")).reshape(49, 1)
+
+    def test_table(self):
+        tsls = TSLS(self.y, self.X, self.yd, self.q)
+        reg = TSLS_Stream(self.db, 'CRIME', ['INC'], ['HOVAL'], ['DISCBD'],
+                          chunksize=10)
+        np.testing.assert_array_almost_equal(reg.betas, tsls.betas, 7)
+        np.testing.assert_array_almost_equal(reg.vm, tsls.vm, 7)
+        np.testing.assert_array_almost_equal(reg.hth, tsls.hth, 7)
+        np.testing.assert_array_almost_equal(reg.varb, tsls.varb, 7)
+        self.assertAlmostEqual(reg.utu, tsls.utu, 7)
+        self.assertEqual(reg.kstar, 1)
+        self.assertEqual(reg.name_h, ['CONSTANT', 'INC', 'DISCBD'])
+        np.testing.assert_array_almost_equal(np.array(reg.z_stat),
+                                             np.array(tsls.z_stat), 7)
+
+    def test_robust(self):
+        tsls = TSLS(self.y, self.X, self.yd, self.q, robust='white')
+        reg = TSLS_Stream(self.db, 'CRIME', ['INC'], ['HOVAL'], ['DISCBD'],
+                          chunksize=10, robust='white')
+        np.testing.assert_array_almost_equal(reg.vm, tsls.vm, 7)
+        gwk = pysal.kernelW_from_shapefile(pysal.examples.get_path('columbus.shp'), k=5, function='triangular', fixed=False)
+        tsls = TSLS(self.y, self.X, self.yd, self.q, robust='hac', gwk=gwk)
+        def chunks():
+            for start in range(0, 49, 20):
+                rows = slice(start, start + 20)
+                yield self.y[rows], self.X[rows], self.yd[rows], self.q[rows]
+        reg = TSLS_Stream(chunks, robust='hac', gwk=gwk)
+        np.testing.assert_array_almost_equal(reg.vm, tsls.vm, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,11 @@
 import numpy as np
 import regimes as REGI
 import user_output as USER
-import multiprocessing as mp
 import scipy.sparse as SP
 from utils import sphstack, set_warn, RegressionProps_basic, spdot
 from twosls import BaseTSLS
 from robust import hac_multi
 import summary_output as SUMMARY
-from platform import system
 
 """
 Two-stage Least Squares estimation with regimes.
@@ -337,15 +335,9 @@ class TSLS_Regimes(BaseTSLS, REGI.Regimes_Frame):
 
     def _tsls_regimes_multi(self, x, yend, q, w_i, regi_ids, cores,\
                  gwk, sig2n_k, robust, spat_diag, vm, name_x, name_yend, name_q):
-        pool = mp.Pool(cores)
-        results_p = {}
-        for r in self.regimes_set:
-            if system() == 'Windows':
-                is_win = True
-                results_p[r] = _work(*(self.y,x,regi_ids,r,yend,q,robust,sig2n_k,self.name_ds,self.name_y,name_x,name_yend,name_q,self.name_w,self.name_regimes))
-            else:
-                results_p[r] = pool.apply_async(_work,args=(self.y,x,regi_ids,r,yend,q,robust,sig2n_k,self.name_ds,self.name_y,name_x,name_yend,name_q,self.name_w,self.name_regimes))
-                is_win = False
+        results = REGI._run_regimes(_work, regi_ids, self.regimes_set, cores,\
+                  {'y': self.y, 'x': x, 'yend': yend, 'q': q},\
+                  args=(robust,sig2n_k,self.name_ds,self.name_y,name_x,name_yend,name_q,self.name_w,self.name_regimes))
         self.kryd = 0
         self.kr = x.shape[1]+yend.shape[1]+1
         self.kf = 0
@@ -354,17 +346,9 @@ class TSLS_Regimes(BaseTSLS, REGI.Regimes_Frame):
         self.betas = np.zeros((self.nr*self.kr,1),float)
         self.u = np.zeros((self.n,1),float)
         self.predy = np.zeros((self.n,1),float)
-        if not is_win:
-            pool.close()
-            pool.join()
-        results = {}
         self.name_y, self.name_x, self.name_yend, self.name_q, self.name_z, self.name_h = [],[],[],[],[],[]
         counter = 0
         for r in self.regimes_set:
-            if is_win:
-                results[r] = results_p[r]
-            else:
-                results[r] = results_p[r].get()
             if w_i:
                 results[r].w = w_i[r]
             else:
@@ -419,11 +403,12 @@ class TSLS_Regimes(BaseTSLS, REGI.Regimes_Frame):
         fac2 = np.linalg.inv(spdot(ZtHSi,ZtH.T,array_out=True))
         return fac2, ZtHSi
         
-def _work(y,x,regi_ids,r,yend,q,robust,sig2n_k,name_ds,name_y,name_x,name_yend,name_q,name_w,name_regimes):
-    y_r = y[regi_ids[r]]
-    x_r = x[regi_ids[r]]
-    yend_r = yend[regi_ids[r]]
-    q_r = q[regi_ids[r]]
+def _work(handle,r,robust,sig2n_k,name_ds,name_y,name_x,name_yend,name_q,name_w,name_regimes):
+    data = REGI._regime_data(handle)
+    y_r = data['y']
+    x_r = data['x']
+    yend_r = data['yend']
+    q_r = data['q']
     x_constant = USER.check_constant(x_r)
     if robust == 'hac':
         robust = None
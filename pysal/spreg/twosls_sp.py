@@ -12,6 +12,7 @@ import twosls as TSLS
 import robust as ROBUST
 import user_output as USER
 import summary_output as SUMMARY
+import impacts as IMPACTS
 from utils import get_lags, set_endog, sp_att, set_warn
 
 __all__ = ["GM_Lag"]
@@ -222,6 +223,9 @@ class GM_Lag(BaseGM_Lag):
                    If True, then use n-k to estimate sigma^2. If False, use n.
     spat_diag    : boolean
                    If True, then compute Anselin-Kelejian test
+    spat_impacts : boolean
+                   If True, compute the direct, indirect and total impacts
+                   of the regressors (see impacts.Impacts)
     vm           : boolean
                    If True, include variance-covariance matrix in summary
                    results
@@ -239,6 +243,10 @@ class GM_Lag(BaseGM_Lag):
                    Name of kernel weights matrix for use in output
     name_ds      : string
                    Name of dataset for use in output
+    inv_method   : string
+                   Method used to compute predy_e, the predictions from the
+                   reduced form: "power_exp" (default), "true_inv", "splu"
+                   or "krylov" (see utils.inverse_prod)
 
     Attributes
     ----------
@@ -302,6 +310,9 @@ class GM_Lag(BaseGM_Lag):
     ak_test      : tuple
                    Anselin-Kelejian test; tuple contains the pair (statistic,
                    p-value)
+    impacts      : Impacts
+                   Direct, indirect and total impacts of the regressors
+                   (only if spat_impacts is True)
     name_y       : string
                    Name of dependent variable for use in output
     name_x       : list of strings
@@ -470,10 +481,11 @@ class GM_Lag(BaseGM_Lag):
     def __init__(self, y, x, yend=None, q=None,\
                  w=None, w_lags=1, lag_q=True,\
                  robust=None, gwk=None, sig2n_k=False,\
-                 spat_diag=False,\
+                 spat_diag=False, spat_impacts=False,\
                  vm=False, name_y=None, name_x=None,\
                  name_yend=None, name_q=None,\
-                 name_w=None, name_gwk=None, name_ds=None):
+                 name_w=None, name_gwk=None, name_ds=None,\
+                 inv_method='power_exp'):
 
         n = USER.check_arrays(x, yend, q)
         USER.check_y(y, n)
@@ -485,7 +497,8 @@ class GM_Lag(BaseGM_Lag):
                             w_lags=w_lags, robust=robust, gwk=gwk,\
                             lag_q=lag_q, sig2n_k=sig2n_k)
         self.predy_e, self.e_pred, warn = sp_att(w,self.y,self.predy,\
-                      yend2[:,-1].reshape(self.n,1),self.betas[-1])
+                      yend2[:,-1].reshape(self.n,1),self.betas[-1],\
+                      inv_method=inv_method)
         set_warn(self,warn)
         self.title = "SPATIAL TWO STAGE LEAST SQUARES"        
         self.name_ds = USER.set_name_ds(name_ds)
@@ -500,7 +513,10 @@ class GM_Lag(BaseGM_Lag):
         self.robust = USER.set_robust(robust)
         self.name_w = USER.set_name_w(name_w, w)
         self.name_gwk = USER.set_name_w(name_gwk, gwk)
-        SUMMARY.GM_Lag(reg=self, w=w, vm=vm, spat_diag=spat_diag)
+        if spat_impacts:
+            self.impacts = IMPACTS.Impacts(self, w)
+        SUMMARY.GM_Lag(reg=self, w=w, vm=vm, spat_diag=spat_diag,\
+                       spat_impacts=spat_impacts)
 
 
 def _test():
@@ -9,12 +9,11 @@ import pysal
 import regimes as REGI
 import user_output as USER
 import summary_output as SUMMARY
-import multiprocessing as mp
+import impacts as IMPACTS
 from twosls_regimes import TSLS_Regimes
 from twosls import BaseTSLS
 from utils import set_endog, set_endog_sparse, sp_att, set_warn, sphstack
 from robust import hac_multi
-from platform import system
 
 
 class GM_Lag_Regimes(TSLS_Regimes, REGI.Regimes_Frame):
@@ -82,6 +81,11 @@ class GM_Lag_Regimes(TSLS_Regimes, REGI.Regimes_Frame):
                    If True, then use n-k to estimate sigma^2. If False, use n.
     spat_diag    : boolean
                    If True, then compute Anselin-Kelejian test
+    spat_impacts : boolean
+                   If True, compute the direct, indirect and total impacts
+                   of the regressors (see impacts.Impacts); when multiple
+                   regressions are estimated, they are computed for each
+                   regime
     vm           : boolean
                    If True, include variance-covariance matrix in summary
                    results
@@ -285,6 +289,10 @@ class GM_Lag_Regimes(TSLS_Regimes, REGI.Regimes_Frame):
                    i.e. when regime_err_sep=True and no variable is fixed
                    across regimes.
                    Contains all attributes of each individual regression
+    impacts      : Impacts
+                   Direct, indirect and total impacts of the regressors
+                   (only if spat_impacts is True and a single regression is
+                   estimated)
 
     References
     ----------
@@ -426,7 +434,7 @@ class GM_Lag_Regimes(TSLS_Regimes, REGI.Regimes_Frame):
     def __init__(self, y, x, regimes, yend=None, q=None,\
                  w=None, w_lags=1, lag_q=True,\
                  robust=None, gwk=None, sig2n_k=False,\
-                 spat_diag=False, constant_regi='many',\
+                 spat_diag=False, spat_impacts=False, constant_regi='many',\
                  cols2regi='all', regime_lag_sep=False, regime_err_sep=True,\
                  cores=None, vm=False, name_y=None, name_x=None,\
                  name_yend=None, name_q=None, name_regimes=None,\
@@ -467,7 +475,8 @@ class GM_Lag_Regimes(TSLS_Regimes, REGI.Regimes_Frame):
             self.GM_Lag_Regimes_Multi(y, x, w_i, regi_ids,\
                  yend=yend, q=q, w_lags=w_lags, lag_q=lag_q, cores=cores,\
                  robust=robust, gwk=gwk, sig2n_k=sig2n_k, cols2regi=cols2regi,\
-                 spat_diag=spat_diag, vm=vm, name_y=name_y, name_x=name_x,\
+                 spat_diag=spat_diag, spat_impacts=spat_impacts, vm=vm,\
+                 name_y=name_y, name_x=name_x,\
                  name_yend=name_yend, name_q=name_q, name_regimes=self.name_regimes,\
                  name_w=name_w, name_gwk=name_gwk, name_ds=name_ds)
         else:
@@ -493,29 +502,25 @@ class GM_Lag_Regimes(TSLS_Regimes, REGI.Regimes_Frame):
                 self.title = "SPATIAL TWO STAGE LEAST SQUARES - REGIMES (Group-wise heteroskedasticity)"
             else:
                 self.title = "SPATIAL TWO STAGE LEAST SQUARES - REGIMES"
-            SUMMARY.GM_Lag(reg=self, w=w, vm=vm, spat_diag=spat_diag, regimes=True)
+            if spat_impacts:
+                self.impacts = IMPACTS.Impacts(self, w)
+            SUMMARY.GM_Lag(reg=self, w=w, vm=vm, spat_diag=spat_diag, regimes=True,\
+                           spat_impacts=spat_impacts)
 
     def GM_Lag_Regimes_Multi(self, y, x, w_i, regi_ids, cores=None,\
                  yend=None, q=None, w_lags=1, lag_q=True,\
                  robust=None, gwk=None, sig2n_k=False,cols2regi='all',\
-                 spat_diag=False, vm=False, name_y=None, name_x=None,\
+                 spat_diag=False, spat_impacts=False, vm=False, name_y=None, name_x=None,\
                  name_yend=None, name_q=None, name_regimes=None,\
                  name_w=None, name_gwk=None, name_ds=None):
-        pool = mp.Pool(cores)
         self.name_ds = USER.set_name_ds(name_ds)
         name_x = USER.set_name_x(name_x, x)
         name_yend.append(USER.set_name_yend_sp(name_y))
         self.name_w = USER.set_name_w(name_w, w_i)
         self.name_gwk = USER.set_name_w(name_gwk, gwk)
-        results_p = {}
-        for r in self.regimes_set:
-            w_r = w_i[r].sparse
-            if system() == 'Windows':
-                is_win = True
-                results_p[r] = _work(*(y,x,regi_ids,r,yend,q,w_r,w_lags,lag_q,robust,sig2n_k,self.name_ds,name_y,name_x,name_yend,name_q,self.name_w,name_regimes))
-            else:                
-                results_p[r] = pool.apply_async(_work,args=(y,x,regi_ids,r,yend,q,w_r,w_lags,lag_q,robust,sig2n_k,self.name_ds,name_y,name_x,name_yend,name_q,self.name_w,name_regimes, ))
-                is_win = False
+        results = REGI._run_regimes(_work, regi_ids, self.regimes_set, cores,\
+                  {'y': y, 'x': x, 'yend': yend, 'q': q}, w_i=w_i,\
+                  args=(w_lags,lag_q,robust,sig2n_k,self.name_ds,name_y,name_x,name_yend,name_q,self.name_w,name_regimes))
         self.kryd = 0
         self.kr = len(cols2regi) + 1
         self.kf = 0
@@ -528,17 +533,9 @@ class GM_Lag_Regimes(TSLS_Regimes, REGI.Regimes_Frame):
         self.predy = np.zeros((self.n,1),float)
         self.predy_e = np.zeros((self.n,1),float)
         self.e_pred = np.zeros((self.n,1),float)
-        if not is_win:
-            pool.close()
-            pool.join()
-        results = {}
         self.name_y, self.name_x, self.name_yend, self.name_q, self.name_z, self.name_h = [],[],[],[],[],[]
         counter = 0
         for r in self.regimes_set:
-            if is_win:
-                results[r] = results_p[r]
-            else:
-                results[r] = results_p[r].get()
             results[r].predy_e, results[r].e_pred, warn = sp_att(w_i[r],results[r].y,results[r].predy, results[r].yend[:,-1].reshape(results[r].n,1),results[r].betas[-1])
             set_warn(results[r],warn)
             results[r].w = w_i[r]
@@ -561,8 +558,11 @@ class GM_Lag_Regimes(TSLS_Regimes, REGI.Regimes_Frame):
         self.multi = results
         if robust == 'hac':
             hac_multi(self,gwk,constant=True)
+        if spat_impacts:
+            for r in self.regimes_set:
+                results[r].impacts = IMPACTS.Impacts(results[r], w_i[r])
         self.chow = REGI.Chow(self)
-        SUMMARY.GM_Lag_multi(reg=self, multireg=self.multi, vm=vm, spat_diag=spat_diag, regimes=True)
+        SUMMARY.GM_Lag_multi(reg=self, multireg=self.multi, vm=vm, spat_diag=spat_diag, regimes=True, spat_impacts=spat_impacts)
 
     def sp_att_reg(self, w_i, regi_ids, wy):
         predy_e_r,e_pred_r = {},{}
@@ -576,17 +576,13 @@ class GM_Lag_Regimes(TSLS_Regimes, REGI.Regimes_Frame):
                           wy[regi_ids[r]],lambd)
             counter += 1
 
-def _work(y,x,regi_ids,r,yend,q,w_r,w_lags,lag_q,robust,sig2n_k,name_ds,name_y,name_x,name_yend,name_q,name_w,name_regimes):
-    y_r = y[regi_ids[r]]
-    x_r = x[regi_ids[r]]
-    if yend != None:
-        yend_r = yend[regi_ids[r]]
-    else:
-        yend_r = yend
-    if q != None:
-        q_r = q[regi_ids[r]]
-    else:
-        q_r = q
+def _work(handle,r,w_lags,lag_q,robust,sig2n_k,name_ds,name_y,name_x,name_yend,name_q,name_w,name_regimes):
+    data = REGI._regime_data(handle)
+    y_r = data['y']
+    x_r = data['x']
+    w_r = data['w']
+    yend_r = data.get('yend')
+    q_r = data.get('q')
     yend_r, q_r = set_endog_sparse(y_r, x_r, w_r, yend_r, q_r, w_lags, lag_q)
     x_constant = USER.check_constant(x_r)
     if robust == 'hac':
@@ -9,10 +9,17 @@ __author__ = "Luc Anselin luc.anselin@asu.edu, \
 
 import numpy as np
 from scipy import sparse as SP
+from scipy.sparse import linalg as SPla
 import scipy.optimize as op
 import numpy.linalg as la
 from pysal import lag_spatial
+from pysal.weights.weights import sparse_moments
 import copy
+import warnings
+
+# cap on the number of terms of the power expansion when the convergence
+# cannot be bounded from W
+MAX_POWER_TERMS = 10000
 
 
 class RegressionPropsY:
@@ -156,7 +163,7 @@ def get_A1_hom(s, scalarKP=False):
     """
     n = float(s.shape[0])
     wpw = s.T*s
-    twpw = np.sum(wpw.diagonal()) 
+    twpw = sparse_moments(s)['trcWtW']
     e = SP.eye(n, n, format='csr')
     e.data = np.ones(n) * (twpw / n)
     num = wpw - e
@@ -399,16 +406,24 @@ def inverse_prod(w, data, scalar, post_multiply=False, inv_method="power_exp", t
                       pre-multiplies.
     inv_method      : string
                       If "true_inv" uses the true inverse of W (slow);
-                      If "power_exp" uses the power expansion method (default)
+                      If "power_exp" uses the power expansion method (default);
+                      If "splu" solves with a sparse LU factorization of
+                      (I - scalar*W), which is kept for later calls with the
+                      same weights and scalar;
+                      If "krylov" solves with GMRES preconditioned by an
+                      incomplete LU factorization of (I - scalar*W)
 
     threshold       : float
                       Test value to stop the iterations. Test is against
                       sqrt(increment' * increment), where increment is a
                       vector representing the contribution from each
-                      iteration.
+                      iteration. For "krylov", relative tolerance of the
+                      residual.
 
     max_iterations  : integer
-                      Maximum number of iterations for the expansion.   
+                      Maximum number of iterations for the expansion, or of
+                      the Krylov solver. For the expansion, if None it is
+                      bounded from the row sums of W (see power_expansion).
 
     Examples
     --------
@@ -431,6 +446,17 @@ def inverse_prod(w, data, scalar, post_multiply=False, inv_method="power_exp", t
     >>> inv_reg = inverse_prod(w, data, rho, inv_method="true_inv", post_multiply=True)
     >>> np.allclose(inv_pow, inv_reg, atol=0.0001)
     True
+    >>> # sparse solvers, with several columns at once
+    >>> data2 = np.hstack((data, data ** 2))
+    >>> inv_lu = inverse_prod(w, data2, rho, inv_method="splu")
+    >>> inv_kr = inverse_prod(w, data2, rho, inv_method="krylov")
+    >>> inv_reg = inverse_prod(w, data2, rho, inv_method="true_inv")
+    >>> np.allclose(inv_lu, inv_reg) and np.allclose(inv_kr, inv_reg)
+    True
+    >>> inv_lu = inverse_prod(w, data2, rho, inv_method="splu", post_multiply=True)
+    >>> inv_reg = inverse_prod(w, data2, rho, inv_method="true_inv", post_multiply=True)
+    >>> np.allclose(inv_lu, inv_reg)
+    True
 
     """                      
     if inv_method=="power_exp":
@@ -440,11 +466,16 @@ def inverse_prod(w, data, scalar, post_multiply=False, inv_method="power_exp", t
         try:
             matrix = la.inv(np.eye(w.n) - (scalar * w.full()[0]))
         except:
-            matrix = la.inv(np.eye(w.shape[0]) - (scalar * w))
+            matrix = la.inv(np.eye(w.shape[0]) - (scalar * w.toarray()))
         if post_multiply:
             inv_prod = spdot(data.T, matrix)
         else:
             inv_prod = spdot(matrix, data)
+    elif inv_method=="splu":
+        inv_prod = spfilter_lu(w, scalar).solve(data, post_multiply)
+    elif inv_method=="krylov":
+        inv_prod = krylov_solve(w, data, scalar, post_multiply=post_multiply,\
+                threshold=threshold, max_iterations=max_iterations)
     else:
         raise Exception, "Invalid method selected for inversion."
     return inv_prod
@@ -458,6 +489,16 @@ def power_expansion(w, data, scalar, post_multiply=False, threshold=0.0000000001
             x &= (I - \rho W)^{-1}v = [I + \rho W + \rho^2 WW + \dots]v \\
               &= v + \rho Wv + \rho^2 WWv + \dots
 
+    The norm of the increments falls at least geometrically, by a factor
+    |rho| times the largest absolute row sum of W (column sum if
+    post_multiply), which bounds its spectral radius. When that factor is
+    lower than 1 and max_iterations is None, the expansion is capped at the
+    number of terms the bound requires to bring the increments below
+    threshold; otherwise it is capped at MAX_POWER_TERMS. A RuntimeWarning
+    is raised if the cap is reached before the threshold. For weights or
+    values of rho for which the expansion converges slowly, the "splu" and
+    "krylov" methods of inverse_prod are faster.
+
     Examples
     --------
     Tests for this function are in inverse_prod()
@@ -474,7 +515,7 @@ def power_expansion(w, data, scalar, post_multiply=False, threshold=0.0000000001
     count = 1
     test = 10000000
     if max_iterations == None:
-        max_iterations = 10000000
+        max_iterations = power_terms(ws, data, scalar, threshold, post_multiply)
     while test > threshold and count <= max_iterations:
         if post_multiply:    
             increment = increment*ws*scalar
@@ -486,8 +527,140 @@ def power_expansion(w, data, scalar, post_multiply=False, threshold=0.0000000001
         if test > test_old:
             raise Exception, "power expansion will not converge, check model specification and that weight are less than 1"
         count += 1
+    if test > threshold:
+        warnings.warn("power expansion stopped after %d terms before reaching the threshold" % max_iterations, RuntimeWarning)
     return running_total
 
+def power_terms(w, data, scalar, threshold=0.0000000001, post_multiply=False):
+    """
+    Number of terms of the power expansion of (I - scalar W)^-1 data after
+    which the increments are guaranteed to be smaller than threshold, from
+    the largest absolute row (or column) sum of W; MAX_POWER_TERMS when the
+    bound is not lower than 1
+
+    Examples
+    --------
+
+    >>> import pysal
+    >>> w = pysal.lat2W(5, 5)
+    >>> w.transform = 'r'
+    >>> power_terms(w.sparse, np.ones((w.n, 1)), 0.5)
+    36
+    >>> power_terms(w.sparse, np.ones((w.n, 1)), 0.5, threshold=0.001)
+    13
+    >>> power_terms(w.sparse, np.ones((w.n, 1)), 1.) == MAX_POWER_TERMS
+    True
+    """
+    ratio = abs(scalar) * abs(w).sum(0 if post_multiply else 1).max()
+    # the euclidean norm is at most sqrt(n) times the largest element
+    size = np.abs(data).max() * np.sqrt(data.size) if data.size else 0
+    if not 0 < ratio < 1 or not size:
+        return MAX_POWER_TERMS if ratio >= 1 else 1
+    return max(1, int(np.ceil(np.log(threshold / size) / np.log(ratio))))
+
+class SpFilterLU:
+    """
+    Sparse LU factorization of the spatial filter (I - scalar*W), reusable
+    for any number of right hand sides
+
+    Parameters
+    ----------
+    w               : Sparse matrix or Pysal W object
+                      nxn spatial weights
+    scalar          : float
+                      Scalar value (typically rho or lambda)
+
+    Attributes
+    ----------
+    lu              : SuperLU
+                      factorization from scipy.sparse.linalg.splu
+
+    Examples
+    --------
+    >>> import pysal
+    >>> w = pysal.lat2W(5, 5)
+    >>> w.transform = 'r'
+    >>> data = np.ones((w.n, 1))
+    >>> np.allclose(SpFilterLU(w, 0.5).solve(data), 2.0)
+    True
+    """
+    def __init__(self, w, scalar):
+        ws = _sparse(w)
+        self.w = ws
+        self.scalar = scalar
+        a = SP.identity(ws.shape[0], format='csc') - scalar * ws
+        self.lu = SPla.splu(a.tocsc())
+
+    def solve(self, data, post_multiply=False):
+        """
+        (I - scalar*W)^-1 data, or data' (I - scalar*W)^-1 if post_multiply
+
+        Parameters
+        ----------
+        data            : array
+                          nxk array, all columns are solved at once
+        post_multiply   : boolean
+                          If True the result has the shape of data.T
+        """
+        data = np.asarray(data, float)
+        if post_multiply:
+            return self.lu.solve(data, trans='T').T
+        return self.lu.solve(data)
+
+def spfilter_lu(w, scalar):
+    """
+    SpFilterLU of w and scalar, reusing the last factorization when it was
+    built for the same weights and scalar
+    """
+    ws = _sparse(w)
+    last = _LAST_LU.get('lu')
+    if last is None or last.w is not ws or last.scalar != scalar:
+        last = SpFilterLU(ws, scalar)
+        _LAST_LU['lu'] = last
+    return last
+
+_LAST_LU = {}
+
+def krylov_solve(w, data, scalar, post_multiply=False, threshold=0.0000000001, max_iterations=None):
+    """
+    Solve (I - scalar*W) x = data column by column with GMRES, preconditioned
+    by an incomplete LU factorization of (I - scalar*W) shared by all the
+    columns. Memory stays close to the size of W, which suits problems too
+    large for a complete factorization.
+
+    Examples
+    --------
+    Tests for this function are in inverse_prod()
+
+    """
+    ws = _sparse(w)
+    a = SP.identity(ws.shape[0], format='csc') - scalar * ws
+    if post_multiply:
+        a = a.T
+    a = a.tocsc()
+    ilu = SPla.spilu(a, drop_tol=1e-5, fill_factor=5)
+    precond = SPla.LinearOperator(a.shape, ilu.solve)
+    data = np.asarray(data, float)
+    single = data.ndim == 1
+    b = data.reshape(data.shape[0], -1)
+    x = np.empty(b.shape)
+    for j in range(b.shape[1]):
+        x[:,j], info = SPla.gmres(a, b[:,j], M=precond, tol=threshold,\
+                maxiter=max_iterations)
+        if info != 0:
+            raise Exception, "Krylov solver did not converge, check model specification or increase max_iterations"
+    if single:
+        x = x.flatten()
+    if post_multiply:
+        return x.T
+    return x
+
+def _sparse(w):
+    try:
+        return w.sparse
+    except:
+        return w
+
 def set_endog(y, x, w, yend, q, w_lags, lag_q):
     # Create spatial lag of y
     yl = lag_spatial(w, y)
@@ -545,10 +718,10 @@ def iter_msg(iteration,max_iter):
         iter_stop = "Convergence threshold (epsilon) reached."
     return iter_stop
 
-def sp_att(w,y,predy,w_y,rho):
+def sp_att(w,y,predy,w_y,rho,inv_method="power_exp"):
     xb = predy - rho*w_y
     if np.abs(rho)<1:
-        predy_sp = inverse_prod(w, xb, rho)
+        predy_sp = inverse_prod(w, xb, rho, inv_method=inv_method)
         warn = None
         resid_sp = y - predy_sp #Note 1: Here if omitting pseudo-R2; If not, see Note 2.
     else:
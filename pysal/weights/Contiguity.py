@@ -6,7 +6,7 @@ __author__ = "Sergio J. Rey <srey@asu.edu> "
 __all__ = ['buildContiguity']
 
 import pysal
-from _contW_binning import ContiguityWeights_binning as ContiguityWeights
+from _contW_hash import ContiguityWeights_hash as ContiguityWeights
 from _contW_binning import ContiguityWeightsPolygons
 
 
@@ -11,11 +11,14 @@ from pysal.weights import W
 
 from scipy import sparse
 import scipy.stats
+import itertools
+from pysal.cg.kdtree import Arc_KDTree, FLOAT_EPS
+from pysal.cg import sphere
 
 __all__ = ["knnW", "Kernel", "DistanceBand"]
 
 
-def knnW(data, k=2, p=2, ids=None, pct_unique=0.25):
+def knnW(data, k=2, p=2, ids=None, pct_unique=0.25, radius=None):
     """
     Creates nearest neighbor weights matrix based on k nearest
     neighbors.
@@ -38,11 +41,16 @@ def knnW(data, k=2, p=2, ids=None, pct_unique=0.25):
     pct_unique : float 
                  threshold percentage of unique points in data. Below this
                  threshold tree is built on unique values only
+    radius     : float
+                 If supplied, data are (lng, lat) points and the neighbors
+                 are the nearest in arc distance on a sphere of this radius.
+                 p and pct_unique are ignored.
     Returns
     -------
 
     w         : W instance
-                Weights object with binary weights
+                Weights object with binary weights, a WCSR instance if
+                radius is supplied
 
 
     Examples
@@ -95,6 +103,13 @@ def knnW(data, k=2, p=2, ids=None, pct_unique=0.25):
     >>> 0 in wnn2.neighbors
     False
 
+    points on the Earth given as (lng, lat)
+
+    >>> pts = [(0, 0), (1, 0), (3, 0), (0, 2), (179, 0)]
+    >>> wa = knnW(pts, k=1, radius=pysal.cg.RADIUS_EARTH_KM)
+    >>> [wa.neighbors[i] for i in range(5)]
+    [[1], [0], [1], [0], [2]]
+
 
     Notes
     -----
@@ -107,7 +122,9 @@ def knnW(data, k=2, p=2, ids=None, pct_unique=0.25):
 
     """
 
-    if issubclass(type(data), scipy.spatial.KDTree):
+    if radius is not None and not isKDTree(data):
+        return _arc_knnW(data, k, ids)
+    if isKDTree(data):
         kd = data
         data = kd.data
         nnq = kd.query(data, k=k+1, p=p)
@@ -149,6 +166,26 @@ def knnW(data, k=2, p=2, ids=None, pct_unique=0.25):
     return pysal.weights.W(neighbors,  id_order=ids)
 
 
+def _arc_knnW(data, k, ids=None):
+    """
+    k nearest neighbors in arc distance of the (lng, lat) points in data, as
+    a WCSR. The points are mapped once on the unit sphere, where the chord
+    distance ranks the neighbors as the arc distance does.
+    """
+    xyz = sphere.toXYZ(np.asarray(data, float))
+    n = len(xyz)
+    d, nn = scipy.spatial.cKDTree(xyz).query(xyz, k=k + 1)
+    nn = nn.reshape(n, k + 1)
+    # each point is dropped from its own neighbors, or the farthest
+    # neighbor is when coincident points hide the point itself
+    own = nn == np.arange(n).reshape(n, 1)
+    own[~own.any(1), -1] = True
+    nn = nn[~own]
+    sp = sparse.csr_matrix((np.ones(n * k), nn, np.arange(0, n * k + 1, k)),
+                           shape=(n, n))
+    return pysal.weights.WCSR(sp, ids)
+
+
 class Kernel(W):
     """Spatial weights based on kernel functions
 
@@ -217,6 +254,11 @@ class Kernel(W):
     eps         : float
                   adjustment to ensure knn distance range is closed on the
                   knnth observations
+    radius      : float
+                  If supplied, data are (lng, lat) points, or a cKDTree on
+                  their pysal.cg.sphere.toXYZ coordinates, and the distances
+                  and bandwidths are arc distances on a sphere of this
+                  radius
 
     Examples
     --------
@@ -300,17 +342,30 @@ class Kernel(W):
     >>> kqd = Kernel(points, function='gaussian', diagonal=True)
     >>> kqd.weights
     {0: [1.0, 0.35206533556593145, 0.3412334260702758], 1: [0.35206533556593145, 1.0, 0.2419707487162134, 0.3412334260702758, 0.31069657591175387], 2: [0.2419707487162134, 1.0, 0.31069657591175387], 3: [0.3412334260702758, 0.3412334260702758, 1.0, 0.3011374490937829, 0.26575287272131043], 4: [0.31069657591175387, 0.31069657591175387, 0.3011374490937829, 1.0, 0.35206533556593145], 5: [0.26575287272131043, 0.35206533556593145, 1.0]}
+
+    Arc distances in km between (lng, lat) points
+
+    >>> pts = [(0, 0), (1, 0), (3, 0), (0, 2), (179, 0)]
+    >>> ka = Kernel(pts, bandwidth=250., radius=pysal.cg.RADIUS_EARTH_KM)
+    >>> ka.neighbors[0]
+    [0, 1, 3]
+    >>> np.round(ka.weights[0], 4)
+    array([ 1.    ,  0.5552,  0.1104])
     """
     def __init__(self, data, bandwidth=None, fixed=True, k=2,
                  function='triangular', eps=1.0000001, ids=None,
-                 diagonal=False):
-        if issubclass(type(data), scipy.spatial.KDTree):
+                 diagonal=False, radius=None):
+        self.radius = radius
+        if isKDTree(data):
             self.kdt = data
             self.data = self.kdt.data
             data = self.data
+        elif radius is not None:
+            self.data = np.asarray(data, float)
+            self.kdt = scipy.spatial.cKDTree(sphere.toXYZ(self.data))
         else:
-            self.data = data
-            self.kdt = KDTree(self.data)
+            self.data = np.asarray(data)
+            self.kdt = scipy.spatial.cKDTree(self.data)
         self.k = k + 1
         self.function = function.lower()
         self.fixed = fixed
@@ -326,12 +381,13 @@ class Kernel(W):
             self._set_bw()
 
         self._eval_kernel()
-        neighbors, weights = self._k_to_W(ids)
         if diagonal:
-            for i in neighbors:
-                nis = neighbors[i]
-                weights[i][neighbors[i].index(i)] = 1.0
+            self.kernel[self._i == self._j] = 1.0
+        neighbors, weights = self._k_to_W(ids)
         W.__init__(self, neighbors, weights, ids)
+        self._sparse = sparse.csr_matrix((self.kernel, self._j, self._indptr),
+                                         shape=(self.n, self.n))
+        self._cache['sparse'] = self._sparse
 
     def _k_to_W(self, ids=None):
         allneighbors = {}
@@ -340,17 +396,19 @@ class Kernel(W):
             ids = np.array(ids)
         else:
             ids = np.arange(len(self.data))
-        for i, neighbors in enumerate(self.kernel):
-            if len(self.neigh[i]) == 0:
-                allneighbors[ids[i]] = []
-                weights[ids[i]] = []
-            else:
-                allneighbors[ids[i]] = list(ids[self.neigh[i]])
-                weights[ids[i]] = self.kernel[i].tolist()
+        indptr = self._indptr
+        neighbor_ids = ids[self._j].tolist()
+        kernel = self.kernel.tolist()
+        for i in xrange(len(ids)):
+            start, end = indptr[i], indptr[i + 1]
+            allneighbors[ids[i]] = neighbor_ids[start:end]
+            weights[ids[i]] = kernel[start:end]
         return allneighbors, weights
 
     def _set_bw(self):
-        dmat, neigh = self.kdt.query(self.data, k=self.k)
+        dmat, neigh = self.kdt.query(self.kdt.data, k=self.k)
+        if self.radius is not None and not isinstance(self.kdt, Arc_KDTree):
+            dmat = sphere.linear2arcdist(dmat, self.radius)
         if self.fixed:
             # use max knn distance as bandwidth
             bandwidth = dmat.max() * self.eps
@@ -360,41 +418,45 @@ class Kernel(W):
             # use local max knn distance
             self.bandwidth = dmat.max(axis=1) * self.eps
             self.bandwidth.shape = (self.bandwidth.size, 1)
-            # identify knn neighbors for each point
-            nnq = self.kdt.query(self.data, k=self.k)
-            self.neigh = nnq[1]
+            # knn neighbors and their distances for each point
+            self.neigh = neigh
+            self._dmat = dmat
 
     def _eval_kernel(self):
-        # get points within bandwidth distance of each point
-        if not hasattr(self, 'neigh'):
-            kdtq = self.kdt.query_ball_point
-            neighbors = [kdtq(self.data[i], r=bwi[0]) for i,
-                         bwi in enumerate(self.bandwidth)]
-            self.neigh = neighbors
-        # get distances for neighbors
-        data = np.array(self.data)
-        bw = self.bandwidth
-
-        kdtq = self.kdt.query
-        z = []
-        for i, nids in enumerate(self.neigh):
-            di, ni = kdtq(self.data[i], k=len(nids))
-            zi = np.array([dict(zip(ni, di))[nid] for nid in nids]) / bw[i]
-            z.append(zi)
-        zs = z
+        """
+        Evaluate the kernel for all pairs of points within bandwidth
+        distance, as flat arrays in row order
+        """
+        bw = self.bandwidth.flatten()
+        n = len(bw)
+        if hasattr(self, 'neigh'):
+            # adaptive bandwidths, the neighbors are the knn
+            k = self.neigh.shape[1]
+            i = np.repeat(np.arange(n), k)
+            j = self.neigh.flatten()
+            d = self._dmat.flatten()
+        else:
+            # get points within bandwidth distance of each point
+            i, j, d = _pairs_within(self.kdt, bw.max(), radius=self.radius)
+            within = d <= bw[i]
+            i, j, d = i[within], j[within], d[within]
+        self._i = i
+        self._j = j
+        self._indptr = np.concatenate(([0], np.bincount(i, minlength=n).cumsum()))
+        z = d / bw[i]
         # functions follow Anselin and Rey (2010) table 5.4
         if self.function == 'triangular':
-            self.kernel = [1 - z for z in zs]
+            self.kernel = 1 - z
         elif self.function == 'uniform':
-            self.kernel = [np.ones(z.shape) * 0.5 for z in zs]
+            self.kernel = np.ones(z.shape) * 0.5
         elif self.function == 'quadratic':
-            self.kernel = [(3. / 4) * (1 - z ** 2) for z in zs]
+            self.kernel = (3. / 4) * (1 - z ** 2)
         elif self.function == 'quartic':
-            self.kernel = [(15. / 16) * (1 - z ** 2) ** 2 for z in zs]
+            self.kernel = (15. / 16) * (1 - z ** 2) ** 2
         elif self.function == 'gaussian':
             c = np.pi * 2
             c = c ** (-0.5)
-            self.kernel = [c * np.exp(-(z ** 2) / 2.) for z in zs]
+            self.kernel = c * np.exp(-(z ** 2) / 2.)
         else:
             print 'Unsupported kernel function', self.function
 
@@ -422,6 +484,11 @@ class DistanceBand(W):
                  distance decay parameter for weight (default -1.0)
                  if alpha is positive the weights will not decline with
                  distance. If binary is True, alpha is ignored
+    radius     : float
+                 If supplied, data are (lng, lat) points, or a cKDTree on
+                 their pysal.cg.sphere.toXYZ coordinates, and threshold and
+                 distances are arc distances on a sphere of this radius.
+                 p is ignored.
 
     Examples
     --------
@@ -459,6 +526,18 @@ class DistanceBand(W):
     >>> w.weights[0]
     [0.01, 0.0079999999999999984]
 
+    arc distances in miles between (lng, lat) points
+
+    >>> pts = [(0, 0), (1, 0), (3, 0), (0, 2), (179, 0)]
+    >>> wa = DistanceBand(pts, 150, binary=False, alpha=1.0,
+    ...                   radius=pysal.cg.RADIUS_EARTH_MILES)
+    WARNING: there is one disconnected observation (no neighbors)
+    Island id:  [4]
+    >>> wa.neighbors[0]
+    [1, 3]
+    >>> np.round(wa.weights[0], 2)
+    array([  69.09,  138.19])
+
 
     Notes
     -----
@@ -468,13 +547,18 @@ class DistanceBand(W):
     so serge changed line 221 of that file on sal-dev to fix the logic bug
 
     """
-    def __init__(self, data, threshold, p=2, alpha=-1.0, binary=True, ids=None):
+    def __init__(self, data, threshold, p=2, alpha=-1.0, binary=True, ids=None,
+                 radius=None):
         """
         Casting to floats is a work around for a bug in scipy.spatial.  See detail in pysal issue #126
         """
-        if issubclass(type(data), scipy.spatial.KDTree):
+        self.radius = radius
+        if isKDTree(data):
             self.kd = data
             self.data = self.kd.data
+        elif radius is not None:
+            self.data = np.asarray(data, float)
+            self.kd = scipy.spatial.cKDTree(sphere.toXYZ(self.data))
         else:
             try:
                 data = np.asarray(data)
@@ -489,9 +573,19 @@ class DistanceBand(W):
         self.threshold = threshold
         self.binary = binary
         self.alpha = alpha
-        self._band()
-        neighbors, weights = self._distance_to_W(ids)
-        W.__init__(self, neighbors, weights, ids)
+        if binary and radius is None:
+            self._band()
+            neighbors, weights = self._distance_to_W(ids)
+            W.__init__(self, neighbors, weights, ids)
+        else:
+            neighbors, weights = self._inverse_distance_to_W(ids)
+            W.__init__(self, neighbors, weights, ids)
+            self._sparse = sparse.csr_matrix(self.dmat, copy=True)
+            if binary:
+                self._sparse.data[:] = 1
+            else:
+                self._sparse.data **= self.alpha
+            self._cache['sparse'] = self._sparse
 
     def _band(self):
         """
@@ -509,35 +603,102 @@ class DistanceBand(W):
             ids = np.array(ids)
         else:
             ids = np.arange(len(self._nmat))
+        for i, neighbors in enumerate(self._nmat):
+            ns = [ni for ni in neighbors if ni != i]
+            neigh = list(ids[ns])
+            if len(neigh) == 0:
+                allneighbors[ids[i]] = []
+                weights[ids[i]] = []
+            else:
+                allneighbors[ids[i]] = neigh
+                weights[ids[i]] = [1] * len(ns)
+        return allneighbors, weights
+
+    def _inverse_distance_to_W(self, ids=None):
+        """
+        distance decay weights from all pairs within threshold, found and
+        measured in one batched pass over the tree, binary weights if
+        self.binary
+        """
+        n = len(self.data)
+        i, j, d = _pairs_within(self.kd, self.threshold, self.p, self.radius)
+        offdiag = i != j
+        i, j, d = i[offdiag], j[offdiag], d[offdiag]
         if self.binary:
-            for i, neighbors in enumerate(self._nmat):
-                ns = [ni for ni in neighbors if ni != i]
-                neigh = list(ids[ns])
-                if len(neigh) == 0:
-                    allneighbors[ids[i]] = []
-                    weights[ids[i]] = []
-                else:
-                    allneighbors[ids[i]] = neigh
-                    weights[ids[i]] = [1] * len(ns)
+            wij = [1] * len(d)
+        elif (d == 0).any():
+            raise Exception, "Cannot compute inverse distance for elements at same location (distance=0)."
+        self.dmat = sparse.csr_matrix((d, (i, j)), shape=(n, n))
+        if ids:
+            ids = np.array(ids)
         else:
-            self.dmat = self.kd.sparse_distance_matrix(
-                self.kd, max_distance=self.threshold)
-            for i, neighbors in enumerate(self._nmat):
-                ns = [ni for ni in neighbors if ni != i]
-                neigh = list(ids[ns])
-                if len(neigh) == 0:
-                    allneighbors[ids[i]] = []
-                    weights[ids[i]] = []
-                else:
-                    try:
-                        allneighbors[ids[i]] = neigh
-                        weights[ids[i]] = [self.dmat[(
-                            i, j)] ** self.alpha for j in ns]
-                    except ZeroDivisionError:
-                        raise Exception, "Cannot compute inverse distance for elements at same location (distance=0)."
+            ids = np.arange(n)
+        indptr = np.concatenate(([0], np.bincount(i, minlength=n).cumsum()))
+        neighbor_ids = ids[j].tolist()
+        if not self.binary:
+            wij = list(d ** self.alpha)
+        allneighbors = {}
+        weights = {}
+        for k in xrange(n):
+            start, end = indptr[k], indptr[k + 1]
+            allneighbors[ids[k]] = neighbor_ids[start:end]
+            weights[ids[k]] = wij[start:end]
         return allneighbors, weights
 
 
+def isKDTree(obj):
+    """
+    True if obj is a scipy.spatial KDTree or cKDTree
+    """
+    return issubclass(type(obj), (scipy.spatial.KDTree,
+                                  scipy.spatial.cKDTree))
+
+
+def _pairs_within(kdt, r, p=2, radius=None):
+    """
+    All pairs of points of kdt that are within distance r of each other
+
+    Parameters
+    ----------
+    kdt    : scipy.spatial KDTree, cKDTree or pysal.cg.kdtree.Arc_KDTree
+    r      : float
+             distance threshold
+    p      : float
+             Minkowski p-norm distance metric parameter
+    radius : float
+             If supplied, kdt holds points on the unit sphere and r and the
+             distances are arc distances on a sphere of this radius
+
+    Returns
+    -------
+    i, j, d : arrays
+              pairs ordered by i then j, including i == j, and their
+              distances. Arc distances are returned for Arc_KDTree.
+    """
+    if isinstance(kdt, Arc_KDTree):
+        radius = kdt.radius
+        nlists = kdt.query_ball_tree(kdt, r)
+    elif radius is not None:
+        # chord matching the arc, with the slack used by Arc_KDTree
+        r = min(r, np.pi * radius)
+        r = sphere.arcdist2linear(r, radius) + FLOAT_EPS * 3
+        nlists = kdt.query_ball_tree(kdt, r)
+    else:
+        nlists = kdt.query_ball_tree(kdt, r, p=p)
+    counts = np.array([len(nl) for nl in nlists])
+    i = np.repeat(np.arange(len(nlists)), counts)
+    j = np.fromiter(itertools.chain.from_iterable(nlists), int, counts.sum())
+    order = np.lexsort((j, i))
+    i, j = i[order], j[order]
+    data = kdt.data
+    if radius is not None:
+        d = scipy.spatial.minkowski_distance(data[i], data[j])
+        d = sphere.linear2arcdist(d, radius)
+    else:
+        d = scipy.spatial.minkowski_distance(data[i], data[j], p)
+    return i, j, d
+
+
 def _test():
     import doctest
     # the following line could be used to define an alternative to the '<BLANKLINE>' flag
@@ -0,0 +1,206 @@
+"""
+Contiguity from sorted vertex and edge keys
+"""
+
+__all__ = ["QUEEN", "ROOK", "ContiguityWeights_hash", "contiguity_pairs"]
+
+import numpy as np
+import pysal
+from pysal.core.util.shapefile import shp_geometry
+from _contW_binning import QUEEN, ROOK
+
+# upper bound on the number of vertex or edge keys sorted at once
+CHUNK_SIZE = 2 ** 22
+
+
+class ContiguityWeights_hash:
+    """
+    Contiguity using sorted vertex (queen) or edge (rook) keys
+
+    All the vertices are read once into arrays. Each vertex, or each edge
+    for rook, is keyed on the exact bits of its coordinates, the keys are
+    sorted together with the id of the polygon they belong to, and polygons
+    sharing a key are neighbors. Keys are split into hash partitions of at
+    most CHUNK_SIZE entries, so the sort never holds all keys at once.
+
+    Parameters
+    ----------
+    shpFileObject : pysal FileIO handler
+                    polygon source, shapefiles are read in bulk with
+                    pysal.core.util.shapefile.shp_geometry
+    wttype        : int
+                    QUEEN or ROOK
+
+    Attributes
+    ----------
+    w             : dict
+                    {polygon index: set of neighboring polygon indices}
+
+    Examples
+    --------
+    >>> import pysal
+    >>> shp = pysal.open(pysal.examples.get_path('10740.shp'))
+    >>> w = ContiguityWeights_hash(shp, ROOK).w
+    >>> sorted(w[0])
+    [1, 4, 5, 85, 101]
+    >>> len(w[163])
+    0
+    """
+    def __init__(self, shpFileObject, wttype):
+        self.shpFileObject = shpFileObject
+        self.wttype = wttype
+        self.do_weights()
+
+    def do_weights(self):
+        shpFileObject = self.shpFileObject
+        if shpFileObject.type != pysal.cg.Polygon:
+            return False
+        coords, rings, parts = _polygon_arrays(shpFileObject)
+        numPoly = len(parts) - 1
+        self.numPoly = numPoly
+        i, j = contiguity_pairs(coords, rings, parts, self.wttype)
+        w = dict((k, set()) for k in xrange(numPoly))
+        order = np.argsort(i, kind='mergesort')
+        i, j = i[order], j[order]
+        bounds = np.concatenate(([0], np.bincount(i, minlength=numPoly).cumsum()))
+        j = j.tolist()
+        for k in np.flatnonzero(np.diff(bounds)):
+            w[k].update(j[bounds[k]:bounds[k + 1]])
+        self.w = w
+
+
+def _polygon_arrays(shpFileObject):
+    """
+    coords, rings and parts arrays (see shp_geometry) of all the polygons
+    """
+    dataPath = getattr(shpFileObject, 'dataPath', '')
+    if dataPath.lower().endswith('.shp'):
+        geo = shp_geometry(dataPath)
+        return geo.coords, geo.rings, geo.parts
+    coords, rings, parts = [], [0], [0]
+    shpFileObject.seek(0)
+    for shp in shpFileObject:
+        for ring in shp.parts + [hole for hole in shp.holes if hole]:
+            coords.extend(ring)
+            rings.append(len(coords))
+        parts.append(len(rings) - 1)
+    shpFileObject.seek(0)
+    coords = np.array(coords, float).reshape(-1, 2)
+    return coords, np.array(rings), np.array(parts)
+
+
+def contiguity_pairs(coords, rings, parts, wttype=QUEEN):
+    """
+    Pairs of polygons sharing a vertex (QUEEN) or an edge (ROOK)
+
+    Parameters
+    ----------
+    coords : array
+             (m, 2) vertices of all the polygons
+    rings  : array
+             ring k is made of vertices coords[rings[k]:rings[k + 1]]
+    parts  : array
+             polygon i is made of rings parts[i]:parts[i + 1]
+    wttype : int
+             QUEEN or ROOK
+
+    Returns
+    -------
+    i, j   : arrays
+             neighboring polygons, each pair is given in both directions
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> coords = np.array([[0, 0], [0, 1], [1, 1], [1, 0], [0, 0],
+    ...                    [1, 0], [1, 1], [2, 1], [2, 0], [1, 0],
+    ...                    [2, 1], [2, 2], [3, 2], [3, 1], [2, 1]], float)
+    >>> rings = np.array([0, 5, 10, 15])
+    >>> parts = np.array([0, 1, 2, 3])
+    >>> i, j = contiguity_pairs(coords, rings, parts, QUEEN)
+    >>> sorted(zip(i.tolist(), j.tolist()))
+    [(0, 1), (1, 0), (1, 2), (2, 1)]
+    >>> i, j = contiguity_pairs(coords, rings, parts, ROOK)
+    >>> sorted(zip(i.tolist(), j.tolist()))
+    [(0, 1), (1, 0)]
+    """
+    rings = np.asarray(rings)
+    parts = np.asarray(parts)
+    # polygon of each ring and of each vertex
+    ring_poly = np.repeat(np.arange(len(parts) - 1), np.diff(parts))
+    poly = np.repeat(ring_poly, np.diff(rings))
+    # bits of the coordinates, + 0.0 turns -0.0 into 0.0
+    bits = (np.asarray(coords, float) + 0.0).view(np.uint64).reshape(-1, 2)
+    if wttype == QUEEN:
+        keys = [bits[:, 0], bits[:, 1]]
+    elif wttype == ROOK:
+        # every vertex but the last one of its ring starts an edge
+        start = np.ones(len(bits), bool)
+        start[rings[1:][np.diff(rings) > 0] - 1] = False
+        start = np.flatnonzero(start)
+        a, b = bits[start], bits[start + 1]
+        # an edge is keyed on its end points in sorted order
+        swap = (a[:, 0] > b[:, 0]) | ((a[:, 0] == b[:, 0]) & (a[:, 1] > b[:, 1]))
+        a[swap], b[swap] = b[swap], a[swap].copy()
+        keys = [a[:, 0], a[:, 1], b[:, 0], b[:, 1]]
+        poly = poly[start]
+    else:
+        raise ValueError("Unsupported weight type: %s" % wttype)
+    n = len(parts) - 1
+    if not n:
+        return np.array([], int), np.array([], int)
+    codes = []
+    nchunks = max(1, -(-len(poly) // CHUNK_SIZE))
+    if nchunks > 1:
+        chunk = reduce(np.bitwise_xor, keys) % np.uint64(nchunks)
+    for c in xrange(nchunks):
+        if nchunks > 1:
+            sel = np.flatnonzero(chunk == c)
+            ckeys = [key[sel] for key in keys]
+            cpoly = poly[sel]
+        else:
+            ckeys, cpoly = keys, poly
+        codes.append(_shared_key_pairs(ckeys, cpoly, n))
+    codes = np.unique(np.concatenate(codes))
+    i, j = codes // n, codes % n
+    return np.concatenate((i, j)), np.concatenate((j, i))
+
+
+def _shared_key_pairs(keys, poly, n):
+    """
+    i * n + j codes of the pairs i < j of polygons sharing a key
+    """
+    if not len(poly):
+        return np.array([], np.int64)
+    order = np.lexsort([poly] + keys[::-1])
+    poly = poly[order]
+    keys = [key[order] for key in keys]
+    same_key = _same_key(keys)
+    # drop repeated (key, polygon) entries
+    keep = np.concatenate(([True], ~(same_key & (poly[1:] == poly[:-1]))))
+    poly = poly[keep]
+    same_key = _same_key([key[keep] for key in keys])
+    # polygons of the same key form a run, every pair within a run is a
+    # pair of neighbors
+    run = np.concatenate(([0], np.cumsum(~same_key)))
+    codes = []
+    d = 1
+    idx = np.flatnonzero(same_key)
+    while len(idx):
+        codes.append(poly[idx].astype(np.int64) * n + poly[idx + d])
+        d += 1
+        idx = idx[idx + d < len(poly)]
+        idx = idx[run[idx + d] == run[idx]]
+    if not codes:
+        return np.array([], np.int64)
+    return np.concatenate(codes)
+
+
+def _same_key(keys):
+    """
+    True where consecutive entries of the sorted keys are equal
+    """
+    same_key = np.ones(len(keys[0]) - 1, bool)
+    for key in keys:
+        same_key &= key[1:] == key[:-1]
+    return same_key
@@ -44,6 +44,10 @@ class TestDistanceWeights(unittest.TestCase):
         w = pysal.knnW(kd, 4)
         self.assertEqual(set(w.neighbors[4]), set([1,3,9,12]))
         self.assertEqual(set(w.neighbors[40]), set([31,38,45,49]))
+        wr = pysal.knnW(np.array(pts), 4,
+                        radius=pysal.cg.sphere.RADIUS_EARTH_KM)
+        for i in range(len(pts)):
+            self.assertEqual(set(w.neighbors[i]), set(wr.neighbors[i]))
         #self.assertTrue((full.argsort()[:, 1:5] == np.array(
         #    [w.neighbors[x] for x in range(len(pts))])).all())
 
@@ -85,13 +89,25 @@ class TestDistanceWeights(unittest.TestCase):
                             [14.142137037944515], [18.027758180095585]])
 
         kw = pysal.kernelW_from_shapefile(self.polyShp, idVariable='POLYID')
-        self.assertEqual(kw.weights[1], [0.2052478782400463,
-                                         0.0070787731484506233, 1.0,
-                                         0.23051223027663237])
+        self.assertEqual(kw.weights[1], [1.0, 0.2052478782400463,
+                                         0.23051223027663237,
+                                         0.0070787731484506233])
         kwa = pysal.adaptive_kernelW_from_shapefile(self.polyShp)
         self.assertEqual(kwa.weights[0], [1.0, 0.03178906767736345,
                                           9.9999990066379496e-08])
 
+    def test_Kernel_sparse(self):
+        points = pysal.weights.user.get_points_array_from_shapefile(
+            self.polyShp)
+        for fixed in [True, False]:
+            kw = pysal.Kernel(points, fixed=fixed, function='gaussian',
+                              diagonal=True)
+            full = np.zeros((kw.n, kw.n))
+            for i in kw.id_order:
+                full[i, kw.neighbors[i]] = kw.weights[i]
+            np.testing.assert_array_equal(kw.sparse.toarray(), full)
+            self.assertEqual(kw.sparse.diagonal().tolist(), [1.0] * kw.n)
+
     def test_threshold(self):
         md = pysal.min_threshold_dist_from_shapefile(self.polyShp)
         self.assertEqual(md, 0.61886415807685413)
@@ -138,6 +154,24 @@ class TestDistanceWeights(unittest.TestCase):
                                     radius=pysal.cg.sphere.RADIUS_EARTH_KM)
         w = pysal.DistanceBand(kd, full.max(), binary=False, alpha=1.0)
         self.assertTrue((w.sparse.todense() == full).all())
+        wr = pysal.DistanceBand(pts, full.max(), binary=False, alpha=1.0,
+                                radius=pysal.cg.sphere.RADIUS_EARTH_KM)
+        np.testing.assert_allclose(wr.sparse.todense(), full)
+        wr = pysal.DistanceBand(pts, 100.0,
+                                radius=pysal.cg.sphere.RADIUS_EARTH_KM)
+        within = (full <= 100.0) & (full > 0)
+        self.assertTrue((wr.sparse.todense() == within).all())
+
+    def test_Kernel_arc(self):
+        pts = [x.centroid for x in pysal.open(self.arcShp)]
+        radius = pysal.cg.sphere.RADIUS_EARTH_KM
+        kd = pysal.cg.kdtree.KDTree(pts, distance_metric='Arc', radius=radius)
+        for fixed in [True, False]:
+            kw = pysal.Kernel(kd, fixed=fixed)
+            kwr = pysal.Kernel(pts, fixed=fixed, radius=radius)
+            np.testing.assert_allclose(kw.bandwidth, kwr.bandwidth)
+            np.testing.assert_allclose(kw.sparse.todense(),
+                                       kwr.sparse.todense(), atol=1e-10)
 
 
 suite = unittest.TestLoader().loadTestsFromTestCase(TestDistanceWeights)
@@ -0,0 +1,105 @@
+import unittest
+import numpy as np
+import pysal
+from pysal.weights import _contW_hash
+from pysal.weights._contW_hash import ContiguityWeights_hash, contiguity_pairs, QUEEN, ROOK
+from pysal.weights._contW_binning import ContiguityWeights_binning
+
+
+class _Polygons(object):
+    """ Polygons served through the FileIO interface, without a dataPath """
+    type = pysal.cg.Polygon
+
+    def __init__(self, polygons):
+        self.polygons = polygons
+
+    def seek(self, pos):
+        pass
+
+    def __iter__(self):
+        return iter(self.polygons)
+
+
+def _pairs(coords, rings, parts, wttype):
+    i, j = contiguity_pairs(np.array(coords, float), rings, parts, wttype)
+    return sorted(zip(i.tolist(), j.tolist()))
+
+
+class TestContiguityWeights(unittest.TestCase):
+    def test_binning(self):
+        names = ['10740.shp', 'NAT.shp', 'columbus.shp', 'rook31.shp',
+                 'sacramentot2.shp', 'stl_hom.shp', 'us48.shp',
+                 'virginia.shp']
+        for name in names:
+            shpObj = pysal.open(pysal.examples.get_path(name), 'r')
+            for wttype in [QUEEN, ROOK]:
+                expected = ContiguityWeights_binning(shpObj, wttype).w
+                shpObj.seek(0)
+                self.assertEqual(ContiguityWeights_hash(shpObj, wttype).w,
+                                 expected)
+                shpObj.seek(0)
+            shpObj.close()
+
+    def test_polygons(self):
+        # shapes that are not read from a .shp file are read one by one
+        shpObj = pysal.open(pysal.examples.get_path('10740.shp'), 'r')
+        polygons = _Polygons(shpObj.read())
+        for wttype in [QUEEN, ROOK]:
+            shpObj.seek(0)
+            self.assertEqual(ContiguityWeights_hash(polygons, wttype).w,
+                             ContiguityWeights_hash(shpObj, wttype).w)
+        shpObj.close()
+
+    def test_chunks(self):
+        shpObj = pysal.open(pysal.examples.get_path('NAT.shp'), 'r')
+        w = ContiguityWeights_hash(shpObj, ROOK).w
+        chunk = _contW_hash.CHUNK_SIZE
+        _contW_hash.CHUNK_SIZE = 1000
+        try:
+            self.assertEqual(ContiguityWeights_hash(shpObj, ROOK).w, w)
+        finally:
+            _contW_hash.CHUNK_SIZE = chunk
+        shpObj.close()
+
+    def test_not_polygons(self):
+        shpObj = pysal.open(pysal.examples.get_path('Point.shp'), 'r')
+        self.assertFalse(hasattr(ContiguityWeights_hash(shpObj, QUEEN), 'w'))
+        shpObj.close()
+
+    def test_edge_orientation(self):
+        # the shared edge is walked in opposite directions by the two squares
+        coords = [[0, 0], [0, 1], [1, 1], [1, 0], [0, 0],
+                  [1, 1], [2, 1], [2, 0], [1, 0], [1, 1]]
+        rings, parts = [0, 5, 10], [0, 1, 2]
+        self.assertEqual(_pairs(coords, rings, parts, ROOK), [(0, 1), (1, 0)])
+        # collinear edges that only overlap in part are not shared
+        coords[5:] = [[1, 0.5], [2, 0.5], [2, 0], [1, 0], [1, 0.5]]
+        self.assertEqual(_pairs(coords, rings, parts, ROOK), [])
+        self.assertEqual(_pairs(coords, rings, parts, QUEEN), [(0, 1), (1, 0)])
+
+    def test_signed_zero(self):
+        coords = [[0, 0], [0, 1], [1, 1], [0, 0],
+                  [-0., -0.], [1, -1], [0, -1], [-0., -0.]]
+        self.assertEqual(_pairs(coords, [0, 4, 8], [0, 1, 2], QUEEN),
+                         [(0, 1), (1, 0)])
+
+    def test_multipart(self):
+        # polygon 0 has two rings, polygon 1 touches the second one and
+        # polygon 2 repeats vertices of its own ring
+        coords = [[0, 0], [0, 1], [1, 1], [0, 0],
+                  [5, 5], [5, 6], [6, 6], [5, 5],
+                  [6, 6], [7, 6], [7, 5], [6, 6],
+                  [9, 9], [9, 10], [9, 10], [10, 10], [9, 9]]
+        rings, parts = [0, 4, 8, 12, 17], [0, 2, 3, 4]
+        self.assertEqual(_pairs(coords, rings, parts, QUEEN), [(0, 1), (1, 0)])
+        self.assertEqual(_pairs(coords, rings, parts, ROOK), [])
+
+    def test_empty(self):
+        i, j = contiguity_pairs(np.zeros((0, 2)), [0], [0])
+        self.assertEqual((len(i), len(j)), (0, 0))
+        self.assertRaises(ValueError, contiguity_pairs, np.zeros((0, 2)),
+                          [0], [0], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
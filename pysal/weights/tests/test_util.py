@@ -9,6 +9,24 @@ import os
 import gc
 
 
+def _order_lists(w, kmax):
+    """ orders of contiguity by the list-based search of order """
+    ids = w.neighbors.keys()
+    info = {}
+    for id in ids:
+        s = [0] * w.n
+        s[ids.index(id)] = -1
+        for j in w.neighbors[id]:
+            s[ids.index(j)] = 1
+        for k in range(1, kmax):
+            for j in [ids[p] for p, val in enumerate(s) if val == k]:
+                for neighbor in w.neighbors[j]:
+                    if s[ids.index(neighbor)] == 0:
+                        s[ids.index(neighbor)] = k + 1
+        info[id] = dict((ids[p], o) for p, o in enumerate(s) if o)
+    return info
+
+
 class Testutil(unittest.TestCase):
     def setUp(self):
         self.w = pysal.rook_from_shapefile(
@@ -69,6 +87,40 @@ class Testutil(unittest.TestCase):
         w3105 = [1, -1, 1, 2, 1]
         self.assertEquals(w3105, w3[1][0:5])
 
+    def test_order_sp(self):
+        w = pysal.lat2W(10, 10)
+        o = pysal.weights.order_sp(w.sparse, kmax=3)
+        w3 = pysal.order(w, kmax=3)
+        for i, id in enumerate(w.id_order):
+            oi = o[i].toarray().flatten()
+            oi[i] = -1
+            self.assertEquals(w3[id], oi.tolist())
+        pysal.weights.util.BFS_BLOCK = 1000
+        try:
+            o2 = pysal.weights.order_sp(w.sparse, kmax=3, cores=2)
+        finally:
+            pysal.weights.util.BFS_BLOCK = 2 ** 22
+        self.assertEquals((o != o2).nnz, 0)
+        self.assertEquals(pysal.weights.order_sp(w.sparse, None).max(), 18)
+
+    def test_order_lists(self):
+        for w in [pysal.lat2W(7, 9, rook=False), self.w]:
+            expected = _order_lists(w, 4)
+            info = pysal.order(w, kmax=4)
+            o = pysal.weights.order_sp(w.sparse, kmax=4)
+            self.assertTrue(o.has_sorted_indices)
+            for id in w.id_order:
+                self.assertEquals(dict((w.id_order[p], k)
+                                       for p, k in enumerate(info[id]) if k),
+                                  expected[id])
+            for k in [2, 4]:
+                wk = pysal.higher_order(w, k)
+                self.assertTrue(wk.sparse.has_sorted_indices)
+                for id in w.id_order:
+                    nids = [j for j, o in expected[id].items() if o == k]
+                    self.assertEquals(sorted(wk.neighbors[id]), sorted(nids))
+                    self.assertEquals(wk[id], dict.fromkeys(nids, 1.0))
+
     def test_higher_order(self):
         w10 = pysal.lat2W(10, 10)
         w10_2 = pysal.higher_order(w10, 2)
@@ -90,6 +142,8 @@ class Testutil(unittest.TestCase):
         self.assertEquals(w5_shimbel024, w5_shimbel[0][24])
         w5_shimbel004 = [-1, 1, 2, 3]
         self.assertEquals(w5_shimbel004, w5_shimbel[0][0:4])
+        w = pysal.W({0: [1], 1: [0], 2: []})
+        self.assertEquals(pysal.shimbel(w)[0], [-1, 1, 0])
 
     def test_full(self):
         neighbors = {'first': ['second'], 'second': ['first',
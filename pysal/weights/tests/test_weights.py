@@ -218,6 +218,23 @@ class TestW(unittest.TestCase):
     def test_trcWtW_WW(self):
         self.assertEqual(self.w3x3.trcWtW_WW, 48.)
 
+    def test_sparse_moments(self):
+        from pysal.weights.weights import sparse_moments
+        w = pysal.lat2W(4, 3)
+        w.transform = 'r'
+        ws = w.sparse
+        m = sparse_moments(ws)
+        NPTA3E(m['diagW2'], (ws * ws).diagonal())
+        NPTA3E(m['diagWtW'], (ws.T * ws).diagonal())
+        NPTA3E(m['diagWtW_WW'], (ws.T * ws + ws * ws).diagonal())
+        self.assertAlmostEqual(m['trcWtW_WW'], w.trcWtW_WW)
+        # another weights object with the same matrix shares the moments
+        w2 = pysal.lat2W(4, 3)
+        w2.transform = 'r'
+        self.assertTrue(w2.diagW2 is m['diagW2'])
+        w2.transform = 'b'
+        self.assertEqual(w2.trcW2, 34.)
+
 
 class Test_WSP_Back_To_W(unittest.TestCase):
     # Test to make sure we get back to the same W functionality
@@ -450,5 +467,50 @@ class TestWSP(unittest.TestCase):
         self.assertEqual(self.w3x3.s0, 24.0)
 
 
+class TestWCSR(unittest.TestCase):
+    def setUp(self):
+        self.w = pysal.open(pysal.examples.get_path("stl.gal")).read()
+        self.wc = pysal.weights.WCSR(self.w.sparse, self.w.id_order)
+
+    def test_WCSR(self):
+        self.assertEquals(self.w.id_order, self.wc.id_order)
+        self.assertEquals(self.w.n, self.wc.n)
+        self.assertEquals(self.w.cardinalities, self.wc.cardinalities)
+        self.assertEquals(self.w.histogram, self.wc.histogram)
+        for i in self.w.id_order:
+            self.assertEquals(self.w[i], self.wc[i])
+            self.assertEquals(sorted(self.w.neighbor_offsets[i]),
+                              self.wc.neighbor_offsets[i])
+
+    def test_views(self):
+        self.assertEquals(sorted(self.wc.neighbors.keys()),
+                          sorted(self.w.neighbors.keys()))
+        self.assertEquals(len(self.wc.weights), self.w.n)
+        self.assertFalse(hasattr(self.wc.neighbors, '__setitem__'))
+
+    def test_set_transform(self):
+        for t in ['r', 'b', 'd', 'v', 'o']:
+            self.w.transform = t
+            self.wc.transform = t
+            self.assertEquals(self.wc.transform, t.upper())
+            NPTA3E(self.w.full()[0], self.wc.full()[0])
+            self.assertAlmostEquals(self.w.s0, self.wc.s0)
+            self.assertAlmostEquals(self.w.s1, self.wc.s1)
+            self.assertAlmostEquals(self.w.trcWtW_WW, self.wc.trcWtW_WW)
+        self.assertEquals(sorted(self.wc.transformations.keys()),
+                          ['B', 'D', 'O', 'R', 'V'])
+
+    def test_id_order(self):
+        ids = self.w.id_order[::-1]
+        self.w.id_order = ids
+        self.wc.transform = 'r'
+        self.wc.id_order = ids
+        self.w.transform = 'r'
+        NPTA3E(self.w.full()[0], self.wc.full()[0])
+        self.wc.transform = 'o'
+        self.w.transform = 'o'
+        NPTA3E(self.w.full()[0], self.wc.full()[0])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -229,9 +229,7 @@ def knnW_from_array(array, k=2, p=2, ids=None, radius=None):
     :class:`pysal.weights.W`
 
     """
-    if radius is not None:
-        array = pysal.cg.KDTree(array, distance_metric='Arc', radius=radius)
-    return knnW(array, k=k, p=p, ids=ids)
+    return knnW(array, k=k, p=p, ids=ids, radius=radius)
 
 
 def knnW_from_shapefile(shapefile, k=2, p=2, idVariable=None, radius=None):
@@ -317,12 +315,10 @@ def knnW_from_shapefile(shapefile, k=2, p=2, idVariable=None, radius=None):
     """
 
     data = get_points_array_from_shapefile(shapefile)
-    if radius is not None:
-        data = pysal.cg.KDTree(data, distance_metric='Arc', radius=radius)
     if idVariable:
         ids = get_ids(shapefile, idVariable)
-        return knnW(data, k=k, p=p, ids=ids)
-    return knnW(data, k=k, p=p)
+        return knnW(data, k=k, p=p, ids=ids, radius=radius)
+    return knnW(data, k=k, p=p, radius=radius)
 
 
 def threshold_binaryW_from_array(array, threshold, p=2, radius=None):
@@ -362,9 +358,7 @@ def threshold_binaryW_from_array(array, threshold, p=2, radius=None):
     {0: [1, 3], 1: [0, 3], 2: [], 3: [0, 1], 4: [5], 5: [4]}
     >>>
     """
-    if radius is not None:
-        array = pysal.cg.KDTree(array, distance_metric='Arc', radius=radius)
-    return DistanceBand(array, threshold=threshold, p=p)
+    return DistanceBand(array, threshold=threshold, p=p, radius=radius)
 
 
 def threshold_binaryW_from_shapefile(shapefile, threshold, p=2, idVariable=None, radius=None):
@@ -411,12 +405,11 @@ def threshold_binaryW_from_shapefile(shapefile, threshold, p=2, idVariable=None,
 
     """
     data = get_points_array_from_shapefile(shapefile)
-    if radius is not None:
-        data = pysal.cg.KDTree(data, distance_metric='Arc', radius=radius)
     if idVariable:
         ids = get_ids(shapefile, idVariable)
-        return DistanceBand(data, threshold=threshold, p=p, ids=ids)
-    return threshold_binaryW_from_array(data, threshold, p=p)
+        return DistanceBand(data, threshold=threshold, p=p, ids=ids,
+                            radius=radius)
+    return threshold_binaryW_from_array(data, threshold, p=p, radius=radius)
 
 
 def threshold_continuousW_from_array(array, threshold, p=2,
@@ -474,10 +467,9 @@ def threshold_continuousW_from_array(array, threshold, p=2,
 
 
     """
-    if radius is not None:
-        array = pysal.cg.KDTree(array, distance_metric='Arc', radius=radius)
     w = DistanceBand(
-        array, threshold=threshold, p=p, alpha=alpha, binary=False)
+        array, threshold=threshold, p=p, alpha=alpha, binary=False,
+        radius=radius)
     return w
 
 
@@ -529,13 +521,13 @@ def threshold_continuousW_from_shapefile(shapefile, threshold, p=2,
 
     """
     data = get_points_array_from_shapefile(shapefile)
-    if radius is not None:
-        data = pysal.cg.KDTree(data, distance_metric='Arc', radius=radius)
     if idVariable:
         ids = get_ids(shapefile, idVariable)
-        w = DistanceBand(data, threshold=threshold, p=p, alpha=alpha, binary=False, ids=ids)
+        w = DistanceBand(data, threshold=threshold, p=p, alpha=alpha, binary=False, ids=ids,
+                         radius=radius)
     else:
-        w =  threshold_continuousW_from_array(data, threshold, p=p, alpha=alpha)
+        w =  threshold_continuousW_from_array(data, threshold, p=p, alpha=alpha,
+                                              radius=radius)
     w.set_shapefile(shapefile,idVariable)
     return w
 
@@ -666,10 +658,8 @@ def kernelW(points, k=2, function='triangular', fixed=True,
 
 
     """
-    if radius is not None:
-        points = pysal.cg.KDTree(points, distance_metric='Arc', radius=radius)
     return Kernel(points, function=function, k=k, fixed=fixed,
-            diagonal=diagonal)
+            diagonal=diagonal, radius=radius)
 
 
 def kernelW_from_shapefile(shapefile, k=2, function='triangular',
@@ -763,13 +753,13 @@ def kernelW_from_shapefile(shapefile, k=2, function='triangular',
 
     >>> kwd = pysal.kernelW_from_shapefile(pysal.examples.get_path("columbus.shp"),idVariable='POLYID', function = 'gaussian', diagonal = True)
     >>> kw.neighbors[1]
-    [2, 4, 1, 3]
+    [1, 2, 3, 4]
     >>> kwd.neighbors[1]
-    [2, 4, 1, 3]
+    [1, 2, 3, 4]
     >>> kw.weights[1]
-    [0.29090631630909874, 0.2436835517263174, 0.3989422804014327, 0.29671172124745776]
+    [0.3989422804014327, 0.29090631630909874, 0.29671172124745776, 0.2436835517263174]
     >>> kwd.weights[1]
-    [0.29090631630909874, 0.2436835517263174, 1.0, 0.29671172124745776]
+    [1.0, 0.29090631630909874, 0.29671172124745776, 0.2436835517263174]
     
 
     Notes
@@ -782,14 +772,12 @@ def kernelW_from_shapefile(shapefile, k=2, function='triangular',
 
     """
     points = get_points_array_from_shapefile(shapefile)
-    if radius is not None:
-        points = pysal.cg.KDTree(points, distance_metric='Arc', radius=radius)
     if idVariable:
         ids = get_ids(shapefile, idVariable)
         return Kernel(points, function=function, k=k, ids=ids, fixed=fixed,
-                diagonal = diagonal)
+                diagonal = diagonal, radius=radius)
     return kernelW(points, k=k, function=function, fixed=fixed,
-            diagonal=diagonal)
+            diagonal=diagonal, radius=radius)
 
 
 def adaptive_kernelW(points, bandwidths=None, k=2, function='triangular',
@@ -927,10 +915,8 @@ def adaptive_kernelW(points, bandwidths=None, k=2, function='triangular',
 
 
     """
-    if radius is not None:
-        points = pysal.cg.KDTree(points, distance_metric='Arc', radius=radius)
     return Kernel(points, bandwidth=bandwidths, fixed=False, k=k,
-            function=function, diagonal=diagonal)
+            function=function, diagonal=diagonal, radius=radius)
 
 
 def adaptive_kernelW_from_shapefile(shapefile, bandwidths=None, k=2, function='triangular',
@@ -1029,14 +1015,12 @@ def adaptive_kernelW_from_shapefile(shapefile, bandwidths=None, k=2, function='t
 
     """
     points = get_points_array_from_shapefile(shapefile)
-    if radius is not None:
-        points = pysal.cg.KDTree(points, distance_metric='Arc', radius=radius)
     if idVariable:
         ids = get_ids(shapefile, idVariable)
         return Kernel(points, bandwidth=bandwidths, fixed=False, k=k,
-                function=function, ids=ids, diagonal=diagonal)
+                function=function, ids=ids, diagonal=diagonal, radius=radius)
     return adaptive_kernelW(points, bandwidths=bandwidths, k=k,
-            function=function, diagonal=diagonal)
+            function=function, diagonal=diagonal, radius=radius)
 
 
 def min_threshold_dist_from_shapefile(shapefile, radius=None, p=2):
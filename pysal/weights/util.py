@@ -7,8 +7,16 @@ import scipy.spatial
 import os
 import gc
 import operator
+import multiprocessing as mp
+from platform import system
 
-__all__ = ['lat2W', 'regime_weights', 'comb', 'order', 'higher_order', 'shimbel', 'remap_ids', 'full2W', 'full', 'WSP2W', 'insert_diagonal', 'get_ids', 'get_points_array_from_shapefile', 'min_threshold_distance', 'lat2SW', 'w_local_cluster', 'higher_order_sp']
+__all__ = ['lat2W', 'regime_weights', 'comb', 'order', 'higher_order', 'shimbel', 'remap_ids', 'full2W', 'full', 'WSP2W', 'insert_diagonal', 'get_ids', 'get_points_array_from_shapefile', 'min_threshold_distance', 'lat2SW', 'w_local_cluster', 'higher_order_sp', 'order_sp']
+
+# upper bound on the number of (source, observation) pairs visited by a
+# block of sources of the breadth-first searches in order_sp
+BFS_BLOCK = 2 ** 22
+
+_BFS = {}
 
 
 def lat2W(nrows=5, ncols=5, rook=True, id_type='int'):
@@ -203,7 +211,7 @@ def comb(items, n=None):
                 yield v + c
 
 
-def order(w, kmax=3):
+def order(w, kmax=3, cores=1):
     """
     Determine the non-redundant order of contiguity up to a specific
     order.
@@ -217,6 +225,10 @@ def order(w, kmax=3):
     kmax    : int
               maximum order of contiguity
 
+    cores   : int
+              number of processes running the breadth-first searches, see
+              order_sp
+
     Returns
     -------
 
@@ -228,6 +240,8 @@ def order(w, kmax=3):
     -----
     Implements the algorithm in Anselin and Smirnov (1996) [1]_
 
+    The lists follow w.id_order. They hold n values for each of the n
+    observations, see order_sp for the sparse version.
 
     Examples
     --------
@@ -246,32 +260,136 @@ def order(w, kmax=3):
        Regional Science, 36, 67-89.
 
     """
-    ids = w.neighbors.keys()
+    return _order_lists(w, order_sp(w.sparse, kmax, cores))
+
+
+def order_sp(wsp, kmax=3, cores=1):
+    """
+    Sparse matrix of the orders of contiguity up to a specific order
+
+    Parameters
+    ----------
+
+    wsp     : sparse matrix
+              spatial weights, the nonzero entries are the first order
+              neighbors
+
+    kmax    : int
+              maximum order of contiguity. None for no maximum, the orders
+              are then the shortest path lengths between all the connected
+              observations
+
+    cores   : int
+              number of processes running the breadth-first searches. Each
+              process handles blocks of sources. None means all the cores
+              available. Note: multiprocessing is not available on Windows.
+
+    Returns
+    -------
+
+    orders  : csr_matrix
+              n x n, entry i, j is the order of contiguity of j to i. Pairs
+              that are not connected by at most kmax steps and the diagonal
+              are not stored.
+
+    Notes
+    -----
+    The orders are found by breadth-first searches from blocks of sources at
+    once, as products of the frontier of the blocks with the binary weights,
+    so that the memory used only depends on the size of the neighborhoods
+    of order kmax.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> w = pysal.lat2W(5, 5)
+    >>> o = pysal.weights.order_sp(w.sparse, 3)
+    >>> o[0].toarray()[0, :11]
+    array([0, 1, 2, 3, 0, 1, 2, 3, 0, 0, 2])
+    >>> o.nnz
+    340
+    >>> pysal.weights.order_sp(w.sparse, None).max()
+    8
+    """
+    adj = sparse.csr_matrix(wsp, dtype=float)
+    adj.eliminate_zeros()
+    adj.data[:] = 1.
+    n = adj.shape[0]
+    size = max(1, BFS_BLOCK // max(1, n))
+    tasks = [(start, min(start + size, n)) for start in xrange(0, n, size)]
+    if cores is None:
+        cores = mp.cpu_count()
+    if system() == 'Windows' or cores == 1 or len(tasks) < 2:
+        blocks = [_bfs(adj, start, stop, kmax) for start, stop in tasks]
+    else:
+        pool = mp.Pool(min(cores, len(tasks)), _init_bfs, (adj, kmax))
+        try:
+            blocks = pool.map(_bfs_work, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    if not blocks:
+        return sparse.csr_matrix((n, n), dtype=int)
+    orders = sparse.vstack(blocks).tocsr()
+    orders.sort_indices()
+    return orders
+
+
+def _bfs(adj, start, stop, kmax):
+    """
+    Orders of contiguity from the sources start to stop - 1
+    """
+    n = adj.shape[0]
+    b = stop - start
+    eye = sparse.csr_matrix((np.ones(b), (np.arange(b),
+                                          np.arange(start, stop))),
+                            shape=(b, n))
+    frontier = adj[start:stop]
+    frontier = frontier - frontier.multiply(eye)
+    frontier.eliminate_zeros()
+    visited = frontier + eye
+    orders = frontier.copy()
+    k = 1
+    while frontier.nnz and (kmax is None or k < kmax):
+        k += 1
+        reached = frontier * adj
+        reached.data[:] = 1.
+        frontier = reached - reached.multiply(visited)
+        frontier.eliminate_zeros()
+        visited = visited + frontier
+        orders = orders + k * frontier
+    orders = sparse.csr_matrix(orders, dtype=int)
+    orders.eliminate_zeros()
+    return orders
+
+
+def _init_bfs(adj, kmax):
+    _BFS['adj'] = adj
+    _BFS['kmax'] = kmax
+
+
+def _bfs_work(task):
+    start, stop = task
+    return _bfs(_BFS['adj'], start, stop, _BFS['kmax'])
+
+
+def _order_lists(w, orders):
+    """
+    Dense lists of orders for each observation, -1 for the observation
+    itself
+    """
     info = {}
-    for id in ids:
-        s = [0] * w.n
-        s[ids.index(id)] = -1
-        for j in w.neighbors[id]:
-            s[ids.index(j)] = 1
-        k = 1
-        while k < kmax:
-            knext = k + 1
-            if s.count(k):
-                # get neighbors of order k
-                js = [ids[j] for j, val in enumerate(s) if val == k]
-                # get first order neighbors for order k neighbors
-                for j in js:
-                    next_neighbors = w.neighbors[j]
-                    for neighbor in next_neighbors:
-                        nid = ids.index(neighbor)
-                        if s[nid] == 0:
-                            s[nid] = knext
-            k = knext
-        info[id] = s
+    indptr, indices, data = orders.indptr, orders.indices, orders.data
+    for i, id in enumerate(w.id_order):
+        s = np.zeros(w.n, int)
+        start, end = indptr[i], indptr[i + 1]
+        s[indices[start:end]] = data[start:end]
+        s[i] = -1
+        info[id] = s.tolist()
     return info
 
 
-def higher_order(w, k=2):
+def higher_order(w, k=2, cores=1):
     """
     Contiguity weights object of order k
 
@@ -282,6 +400,9 @@ def higher_order(w, k=2):
             spatial weights object
     k     : int
             order of contiguity
+    cores : int
+            number of processes running the breadth-first searches, see
+            order_sp
 
     Returns
     -------
@@ -316,17 +437,33 @@ def higher_order(w, k=2):
        constructing proper higher order spatial lag operators. Journal of
        Regional Science, 36, 67-89.
     """
-    info = order(w, k)
-    ids = info.keys()
+    wk = _order_k(w.sparse, k, cores)
     neighbors = {}
     weights = {}
-    for id in ids:
-        nids = [ids[j] for j, o in enumerate(info[id]) if o == k]
-        neighbors[id] = nids
+    ids = w.id_order
+    for i, id in enumerate(ids):
+        nids = wk.indices[wk.indptr[i]:wk.indptr[i + 1]]
+        neighbors[id] = [ids[j] for j in nids]
         weights[id] = [1.0] * len(nids)
-    return pysal.weights.W(neighbors, weights)
+    wk_sparse = wk
+    wk = pysal.weights.W(neighbors, weights, ids)
+    wk._sparse = wk_sparse
+    wk._cache['sparse'] = wk._sparse
+    return wk
+
 
-def higher_order_sp(wsp, k=2):
+def _order_k(wsp, k, cores=1):
+    """
+    binary csr_matrix of the pairs of order of contiguity k
+    """
+    orders = order_sp(wsp, k, cores)
+    orders.data = (orders.data == k).astype(float)
+    orders.eliminate_zeros()
+    orders.sort_indices()
+    return orders
+
+
+def higher_order_sp(wsp, k=2, cores=1):
     """
     Contiguity weights for a sparse W for order k
 
@@ -337,6 +474,9 @@ def higher_order_sp(wsp, k=2):
 
     k: Order of contiguity
 
+    cores: number of processes running the breadth-first searches, see
+           order_sp
+
     Return
     ------
 
@@ -363,24 +503,7 @@ def higher_order_sp(wsp, k=2):
     {1: 1.0, 3: 1.0, 5: 1.0, 9: 1.0, 15: 1.0, 19: 1.0, 21: 1.0, 23: 1.0}
     >>>     
     """
-
-
-    wk = wsp**k
-    rk,ck = wk.nonzero()
-    sk = set(zip(rk,ck))
-    for j in range(1,k):
-        wj = wsp**j
-        rj,cj = wj.nonzero()
-        sj = set(zip(rj,cj))
-        sk.difference_update(sj)
-    d= {}
-    for pair in sk:
-        k,v = pair
-        if d.has_key(k):
-            d[k].append(v)
-        else:
-            d[k] = [v]
-    return pysal.weights.WSP(pysal.W(neighbors=d).sparse)
+    return pysal.weights.WSP(_order_k(wsp, k, cores))
 
 def w_local_cluster(w):
     """
@@ -448,7 +571,7 @@ def w_local_cluster(w):
     return c
 
 
-def shimbel(w):
+def shimbel(w, cores=1):
     """
     Find the Shimbel matrix for first order contiguity matrix.
 
@@ -456,12 +579,17 @@ def shimbel(w):
     ----------
     w     : W
             spatial weights object
+    cores : int
+            number of processes running the breadth-first searches, see
+            order_sp
+
     Returns
     -------
 
     info  : list of lists
             one list for each observation which stores the shortest
             order between it and each of the the other observations.
+            Observations that are not connected have order 0.
 
     Examples
     --------
@@ -474,30 +602,7 @@ def shimbel(w):
     [-1, 1, 2, 3]
     >>>
     """
-    info = {}
-    ids = w.id_order
-    for id in ids:
-        s = [0] * w.n
-        s[ids.index(id)] = -1
-        for j in w.neighbors[id]:
-            s[ids.index(j)] = 1
-        k = 1
-        flag = s.count(0)
-        while flag:
-            p = -1
-            knext = k + 1
-            for j in range(s.count(k)):
-                neighbor = s.index(k, p + 1)
-                p = neighbor
-                next_neighbors = w.neighbors[ids[p]]
-                for neighbor in next_neighbors:
-                    nid = ids.index(neighbor)
-                    if s[nid] == 0:
-                        s[nid] = knext
-            k = knext
-            flag = s.count(0)
-        info[id] = s
-    return info
+    return _order_lists(w, order_sp(w.sparse, None, cores))
 
 
 def full(w):
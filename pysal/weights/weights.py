@@ -1,4 +1,4 @@
-__all__ = ['W', 'WSP']
+__all__ = ['W', 'WCSR', 'WSP']
 __author__ = "Sergio J. Rey <srey@asu.edu> "
 
 import pysal
@@ -6,9 +6,15 @@ import math
 import numpy as np
 import scipy.sparse
 import gc
+import collections
+import hashlib
 from os.path import basename as BASENAME
 from pysal.weights import  util
 
+# number of sparse matrices whose moments are kept by sparse_moments
+MOMENTS_CACHE_SIZE = 16
+_MOMENTS = collections.OrderedDict()
+
 
 class W(object):
     """
@@ -288,8 +294,8 @@ class W(object):
 
         """
         if 'trcW2' not in self._cache:
-            self._trcW2 = self.diagW2.sum()
-            self._cache['trcw2'] = self._trcW2
+            self._trcW2 = sparse_moments(self.sparse)['trcW2']
+            self._cache['trcW2'] = self._trcW2
         return self._trcW2
 
     @property
@@ -302,8 +308,8 @@ class W(object):
         trcW2
 
         """
-        if 'diagw2' not in self._cache:
-            self._diagW2 = (self.sparse * self.sparse).diagonal()
+        if 'diagW2' not in self._cache:
+            self._diagW2 = sparse_moments(self.sparse)['diagW2']
             self._cache['diagW2'] = self._diagW2
         return self._diagW2
 
@@ -318,7 +324,7 @@ class W(object):
 
         """
         if 'diagWtW' not in self._cache:
-            self._diagWtW = (self.sparse.transpose() * self.sparse).diagonal()
+            self._diagWtW = sparse_moments(self.sparse)['diagWtW']
             self._cache['diagWtW'] = self._diagWtW
         return self._diagWtW
 
@@ -333,7 +339,7 @@ class W(object):
 
         """
         if 'trcWtW' not in self._cache:
-            self._trcWtW = self.diagWtW.sum()
+            self._trcWtW = sparse_moments(self.sparse)['trcWtW']
             self._cache['trcWtW'] = self._trcWtW
         return self._trcWtW
 
@@ -343,9 +349,7 @@ class W(object):
         diagonal of :math:`W^{'}W + WW`
         """
         if 'diagWtW_WW' not in self._cache:
-            wt = self.sparse.transpose()
-            w = self.sparse
-            self._diagWtW_WW = (wt * w + w * w).diagonal()
+            self._diagWtW_WW = sparse_moments(self.sparse)['diagWtW_WW']
             self._cache['diagWtW_WW'] = self._diagWtW_WW
         return self._diagWtW_WW
 
@@ -355,7 +359,7 @@ class W(object):
         trace of :math:`W^{'}W + WW`
         """
         if 'trcWtW_WW' not in self._cache:
-            self._trcWtW_WW = self.diagWtW_WW.sum()
+            self._trcWtW_WW = sparse_moments(self.sparse)['trcWtW_WW']
             self._cache['trcWtW_WW'] = self._trcWtW_WW
         return self._trcWtW_WW
 
@@ -928,6 +932,360 @@ class W(object):
 
 
 
+def sparse_moments(sparse, moments=None):
+    """
+    Diagonals and traces of :math:`WW`, :math:`W^{'}W` and
+    :math:`W^{'}W + WW` for a sparse weights matrix
+
+    Parameters
+    ----------
+
+    sparse  : scipy sparse matrix
+              n x n spatial weights
+    moments : dictionary
+              if given, the moments of sparse already known (for instance
+              stored along a weights file), that are cached instead of
+              being computed
+
+    Returns
+    -------
+
+    moments : dictionary
+              keys 'diagW2', 'diagWtW' and 'diagWtW_WW' for the diagonals,
+              'trcW2', 'trcWtW' and 'trcWtW_WW' for the traces
+
+    Notes
+    -----
+
+    The diagonals are reductions of elementwise products of the CSR arrays,
+    :math:`(WW)_{ii} = \sum_j w_{ij} w_{ji}` and
+    :math:`(W^{'}W)_{jj} = \sum_i w_{ij}^2`, so the products of W are
+    never built. The moments of the last MOMENTS_CACHE_SIZE matrices are
+    cached, keyed on the content of the matrix, so that they are computed
+    once for all the weights objects, regressions and tests that use the same
+    weights under the same transformation. The cached arrays are shared and
+    should not be modified.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> w = pysal.lat2W(3, 3)
+    >>> w.transform = 'r'
+    >>> m = sparse_moments(w.sparse)
+    >>> round(m['trcW2'], 6)
+    3.333333
+    >>> m['diagWtW'][:3]
+    array([ 0.22222222,  0.5625    ,  0.22222222])
+    >>> m['trcWtW_WW'] == (w.sparse.T * w.sparse + w.sparse * w.sparse).diagonal().sum()
+    True
+    """
+    sparse = sparse.tocsr()
+    key = _sparse_key(sparse)
+    cached = _MOMENTS.pop(key, None)
+    if cached is not None:
+        moments = cached
+    elif moments is None:
+        n = sparse.shape[0]
+        diagW2 = np.asarray(sparse.multiply(sparse.T).sum(1)).flatten()
+        diagWtW = np.bincount(sparse.indices, sparse.data * sparse.data,
+                              minlength=n)
+        moments = {'diagW2': diagW2, 'diagWtW': diagWtW}
+    else:
+        moments = {'diagW2': np.asarray(moments['diagW2']),
+                   'diagWtW': np.asarray(moments['diagWtW'])}
+    if 'diagWtW_WW' not in moments:
+        moments['diagWtW_WW'] = moments['diagWtW'] + moments['diagW2']
+        for name in ['W2', 'WtW', 'WtW_WW']:
+            moments['trc' + name] = moments['diag' + name].sum()
+    _MOMENTS[key] = moments
+    while len(_MOMENTS) > MOMENTS_CACHE_SIZE:
+        _MOMENTS.popitem(last=False)
+    return moments
+
+
+def _sparse_key(sparse):
+    """
+    digest of the shape and CSR arrays of sparse
+    """
+    sha = hashlib.sha1(str(sparse.shape))
+    for a in (sparse.indptr, sparse.indices, sparse.data):
+        sha.update(a.dtype.str)
+        sha.update(np.ascontiguousarray(a))
+    return sha.hexdigest()
+
+
+class WCSR(W):
+    """
+    Spatial weights backed by compressed sparse row arrays
+
+    Parameters
+    ----------
+
+    sparse   : scipy sparse object
+               NxN object from scipy.sparse holding the original weights
+
+    id_order : list
+               An ordered list of ids, assumed to match the ordering in
+               sparse. If not set, range(n) is used.
+    silent_island_warning   : boolean
+                              Switch to turn off (default on) print statements
+                              for every observation with islands
+
+    Attributes
+    ----------
+
+    indptr
+    indices
+    data
+
+    and all the attributes of W
+
+    Notes
+    -----
+
+    The neighbors and weights of each observation are held in the contiguous
+    indptr, indices and data arrays of a CSR matrix instead of dictionaries
+    of lists. neighbors, weights and neighbor_offsets are lazy read-only
+    views on these arrays, sparse wraps them without copying, and the
+    transformations are vectorized and cached as data arrays that share the
+    indptr and indices arrays.
+
+    Examples
+    --------
+    >>> import pysal
+    >>> w = pysal.lat2W(3, 3)
+    >>> wc = pysal.weights.WCSR(w.sparse, w.id_order)
+    >>> wc.n
+    9
+    >>> wc.pct_nonzero == w.pct_nonzero
+    True
+    >>> wc.neighbors[4]
+    [1, 3, 5, 7]
+    >>> wc.transform = 'r'
+    >>> wc.weights[4]
+    [0.25, 0.25, 0.25, 0.25]
+    >>> wc.data[:5]
+    array([ 0.5       ,  0.5       ,  0.33333333,  0.33333333,  0.33333333])
+    >>> w = pysal.open(pysal.examples.get_path("stl.gal")).read()
+    >>> wc = pysal.weights.WCSR(w.sparse, w.id_order)
+    >>> wc.neighbors['2']
+    ['5', '8', '10']
+    """
+    def __init__(self, sparse, id_order=None, silent_island_warning=False):
+        if not scipy.sparse.issparse(sparse):
+            raise ValueError("must pass a scipy sparse object")
+        rows, cols = sparse.shape
+        if rows != cols:
+            raise ValueError("Weights object must be square")
+        sparse = sparse.tocsr()
+        sparse.sort_indices()
+        self.silent_island_warning = silent_island_warning
+        self.indptr = sparse.indptr
+        self.indices = sparse.indices
+        self.data = np.asarray(sparse.data, float)
+        self.transformations = {'O': self.data}
+        self._transform = 'O'
+        self._n = rows
+        if id_order is None:
+            self._id_order = range(rows)
+            self._id_order_set = False
+        else:
+            if len(id_order) != rows:
+                raise ValueError("Number of values in id_order must match shape of sparse")
+            self._id_order = list(id_order)
+            self._id_order_set = True
+        self._reset()
+        if self.islands and not self.silent_island_warning:
+            ni = len(self.islands)
+            if ni == 1:
+                print "WARNING: there is one disconnected observation (no neighbors)"
+                print "Island id: ",self.islands
+            else:
+                print "WARNING: there are %d disconnected observations"%ni
+                print "Island ids: ",self.islands
+
+    @property
+    def neighbors(self):
+        """
+        read-only view, key is an id, value is the list of neighbor ids
+        """
+        return _CSRView(self, False)
+
+    @property
+    def weights(self):
+        """
+        read-only view, key is an id, value is the list of weights under
+        the current transformation
+        """
+        return _CSRView(self, True)
+
+    @property
+    def neighbor_offsets(self):
+        """
+        read-only view, key is an id, value is the list of offsets of the
+        id's neighbors in id_order
+        """
+        return _CSRView(self, False, offsets=True)
+
+    def _build_sparse(self):
+        """
+        wrap the CSR arrays of the current transformation
+        """
+        return scipy.sparse.csr_matrix((self.data, self.indices, self.indptr),
+                                       shape=(self._n, self._n), copy=False)
+
+    @property
+    def n(self):
+        """
+        number of units
+        """
+        return self._n
+
+    @property
+    def cardinalities(self):
+        """
+        number of neighbors for each observation : dict
+        """
+        if 'cardinalities' not in self._cache:
+            c = np.diff(self.indptr).tolist()
+            self._cardinalities = dict(zip(self._id_order, c))
+            self._cache['cardinalities'] = self._cardinalities
+        return self._cardinalities
+
+    @property
+    def islands(self):
+        """
+        list of ids without any neighbors
+        """
+        if 'islands' not in self._cache:
+            ids = np.nonzero(np.diff(self.indptr) == 0)[0]
+            self._islands = [self._id_order[i] for i in ids]
+            self._cache['islands'] = self._islands
+        return self._islands
+
+    def _set_id_order(self, ordered_ids):
+        """
+        Set the order of the observations, permuting the rows and columns
+        of the CSR arrays accordingly.
+        """
+        if set(self._id_order) != set(ordered_ids):
+            raise Exception('ordered_ids do not align with W ids')
+        id2i = self.id2i
+        perm = np.array([id2i[i] for i in ordered_ids])
+        nnz = len(self.indices)
+        # track the position of every weight through the permutation
+        pos = scipy.sparse.csr_matrix((np.arange(1, nnz + 1), self.indices,
+                                       self.indptr), shape=(self._n, self._n))
+        inv = np.empty(self._n, int)
+        inv[perm] = np.arange(self._n)
+        pos = pos[perm].tocoo()
+        pos = scipy.sparse.csr_matrix((pos.data, (pos.row, inv[pos.col])),
+                                      shape=(self._n, self._n))
+        pos.sort_indices()
+        order = pos.data - 1
+        self.indptr = pos.indptr
+        self.indices = pos.indices
+        for key in self.transformations:
+            self.transformations[key] = self.transformations[key][order]
+        self.data = self.transformations[self._transform]
+        self._id_order = list(ordered_ids)
+        self._id_order_set = True
+        self._reset()
+
+    def _get_id_order(self):
+        return self._id_order
+
+    id_order = property(_get_id_order, _set_id_order)
+
+    def set_transform(self, value="B"):
+        """
+        Transformations of weights.
+
+        Notes
+        -----
+
+        Transformations are applied only to the value of the weights at
+        instantiation and are cached as data arrays.
+
+        Parameters
+        ----------
+        transform : string (not case sensitive)
+                    B: Binary
+                    R: Row-standardization (global sum=n)
+                    D: Double-standardization (global sum=1)
+                    V: Variance stabilizing
+                    O: Restore original transformation (from instantiation)
+
+        Examples
+        --------
+        >>> import pysal
+        >>> w = pysal.weights.WCSR(pysal.lat2W().sparse)
+        >>> w.transform = 'r'
+        >>> w.weights[0]
+        [0.5, 0.5]
+        >>> w.transform = 'v'
+        >>> w.s0 == w.n
+        True
+        """
+        value = value.upper()
+        if value not in self.transformations:
+            original = self.transformations['O']
+            rows = np.repeat(np.arange(self._n), np.diff(self.indptr))
+            if value == "R":
+                row_sum = np.bincount(rows, original, self._n)
+                if not self.silent_island_warning:
+                    for i in np.nonzero(row_sum == 0)[0]:
+                        print 'WARNING: ', self._id_order[i], ' is an island (no neighbors)'
+                data = original / row_sum[rows]
+            elif value == "D":
+                data = original / original.sum()
+            elif value == "B":
+                data = np.ones_like(original)
+            elif value == "V":
+                q = np.sqrt(np.bincount(rows, original * original, self._n))
+                data = original / q[rows]
+                data *= self._n / data.sum()
+            else:
+                print 'unsupported weights transformation'
+                return
+            self.transformations[value] = data
+        self._transform = value
+        self.data = self.transformations[value]
+        self._reset()
+
+    transform = property(W.get_transform, set_transform)
+
+
+class _CSRView(collections.Mapping):
+    """
+    Read-only dictionary like view on the rows of a WCSR object
+    """
+    def __init__(self, w, weights, offsets=False):
+        self._w = w
+        self._weights = weights
+        self._offsets = offsets
+
+    def __getitem__(self, key):
+        w = self._w
+        i = w.id2i[key]
+        start, end = w.indptr[i], w.indptr[i + 1]
+        if self._weights:
+            return w.data[start:end].tolist()
+        offsets = w.indices[start:end].tolist()
+        if self._offsets:
+            return offsets
+        ids = w._id_order
+        return [ids[j] for j in offsets]
+
+    def __iter__(self):
+        return iter(self._w._id_order)
+
+    def __len__(self):
+        return self._w._n
+
+
+
+
 
 class WSP(object):
     """
@@ -1006,7 +1364,7 @@ class WSP(object):
         trace of :math:`W^{'}W + WW`
         """
         if 'trcWtW_WW' not in self._cache:
-            self._trcWtW_WW = self.diagWtW_WW.sum()
+            self._trcWtW_WW = sparse_moments(self.sparse)['trcWtW_WW']
             self._cache['trcWtW_WW'] = self._trcWtW_WW
         return self._trcWtW_WW
 
@@ -1016,9 +1374,7 @@ class WSP(object):
         diagonal of :math:`W^{'}W + WW`
         """
         if 'diagWtW_WW' not in self._cache:
-            wt = self.sparse.transpose()
-            w = self.sparse
-            self._diagWtW_WW = (wt * w + w * w).diagonal()
+            self._diagWtW_WW = sparse_moments(self.sparse)['diagWtW_WW']
             self._cache['diagWtW_WW'] = self._diagWtW_WW
         return self._diagWtW_WW
 